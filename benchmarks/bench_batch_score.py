@@ -0,0 +1,156 @@
+# Check that scripts/batch_score.py writes the same churn likelihood PLAYER_360 computes one player at a
+# time and rescores only changed, new and re-versioned rows, then compare the throughput in rows/s of the
+# per-player calls with the batch scorer on 1 and more workers and with an incremental rerun
+#
+#   python benchmarks/bench_batch_score.py --users 100000 1000000 --workers 1 4
+import argparse
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from common import print_table, timer
+from batch_score import FEATURE_COLUMNS, HASHED_COLUMNS, PREDICTIONS_TABLE, LocalBatchScorer, load_booster
+from player_loader import PREDICTION_HASH_COLUMNS
+
+
+def make_scoring_features(n_users, seed=0):
+    # the latest feature row of every active player, like APP.TO_BE_PREDICTED_CHURN_FEATURES
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'USER_ID': np.arange(1001, 1001 + n_users),
+        'DAY': pd.Timestamp('2024-12-31').strftime('%Y-%m-%d'),
+    })
+    for i, column in enumerate(FEATURE_COLUMNS):
+        df[column] = np.round(rng.gamma(1.0 + i % 3, 10.0, size=n_users), 2)
+    return df
+
+
+def train_booster(path, n_rows=20_000, seed=0):
+    # a booster of the notebook's shape, saved like model.to_xgboost().save_model()
+    df = make_scoring_features(n_rows, seed=seed + 1)
+    label = (df['TOTAL_SESSIONS_ROLLING_30_DAYS'] + np.random.default_rng(seed).normal(0, 5, n_rows) > 10).astype(int)
+    booster = xgb.train({'objective': 'binary:logistic', 'nthread': 1}, xgb.DMatrix(df[FEATURE_COLUMNS], label=label), num_boost_round=100)
+    booster.save_model(path)
+    return path
+
+
+def app_conn(features_df):
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.execute("ATTACH DATABASE ':memory:' AS APP")
+    write_features(conn, features_df)
+    return conn
+
+
+def write_features(conn, features_df):
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS APP.TO_BE_PREDICTED_CHURN_FEATURES")
+        features_df.to_sql('_load_features', conn, index=False)
+        conn.execute("CREATE TABLE APP.TO_BE_PREDICTED_CHURN_FEATURES AS SELECT * FROM _load_features")
+        conn.execute("DROP TABLE _load_features")
+
+
+def predictions(conn):
+    return pd.read_sql_query(f"SELECT * FROM APP.{PREDICTIONS_TABLE} ORDER BY USER_ID", conn)
+
+
+def score_one_by_one(booster, features_df):
+    # PLAYER_360: one predict_proba call on the single feature row of the player that was opened
+    return np.array([booster.predict(xgb.DMatrix(features_df.iloc[[i]][FEATURE_COLUMNS]))[0] for i in range(len(features_df))])
+
+
+def check_batch_score(model_path, n_users=5_000, seed=0):
+    # PLAYER_360 only finds a precomputed prediction if it hashes the same columns in the same order
+    assert PREDICTION_HASH_COLUMNS == HASHED_COLUMNS, (PREDICTION_HASH_COLUMNS, HASHED_COLUMNS)
+    booster = load_booster(model_path)
+    features_df = make_scoring_features(n_users, seed=seed)
+    conn = app_conn(features_df)
+    run = LocalBatchScorer(conn, booster, chunk_rows=1_000, max_workers=4).run()
+    assert (run.rows, run.written, run.deleted, run.partitions) == (n_users, n_users, 0, 5)
+    scored_df = predictions(conn)
+    assert scored_df['USER_ID'].tolist() == features_df['USER_ID'].tolist()
+    sample = features_df.sample(50, random_state=seed).sort_values('USER_ID')
+    np.testing.assert_allclose(scored_df.set_index('USER_ID').loc[sample['USER_ID'], 'PREDICT_PROBA_1'],
+                               score_one_by_one(booster, sample), rtol=1e-6)
+    np.testing.assert_allclose(scored_df['PREDICT_PROBA_0'] + scored_df['PREDICT_PROBA_1'], 1.0)
+    assert set(scored_df['MODEL_VERSION']) == {'v1'} and scored_df['SCORED_AT'].notna().all()
+
+    # the same scores on one worker and in one partition
+    single = app_conn(features_df)
+    LocalBatchScorer(single, booster, chunk_rows=n_users, max_workers=1).run()
+    pd.testing.assert_frame_equal(predictions(single).drop(columns='SCORED_AT'), scored_df.drop(columns='SCORED_AT'))
+    single.close()
+
+    # nothing changed, nothing is scored
+    assert LocalBatchScorer(conn, booster, chunk_rows=1_000).run().written == 0
+
+    # changed, new and departed players
+    changed = features_df.copy()
+    changed.loc[changed.index[:10], 'TOTAL_ADS_ROLLING_30_DAYS'] += 1
+    changed.loc[changed.index[10:20], 'DAY'] = '2025-01-01'
+    changed = pd.concat([changed.iloc[:-5], make_scoring_features(3, seed=seed + 2).assign(USER_ID=[1, 2, 3])])
+    write_features(conn, changed)
+    before = predictions(conn).set_index('USER_ID')
+    run = LocalBatchScorer(conn, booster, chunk_rows=1_000).run()
+    assert (run.written, run.deleted) == (23, 5), run
+    after = predictions(conn).set_index('USER_ID')
+    assert len(after) == len(changed)
+    untouched = changed['USER_ID'].iloc[20:-3]
+    pd.testing.assert_frame_equal(after.loc[untouched], before.loc[untouched])
+
+    # a new model version rescores everyone
+    run = LocalBatchScorer(conn, booster, version='v2', chunk_rows=1_000).run()
+    assert run.written == len(changed) and set(predictions(conn)['MODEL_VERSION']) == {'v2'}
+    conn.close()
+    print(f"batch score checks passed on {n_users:,} players")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--chunk-rows', type=int, default=50_000)
+    parser.add_argument('--one-by-one', type=int, default=2_000, help="players scored one at a time to estimate the page path")
+    parser.add_argument('--changed', type=float, default=0.01, help="share of players whose features change before the rerun")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        model_path = train_booster(str(Path(folder) / 'churn_model.json'), seed=args.seed)
+        check_batch_score(model_path, seed=args.seed)
+        booster = load_booster(model_path)
+
+        rows = []
+        for n_users in args.users:
+            features_df = make_scoring_features(n_users, seed=args.seed)
+            timings = {}
+            with timer(timings, 'one_by_one'):
+                score_one_by_one(booster, features_df.iloc[:args.one_by_one])
+            row = {'users': f"{n_users:,}", 'one_by_one_rows_s': f"{args.one_by_one / timings['one_by_one']:,.0f}"}
+            for workers in args.workers:
+                conn = app_conn(features_df)
+                run = LocalBatchScorer(conn, booster, chunk_rows=args.chunk_rows, max_workers=workers).run()
+                row[f"batch_{workers}w_rows_s"] = f"{run.rows_per_second:,.0f}"
+                conn.close()
+            # the next refresh, a share of the players played since
+            changed = features_df.copy()
+            picked = changed.sample(frac=args.changed, random_state=args.seed).index
+            changed.loc[picked, 'TOTAL_SESSIONS_ROLLING_30_DAYS'] += 1
+            conn = app_conn(features_df)
+            LocalBatchScorer(conn, booster, chunk_rows=args.chunk_rows, max_workers=max(args.workers)).run()
+            write_features(conn, changed)
+            rerun = LocalBatchScorer(conn, booster, chunk_rows=args.chunk_rows, max_workers=max(args.workers)).run()
+            assert rerun.written == len(picked)
+            row['rerun_scored'] = f"{rerun.written:,}"
+            row['rerun_s'] = f"{rerun.seconds:.2f}"
+            conn.close()
+            rows.append(row)
+    print_table(rows, ['users', 'one_by_one_rows_s'] + [f"batch_{workers}w_rows_s" for workers in args.workers]
+                + ['rerun_scored', 'rerun_s'])
+
+
+if __name__ == '__main__':
+    main()
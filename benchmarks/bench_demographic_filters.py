@@ -0,0 +1,90 @@
+# Benchmark the single-mask GAME_360 filters against the per-row age apply of filter_dataframe
+#
+#   python benchmarks/bench_demographic_filters.py --rows 1000000 10000000
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from bench_query_builder import BENCH_FILTERS, CHECK_FILTERS, pandas_filter, random_filters
+from common import print_table, timer
+from demographic_filters import age_range_codes, filter_players
+from synthetic import LOCATIONS, RANKS
+
+
+def make_demographic_columns(n_rows, seed=0):
+    # only the filtered columns, the strings are shared objects like in a fetched frame
+    rng = np.random.default_rng(seed)
+
+    def choice(options):
+        return np.array(options, dtype=object)[rng.integers(0, len(options), size=n_rows)]
+
+    return pd.DataFrame({
+        'USER_ID': np.arange(n_rows),
+        'CHURNED': rng.integers(0, 2, size=n_rows),
+        'AGE': rng.integers(8, 80, size=n_rows),
+        'GENDER': choice(['Male', 'Female']),
+        'LOCATION': choice(LOCATIONS),
+        'PLAYER_TYPE': choice(['Hardcore', 'Casual']),
+        'HAS_SUPPORT_TICKET': rng.random(n_rows) < 0.2,
+        'RANK_NAME': choice(RANKS),
+    })
+
+
+def check_equivalence(n_rows, seed, n_random=50):
+    df = make_demographic_columns(n_rows, seed=seed)
+    # fractional, missing and out of range ages
+    df['AGE'] = df['AGE'].astype(float)
+    df.loc[::97, 'AGE'] = 11.5
+    df.loc[::89, 'AGE'] = np.nan
+    df.loc[::83, 'AGE'] = -1
+    df.loc[::79, 'AGE'] = 101
+
+    rng = np.random.default_rng(seed)
+    age_codes = age_range_codes(df['AGE'])
+    for filters in CHECK_FILTERS + [random_filters(rng) for _ in range(n_random)]:
+        expected = pandas_filter(df, filters)
+        pd.testing.assert_frame_equal(filter_players(df, filters), expected)
+        pd.testing.assert_frame_equal(filter_players(df, filters, age_codes), expected)
+    print(f"equivalence check passed on {n_rows:,} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--apply-max-rows', type=int, default=1_000_000,
+                        help='only time the per-row apply up to this many rows')
+    parser.add_argument('--check-rows', type=int, default=20_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_equivalence(args.check_rows, args.seed)
+
+    rows = []
+    for n_rows in args.rows:
+        df = make_demographic_columns(n_rows, seed=args.seed)
+        timings = {}
+        with timer(timings, 'mask'):
+            filtered_df = filter_players(df, BENCH_FILTERS)
+        with timer(timings, 'age_codes'):
+            age_codes = age_range_codes(df['AGE'])
+        with timer(timings, 'mask_precomputed'):
+            filter_players(df, BENCH_FILTERS, age_codes)
+        if n_rows <= args.apply_max_rows:
+            with timer(timings, 'apply'):
+                pandas_filter(df, BENCH_FILTERS)
+        rows.append({
+            'rows': f"{n_rows:,}",
+            'matching': f"{len(filtered_df):,}",
+            'mask_s': f"{timings['mask']:.3f}",
+            'age_codes_s': f"{timings['age_codes']:.3f}",
+            'mask_precomputed_s': f"{timings['mask_precomputed']:.3f}",
+            'apply_s': f"{timings['apply']:.3f}" if 'apply' in timings else 'skipped',
+            'speedup': f"{timings['apply'] / timings['mask']:.0f}x" if 'apply' in timings else '',
+        })
+        del df, filtered_df, age_codes
+    print_table(rows, ['rows', 'matching', 'mask_s', 'age_codes_s', 'mask_precomputed_s', 'apply_s', 'speedup'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Benchmark the vectorized date-range densification against the per-user loop
+#
+#   python benchmarks/bench_densify.py --users 10000 100000 1000000
+import argparse
+
+import pandas as pd
+
+from common import print_table, timer
+from reference import fill_date_range_loop
+from rolling_features import densify_user_days, user_login_bounds
+from synthetic import make_day_sessions
+
+
+def check_equivalence(n_users, seed):
+    day_sessions_df = make_day_sessions(n_users, seed=seed)
+    users_logins_df = user_login_bounds(day_sessions_df)
+    expected = fill_date_range_loop(day_sessions_df, users_logins_df)
+    result = densify_user_days(day_sessions_df, users_logins_df)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    print(f"equivalence check passed on {n_users:,} users ({len(result):,} rows)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--loop-max-users', type=int, default=10_000,
+                        help='only time the per-user loop up to this many users')
+    parser.add_argument('--check-users', type=int, default=2_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_equivalence(args.check_users, args.seed)
+
+    rows = []
+    for n_users in args.users:
+        day_sessions_df = make_day_sessions(n_users, seed=args.seed)
+        users_logins_df = user_login_bounds(day_sessions_df)
+        timings = {}
+        with timer(timings, 'vectorized'):
+            dense_df = densify_user_days(day_sessions_df, users_logins_df)
+        if n_users <= args.loop_max_users:
+            with timer(timings, 'loop'):
+                fill_date_range_loop(day_sessions_df, users_logins_df)
+        rows.append({
+            'users': f"{n_users:,}",
+            'active_rows': f"{len(day_sessions_df):,}",
+            'dense_rows': f"{len(dense_df):,}",
+            'vectorized_s': f"{timings['vectorized']:.3f}",
+            'loop_s': f"{timings['loop']:.3f}" if 'loop' in timings else 'skipped',
+            'speedup': f"{timings['loop'] / timings['vectorized']:.0f}x" if 'loop' in timings else '',
+        })
+    print_table(rows, ['users', 'active_rows', 'dense_rows', 'vectorized_s', 'loop_s', 'speedup'])
+
+
+if __name__ == '__main__':
+    main()
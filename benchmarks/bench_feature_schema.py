@@ -0,0 +1,127 @@
+# Check that the rolling feature build with the compact dtypes of notebooks/feature_schema.py returns the
+# features of the default build value for value at the widths of APP.ROLLING_CHURN_FEATURES, that Arrow
+# and pandas batches are cast alike and that values which do not fit raise, then report the peak RSS and
+# the frame sizes of the fetch and feature build before and after, each build in its own process
+#
+#   python benchmarks/bench_feature_schema.py --users 10000 50000
+import argparse
+import gc
+import json
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from common import print_table, timer
+from feature_schema import PURCHASES, ROLLING_FEATURES, SESSION_POINTS, compact_batches, compact_frame
+from local_engine import connect
+from pipeline import fetch_notebook_inputs, notebook_features
+from player_loader import compact_features
+from run import peak_rss_mb, reset_peak_rss
+from synthetic import make_raw_activity
+
+
+def make_connection(n_users, seed=0):
+    sessions_df, points_df, purchases_df = make_raw_activity(n_users, seed=seed)
+    return connect({'RAW.SESSIONS': sessions_df, 'ANALYTIC.POINTS_PER_EVENT': points_df, 'RAW.PURCHASES': purchases_df})
+
+
+def frame_mb(df):
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def check_feature_schema(n_users=3_000, seed=0):
+    conn = make_connection(n_users, seed)
+    default_df = notebook_features(*fetch_notebook_inputs(conn, compact=False), compact=False)
+    session_points_df, purchases_df = fetch_notebook_inputs(conn)
+    assert session_points_df.dtypes.to_dict() == {column: np.dtype(dtype) if isinstance(dtype, str) else dtype
+                                                  for column, dtype in SESSION_POINTS.items()}
+    compact_df = notebook_features(session_points_df, purchases_df)
+
+    # the same features, at the widths of the table
+    assert {column: str(dtype) for column, dtype in compact_df.dtypes.items()} == ROLLING_FEATURES
+    pd.testing.assert_frame_equal(compact_df, default_df, check_dtype=False)
+    assert (default_df.dtypes.drop('LOGIN_NEXT_7_DAYS') == compact_df.dtypes.drop('LOGIN_NEXT_7_DAYS')).all()
+    # the pages read the table back at the same widths
+    pd.testing.assert_frame_equal(compact_features(default_df.astype({'USER_ID': 'int64', 'SESSION_INACTIVE': 'int64'})),
+                                  compact_df)
+
+    # Arrow batches, as fetch_arrow_batches returns them, and pandas batches give the same frame
+    raw_df = pd.read_sql_query("SELECT * FROM RAW.PURCHASES", conn, parse_dates=['TIMESTAMP_OF_PURCHASE'])
+    table = pa.Table.from_pandas(raw_df, preserve_index=False)
+    from_arrow = compact_batches(table.to_batches(max_chunksize=1_000), PURCHASES)
+    from_pandas = compact_batches((raw_df.iloc[start:start + 1_000] for start in range(0, len(raw_df), 1_000)), PURCHASES)
+    pd.testing.assert_frame_equal(from_arrow, from_pandas)
+    pd.testing.assert_frame_equal(from_arrow, purchases_df.drop(columns='DAY'))
+    assert from_arrow['PURCHASE_TYPE'].dtype == PURCHASES['PURCHASE_TYPE']
+    empty = compact_batches([], PURCHASES)
+    assert len(empty) == 0 and list(empty.columns) == list(PURCHASES)
+
+    # values that do not fit raise instead of wrapping or turning into NaN
+    for df in [pd.DataFrame({'AD_CONVERSION': [0, 300]}), pd.DataFrame({'AD_TYPE': ['video', 'popup']})]:
+        try:
+            compact_frame(df, PURCHASES)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{list(df.columns)} should not fit")
+    conn.close()
+    print(f"feature schema checks passed on {len(compact_df):,} feature rows")
+
+
+def build(n_users, compact, seed=0):
+    # runs in a child process, the peak is measured from the loaded tables on
+    conn = make_connection(n_users, seed)
+    gc.collect()
+    reset_peak_rss()
+    start_mb = peak_rss_mb()
+    timings = {}
+    with timer(timings, 'fetch'):
+        session_points_df, purchases_df = fetch_notebook_inputs(conn, compact)
+    fetch_mb = frame_mb(session_points_df) + frame_mb(purchases_df)
+    n_rows = len(session_points_df) + len(purchases_df)
+    with timer(timings, 'build'):
+        features_df = notebook_features(session_points_df, purchases_df, compact=compact)
+    return {'rows': n_rows, 'feature_rows': len(features_df), 'fetch_mb': fetch_mb, 'features_mb': frame_mb(features_df),
+            'peak_mb': peak_rss_mb() - start_mb, 'fetch_s': timings['fetch'], 'build_s': timings['build']}
+
+
+def measure(n_users, compact, seed=0):
+    command = [sys.executable, '-W', 'ignore', __file__, '--child', 'compact' if compact else 'default',
+               '--users', str(n_users), '--seed', str(seed)]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[10_000, 50_000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--child', choices=['default', 'compact'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(build(args.users[0], args.child == 'compact', args.seed)))
+        return
+    check_feature_schema(seed=args.seed)
+    rows = []
+    for n_users in args.users:
+        before = measure(n_users, compact=False, seed=args.seed)
+        after = measure(n_users, compact=True, seed=args.seed)
+        rows.append({
+            'users': f"{n_users:,}",
+            'raw_rows': f"{before['rows']:,}",
+            'feature_rows': f"{before['feature_rows']:,}",
+            'fetch_mb': f"{before['fetch_mb']:,.0f} -> {after['fetch_mb']:,.0f}",
+            'features_mb': f"{before['features_mb']:,.0f} -> {after['features_mb']:,.0f}",
+            'peak_rss_mb': f"{before['peak_mb']:,.0f} -> {after['peak_mb']:,.0f}",
+            'peak_saved': f"{1 - after['peak_mb'] / before['peak_mb']:.0%}",
+            'seconds': f"{before['fetch_s'] + before['build_s']:.1f} -> {after['fetch_s'] + after['build_s']:.1f}",
+        })
+    print_table(rows, ['users', 'raw_rows', 'feature_rows', 'fetch_mb', 'features_mb', 'peak_rss_mb', 'peak_saved', 'seconds'])
+
+
+if __name__ == '__main__':
+    main()
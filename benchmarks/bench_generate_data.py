@@ -0,0 +1,110 @@
+# Check that scripts/generate_data.py is deterministic by seed whatever the worker count, writes the RAW
+# schemas ingest_raw.py loads, and gives the churn and player type mixes RETENTION and DEMOGRAPHICS expect,
+# then time it at a few sizes
+#
+#   python benchmarks/bench_generate_data.py --users 10000 100000 --workers 1 4
+import argparse
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from common import print_table, timer
+from generate_data import CHUNK_ID_SPACE, CHURN_DAYS, RAW_COLUMNS, generate
+from ingest_raw import RAW_SOURCES, LocalIngest, read_raw_file
+
+END = '2024-12-31'
+
+
+def folder_bytes(folder):
+    return {path.relative_to(folder).as_posix(): path.read_bytes() for path in sorted(Path(folder).rglob('*')) if path.is_file()}
+
+
+def check_generator(work, n_users=3000, chunk_users=1000):
+    work = Path(work)
+    counts = generate(work / 'a', n_users, chunk_users=chunk_users, seed=7, end=END, workers=1)
+    generate(work / 'b', n_users, chunk_users=chunk_users, seed=7, end=END, workers=2)
+    generate(work / 'c', n_users, chunk_users=chunk_users, seed=8, end=END, workers=2)
+    first = folder_bytes(work / 'a')
+    assert first == folder_bytes(work / 'b'), "the output depends on the worker count"
+    assert first != folder_bytes(work / 'c')
+    assert len([name for name in first if name.startswith('sessions_output/')]) == n_users // chunk_users
+
+    # the files have the RAW columns and load with the driver, one part per chunk
+    frames = {}
+    for source in RAW_SOURCES:
+        paths = sorted((work / 'a').glob(source.path + '*' if source.path.endswith('/') else source.path))
+        frames[source.table] = pd.concat([read_raw_file(path, source.file_format) for path in paths], ignore_index=True)
+        assert list(frames[source.table].columns) == RAW_COLUMNS[source.table], source.table
+        assert len(frames[source.table]) == counts[source.table]
+    conn = sqlite3.connect(':memory:')
+    conn.execute("ATTACH DATABASE ':memory:' AS RAW")
+    LocalIngest(work / 'a', conn, today=END).run()
+    for table, n_rows in counts.items():
+        assert conn.execute(f"SELECT COUNT(*) FROM RAW.{table}").fetchone()[0] == n_rows
+
+    sessions_df = frames['SESSIONS'].assign(LOG_IN=lambda df: pd.to_datetime(df['LOG_IN']),
+                                            LOG_OUT=lambda df: pd.to_datetime(df['LOG_OUT']))
+    assert sessions_df['SESSION_ID'].is_unique and frames['PURCHASES']['PURCHASE_ID'].is_unique
+    assert sessions_df['SESSION_ID'].max() > CHUNK_ID_SPACE
+    assert (sessions_df['LOG_OUT'] > sessions_df['LOG_IN']).all()
+    assert set(frames['GAME_EVENTS']['SESSION_ID']) <= set(sessions_df['SESSION_ID'])
+    assert sessions_df['USER_ID'].nunique() == n_users == frames['USERS']['USER_ID'].nunique()
+
+    # churned as in RETENTION, Hardcore as in DEMOGRAPHICS (more than 15 sessions per active week)
+    last_login = sessions_df.groupby('USER_ID')['LOG_IN'].max()
+    churned = (pd.Timestamp(END) - last_login.dt.normalize()).dt.days > CHURN_DAYS
+    weeks = sessions_df.assign(WEEK=sessions_df['LOG_IN'].dt.to_period('W')).groupby('USER_ID').agg(
+        SESSIONS=('SESSION_ID', 'size'), ACTIVE_WEEKS=('WEEK', 'nunique'))
+    hardcore = weeks['SESSIONS'] / weeks['ACTIVE_WEEKS'] > 15
+    assert 0.3 < churned.mean() < 0.8 and 0.05 < hardcore.mean() < 0.4
+    tickets = frames['SUPPORT_TICKETS'].groupby('USER_ID').size().reindex(churned.index, fill_value=0)
+    assert tickets[churned].mean() > tickets[~churned].mean()
+    spend = frames['PURCHASES'].groupby('USER_ID')['PURCHASE_AMOUNT'].sum().reindex(hardcore.index, fill_value=0)
+    assert spend[hardcore].mean() > spend[~hardcore].mean()
+
+    # parquet parts hold the same rows as the stage files
+    generate(work / 'p', n_users, chunk_users=chunk_users, seed=7, end=END, file_format='parquet', workers=1)
+    parquet_df = pd.read_parquet(work / 'p' / 'sessions')
+    pd.testing.assert_frame_equal(parquet_df.sort_values('SESSION_ID', ignore_index=True),
+                                  sessions_df.sort_values('SESSION_ID', ignore_index=True), check_dtype=False)
+    print(f"generator checks passed: {churned.mean():.0%} churned, {hardcore.mean():.0%} Hardcore, "
+          f"{len(sessions_df) / n_users:.0f} sessions per player")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--chunk-users', type=int, default=10_000)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as work:
+        check_generator(work)
+        for n_users in args.users:
+            for workers in args.workers:
+                folder = Path(work) / f"out_{n_users}_{workers}"
+                timings = {}
+                with timer(timings, 'generate'):
+                    counts = generate(folder, n_users, chunk_users=args.chunk_users, seed=args.seed, end=END,
+                                      file_format=args.format, workers=workers)
+                n_rows = sum(counts.values())
+                rows.append({
+                    'users': f"{n_users:,}",
+                    'workers': workers,
+                    'rows': f"{n_rows:,}",
+                    'seconds': f"{timings['generate']:.1f}",
+                    'rows_per_s': f"{n_rows / timings['generate']:,.0f}",
+                    'mb': f"{sum(path.stat().st_size for path in folder.rglob('*') if path.is_file()) / 2**20:.0f}",
+                })
+                shutil.rmtree(folder)
+    print_table(rows, ['users', 'workers', 'rows', 'seconds', 'rows_per_s', 'mb'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# Benchmark the packed (USER_ID, DAY) anti-join used to hold out the rows to predict
+#
+#   python benchmarks/bench_holdout.py --rows 50000000
+import argparse
+import gc
+
+import numpy as np
+import pandas as pd
+
+from common import print_table, timer
+from holdout import anti_join_user_days, holdout_split, user_day_keys
+from rolling_features import latest_user_rows, user_day_grid
+
+
+def make_feature_rows(n_rows, seed=0):
+    # dense (USER_ID, DAY) grid of about n_rows rows, 30 to 120 days per user
+    rng = np.random.default_rng(seed)
+    spans = rng.integers(30, 121, size=n_rows // 30 + 1)
+    spans = spans[:np.searchsorted(np.cumsum(spans), n_rows) + 1]
+    first_days = np.datetime64('2023-01-01') + rng.integers(0, 365, size=len(spans)).astype('timedelta64[D]')
+    users_logins_df = pd.DataFrame({
+        'USER_ID': np.arange(1001, 1001 + len(spans), dtype=np.int32),
+        'FIRST_LOGIN_DAY': pd.to_datetime(first_days),
+        'LAST_LOGIN_DAY': pd.to_datetime(first_days + (spans - 1).astype('timedelta64[D]')),
+    })
+    return user_day_grid(users_logins_df).to_frame(index=False).iloc[:n_rows]
+
+
+def merge_anti_join(df, exclude_df):
+    # the conventional correct alternative, kept for comparison
+    merged = df.merge(exclude_df[['USER_ID', 'DAY']], on=['USER_ID', 'DAY'], how='left', indicator=True)
+    return merged[merged['_merge'] == 'left_only'].drop(columns='_merge')
+
+
+def isin_mask(df, exclude_df):
+    # removed_to_pred_df cell before the change
+    mask = df[['USER_ID', 'DAY']].isin(exclude_df[['USER_ID', 'DAY']]).all(axis=1)
+    return df[~mask]
+
+
+def check_holdout_split(n_rows=200_000, seed=0):
+    features_df = make_feature_rows(n_rows, seed=seed)
+    active_user_ids = features_df['USER_ID'].unique()[::2]
+    horizon = 7
+    train_df, test_df, predict_df = holdout_split(features_df, active_user_ids, test_days=30, horizon=horizon)
+    # the test period is the last 30 days of the rows left once the ones to predict are held out
+    test_start = anti_join_user_days(features_df, predict_df)['DAY'].max() - pd.Timedelta(days=29)
+    assert test_df['DAY'].min() >= test_start
+    # no training label window reaches into the test period
+    assert train_df['DAY'].max() < test_start - pd.Timedelta(days=horizon)
+    # one row to predict per active user, held out of both train and test
+    assert len(predict_df) == len(active_user_ids)
+    predict_keys = user_day_keys(predict_df)
+    assert not np.isin(user_day_keys(train_df), predict_keys).any()
+    assert not np.isin(user_day_keys(test_df), predict_keys).any()
+
+    # an explicit test_start, and a table the rows to predict were already held out of
+    test_start = pd.Timestamp('2023-09-01')
+    train_df, test_df, predict_df = holdout_split(anti_join_user_days(features_df, latest_user_rows(features_df)),
+                                                  test_start=test_start, horizon=horizon)
+    assert train_df['DAY'].max() < test_start - pd.Timedelta(days=horizon) and test_df['DAY'].min() >= test_start
+    assert predict_df.empty
+    print("holdout split checks passed")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000, 50_000_000])
+    parser.add_argument('--compare-max-rows', type=int, default=10_000_000,
+                        help='only run the merge and isin versions up to this many rows')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_holdout_split(seed=args.seed)
+    rows = []
+    for n_rows in args.rows:
+        features_df = make_feature_rows(n_rows, seed=args.seed)
+        to_pred_df = latest_user_rows(features_df)
+        timings = {}
+        with timer(timings, 'packed'):
+            kept_df = anti_join_user_days(features_df, to_pred_df)
+        row = {
+            'rows': f"{len(features_df):,}",
+            'held_out': f"{len(to_pred_df):,}",
+            'packed_s': f"{timings['packed']:.2f}",
+            'kept': f"{len(kept_df):,}",
+        }
+        if n_rows <= args.compare_max_rows:
+            with timer(timings, 'merge'):
+                expected_df = merge_anti_join(features_df, to_pred_df)
+            pd.testing.assert_frame_equal(kept_df.reset_index(drop=True), expected_df.reset_index(drop=True))
+            with timer(timings, 'isin'):
+                isin_kept_df = isin_mask(features_df, to_pred_df)
+            row.update({
+                'merge_s': f"{timings['merge']:.2f}",
+                'isin_s': f"{timings['isin']:.2f}",
+                'isin_kept': f"{len(isin_kept_df):,}",
+            })
+            del expected_df, isin_kept_df
+        rows.append(row)
+        del features_df, to_pred_df, kept_df
+        gc.collect()
+    # isin_kept shows how many rows the old mask kept, it should equal kept
+    print_table(rows, ['rows', 'held_out', 'packed_s', 'kept', 'merge_s', 'isin_s', 'isin_kept'])
+
+
+if __name__ == '__main__':
+    main()
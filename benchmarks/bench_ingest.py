@@ -0,0 +1,132 @@
+# Check the local mode of scripts/ingest_raw.py against raw_build.sql run on SQLite (load, then UPDATE
+# the timestamps), check that reruns and interrupted runs only load the missing files, and time both
+#
+#   python benchmarks/bench_ingest.py --users 2000 20000 --files 8
+import argparse
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from common import print_table, timer
+from ingest_raw import INGEST_LOG, RAW_SOURCES, LocalIngest
+from reference import raw_build_local
+from synthetic import write_stage_layout
+
+TODAY = pd.Timestamp('2025-06-01')
+
+
+def raw_conn(path=':memory:'):
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.execute("ATTACH DATABASE ? AS RAW", [str(path)])
+    return conn
+
+
+def table_frames(conn):
+    frames = {}
+    for source in RAW_SOURCES:
+        df = pd.read_sql_query(f"SELECT * FROM RAW.{source.table}", conn)
+        frames[source.table] = df.sort_values(list(df.columns), ignore_index=True)
+    return frames
+
+
+def assert_same_tables(conn, expected_conn):
+    result, expected = table_frames(conn), table_frames(expected_conn)
+    for table in expected:
+        pd.testing.assert_frame_equal(result[table], expected[table], check_dtype=False, obj=table)
+
+
+def log_counts(conn):
+    return dict(conn.execute(f"SELECT TABLE_NAME, COUNT(*) FROM RAW.{INGEST_LOG} GROUP BY TABLE_NAME").fetchall())
+
+
+def check_equivalence(folder, n_files):
+    expected_conn = raw_conn()
+    days = raw_build_local(folder, expected_conn, TODAY)
+
+    conn = raw_conn()
+    ingest = LocalIngest(folder, conn, max_workers=2, today=TODAY)
+    loaded = ingest.run()
+    assert loaded['SESSIONS'] == n_files and loaded['USERS'] == 1
+    assert_same_tables(conn, expected_conn)
+    assert conn.execute(f"SELECT MAX(DAYS_SHIFTED) FROM RAW.{INGEST_LOG}").fetchone()[0] == days
+
+    # a rerun with nothing new loads nothing and changes nothing
+    assert sum(LocalIngest(folder, conn, today=TODAY + pd.Timedelta(days=3)).run().values()) == 0
+    assert_same_tables(conn, expected_conn)
+
+    # a run that fails half way keeps the files it committed, the next run loads only the rest
+    with tempfile.TemporaryDirectory() as work:
+        broken = Path(work) / 'stage'
+        shutil.copytree(folder, broken)
+        last = sorted((broken / 'purchases_output').iterdir())[-1]
+        content = last.read_bytes()
+        last.write_bytes(b'not gzip')
+        conn = raw_conn(Path(work) / 'raw.db')
+        try:
+            LocalIngest(broken, conn, max_workers=2, today=TODAY).run()
+            raise AssertionError("the broken file loaded")
+        except (OSError, EOFError, ValueError):
+            pass
+        partial = log_counts(conn)
+        assert 0 < sum(partial.values()) < sum(len(ingest.files(source)) for source in RAW_SOURCES)
+        conn.close()
+        last.write_bytes(content)
+        conn = raw_conn(Path(work) / 'raw.db')
+        resumed = LocalIngest(broken, conn, max_workers=2, today=TODAY + pd.Timedelta(days=10)).run()
+        assert all(resumed[table] + partial.get(table, 0) == len(ingest.files(source))
+                   for source in RAW_SOURCES for table in [source.table])
+        # the shift recorded by the first run is kept, so a later CURRENT_DATE does not move the rows
+        assert_same_tables(conn, expected_conn)
+    print(f"equivalence checks passed, dates shifted by {days} days")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[2_000, 20_000])
+    parser.add_argument('--files', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as work:
+        for n_users in args.users:
+            folder = Path(work) / f"stage_{n_users}"
+            folder.mkdir()
+            write_stage_layout(folder, n_users, n_files=args.files, seed=args.seed)
+            if n_users == args.users[0]:
+                check_equivalence(folder, args.files)
+
+            timings = {}
+            with timer(timings, 'old'):
+                raw_build_local(folder, raw_conn(), TODAY)
+            conn = raw_conn()
+            with timer(timings, 'new'):
+                LocalIngest(folder, conn, max_workers=args.workers, today=TODAY).run()
+            n_rows = sum(conn.execute(f"SELECT COUNT(*) FROM RAW.{source.table}").fetchone()[0] for source in RAW_SOURCES)
+
+            # one more session file lands: the old script reloads everything, the driver loads that file
+            extra = folder / 'sessions_output' / f"data_{args.files}.csv.gz"
+            shutil.copy(folder / 'sessions_output' / 'data_0.csv.gz', extra)
+            with timer(timings, 'old_rerun'):
+                raw_build_local(folder, raw_conn(), TODAY)
+            with timer(timings, 'new_rerun'):
+                loaded = LocalIngest(folder, conn, max_workers=args.workers, today=TODAY).run()
+            assert sum(loaded.values()) == 1
+            extra.unlink()
+            rows.append({
+                'users': f"{n_users:,}",
+                'rows': f"{n_rows:,}",
+                'raw_build_s': f"{timings['old']:.2f}",
+                'ingest_s': f"{timings['new']:.2f}",
+                'raw_build_rerun_s': f"{timings['old_rerun']:.2f}",
+                'ingest_rerun_s': f"{timings['new_rerun']:.2f}",
+            })
+    print_table(rows, ['users', 'rows', 'raw_build_s', 'ingest_s', 'raw_build_rerun_s', 'ingest_rerun_s'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# Check the span trees, cache hit flags, query IDs and JSON logs of streamlit/instrumentation.py on the
+# local stand-in session, then time what a span costs against the bare call it wraps
+#
+#   python benchmarks/bench_instrumentation.py --spans 10000 100000
+import argparse
+import json
+import logging
+
+import pandas as pd
+
+from common import print_table, timer
+from instrumentation import RenderHistory, RenderTrace, active_trace, span, traced
+from lineage_cache import LineageCache
+from local_engine import LocalSession, connect
+
+
+class CapturedLogs(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(json.loads(record.getMessage()))
+
+
+def check_instrumentation():
+    conn = connect({'RAW.SESSIONS': pd.DataFrame({'USER_ID': [1, 1, 2], 'SESSION_ID': [10, 11, 12]})})
+    session = LocalSession(conn)
+    handler = CapturedLogs()
+    logger = logging.getLogger('player360.render')
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    history = RenderHistory(max_runs=2)
+
+    # a dict stands in for st.cache_data, the traced loader sits outside it like in the pages
+    cached = {}
+
+    @traced('query', queries=True)
+    def load_query(query):
+        if query not in cached:
+            cached[query] = session.sql(query).to_pandas()
+        return cached[query]
+
+    lineage_cache = LineageCache()
+
+    @traced('transform', cache=lineage_cache)
+    @lineage_cache.memoize
+    def sessions_per_user(df):
+        return df.groupby('USER_ID').size()
+
+    with RenderTrace('PLAYER_360', session, history=history) as trace:
+        with span('SESSIONS', 'section'):
+            df = load_query("SELECT * FROM RAW.SESSIONS")
+            load_query("SELECT * FROM RAW.SESSIONS")
+            sessions_per_user(df, lineage=('RAW.SESSIONS', 1))
+            sessions_per_user(df, lineage=('RAW.SESSIONS', 1))
+        try:
+            with span('explain', 'model'):
+                raise KeyError('PREDICT_PROBA_1')
+        except KeyError:
+            pass
+    rows = trace.records()
+    assert [row['PATH'] for row in rows] == ['PLAYER_360', 'PLAYER_360/SESSIONS', 'PLAYER_360/SESSIONS/load_query', 'PLAYER_360/SESSIONS/load_query',
+                     'PLAYER_360/SESSIONS/sessions_per_user', 'PLAYER_360/SESSIONS/sessions_per_user', 'PLAYER_360/explain']
+    assert [row['CACHE_HIT'] for row in rows[2:6]] == [False, True, False, True]
+    assert rows[2]['QUERY_IDS'] == ['local-1'] and rows[3]['QUERY_IDS'] == []
+    assert rows[6]['ERROR'] == 'KeyError' and trace.root.error is None
+    assert rows[1]['SECONDS'] >= sum(row['SECONDS'] for row in rows[2:6]) and active_trace() is None
+
+    # one JSON line per rerun, a rerun cut short is logged when the next one starts
+    interrupted = RenderTrace('PLAYER_360', session, history=history).start()
+    with span('player_bundle', 'query', queries=True):
+        load_query("SELECT * FROM RAW.SESSIONS WHERE USER_ID = 2")
+    RenderTrace('PLAYER_360', session, history=history).start().finish()
+    assert [record['run_id'] for record in handler.records][:2] == [trace.run_id, interrupted.run_id]
+    assert handler.records[1]['error'] == 'interrupted' and handler.records[1]['spans'][1]['query_ids'] == ['local-2']
+
+    # spans with no active trace run the block without recording it
+    with span('prefetch', 'query') as detached:
+        load_query("SELECT 1")
+    assert detached.seconds is None
+
+    # the history keeps the last max_runs reruns
+    summary = history.percentiles_frame('PLAYER_360')
+    assert len(history) == 2 and 'PLAYER_360/SESSIONS/load_query' not in set(summary['PATH'])
+    assert summary.loc[summary['PATH'] == 'PLAYER_360', 'CALLS'].item() == 2
+    logger.removeHandler(handler)
+    session.close()
+    print("instrumentation checks passed")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--spans', type=int, nargs='+', default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    check_instrumentation()
+    logging.getLogger('player360.render').setLevel(logging.WARNING)
+    df = pd.DataFrame({'USER_ID': range(1000), 'POINTS': range(1000)})
+    session = LocalSession(connect({}))
+    rows = []
+    for n_spans in args.spans:
+        timings = {}
+        with timer(timings, 'bare'):
+            for _ in range(n_spans):
+                df['POINTS'].sum()
+        with RenderTrace('bench', history=RenderHistory()) as trace, timer(timings, 'span'):
+            for _ in range(n_spans):
+                with span('sum'):
+                    df['POINTS'].sum()
+        with RenderTrace('bench', session) as trace, timer(timings, 'query_span'):
+            for _ in range(n_spans):
+                with span('sum', 'query', queries=True):
+                    df['POINTS'].sum()
+        with timer(timings, 'records'):
+            trace.records()
+        rows.append({
+            'spans': f"{n_spans:,}",
+            'bare_s': f"{timings['bare']:.3f}",
+            'span_s': f"{timings['span']:.3f}",
+            'query_span_s': f"{timings['query_span']:.3f}",
+            'us_per_span': f"{(timings['span'] - timings['bare']) / n_spans * 1e6:.1f}",
+            'us_per_query_span': f"{(timings['query_span'] - timings['bare']) / n_spans * 1e6:.1f}",
+            'records_s': f"{timings['records']:.3f}",
+        })
+    session.close()
+    print_table(rows, ['spans', 'bare_s', 'span_s', 'query_span_s', 'us_per_span', 'us_per_query_span', 'records_s'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# Benchmark the vectorized labeling and windowing steps against the per-user groupby().apply versions
+#
+#   python benchmarks/bench_labels.py --users 1000 10000 100000
+import argparse
+
+import pandas as pd
+
+from common import print_table, timer
+from reference import calculate_login_within_7_days, remove_first_30_days
+from rolling_features import drop_warmup_days, latest_user_rows, login_next_7_days
+from synthetic import make_feature_days
+
+
+def apply_labels(features_df):
+    # create_labels cell before the change
+    return features_df.groupby('USER_ID', group_keys=False).apply(calculate_login_within_7_days)['LOGIN_NEXT_7_DAYS']
+
+
+def apply_latest_rows(features_df):
+    # predicted_df cell before the change
+    return features_df.sort_values(by=['USER_ID', 'DAY']).groupby('USER_ID').apply(lambda x: x.iloc[-1]).reset_index(drop=True)
+
+
+def run_steps(features_df, vectorized):
+    timings = {}
+    with timer(timings, 'trim'):
+        trimmed_df = drop_warmup_days(features_df) if vectorized else remove_first_30_days(features_df)
+    labeled_df = trimmed_df.copy()
+    with timer(timings, 'label'):
+        labeled_df['LOGIN_NEXT_7_DAYS'] = login_next_7_days(trimmed_df) if vectorized else apply_labels(trimmed_df.copy())
+    with timer(timings, 'latest'):
+        latest_df = latest_user_rows(labeled_df) if vectorized else apply_latest_rows(labeled_df)
+    return labeled_df, latest_df, timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--apply-max-users', type=int, default=10_000,
+                        help='only time the groupby().apply versions up to this many users')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rows = []
+    for n_users in args.users:
+        features_df = make_feature_days(n_users, seed=args.seed)
+        labeled_df, latest_df, fast = run_steps(features_df, vectorized=True)
+        row = {'users': f"{n_users:,}", 'rows': f"{len(features_df):,}"}
+        for step in ('trim', 'label', 'latest'):
+            row[f'{step}_s'] = f"{fast[step]:.3f}"
+        if n_users <= args.apply_max_users:
+            expected_labeled_df, expected_latest_df, slow = run_steps(features_df, vectorized=False)
+            pd.testing.assert_frame_equal(labeled_df, expected_labeled_df, check_dtype=False)
+            pd.testing.assert_frame_equal(latest_df, expected_latest_df, check_dtype=False)
+            for step in ('trim', 'label', 'latest'):
+                row[f'{step}_apply_s'] = f"{slow[step]:.3f}"
+        rows.append(row)
+    print_table(rows, ['users', 'rows', 'trim_s', 'trim_apply_s', 'label_s', 'label_apply_s', 'latest_s', 'latest_apply_s'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+# Replay a series of GAME_360 sidebar filter changes and time the reruns with every tab body run, like
+# st.tabs does, against LazyTabs running only the selected section and reusing what it drew per lineage token
+#
+#   python benchmarks/bench_lazy_sections.py --rows 2000 10000 --reruns 6
+import argparse
+
+import matplotlib
+
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+from bench_demographic_filters import make_demographic_columns
+from common import print_table, timer
+from demographic_filters import filter_players
+from lazy_sections import LazyTabs, figure_png
+from lineage_cache import LineageCache, derive, lineage, table_versions
+from query_builder import EDA_TABLES, EdaFilters
+
+SECTIONS = ["STATIC DEMOGRAPHICS", "STATIC GAME METRICS", "DYNAMIC DEMOGRAPHICS", "DYNAMIC CHURN LIKELIHOOD"]
+PAIRPLOT_COLUMNS = ['PROPORTION_PURCHASED', 'AVERAGE_PURCHASE_AMOUNT', 'AVERAGE_AD_ENGAGEMENT_TIME', 'CHURNED']
+
+
+def make_eda_frame(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = make_demographic_columns(n_rows, seed=seed)
+    df['PROPORTION_PURCHASED'] = rng.random(n_rows)
+    df['AVERAGE_PURCHASE_AMOUNT'] = rng.gamma(2.0, 10.0, n_rows)
+    df['AVERAGE_AD_ENGAGEMENT_TIME'] = rng.gamma(3.0, 5.0, n_rows)
+    df['TOTAL_LOGINS'] = rng.poisson(40, n_rows)
+    return df
+
+
+# the charts of the demographics tabs, as the page draws them
+def draw_correlation_heatmap(df, annotations=False):
+    sns.heatmap(df[list(df.describe())].corr(), annot=annotations, cmap='coolwarm', fmt='.2f', linewidths=0.5, annot_kws={"size": 8})
+    plt.title("Correlation Matrix")
+
+
+def draw_churn_pairplot(df):
+    sns.pairplot(df[PAIRPLOT_COLUMNS], diag_kind='kde', hue="CHURNED", palette='husl')
+    plt.tight_layout()
+
+
+def render_demographics(df, tabs=None, label=None, token=None):
+    if tabs is None:
+        return [figure_png(lambda: draw_correlation_heatmap(df)), figure_png(lambda: draw_churn_pairplot(df))]
+    return [tabs.memo(label, 'heatmap', token, lambda: figure_png(lambda: draw_correlation_heatmap(df))),
+            tabs.memo(label, 'pairplot', token, lambda: figure_png(lambda: draw_churn_pairplot(df)))]
+
+
+def check_lazy_tabs():
+    tabs = LazyTabs(SECTIONS, LineageCache())
+    try:
+        tabs.select("PURCHASES")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown tab accepted")
+    tabs.select("DYNAMIC DEMOGRAPHICS")
+    assert tabs.is_open("DYNAMIC DEMOGRAPHICS") and not tabs.is_open("STATIC DEMOGRAPHICS")
+
+    calls = []
+    build = lambda: calls.append(1) or len(calls)
+    assert tabs.memo("DYNAMIC DEMOGRAPHICS", 'heatmap', ('a',), build) == 1
+    assert tabs.memo("DYNAMIC DEMOGRAPHICS", 'heatmap', ('a',), build) == 1
+    assert tabs.memo("DYNAMIC DEMOGRAPHICS", 'pairplot', ('a',), build) == 2
+    assert tabs.memo("DYNAMIC DEMOGRAPHICS", 'heatmap', ('b',), build) == 3
+    assert tabs.memo("DYNAMIC DEMOGRAPHICS", 'heatmap', None, build) == 4
+    stats = tabs.cache.stats_frame().set_index('FUNCTION')
+    assert stats.loc['DYNAMIC DEMOGRAPHICS/heatmap', ['HITS', 'MISSES', 'ENTRIES']].tolist() == [1, 2, 2]
+
+    # the PNG is counted against the byte budget and every figure the drawing opened is closed
+    figures = set(plt.get_fignums())
+    png = tabs.memo("DYNAMIC DEMOGRAPHICS", 'pairplot', ('c',), lambda: figure_png(lambda: draw_churn_pairplot(make_eda_frame(200))))
+    assert png.startswith(b'\x89PNG') and set(plt.get_fignums()) == figures
+    assert tabs.cache.nbytes >= len(png)
+    print("lazy tab checks passed")
+
+
+def filter_changes(n_reruns, seed=0):
+    # one sidebar widget changes per rerun, a few selections come back
+    rng = np.random.default_rng(seed)
+    options = [EdaFilters(), EdaFilters(playerbase='Active'), EdaFilters(gender='Female'),
+               EdaFilters(player_type='Hardcore'), EdaFilters(support_ticket='Yes')]
+    return [options[i] for i in rng.integers(0, len(options), n_reruns)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[2_000, 10_000])
+    parser.add_argument('--reruns', type=int, default=6)
+    args = parser.parse_args()
+
+    check_lazy_tabs()
+    versions = table_versions(pd.DataFrame({'TABLE_NAME': list(EDA_TABLES), 'LAST_ALTERED': pd.Timestamp('2024-01-01')}))
+    eda_lineage = lineage(versions, EDA_TABLES)
+    changes = filter_changes(args.reruns)
+    rows = []
+    for n_rows in args.rows:
+        eda_df = make_eda_frame(n_rows)
+        timings = {}
+        # st.tabs: both demographics tabs draw on every rerun whichever tab is shown
+        with timer(timings, 'eager'):
+            for filters in changes:
+                filtered_df = filter_players(eda_df, filters)
+                render_demographics(eda_df)
+                render_demographics(filtered_df)
+        for selected in ["STATIC GAME METRICS", "DYNAMIC DEMOGRAPHICS"]:
+            tabs = LazyTabs(SECTIONS, LineageCache())
+            with timer(timings, selected):
+                for filters in changes:
+                    tabs.select(selected)
+                    filtered_df = filter_players(eda_df, filters)
+                    if tabs.is_open("STATIC DEMOGRAPHICS"):
+                        render_demographics(eda_df, tabs, "STATIC DEMOGRAPHICS", eda_lineage)
+                    if tabs.is_open("DYNAMIC DEMOGRAPHICS"):
+                        render_demographics(filtered_df, tabs, "DYNAMIC DEMOGRAPHICS", derive(eda_lineage, filters=filters))
+        rows.append({
+            'rows': f"{n_rows:,}",
+            'reruns': len(changes),
+            'selections': len(set(changes)),
+            'st_tabs_s': f"{timings['eager']:.1f}",
+            'lazy_metrics_tab_s': f"{timings['STATIC GAME METRICS']:.2f}",
+            'lazy_dynamic_tab_s': f"{timings['DYNAMIC DEMOGRAPHICS']:.1f}",
+        })
+    print_table(rows, ['rows', 'reruns', 'selections', 'st_tabs_s', 'lazy_metrics_tab_s', 'lazy_dynamic_tab_s'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# Time a cache hit of the GAME_360 frame helpers keyed by lineage token against the cost st.cache_data
+# pays on every hit: hashing the frame argument and unpickling a copy of the stored result
+#
+#   python benchmarks/bench_lineage_cache.py --rows 100000 1000000 5000000
+import argparse
+import pickle
+import time
+
+import pandas as pd
+
+from bench_demographic_filters import make_demographic_columns
+from common import print_table, timer
+from demographic_filters import filter_players
+from lineage_cache import LineageCache, derive, lineage, table_versions
+from query_builder import EDA_TABLES, EdaFilters
+
+# the sampling st.cache_data applies before hashing a large frame
+STREAMLIT_ROWS_LARGE = 100000
+STREAMLIT_SAMPLE_SIZE = 10000
+
+
+def streamlit_frame_hash(df):
+    # what st.cache_data hashes for a DataFrame argument
+    if len(df) >= STREAMLIT_ROWS_LARGE:
+        df = df.sample(n=STREAMLIT_SAMPLE_SIZE, random_state=0)
+    return pd.util.hash_pandas_object(df.dtypes).to_numpy().tobytes() + pd.util.hash_pandas_object(df).to_numpy().tobytes()
+
+
+def split_frame(input_df, rows):
+    return [input_df.loc[i : i + rows - 1, :] for i in range(0, len(input_df), rows)]
+
+
+def check_cache():
+    versions = table_versions(pd.DataFrame({'TABLE_NAME': list(EDA_TABLES),
+                                            'LAST_ALTERED': pd.Timestamp('2024-01-01')}))
+    token = lineage(versions, EDA_TABLES)
+    # multiselect lists and tuples give the same token, a refresh of any joined table a new one
+    assert lineage(versions, EDA_TABLES, filters=['a', 'b']) == lineage(versions, EDA_TABLES, filters=('a', 'b'))
+    assert lineage({**versions, 'RAW.ACHIEVEMENTS': pd.Timestamp('2024-01-02')}, EDA_TABLES) != token
+    assert derive(None, sort_by='AGE') is None
+
+    calls = []
+    cache = LineageCache(max_bytes=10**9)
+    filtered = cache.memoize(lambda df, playerbase: calls.append(playerbase) or df[df['CHURNED'] == int(playerbase == 'Churned')])
+    df = make_demographic_columns(1000)
+    first = filtered(df, 'Churned', lineage=token)
+    # the frame is not part of the key, the token is
+    assert filtered(df.iloc[:10], 'Churned', lineage=token) is first and calls == ['Churned']
+    filtered(df, 'Active', lineage=token)
+    filtered(df, 'Churned', lineage=derive(token, sort_by='AGE'))
+    filtered(df, 'Churned')
+    assert calls == ['Churned', 'Active', 'Churned', 'Churned'] and cache.stats['bypasses'] == 1
+    assert cache.stats_frame()[['HITS', 'MISSES', 'ENTRIES']].values.tolist() == [[1, 3, 3]]
+
+    # least recently used entries go first once the byte budget is exceeded
+    cache = LineageCache(max_bytes=2 * df.memory_usage(deep=True).sum() + 1)
+    copy = cache.memoize(lambda df, name: df.copy())
+    for name in ['a', 'b', 'a', 'c']:
+        copy(df, name, lineage=token)
+    assert len(cache) == 2 and cache.stats['evictions'] == 1 and cache.nbytes <= cache.max_bytes
+    assert copy(df, 'a', lineage=token) is not None and cache.stats['misses'] == 3
+
+    # entries past the ttl are recomputed
+    cache = LineageCache(ttl=0.05)
+    copy = cache.memoize(lambda df: df.copy())
+    copy(df, lineage=token)
+    time.sleep(0.1)
+    copy(df, lineage=token)
+    assert cache.stats['expirations'] == 1 and cache.stats['misses'] == 2
+    print("cache checks passed")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_cache()
+
+    filters = EdaFilters(playerbase='Inactive', gender='Female')
+    versions = {table: pd.Timestamp('2024-01-01') for table in EDA_TABLES}
+    rows = []
+    for n_rows in args.rows:
+        df = make_demographic_columns(n_rows, seed=args.seed)
+        cache = LineageCache(max_bytes=4 * 2**30)
+        cached_filter = cache.memoize(filter_players)
+        cached_split = cache.memoize(split_frame)
+        token = lineage(versions, EDA_TABLES)
+        filtered_token = derive(token, filters=filters)
+        filtered_df = cached_filter(df, filters, lineage=token)
+        pages = cached_split(filtered_df, 25, lineage=filtered_token)
+        stored_filtered, stored_pages = pickle.dumps(filtered_df), pickle.dumps(pages)
+
+        timings = {}
+        with timer(timings, 'lineage_filter'):
+            for _ in range(args.repeat):
+                hit = cached_filter(df, filters, lineage=token)
+        with timer(timings, 'lineage_split'):
+            for _ in range(args.repeat):
+                cached_split(filtered_df, 25, lineage=filtered_token)
+        with timer(timings, 'st_filter'):
+            for _ in range(args.repeat):
+                streamlit_frame_hash(df)
+                pickle.loads(stored_filtered)
+        with timer(timings, 'st_split'):
+            for _ in range(args.repeat):
+                streamlit_frame_hash(filtered_df)
+                pickle.loads(stored_pages)
+        assert hit is filtered_df and cache.stats['misses'] == 2
+
+        rows.append({
+            'rows': f"{n_rows:,}",
+            'filtered_rows': f"{len(filtered_df):,}",
+            'pages': f"{len(pages):,}",
+            'st_filter_hit_ms': f"{timings['st_filter'] / args.repeat * 1000:.1f}",
+            'st_split_hit_ms': f"{timings['st_split'] / args.repeat * 1000:.1f}",
+            'lineage_filter_hit_ms': f"{timings['lineage_filter'] / args.repeat * 1000:.3f}",
+            'lineage_split_hit_ms': f"{timings['lineage_split'] / args.repeat * 1000:.3f}",
+            'cache_mb': f"{cache.nbytes / 2**20:.0f}",
+        })
+    print_table(rows, ['rows', 'filtered_rows', 'pages', 'st_filter_hit_ms', 'st_split_hit_ms',
+                       'lineage_filter_hit_ms', 'lineage_split_hit_ms', 'cache_mb'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+# Check that streamlit/model_cache.py looks a model up and loads it once per process, serves concurrent
+# callers from one load, reloads when a new default version is set and scores like the model's predict_proba,
+# then time the PLAYER_360 prediction path of a rerun the way it was, a new Registry, a version lookup and a
+# warehouse call, against the cached booster on a registry stand-in with the given round trip latencies
+#
+#   python benchmarks/bench_model_cache.py --rows 1 100 10000 --lookup-ms 150 --load-ms 1500 --run-ms 1500
+import argparse
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from common import print_table, timer
+from model_cache import ModelCache, native_booster
+
+FEATURES = ['TOTAL_SESSIONS_ROLLING_30_DAYS', 'TOTAL_POINTS_ROLLING_30_DAYS', 'TOTAL_ADS_ROLLING_30_DAYS',
+            'AD_CONVERSION_RATE_ROLLING_30_DAYS']
+MODEL_NAME = 'Player360_RollingChurn_Classifier'
+
+
+def make_features(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({column: np.round(rng.gamma(2.0, 10.0, size=n_rows), 2) for column in FEATURES})
+
+
+class Classifier:
+    # the get_booster and predict_proba of xgboost.XGBClassifier, which needs scikit-learn
+    def __init__(self, booster):
+        self.booster = booster
+
+    def get_booster(self):
+        return self.booster
+
+    def predict_proba(self, X):
+        proba_1 = self.booster.predict(xgb.DMatrix(X[self.booster.feature_names]))
+        return np.column_stack([1.0 - proba_1, proba_1])
+
+
+def train_classifier(seed=0):
+    df = make_features(5_000, seed=seed + 1)
+    label = (df['TOTAL_SESSIONS_ROLLING_30_DAYS'] + np.random.default_rng(seed).normal(0, 5, len(df)) > 20).astype(int)
+    params = {'objective': 'binary:logistic', 'max_depth': 4, 'nthread': 1, 'seed': seed}
+    return Classifier(xgb.train(params, xgb.DMatrix(df, label=label), num_boost_round=50))
+
+
+class FakeModelVersion:
+    def __init__(self, registry, name, classifier):
+        self.registry = registry
+        self.version_name = name
+        self.classifier = classifier
+
+    def load(self, force=False):
+        self.registry.calls['load'] += 1
+        time.sleep(self.registry.load_s)
+        return self.classifier
+
+    def run(self, X, function_name):
+        # a service function call, a warehouse round trip
+        self.registry.calls['run'] += 1
+        time.sleep(self.registry.run_s)
+        proba = self.classifier.predict_proba(X)
+        return pd.DataFrame({'PREDICT_PROBA_0': proba[:, 0], 'PREDICT_PROBA_1': proba[:, 1]})
+
+
+class FakeRegistry:
+    # the part of snowflake.ml Registry the cache uses, every call sleeps for its round trip
+    def __init__(self, classifiers, lookup_s=0.0, load_s=0.0, run_s=0.0):
+        self.lookup_s, self.load_s, self.run_s = lookup_s, load_s, run_s
+        self.calls = {'get_model': 0, 'load': 0, 'run': 0}
+        self.default = 'V1'
+        self.versions = {name.upper(): FakeModelVersion(self, name.upper(), classifier) for name, classifier in classifiers.items()}
+
+    def get_model(self, name):
+        self.calls['get_model'] += 1
+        time.sleep(self.lookup_s)
+        return SimpleNamespace(default=self.versions[self.default], version=lambda version: self.versions[version.upper()])
+
+
+def check_model_cache(seed=0):
+    v1, v2 = train_classifier(seed), train_classifier(seed + 10)
+    registry = FakeRegistry({'v1': v1, 'v2': v2})
+    made = []
+    cache = ModelCache(lambda: made.append(1) or registry, state_ttl=3600)
+    X = make_features(500, seed=seed)
+
+    # scores like the model, in the column order of the booster whatever the frame's order
+    proba = cache.predict_proba(MODEL_NAME, X[FEATURES[::-1]], 'v1')
+    np.testing.assert_allclose(proba['PREDICT_PROBA_1'], v1.predict_proba(X)[:, 1], rtol=1e-6)
+    np.testing.assert_allclose(proba['PREDICT_PROBA_0'] + proba['PREDICT_PROBA_1'], 1.0)
+    assert native_booster(v1) is cache.booster(MODEL_NAME, 'V1')
+
+    # one registry, one lookup and one load for every later rerun, the version handle comes from the same entry
+    for _ in range(20):
+        cache.predict_proba(MODEL_NAME, X.iloc[:1], 'v1')
+    assert cache.version(MODEL_NAME, 'v1') is registry.versions['V1']
+    assert len(made) == 1 and registry.calls['get_model'] == 2 and registry.calls['load'] == 1
+    assert (cache.stats['misses'], cache.stats['hits']) == (1, 22)
+
+    # the default version follows the registry once the state is re-read
+    assert cache.model(MODEL_NAME) is v1
+    registry.default = 'V2'
+    assert cache.model(MODEL_NAME) is v1
+    cache.state_ttl = 0
+    assert cache.model(MODEL_NAME) is v2
+    assert cache.stats['invalidations'] == 1 and registry.calls['load'] == 2
+    # explicit versions are reloaded too, the registry state is part of the key
+    assert cache.model(MODEL_NAME, 'v1') is v1 and registry.calls['load'] == 3
+    frame = cache.stats_frame()
+    assert sorted(frame['VERSION']) == ['V1', 'V2'] and set(frame['STATE']) == {'ready'}
+
+    # concurrent first calls share one load
+    slow = FakeRegistry({'v1': v1}, load_s=0.2)
+    cache = ModelCache(lambda: slow)
+    threads = [threading.Thread(target=cache.booster, args=(MODEL_NAME, 'v1')) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert slow.calls['load'] == 1 and cache.stats['misses'] == 1
+
+    # a failed load is not cached, the next call retries it
+    broken = FakeRegistry({'v1': v1})
+    cache = ModelCache(lambda: broken)
+    broken.versions['V1'].load = lambda force=False: None
+    try:
+        cache.booster(MODEL_NAME, 'v1')
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("loading a model without a booster should fail")
+    del broken.versions['V1'].load
+    assert cache.booster(MODEL_NAME, 'v1') is not None and cache.stats['errors'] == 1
+
+    # a warm load finishes in the background, the first rerun finds it
+    warm = FakeRegistry({'v1': v1}, load_s=0.2)
+    cache = ModelCache(lambda: warm)
+    for future in cache.warm([(MODEL_NAME, 'v1')]):
+        future.result()
+    timings = {}
+    with timer(timings, 'first'):
+        cache.predict_proba(MODEL_NAME, X.iloc[:1], 'v1')
+    assert timings['first'] < 0.1 and cache.stats['hits'] == 1
+    cache.close()
+    print("model cache checks passed")
+
+
+def uncached_rerun(registry, X):
+    # what a PLAYER_360 rerun did: build a Registry, look the version up and score in the warehouse
+    return registry.get_model(MODEL_NAME).version('v1').run(X, function_name="predict_proba")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 100, 10_000])
+    parser.add_argument('--lookup-ms', type=float, default=150, help="round trip of a registry lookup")
+    parser.add_argument('--load-ms', type=float, default=1500, help="download and unpickling of the model")
+    parser.add_argument('--run-ms', type=float, default=1500, help="round trip of a mv.run call in the warehouse")
+    parser.add_argument('--reruns', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_model_cache(args.seed)
+    classifier = train_classifier(args.seed)
+    registry = FakeRegistry({'v1': classifier}, args.lookup_ms / 1000, args.load_ms / 1000, args.run_ms / 1000)
+    rows = []
+    for n_rows in args.rows:
+        X = make_features(n_rows, seed=args.seed)
+        cache = ModelCache(lambda: registry)
+        timings = {}
+        with timer(timings, 'cold'):
+            cache.predict_proba(MODEL_NAME, X, 'v1')
+        with timer(timings, 'cached'):
+            for _ in range(args.reruns):
+                cached = cache.predict_proba(MODEL_NAME, X, 'v1')
+        with timer(timings, 'uncached'):
+            for _ in range(args.reruns):
+                uncached = uncached_rerun(registry, X)
+        np.testing.assert_allclose(cached['PREDICT_PROBA_1'], uncached['PREDICT_PROBA_1'], rtol=1e-6)
+        rows.append({
+            'rows': f"{n_rows:,}",
+            'uncached_rerun_ms': f"{timings['uncached'] / args.reruns * 1000:,.0f}",
+            'cold_ms': f"{timings['cold'] * 1000:,.0f}",
+            'cached_rerun_ms': f"{timings['cached'] / args.reruns * 1000:,.2f}",
+        })
+        cache.close()
+    print_table(rows, ['rows', 'uncached_rerun_ms', 'cold_ms', 'cached_rerun_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+# Check the paged tables of both apps against sorting the frame and splitting it into every page,
+# check the SQL pages of GAME_360 on the local SQLite engine, and time a page render of both
+#
+#   python benchmarks/bench_pagination.py --rows 100000 1000000 10000000
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from bench_demographic_filters import make_demographic_columns
+from bench_query_builder import CHECK_FILTERS
+from common import print_table, timer
+from local_engine import connect, read_sql
+from pagination import frame_page, page_count, page_bounds, sort_permutation
+from query_builder import EDA_COLUMN_NAMES, count_query, eda_page_query, eda_query
+from reference import pagination_page
+from synthetic import make_player_tables
+
+
+def check_frame_pages(seed):
+    df = make_demographic_columns(2003, seed=seed)
+    df['AGE'] = df['AGE'].astype(float)
+    df.loc[::7, 'AGE'] = np.nan
+    # frames filtered by save_filter keep their original row labels
+    filtered_df = df[df['CHURNED'] == 1]
+    for frame in [df, filtered_df]:
+        for page_size in [25, 100]:
+            n_pages = page_count(len(frame), page_size)
+            # the old page count dropped the last partial page
+            assert n_pages == int(np.ceil(len(frame) / page_size))
+            for sort_field, ascending in [(None, True), ('AGE', True), ('AGE', False), ('LOCATION', True), ('RANK_NAME', False)]:
+                order = None if sort_field is None else sort_permutation(frame[sort_field], ascending)
+                expected = frame if sort_field is None else frame.sort_values(sort_field, ascending=ascending, kind='stable')
+                pages = [frame_page(frame, page, page_size, order) for page in range(1, n_pages + 1)]
+                pd.testing.assert_frame_equal(pd.concat(pages), expected)
+                if frame is df:
+                    # the pages the old code could reach hold the same sort keys, it broke ties in any order
+                    columns = frame.columns if sort_field is None else [sort_field]
+                    for page in [1, 2, n_pages - 1]:
+                        _, old_page = pagination_page(frame, page_size, page, sort_field, ascending)
+                        pd.testing.assert_frame_equal(pages[page - 1][columns].reset_index(drop=True),
+                                                      old_page[columns].reset_index(drop=True))
+    assert page_bounds(5, 25, 101) == (100, 101) and page_bounds(9, 25, 101) == (101, 101)
+    print("frame page checks passed")
+
+
+def check_sql_pages(n_users, seed):
+    conn = connect(make_player_tables(n_users, seed=seed))
+    rng = np.random.default_rng(seed)
+    for filters in CHECK_FILTERS:
+        expected_all = read_sql(conn, *eda_query(None, filters))
+        total = read_sql(conn, *count_query(None, filters))['PLAYERS'].iloc[0]
+        assert total == len(expected_all)
+        for page_size in [25, 100]:
+            n_pages = page_count(total, page_size)
+            for sort_by, ascending in [(None, True)] + [(col, bool(rng.integers(0, 2))) for col in rng.choice(EDA_COLUMN_NAMES, 3)]:
+                if sort_by is None:
+                    expected = expected_all.sort_values('USER_ID', ignore_index=True)
+                else:
+                    expected = expected_all.sort_values([sort_by, 'USER_ID'], ascending=[ascending, True], ignore_index=True)
+                last_user_id = None
+                for page in sorted({1, 2, n_pages}):
+                    start, stop = page_bounds(page, page_size, total)
+                    page_df = read_sql(conn, *eda_page_query(None, filters, page_size, offset=start, sort_by=sort_by, ascending=ascending))
+                    pd.testing.assert_frame_equal(page_df, expected.iloc[start:stop].reset_index(drop=True), check_dtype=False)
+                    if sort_by is None and page == 2 and last_user_id is not None:
+                        # the next page by keyset is the same as by offset
+                        keyset_df = read_sql(conn, *eda_page_query(None, filters, page_size, sort_by=None, after_user_id=last_user_id))
+                        pd.testing.assert_frame_equal(keyset_df, page_df)
+                    if len(page_df):
+                        last_user_id = page_df['USER_ID'].iloc[-1]
+    try:
+        eda_page_query(None, sort_by='AGE; DROP TABLE X')
+        raise AssertionError("unknown sort column accepted")
+    except ValueError:
+        pass
+    print(f"sql page checks passed on {len(CHECK_FILTERS)} filter selections")
+
+
+def peak_mb(func):
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--old-max-rows', type=int, default=1_000_000, help="largest frame the old split_frame is timed on")
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_frame_pages(args.seed)
+    check_sql_pages(args.users, args.seed)
+
+    rows = []
+    page_size, page = 25, 3
+    for n_rows in args.rows:
+        df = make_demographic_columns(n_rows, seed=args.seed)
+        timings = {}
+        row = {'rows': f"{n_rows:,}"}
+        if n_rows <= args.old_max_rows:
+            with timer(timings, 'old'):
+                pagination_page(df, page_size, page, 'AGE', False)
+            row['old_sorted_page_s'] = f"{timings['old']:.2f}"
+            row['old_peak_mb'] = f"{peak_mb(lambda: pagination_page(df, page_size, page, 'AGE', False)):.0f}"
+        with timer(timings, 'permutation'):
+            order = sort_permutation(df['AGE'], False)
+        start = time.perf_counter()
+        for page_number in range(1, 101):
+            frame_page(df, page_number, page_size, order)
+        timings['page'] = (time.perf_counter() - start) / 100
+        row['permutation_s'] = f"{timings['permutation']:.2f}"
+        row['permutation_mb'] = f"{order.nbytes / 2**20:.0f}"
+        row['new_sorted_page_ms'] = f"{timings['page'] * 1000:.2f}"
+        row['new_page_peak_kb'] = f"{peak_mb(lambda: frame_page(df, page, page_size, order)) * 1024:.0f}"
+        rows.append(row)
+        del df, order
+    print_table(rows, ['rows', 'old_sorted_page_s', 'old_peak_mb', 'permutation_s', 'permutation_mb',
+                       'new_sorted_page_ms', 'new_page_peak_kb'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Compare the concurrent PLAYER_360 player loader with the sequential per-player queries,
+# on a local stand-in session that adds a fixed latency to every query
+#
+#   python benchmarks/bench_player_loader.py --latency 0 0.05 0.2
+import argparse
+import statistics
+
+import numpy as np
+import pandas as pd
+
+from common import print_table, timer
+from local_engine import LocalSession, connect
+from player_loader import FEATURE_QUERIES, compact_features, load_player_bundle
+from reference import player_queries_sequential
+from synthetic import make_player_activity_tables
+
+
+def sequential_load(session, user_id, active):
+    # the old page with database=None does not parse, so drop the leading '.' from its table names
+    return player_queries_sequential(lambda query: session.sql(query.replace(' None.', ' ')).to_pandas(),
+                                     None, user_id, active)
+
+
+def check_equivalence(conn, user_ids):
+    session = LocalSession(conn)
+    for i, user_id in enumerate(user_ids):
+        active = i % 2 == 0
+        expected = sequential_load(session, user_id, active)
+        bundle = load_player_bundle(session, None, user_id, active)
+        for name, frame in bundle._asdict().items():
+            if frame is None:
+                # the batch scores are only read when asked for
+                assert name == 'churn_prediction' or (not active and name == 'to_predict')
+                continue
+            # the feature queries come back at the widths of the feature table
+            pd.testing.assert_frame_equal(frame, compact_features(expected[name]) if name in FEATURE_QUERIES else expected[name])
+    # the user id is bound, never formatted into the SQL
+    assert all(params == [int(user_ids[-1])] for _, params in session.queries[-5:])
+    session.close()
+    print(f"equivalence check passed on {len(user_ids)} players")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=2_000)
+    parser.add_argument('--latency', type=float, nargs='+', default=[0.0, 0.05, 0.2])
+    parser.add_argument('--players', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    conn = connect(make_player_activity_tables(args.users, seed=args.seed))
+    user_ids = np.random.default_rng(args.seed).choice(np.arange(1001, 1001 + args.users), size=args.players, replace=False)
+    check_equivalence(conn, user_ids)
+
+    rows = []
+    for latency in args.latency:
+        session = LocalSession(conn, latency=latency)
+        sequential, concurrent = [], []
+        for user_id in user_ids:
+            timings = {}
+            with timer(timings, 'sequential'):
+                sequential_load(session, user_id, active=True)
+            with timer(timings, 'concurrent'):
+                load_player_bundle(session, None, user_id, active=True)
+            sequential.append(timings['sequential'])
+            concurrent.append(timings['concurrent'])
+        session.close()
+        rows.append({
+            'latency_s': f"{latency:.2f}",
+            'queries': 6,
+            'sequential_ms': f"{statistics.median(sequential) * 1000:.1f}",
+            'concurrent_ms': f"{statistics.median(concurrent) * 1000:.1f}",
+            'speedup': f"{statistics.median(sequential) / statistics.median(concurrent):.1f}x",
+        })
+    print_table(rows, ['latency_s', 'queries', 'sequential_ms', 'concurrent_ms', 'speedup'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# Benchmark a PLAYER_360 player switch with the PLAYER_PROFILES store against the full-table scans
+#
+#   python benchmarks/bench_player_store.py --users 10000 100000 1000000
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from common import print_table, timer
+from local_engine import connect, read_sql
+from player_store import PlayerStore
+from reference import player_sidebar
+from synthetic import make_profile_tables
+
+SOURCE_TABLES = ['RAW.USERS', 'ANALYTIC.RETENTION', 'ANALYTIC.USER_RANKINGS', 'ANALYTIC.DEMOGRAPHICS', 'RAW.SUPPORT_TICKETS']
+# SQLite returns timestamps as text, Snowflake returns them typed
+DATE_COLUMNS = ['FIRST_LOGIN_DATE', 'LAST_LOGIN_DATE', 'DATE_CREATED', 'TICKET_DATE_CREATED']
+
+
+def player_profiles(tables):
+    # pandas version of the ANALYTIC.PLAYER_PROFILES dynamic table
+    tickets_df = tables['RAW.SUPPORT_TICKETS'].sort_values(['USER_ID', 'DATE_CREATED'])
+    first_ticket_df = tickets_df.groupby('USER_ID').head(1).rename(columns={
+        'CATEGORY': 'TICKET_CATEGORY', 'CASE_DESCRIPTION': 'TICKET_CASE_DESCRIPTION',
+        'SENTIMENT_ANALYSIS': 'TICKET_SENTIMENT_ANALYSIS', 'DATE_CREATED': 'TICKET_DATE_CREATED'})
+    first_ticket_df['TOTAL_SUPPORT_TICKETS'] = first_ticket_df['USER_ID'].map(tickets_df['USER_ID'].value_counts())
+    profiles_df = (tables['RAW.USERS']
+                   .merge(tables['ANALYTIC.DEMOGRAPHICS'][['USER_ID', 'PLAYER_TYPE']].drop_duplicates(), on='USER_ID', how='left')
+                   .merge(tables['ANALYTIC.RETENTION'][['USER_ID', 'FIRST_LOGIN_DATE', 'LAST_LOGIN_DATE', 'TOTAL_LOGINS', 'DAYS_SINCE_LAST_LOGIN', 'CHURNED']], on='USER_ID', how='left')
+                   .merge(tables['ANALYTIC.USER_RANKINGS'][['USER_ID', 'TOTAL_POINTS', 'RANK_NAME', 'PERCENTILE']], on='USER_ID', how='left')
+                   .merge(tables['ANALYTIC.AD_ENGAGEMENT'], on='USER_ID', how='left')
+                   .merge(first_ticket_df, on='USER_ID', how='left'))
+    profiles_df['TOTAL_SUPPORT_TICKETS'] = profiles_df['TOTAL_SUPPORT_TICKETS'].fillna(0).astype(int)
+    return profiles_df
+
+
+def store_sidebar(store, user_id):
+    profile = store.profile(user_id)
+    return {
+        "Player Status": 'Active' if store.is_active(user_id) else 'Inactive',
+        "Name": profile['FIRST_NAME'] + ' ' + profile['LAST_NAME'],
+        "Email": profile['EMAIL'],
+        "Photo": profile['PHOTO_URL'],
+        "Player Type": profile['PLAYER_TYPE'],
+        "Rank Name": profile['RANK_NAME'],
+        "Rank Percentile": profile['PERCENTILE'].round(2),
+        "First Login": pd.to_datetime(profile['FIRST_LOGIN_DATE']),
+        "Last Login": pd.to_datetime(profile['LAST_LOGIN_DATE']),
+        "Days Inactive": profile['DAYS_SINCE_LAST_LOGIN'],
+        "Total Logins": profile['TOTAL_LOGINS'],
+        "Total Points": profile['TOTAL_POINTS'].round(2),
+        "Has Support Ticket": profile['TOTAL_SUPPORT_TICKETS'] > 0,
+    }
+
+
+def old_sidebar(tables, user_id):
+    return player_sidebar(tables['RAW.USERS'], tables['ANALYTIC.RETENTION'], tables['ANALYTIC.USER_RANKINGS'],
+                          tables['ANALYTIC.DEMOGRAPHICS'], tables['RAW.SUPPORT_TICKETS'], user_id)
+
+
+def check_equivalence(n_users, seed, n_players=300):
+    tables = make_profile_tables(n_users, seed=seed)
+    store = PlayerStore(player_profiles(tables))
+    demographics_df = tables['ANALYTIC.DEMOGRAPHICS'].set_index('USER_ID')
+    rng = np.random.default_rng(seed)
+    for user_id in rng.choice(tables['RAW.USERS']['USER_ID'], size=n_players, replace=False):
+        expected = old_sidebar(tables, user_id)
+        # the store returns the selected player's type, not the first row's
+        expected['Player Type'] = demographics_df.loc[user_id, 'PLAYER_TYPE']
+        assert store_sidebar(store, user_id) == expected, user_id
+    assert store.profile(0) is None and 10**9 not in store
+
+    # sparse ids fall back to the dict index
+    sparse_store = PlayerStore(pd.DataFrame({'USER_ID': [5, 10**8], 'CHURNED': [0, 1]}))
+    assert sparse_store._positions is None and sparse_store.is_active(5) and not sparse_store.is_active(10**8)
+    print(f"equivalence check passed on {n_players} players")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--switches', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_equivalence(5_000, args.seed)
+
+    rows = []
+    for n_users in args.users:
+        tables = make_profile_tables(n_users, seed=args.seed)
+        conn = connect({**{name: tables[name] for name in SOURCE_TABLES}, 'ANALYTIC.PLAYER_PROFILES': player_profiles(tables)})
+        timings = {}
+        with timer(timings, 'cold_tables'):
+            loaded = {name: read_sql(conn, f"SELECT * FROM {name}", parse_dates=[col for col in DATE_COLUMNS if col in tables[name]])
+                      for name in SOURCE_TABLES}
+        with timer(timings, 'cold_store'):
+            store = PlayerStore(read_sql(conn, "SELECT * FROM ANALYTIC.PLAYER_PROFILES", parse_dates=DATE_COLUMNS[:2] + DATE_COLUMNS[3:]))
+        conn.close()
+
+        user_ids = np.random.default_rng(args.seed).choice(tables['RAW.USERS']['USER_ID'], size=args.switches)
+        with timer(timings, 'warm_tables'):
+            for user_id in user_ids:
+                player_sidebar(loaded['RAW.USERS'], loaded['ANALYTIC.RETENTION'], loaded['ANALYTIC.USER_RANKINGS'],
+                               loaded['ANALYTIC.DEMOGRAPHICS'], loaded['RAW.SUPPORT_TICKETS'], user_id)
+        with timer(timings, 'warm_store'):
+            for user_id in user_ids:
+                store_sidebar(store, user_id)
+        rows.append({
+            'users': f"{n_users:,}",
+            'cold_tables_s': f"{timings['cold_tables']:.2f}",
+            'cold_store_s': f"{timings['cold_store']:.2f}",
+            'switch_tables_ms': f"{timings['warm_tables'] / args.switches * 1000:.2f}",
+            'switch_store_ms': f"{timings['warm_store'] / args.switches * 1000:.3f}",
+        })
+        del tables, loaded, store
+    print_table(rows, ['users', 'cold_tables_s', 'cold_store_s', 'switch_tables_ms', 'switch_store_ms'])
+
+
+if __name__ == '__main__':
+    main()
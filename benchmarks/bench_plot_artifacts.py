@@ -0,0 +1,163 @@
+# Check that streamlit/plot_artifacts.py addresses PNGs by the content of their inputs, renders each once on
+# its process pool, keeps them within the memory and disk budgets, reads them back from disk in a new process
+# and retries failed renders, then time the GAME_360 pair plots drawn in the script thread against a submit,
+# the wait for the worker and a cached read, and the longest stall of the script thread while a worker draws
+#
+#   python benchmarks/bench_plot_artifacts.py --points 1000 5000 --workers 2
+import argparse
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import print_table, timer
+from lazy_sections import figure_png
+from plot_artifacts import PlotArtifacts, artifact_key
+from plot_data import binned_pairs, draw_binned_pairplot, draw_pairplot, stratified_sample
+
+COLUMNS = ['PROPORTION_PURCHASED', 'AVERAGE_PURCHASE_AMOUNT', 'AVERAGE_AD_ENGAGEMENT_TIME', 'CHURNED']
+PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
+
+
+def make_players(n_players, seed=0):
+    rng = np.random.default_rng(seed)
+    churned = (rng.random(n_players) < 0.3).astype(int)
+    return pd.DataFrame({
+        'PROPORTION_PURCHASED': np.round(rng.beta(2, 5, n_players) + 0.1 * churned, 3),
+        'AVERAGE_PURCHASE_AMOUNT': np.round(rng.gamma(2.0, 10.0, n_players), 2),
+        'AVERAGE_AD_ENGAGEMENT_TIME': np.round(rng.gamma(3.0, 5.0, n_players) - 2 * churned, 2),
+        'CHURNED': churned,
+    })
+
+
+def draw_bar(values, title=None):
+    import matplotlib.pyplot as plt
+
+    plt.bar(range(len(values)), values)
+    if title:
+        plt.title(title)
+
+
+def draw_broken(values):
+    raise ValueError("no figure for these values")
+
+
+def check_plot_artifacts(seed=0):
+    df = make_players(2_000, seed)
+
+    # keys follow the content of the inputs, not the identity of the objects
+    key = artifact_key('pairplot', draw_pairplot, df, hue='CHURNED')
+    assert key == artifact_key('pairplot', draw_pairplot, df.copy(), hue='CHURNED')
+    changed = df.copy()
+    changed.iloc[5, 1] += 1
+    assert key != artifact_key('pairplot', draw_pairplot, changed, hue='CHURNED')
+    assert key != artifact_key('pairplot', draw_pairplot, df.astype({'CHURNED': float}), hue='CHURNED')
+    assert key != artifact_key('pairplot', draw_binned_pairplot, df, hue='CHURNED')
+    assert key != artifact_key('pairplot', draw_pairplot, df, hue='GENDER')
+    assert artifact_key(np.arange(4)) != artifact_key(np.arange(4).reshape(2, 2))
+
+    with tempfile.TemporaryDirectory() as folder:
+        artifacts = PlotArtifacts(persist_dir=folder, max_workers=2)
+        # the worker draws what the script thread draws
+        png = artifacts.render('bar', draw_bar, np.arange(10), title='bars')
+        assert png.startswith(PNG_MAGIC) and png == figure_png(lambda: draw_bar(np.arange(10), title='bars'))
+
+        # concurrent submits of the same figure share one render, a later submit reads the cache
+        keys = set()
+        threads = [threading.Thread(target=lambda: keys.add(artifacts.submit('bar', draw_bar, np.arange(20))))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        (key,) = keys
+        assert artifacts.status(key) in ('pending', 'ready') and artifacts.wait(key) == 'ready'
+        assert artifacts.stats['misses'] == 2
+        assert artifacts.submit('bar', draw_bar, np.arange(20)) == key and artifacts.stats['misses'] == 2
+        assert artifacts.get(key).startswith(PNG_MAGIC) and artifacts.stats['hits'] == 2
+
+        # a failed render reports its error and is tried again on the next submit
+        broken = artifacts.submit('bar', draw_broken, np.arange(3))
+        assert artifacts.wait(broken) == 'failed' and isinstance(artifacts.error(broken), ValueError)
+        assert artifacts.get(broken) is None
+        artifacts.submit('bar', draw_broken, np.arange(3))
+        assert artifacts.wait(broken) == 'failed' and artifacts.stats['errors'] == 2
+        artifacts.close()
+
+        # a new process finds the PNGs on disk, within its memory budget
+        key_bytes = (artifacts.persist_dir / f"{key}.png").stat().st_size
+        small = PlotArtifacts(max_bytes=max(len(png), key_bytes), persist_dir=folder)
+        assert small.status(key) == 'ready' and small.get(key).startswith(PNG_MAGIC)
+        assert small.stats['persisted_hits'] == 1 and small.stats['misses'] == 0
+        assert small.render('bar', draw_bar, np.arange(10), title='bars') == png
+        assert len(small) == 1 and small.nbytes <= small.max_bytes and small.stats['evictions'] == 1
+        small.close()
+
+        # the folder keeps the newest files within its budget
+        bounded = PlotArtifacts(persist_dir=folder, max_disk_bytes=3 * len(png))
+        for n in range(6):
+            bounded.render('bar', draw_bar, np.arange(10 + n))
+        sizes = [path.stat().st_size for path in bounded.persist_dir.glob('*.png')]
+        assert sum(sizes) <= bounded.max_disk_bytes and bounded.status(key) == 'missing'
+        bounded.close()
+    print("plot artifact checks passed")
+
+
+def longest_stall(artifacts, key, tick=0.005):
+    # the script thread keeps ticking while the worker draws, the longest gap between ticks is its stall
+    last, stall = time.perf_counter(), 0.0
+    while artifacts.wait(key, tick) == 'pending':
+        now = time.perf_counter()
+        stall, last = max(stall, now - last), now
+    return max(stall, time.perf_counter() - last)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, default=100_000)
+    parser.add_argument('--points', type=int, nargs='+', default=[1_000, 5_000])
+    parser.add_argument('--bins', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_plot_artifacts(args.seed)
+    df = make_players(args.players, args.seed)
+    figures = [(f"kde pairplot {points:,}", draw_pairplot,
+                (stratified_sample(df, points, by='CHURNED').frame[COLUMNS],), {'hue': 'CHURNED'}) for points in args.points]
+    figures.append((f"binned pairplot {args.bins}", draw_binned_pairplot,
+                    (binned_pairs(df, COLUMNS[:-1], by='CHURNED', bins=args.bins),), {}))
+
+    artifacts = PlotArtifacts(max_workers=args.workers)
+    timings = {}
+    with timer(timings, 'spawn'):
+        # the pool starts with the first render, warm it on a small figure like a page's first rerun would
+        artifacts.render('bar', draw_bar, np.arange(3))
+    print(f"worker start and first render {timings['spawn']:.2f} s")
+    rows = []
+    for name, draw, draw_args, draw_kwargs in figures:
+        timings = {}
+        with timer(timings, 'sync'):
+            figure_png(lambda: draw(*draw_args, **draw_kwargs))
+        with timer(timings, 'submit'):
+            key = artifacts.submit('figure', draw, *draw_args, **draw_kwargs)
+        with timer(timings, 'ready'):
+            stall = longest_stall(artifacts, key)
+        with timer(timings, 'cached'):
+            artifacts.get(artifacts.submit('figure', draw, *draw_args, **draw_kwargs))
+        rows.append({
+            'figure': name,
+            'script_thread_ms': f"{timings['sync'] * 1000:,.0f}",
+            'submit_ms': f"{timings['submit'] * 1000:,.1f}",
+            'worker_ready_ms': f"{timings['ready'] * 1000:,.0f}",
+            'longest_stall_ms': f"{stall * 1000:,.1f}",
+            'cached_rerun_ms': f"{timings['cached'] * 1000:,.1f}",
+        })
+    artifacts.close()
+    print_table(rows, ['figure', 'script_thread_ms', 'submit_ms', 'worker_ready_ms', 'longest_stall_ms', 'cached_rerun_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# Check that the stratified samples of streamlit/plot_data.py keep the churn mix and the binned pair plots
+# count every player, then time the GAME_360 3D scatter payload and pair plot drawn from all players,
+# a fixed size sample and histograms as the playerbase grows
+#
+#   python benchmarks/bench_plot_data.py --rows 10000 100000 1000000 --full-max-rows 20000
+import argparse
+
+import matplotlib
+
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import seaborn as sns
+
+from bench_lazy_sections import PAIRPLOT_COLUMNS, make_eda_frame
+from common import print_table, timer
+from lazy_sections import figure_png
+from plot_data import binned_pairs, class_budgets, draw_binned_pairplot, stratified_sample
+
+SCATTER_COLUMNS = ['TOTAL_LOGINS', 'PROPORTION_PURCHASED', 'AVERAGE_PURCHASE_AMOUNT']
+
+
+def check_plot_data():
+    df = make_eda_frame(50_000)
+    # a rare class, about 3% churned
+    df['CHURNED'] = (np.random.default_rng(1).random(len(df)) < 0.03).astype(int)
+    sample = stratified_sample(df, 2000)
+    assert len(sample.frame) == 2000 and sum(sample.shown.values()) == 2000
+    assert abs(sample.frame['CHURNED'].mean() - df['CHURNED'].mean()) < 0.001
+    assert sample.frame.index.equals(stratified_sample(df, 2000).frame.index)
+    assert not sample.frame.index.equals(stratified_sample(df, 2000, seed=1).frame.index)
+    assert sample.caption() == "2,000 of 50,000 players (4.0%)"
+
+    # a class floor keeps rare classes visible and the caption gives the rate of each class
+    floored = stratified_sample(df, 2000, min_per_class=500)
+    assert floored.shown[1] >= 500 and len(floored.frame) == 2000
+    assert floored.caption({0: 'retained', 1: 'churned'}).endswith(", retained 3.1%, churned 35.1%")
+    assert class_budgets({0: 10, 1: 5}, 100) == {0: 10, 1: 5}
+    assert class_budgets({0: 2, 1: 1, 2: 1}, 3) == {0: 1, 1: 1, 2: 1}
+    assert stratified_sample(df.iloc[:100], 2000).caption() == "all 100 players"
+
+    binned = binned_pairs(df, PAIRPLOT_COLUMNS[:-1], bins=20)
+    assert binned.totals == df['CHURNED'].value_counts().sort_index().to_dict()
+    for counts in list(binned.diagonal.values()) + list(binned.pairs.values()):
+        assert counts.sum(axis=tuple(range(1, counts.ndim))).tolist() == [binned.totals[0], binned.totals[1]]
+    figures = set(plt.get_fignums())
+    assert figure_png(lambda: draw_binned_pairplot(binned, title='check')).startswith(b'\x89PNG')
+    assert set(plt.get_fignums()) == figures
+    print("plot data checks passed")
+
+
+def draw_pairplot(df):
+    sns.pairplot(df[PAIRPLOT_COLUMNS], diag_kind='kde', hue="CHURNED", palette='husl')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--scatter-points', type=int, default=20_000)
+    parser.add_argument('--pairplot-points', type=int, default=5_000)
+    parser.add_argument('--bins', type=int, default=40)
+    parser.add_argument('--full-max-rows', type=int, default=20_000, help="largest frame to draw in full")
+    args = parser.parse_args()
+
+    check_plot_data()
+    rows = []
+    for n_rows in args.rows:
+        df = make_eda_frame(n_rows)
+        timings = {}
+        with timer(timings, 'sample'):
+            scatter = stratified_sample(df, args.scatter_points)
+        # the 3D scatter sends three float columns per point to the browser
+        full_kb = n_rows * len(SCATTER_COLUMNS) * 8 / 1024
+        sample_kb = len(scatter.frame) * len(SCATTER_COLUMNS) * 8 / 1024
+        if n_rows <= args.full_max_rows:
+            with timer(timings, 'full'):
+                figure_png(lambda: draw_pairplot(df))
+        with timer(timings, 'sampled'):
+            figure_png(lambda: draw_pairplot(stratified_sample(df, args.pairplot_points).frame))
+        with timer(timings, 'binned'):
+            figure_png(lambda: draw_binned_pairplot(binned_pairs(df, PAIRPLOT_COLUMNS[:-1], bins=args.bins)))
+        rows.append({
+            'rows': f"{n_rows:,}",
+            'scatter_full_kb': f"{full_kb:,.0f}",
+            'scatter_sample_kb': f"{sample_kb:,.0f}",
+            'sample_ms': f"{timings['sample'] * 1000:.1f}",
+            'pairplot_full_s': f"{timings['full']:.1f}" if 'full' in timings else 'skipped',
+            'pairplot_sampled_s': f"{timings['sampled']:.1f}",
+            'pairplot_binned_s': f"{timings['binned']:.1f}",
+        })
+    print_table(rows, ['rows', 'scatter_full_kb', 'scatter_sample_kb', 'sample_ms', 'pairplot_full_s',
+                       'pairplot_sampled_s', 'pairplot_binned_s'])
+
+
+if __name__ == '__main__':
+    main()
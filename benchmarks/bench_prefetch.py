@@ -0,0 +1,101 @@
+# Step through PLAYER_360 players one id at a time, with and without the background prefetcher,
+# on the local stand-in session with a fixed per-query latency
+#
+#   python benchmarks/bench_prefetch.py --latency 0.05 0.2 --think 0.3
+import argparse
+import statistics
+import time
+
+from common import print_table
+from local_engine import LocalSession, connect
+from player_loader import load_player_bundle
+from prefetch import PlayerPrefetcher, frames_nbytes, neighbour_ids
+from synthetic import make_player_activity_tables
+
+
+def check_prefetcher(conn):
+    session = LocalSession(conn, latency=0.05)
+    load = lambda key: load_player_bundle(session, None, *key)
+
+    # queued loads that are no longer wanted are cancelled, running ones finish
+    prefetcher = PlayerPrefetcher(load, max_workers=1)
+    prefetcher.prefetch([(uid, True) for uid in range(1001, 1011)])
+    prefetcher.prefetch([(1500, True)])
+    assert prefetcher.stats['cancelled'] >= 8
+    bundle = prefetcher.get((1500, True))
+    assert bundle is not None and bundle.sessions['USER_ID'].eq(1500).all()
+
+    # callers get copies, adding a column does not change the cached frames
+    bundle.sessions['DAY'] = 1
+    assert 'DAY' not in prefetcher.get((1500, True)).sessions
+    prefetcher.close()
+
+    # a bundle read at another lineage token, before a table refresh, is dropped instead of served
+    prefetcher = PlayerPrefetcher(load, max_workers=1)
+    prefetcher.prefetch([(1001, True)], lineage='v1')
+    assert prefetcher.get((1001, True), 'v1') is not None and prefetcher.stats['waits'] == 1
+    assert prefetcher.get((1001, True), 'v2') is None and (1001, True) not in prefetcher
+    assert prefetcher.stats['stale'] == 1 and prefetcher.nbytes == 0
+    prefetcher.close()
+
+    # the memory cap evicts the least recently used players
+    one_player = frames_nbytes(load((1001, True)))
+    prefetcher = PlayerPrefetcher(load, max_workers=2, max_bytes=int(one_player * 2.5))
+    for uid in range(1001, 1007):
+        prefetcher.prefetch([(uid, True)])
+        prefetcher.get((uid, True))
+    assert prefetcher.nbytes <= prefetcher.max_bytes and prefetcher.stats['evictions'] > 0
+    assert prefetcher.get((1001, True)) is None
+    prefetcher.close()
+    session.close()
+    print("prefetcher checks passed")
+
+
+def step_through(session, start, steps, think, prefetch):
+    # time spent waiting for the player's data on every step, the think time stands for rendering and reading
+    prefetcher = PlayerPrefetcher(lambda key: load_player_bundle(session, None, *key)) if prefetch else None
+    waits = []
+    for user_id in range(start, start + steps):
+        started = time.perf_counter()
+        bundle = prefetcher.get((user_id, True)) if prefetch else None
+        if bundle is None:
+            bundle = load_player_bundle(session, None, user_id, True)
+        waits.append(time.perf_counter() - started)
+        if prefetch:
+            prefetcher.prefetch([(uid, True) for uid in neighbour_ids(user_id)])
+        time.sleep(think)
+    if prefetch:
+        prefetcher.close()
+    return waits
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=2_000)
+    parser.add_argument('--latency', type=float, nargs='+', default=[0.05, 0.2])
+    parser.add_argument('--think', type=float, default=0.3)
+    parser.add_argument('--steps', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    conn = connect(make_player_activity_tables(args.users, seed=args.seed))
+    check_prefetcher(conn)
+
+    rows = []
+    for latency in args.latency:
+        session = LocalSession(conn, latency=latency)
+        cold = step_through(session, 1101, args.steps, args.think, prefetch=False)
+        warm = step_through(session, 1201, args.steps, args.think, prefetch=True)
+        session.close()
+        rows.append({
+            'latency_s': f"{latency:.2f}",
+            'think_s': f"{args.think:.2f}",
+            'no_prefetch_ms': f"{statistics.median(cold) * 1000:.1f}",
+            'prefetch_ms': f"{statistics.median(warm) * 1000:.1f}",
+            'prefetch_first_step_ms': f"{warm[0] * 1000:.1f}",
+        })
+    print_table(rows, ['latency_s', 'think_s', 'no_prefetch_ms', 'prefetch_ms', 'prefetch_first_step_ms'])
+
+
+if __name__ == '__main__':
+    main()
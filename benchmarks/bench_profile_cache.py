@@ -0,0 +1,96 @@
+# Time the GAME_360 profile report cold, from the in-memory cache and from the persisted copy,
+# and check the size-based eviction of the cache
+#
+#   python benchmarks/bench_profile_cache.py --users 10000 100000
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from common import print_table, timer
+from lineage_cache import lineage
+from local_engine import connect, read_sql
+from profiling import ProfileCache, filter_signature
+from query_builder import EDA_TABLES, EdaFilters, eda_query
+from synthetic import make_player_tables
+
+
+def check_cache():
+    # the multiselect order does not change the key, the selection does
+    assert filter_signature(EdaFilters(age_ranges=('0-11', '65+'))) == filter_signature(EdaFilters(age_ranges=('65+', '0-11')))
+    assert filter_signature(EdaFilters()) != filter_signature(EdaFilters(), scope='static')
+    assert filter_signature(EdaFilters(), n_rows=10) != filter_signature(EdaFilters(), n_rows=11)
+
+    renders = []
+    cache = ProfileCache(max_bytes=250, render=lambda df: renders.append(df) or 'x' * 100)
+    for key in ['a', 'b', 'a', 'c']:
+        cache.report(key, None)
+    # 'b' was the least recently used when 'c' pushed the cache over 250 bytes
+    assert list(cache.reports) == ['a', 'c'] and cache.nbytes == 200 and len(renders) == 3
+    cache.put('big', 'x' * 1000)
+    assert 'big' not in cache and cache.nbytes == 200
+
+    # the counters are updated under the lock, concurrent reports add up
+    cache = ProfileCache(render=lambda df: 'report')
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: cache.report(str(i % 10), None), range(2000)))
+    assert cache.stats['hits'] + cache.stats['misses'] == 2000
+
+    with tempfile.TemporaryDirectory() as folder:
+        ProfileCache(persist_dir=folder, render=lambda df: 'report').report('k', None)
+        restarted = ProfileCache(persist_dir=folder, render=lambda df: 1 / 0)
+        assert restarted.report('k', None) == 'report' and restarted.stats['persisted_hits'] == 1
+
+    # a refresh of the tables gives a new key, the report of the old data is neither in memory nor persisted
+    before = {table: pd.Timestamp('2024-01-01') for table in EDA_TABLES}
+    after = {**before, EDA_TABLES[0]: pd.Timestamp('2024-01-02')}
+    old_key, new_key = (filter_signature(EdaFilters(), scope='static', n_rows=10, lineage=lineage(versions, EDA_TABLES))
+                        for versions in (before, after))
+    assert old_key != new_key
+    with tempfile.TemporaryDirectory() as folder:
+        renders = []
+        cache = ProfileCache(persist_dir=folder, render=lambda df: renders.append(df) or 'report')
+        cache.report(old_key, None)
+        cache.report(new_key, None)
+        assert len(renders) == 2 and cache.stats['misses'] == 2 and cache.stats['persisted_hits'] == 0
+    print("cache checks passed")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_cache()
+
+    rows = []
+    for n_users in args.users:
+        conn = connect(make_player_tables(n_users, n_feature_days=1, seed=args.seed))
+        eda_df = read_sql(conn, *eda_query(None))
+        key = filter_signature(EdaFilters(), n_rows=len(eda_df), columns=eda_df.columns)
+        timings = {}
+        with tempfile.TemporaryDirectory() as folder:
+            cache = ProfileCache(persist_dir=folder)
+            with timer(timings, 'cold'):
+                html = cache.report(key, eda_df)
+            with timer(timings, 'memory_hit'):
+                cache.report(key, eda_df)
+            with timer(timings, 'persisted_hit'):
+                ProfileCache(persist_dir=folder).report(key, eda_df)
+        rows.append({
+            'users': f"{n_users:,}",
+            'html_mb': f"{len(html) / 2**20:.1f}",
+            # reports of this size the default 64 MB budget holds
+            'reports_per_cache': cache.max_bytes // len(html.encode()),
+            'cold_s': f"{timings['cold']:.2f}",
+            'memory_hit_s': f"{timings['memory_hit']:.5f}",
+            'persisted_hit_s': f"{timings['persisted_hit']:.3f}",
+        })
+        conn.close()
+    print_table(rows, ['users', 'html_mb', 'reports_per_cache', 'cold_s', 'memory_hit_s', 'persisted_hit_s'])
+
+
+if __name__ == '__main__':
+    main()
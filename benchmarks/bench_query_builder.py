@@ -0,0 +1,114 @@
+# Check the GAME_360 query builder against the pandas filters on a local SQLite engine, and
+# compare pulling every player and filtering in pandas with filtering in the database
+#
+#   python benchmarks/bench_query_builder.py --users 10000 100000 1000000
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from common import print_table, timer
+from local_engine import connect, read_sql
+from query_builder import EdaFilters, churn_rate_query, count_query, eda_query, filtered_features_query
+from reference import churn_rates, filter_dataframe
+from synthetic import make_player_tables
+
+CHECK_FILTERS = [
+    EdaFilters(),
+    EdaFilters(playerbase='Active'),
+    EdaFilters(playerbase='Inactive', gender='Female'),
+    EdaFilters(age_ranges=('0-11', '65+')),
+    EdaFilters(age_ranges=('18-24', '25-34', '35-44'), country_ranges=('USA', 'UK')),
+    EdaFilters(player_type='Hardcore', support_ticket='Yes'),
+    EdaFilters(player_type='Casual', support_ticket='No', rank_range=('Gold', 'Unreal')),
+    EdaFilters('Active', ('12-17',), 'Male', ('Korea', 'Poland', 'Brazil'), 'Casual', 'No', ('Bronze', 'Silver')),
+]
+
+# the selection timed in the benchmark, a typical drill down of the sidebar
+BENCH_FILTERS = EdaFilters(playerbase='Active', age_ranges=('18-24', '25-34'), country_ranges=('USA', 'Canada'), player_type='Hardcore')
+
+
+def random_filters(rng):
+    def pick(options):
+        return tuple(sorted(rng.choice(options, size=rng.integers(0, 3), replace=False)))
+    return EdaFilters(
+        playerbase=rng.choice(['All', 'Active', 'Inactive']),
+        age_ranges=pick(['0-11', '12-17', '18-24', '25-34', '35-44', '45-54', '55-64', '65+']),
+        gender=rng.choice(['All', 'Male', 'Female']),
+        country_ranges=pick(['China', 'Mexico', 'UK', 'USA', 'Canada', 'Brazil', 'France', 'Germany', 'Korea', 'Poland']),
+        player_type=rng.choice(['All', 'Hardcore', 'Casual']),
+        support_ticket=rng.choice(['All', 'Yes', 'No']),
+        rank_range=pick(['Bronze', 'Silver', 'Gold', 'Platinum', 'Diamond', 'Elite', 'Champion', 'Unreal']),
+    )
+
+
+def pandas_filter(eda_df, filters):
+    return filter_dataframe(eda_df, filters.playerbase, list(filters.age_ranges), filters.gender,
+                            list(filters.country_ranges), filters.player_type, filters.support_ticket,
+                            list(filters.rank_range))
+
+
+def check_equivalence(n_users, seed, n_random=50):
+    tables = make_player_tables(n_users, seed=seed)
+    conn = connect(tables)
+    eda_df = read_sql(conn, *eda_query(None))
+    assert len(eda_df) == n_users
+
+    rng = np.random.default_rng(seed)
+    all_filters = CHECK_FILTERS + [random_filters(rng) for _ in range(n_random)]
+    for filters in all_filters:
+        expected = pandas_filter(eda_df, filters).sort_values('USER_ID').reset_index(drop=True)
+        result = read_sql(conn, *eda_query(None, filters)).sort_values('USER_ID').reset_index(drop=True)
+        # an empty SQLite result has object columns
+        pd.testing.assert_frame_equal(result, expected, check_dtype=len(expected) > 0)
+        assert read_sql(conn, *count_query(None, filters))['PLAYERS'].iloc[0] == len(expected)
+
+        features_df = tables['APP.ROLLING_CHURN_FEATURES']
+        expected_features = pd.merge(features_df, expected[['USER_ID']], on='USER_ID', how='inner')
+        result_features = read_sql(conn, *filtered_features_query(None, filters))
+        assert sorted(result_features['USER_ID']) == sorted(expected_features['USER_ID'])
+
+    for by, expected in churn_rates(eda_df).items():
+        result = read_sql(conn, *churn_rate_query(None, by))
+        assert list(result['GROUP_KEY']) == [str(key) for key in expected.index], by
+        np.testing.assert_allclose(result['CHURN_RATE'], expected.to_numpy())
+
+    sample_df = read_sql(conn, *eda_query(None, limit=100, sample=True, dialect='sqlite'))
+    assert len(sample_df) == min(100, n_users) and sample_df['USER_ID'].is_unique
+    print(f"equivalence check passed on {n_users:,} users and {len(all_filters)} filter selections")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--check-users', type=int, default=5_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_equivalence(args.check_users, args.seed)
+
+    rows = []
+    for n_users in args.users:
+        conn = connect(make_player_tables(n_users, n_feature_days=1, seed=args.seed))
+        timings = {}
+        with timer(timings, 'pandas'):
+            eda_df = read_sql(conn, *eda_query(None))
+            expected = pandas_filter(eda_df, BENCH_FILTERS)
+        with timer(timings, 'sql'):
+            filtered_df = read_sql(conn, *eda_query(None, BENCH_FILTERS))
+        assert len(filtered_df) == len(expected)
+        rows.append({
+            'users': f"{n_users:,}",
+            'matching': f"{len(filtered_df):,}",
+            'pandas_fetch_mb': f"{eda_df.memory_usage(deep=True).sum() / 2**20:.1f}",
+            'sql_fetch_mb': f"{filtered_df.memory_usage(deep=True).sum() / 2**20:.1f}",
+            'pandas_s': f"{timings['pandas']:.3f}",
+            'sql_s': f"{timings['sql']:.3f}",
+        })
+        conn.close()
+    print_table(rows, ['users', 'matching', 'pandas_fetch_mb', 'sql_fetch_mb', 'pandas_s', 'sql_s'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# Parity check and timing of the SQL rolling features pipeline against the pandas notebook path
+#
+#   python benchmarks/bench_rolling_features_sql.py --users 2000
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from common import print_table, timer
+from holdout import anti_join_user_days
+from local_engine import connect, read_sql
+from reference import notebook_rolling_features
+from rolling_features import latest_user_rows
+from rolling_features_sql import FEATURE_COLUMNS, INTEGER_FEATURES, rolling_features_query, to_predict_query, \
+    training_features_query
+from synthetic import make_raw_activity, session_points
+
+
+def run_sql_path(conn):
+    conn.execute("CREATE TABLE ROLLING_CHURN_FEATURES AS\n" + rolling_features_query('sqlite'))
+    return read_sql(conn, "SELECT * FROM ROLLING_CHURN_FEATURES", parse_dates=['DAY'])
+
+
+def assert_parity(sql_df, pandas_df):
+    pandas_df = pandas_df[FEATURE_COLUMNS].reset_index(drop=True)
+    sql_df = sql_df[FEATURE_COLUMNS].sort_values(['USER_ID', 'DAY']).reset_index(drop=True)
+    assert len(sql_df) == len(pandas_df), f"{len(sql_df)} SQL rows != {len(pandas_df)} pandas rows"
+    for col in FEATURE_COLUMNS:
+        expected, result = pandas_df[col], sql_df[col]
+        if col == 'DAY':
+            assert (result.to_numpy() == expected.to_numpy()).all(), col
+        elif col in INTEGER_FEATURES:
+            # both sides truncate integer sums, amounts are summed in hundredths
+            assert (result.to_numpy() == expected.to_numpy()).all(), col
+        else:
+            np.testing.assert_allclose(result.to_numpy(dtype=float), expected.to_numpy(dtype=float),
+                                       rtol=1e-5, atol=1e-5, equal_nan=True, err_msg=col)
+
+
+def assert_split(conn, pandas_df, retention_df):
+    # the APP tables of rolling_features_build.sql against the predicted_df and removed_to_pred_df cells
+    active_users = retention_df.loc[retention_df['CHURNED'] == 0, 'USER_ID']
+    to_pred_df = latest_user_rows(pandas_df[pandas_df['USER_ID'].isin(active_users)])
+    conn.execute("CREATE TABLE TO_BE_PREDICTED_CHURN_FEATURES AS\n" + to_predict_query('sqlite'))
+    assert_parity(read_sql(conn, "SELECT * FROM TO_BE_PREDICTED_CHURN_FEATURES", parse_dates=['DAY']), to_pred_df)
+    assert_parity(read_sql(conn, training_features_query('sqlite'), parse_dates=['DAY']),
+                  anti_join_user_days(pandas_df, to_pred_df))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[500, 2000])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rows = []
+    for n_users in args.users:
+        sessions_df, points_df, purchases_df = make_raw_activity(n_users, seed=args.seed)
+        user_ids = np.sort(sessions_df['USER_ID'].unique())
+        retention_df = pd.DataFrame({'USER_ID': user_ids,
+                                     'CHURNED': np.random.default_rng(args.seed).integers(0, 2, size=len(user_ids))})
+        conn = connect({'SESSIONS': sessions_df, 'POINTS_PER_EVENT': points_df, 'PURCHASES': purchases_df,
+                        'RETENTION': retention_df})
+        timings = {}
+        with timer(timings, 'pandas'):
+            pandas_df = notebook_rolling_features(session_points(sessions_df, points_df), purchases_df)
+        with timer(timings, 'sql'):
+            sql_df = run_sql_path(conn)
+        assert_parity(sql_df, pandas_df)
+        assert_split(conn, pandas_df, retention_df)
+        conn.close()
+        rows.append({
+            'users': f"{n_users:,}",
+            'sessions': f"{len(sessions_df):,}",
+            'purchases': f"{len(purchases_df):,}",
+            'feature_rows': f"{len(sql_df):,}",
+            'pandas_s': f"{timings['pandas']:.2f}",
+            'sqlite_s': f"{timings['sql']:.2f}",
+        })
+    print("SQL and pandas rolling features and their APP splits match")
+    print_table(rows, ['users', 'sessions', 'purchases', 'feature_rows', 'pandas_s', 'sqlite_s'])
+
+
+if __name__ == '__main__':
+    main()
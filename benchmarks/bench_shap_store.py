@@ -0,0 +1,194 @@
+# Check that scripts/batch_explain.py explains both churn models like the boosters do, encodes the static
+# features like GAME_360 and only re-explains changed rows, and that streamlit/shap_store.py reads bounded
+# stratified samples and global importances that match pandas over every stored row, then time the
+# on-demand explanation of the forms against the store reads and the batch build as the playerbase grows
+#
+#   python benchmarks/bench_shap_store.py --users 10000 100000 --feature-days 10 --sample-rows 1000 10000
+import argparse
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from common import print_table, timer
+from local_engine import connect, read_sql
+from query_builder import EdaFilters, eda_query, filtered_features_query
+from batch_explain import ORDINAL_CATEGORIES, LocalShapStore, contributions, source_query
+from shap_store import (ROLLING_MODEL, STATIC_MODEL, importance_query, player_shap_query, plot_values, read_sample,
+                        shap_columns)
+from synthetic import make_player_tables
+
+
+def make_tables(n_users, n_feature_days, seed=0):
+    # the player tables with the twelve rolling features of the rolling model
+    tables = make_player_tables(n_users, n_feature_days=n_feature_days, seed=seed)
+    features_df = tables['APP.ROLLING_CHURN_FEATURES']
+    rng = np.random.default_rng(seed + 3)
+    for i, column in enumerate(ROLLING_MODEL.features):
+        if column not in features_df:
+            features_df[column] = np.round(rng.gamma(1.0 + i % 3, 10.0, size=len(features_df)), 2)
+    return tables
+
+
+def train_booster(X, label, seed=0):
+    params = {'objective': 'binary:logistic', 'max_depth': 4, 'nthread': 1, 'seed': seed}
+    return xgb.train(params, xgb.DMatrix(X, label=label), num_boost_round=50)
+
+
+def train_boosters(conn, seed=0):
+    rolling_df = read_sql(conn, source_query(None, ROLLING_MODEL))
+    static_df = read_sql(conn, source_query(None, STATIC_MODEL))
+    return {
+        ROLLING_MODEL.name: train_booster(rolling_df[ROLLING_MODEL.features], rolling_df['STRATUM'], seed),
+        STATIC_MODEL.name: train_booster(static_df[STATIC_MODEL.features].astype(float), static_df['STRATUM'], seed),
+    }
+
+
+def page_static_features(eda_df):
+    # the preprocessing of the GAME_360 Churn Classifier form, on every player
+    df = eda_df.copy()
+    df['AGE_GROUP'] = pd.cut(df['AGE'], bins=[0, 12, 18, 24, 34, 44, 54, 64, 100],
+                             labels=['0_11', '12_17', '18_24', '25_34', '35_44', '45_54', '55_64', '65+'])
+    for column, categories in ORDINAL_CATEGORIES.items():
+        df[f"{column}_OE"] = df[column].map({category: code for code, category in enumerate(categories)})
+    df['AGE_GROUP'] = pd.Categorical(df['AGE_GROUP'], ordered=False).codes
+    df['LOCATION'] = pd.Categorical(df['LOCATION']).codes
+    df['HAS_SUPPORT_TICKET'] = df['HAS_SUPPORT_TICKET'].astype(int)
+    return df
+
+
+def stored(conn, model):
+    return read_sql(conn, f"SELECT * FROM APP.{model.table} ORDER BY USER_ID, DAY")
+
+
+def check_shap_store(n_users=2_000, n_feature_days=5, seed=0):
+    tables = make_tables(n_users, n_feature_days, seed)
+    tables['ANALYTIC.DEMOGRAPHICS'].loc[tables['ANALYTIC.DEMOGRAPHICS'].index[:7], 'AGE'] = np.nan
+    conn = connect(tables)
+    boosters = train_boosters(conn, seed)
+
+    # the static features are encoded like the page encodes them
+    static_df = read_sql(conn, source_query(None, STATIC_MODEL)).sort_values('USER_ID', ignore_index=True)
+    page_df = page_static_features(read_sql(conn, *eda_query(None))).sort_values('USER_ID', ignore_index=True)
+    pd.testing.assert_frame_equal(static_df[STATIC_MODEL.features].astype(float),
+                                  page_df[STATIC_MODEL.features].astype(float))
+    assert (static_df['AGE_GROUP'] == -1).sum() == 7
+
+    for model, rows in [(ROLLING_MODEL, n_users * n_feature_days), (STATIC_MODEL, n_users)]:
+        booster = boosters[model.name]
+        run = LocalShapStore(conn, booster, model, chunk_rows=1_000, max_workers=2).run()
+        assert (run.rows, run.written, run.deleted) == (rows, rows, 0), run
+        store_df = stored(conn, model)
+        # the SHAP values and the base value add up to the margin of the booster
+        margin = booster.predict(xgb.DMatrix(store_df[model.features]), output_margin=True)
+        np.testing.assert_allclose(store_df[shap_columns(model)].sum(axis=1) + store_df['BASE_VALUE'], margin, rtol=1e-4, atol=1e-4)
+        values, _ = contributions(booster, store_df[model.features].iloc[:50])
+        np.testing.assert_allclose(store_df[shap_columns(model)].iloc[:50].to_numpy(), values, rtol=1e-6)
+
+        # the global importance of the summary is the mean over every stored row
+        importance = read_sql(conn, *importance_query(None, model)).set_index('FEATURE')
+        expected = store_df[shap_columns(model)].abs().mean()
+        np.testing.assert_allclose(importance.loc[model.features, 'MEAN_ABS_SHAP'], expected.to_numpy(), rtol=1e-9)
+        assert list(importance.index) == [column[:-len('_SHAP')] for column in expected.sort_values(ascending=False).index]
+
+        # a bounded sample keeps the label mix and is the same on every read
+        sample = read_sample(lambda sql, params: read_sql(conn, sql, params), None, model, 500)
+        assert len(sample.frame) == 500 == sum(sample.shown.values()) and sum(sample.totals.values()) == rows
+        assert abs(sample.frame['STRATUM'].mean() - store_df['STRATUM'].mean()) < 0.01
+        again = read_sample(lambda sql, params: read_sql(conn, sql, params), None, model, 500)
+        pd.testing.assert_frame_equal(sample.frame, again.frame)
+        shap_values, feature_values = plot_values(model, sample.frame)
+        assert shap_values.shape == feature_values.shape == (500, len(model.features))
+
+        # the sample is drawn from the players matching the filters only
+        males = read_sample(lambda sql, params: read_sql(conn, sql, params), None, model, 300, EdaFilters(gender='Male'))
+        male_ids = set(tables['ANALYTIC.DEMOGRAPHICS'].query("GENDER == 'Male'")['USER_ID'])
+        assert len(males.frame) == 300 and set(males.frame['USER_ID']) <= male_ids
+
+    # one player's rows, oldest day first
+    player_df = read_sql(conn, *player_shap_query(None, ROLLING_MODEL, 1005))
+    assert len(player_df) == n_feature_days and player_df['DAY'].is_monotonic_increasing
+
+    # a rerun explains nothing, then only the changed rows, and drops the days that left the features
+    booster = boosters[ROLLING_MODEL.name]
+    assert LocalShapStore(conn, booster, ROLLING_MODEL).run().written == 0
+    features_df = tables['APP.ROLLING_CHURN_FEATURES']
+    changed = features_df.copy()
+    changed.loc[changed.index[:10], 'TOTAL_ADS_ROLLING_30_DAYS'] += 1
+    changed = changed[changed['DAY'] != changed['DAY'].min()]
+    before = stored(conn, ROLLING_MODEL).set_index(['USER_ID', 'DAY'])
+    conn.execute("DELETE FROM APP.ROLLING_CHURN_FEATURES")
+    changed.to_sql('_load_features', conn, index=False)
+    conn.execute("INSERT INTO APP.ROLLING_CHURN_FEATURES SELECT * FROM _load_features")
+    conn.execute("DROP TABLE _load_features")
+    conn.commit()
+    run = LocalShapStore(conn, booster, ROLLING_MODEL).run()
+    edited = changed.index.intersection(features_df.index[:10])
+    assert (run.written, run.deleted) == (len(edited), n_users), run
+    after = stored(conn, ROLLING_MODEL).set_index(['USER_ID', 'DAY'])
+    untouched = after.index.difference(pd.MultiIndex.from_frame(changed.loc[edited, ['USER_ID', 'DAY']]))
+    pd.testing.assert_frame_equal(after.loc[untouched], before.loc[untouched])
+
+    # a new model version explains every row again and keeps the rows of the old one
+    run = LocalShapStore(conn, booster, ROLLING_MODEL._replace(version='v2')).run()
+    assert run.written == len(changed)
+    assert read_sql(conn, *importance_query(None, ROLLING_MODEL, 'v2'))['N'].iloc[0] == len(changed)
+    conn.close()
+    print(f"shap store checks passed on {n_users:,} players")
+
+
+def on_demand(conn, booster, sample_rows):
+    # the rolling form before: the filtered feature rows, explained for the slider's sample. The form ran
+    # mv.run in the warehouse, timed here with the same tree path in process and without the round trip
+    features_df = read_sql(conn, *filtered_features_query(None, EdaFilters(), limit=100_000))
+    values, _ = contributions(booster, features_df[ROLLING_MODEL.features].iloc[:sample_rows])
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--feature-days', type=int, default=10)
+    parser.add_argument('--sample-rows', type=int, nargs='+', default=[1_000, 10_000])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_shap_store(seed=args.seed)
+    rows = []
+    for n_users in args.users:
+        conn = connect(make_tables(n_users, args.feature_days, args.seed))
+        booster = train_boosters(conn, args.seed)[ROLLING_MODEL.name]
+        timings = {}
+        with timer(timings, 'build'):
+            run = LocalShapStore(conn, booster, ROLLING_MODEL, max_workers=args.workers).run()
+        with timer(timings, 'player'):
+            read_sql(conn, *player_shap_query(None, ROLLING_MODEL, 1001))
+        with timer(timings, 'importance'):
+            read_sql(conn, *importance_query(None, ROLLING_MODEL))
+        for sample_rows in args.sample_rows:
+            with timer(timings, 'on_demand'):
+                on_demand(conn, booster, sample_rows)
+            with timer(timings, 'sample'):
+                read_sample(lambda sql, params: read_sql(conn, sql, params), None, ROLLING_MODEL, sample_rows)
+            with timer(timings, 'filtered'):
+                read_sample(lambda sql, params: read_sql(conn, sql, params), None, ROLLING_MODEL, sample_rows,
+                            EdaFilters(gender='Male', player_type='Casual'))
+            rows.append({
+                'users': f"{n_users:,}",
+                'feature_rows': f"{run.rows:,}",
+                'build_rows_s': f"{run.rows_per_second:,.0f}",
+                'sample_rows': f"{sample_rows:,}",
+                'on_demand_s': f"{timings['on_demand']:.2f}",
+                'store_sample_s': f"{timings['sample']:.2f}",
+                'filtered_sample_s': f"{timings['filtered']:.2f}",
+                'player_ms': f"{timings['player'] * 1000:.1f}",
+                'importance_ms': f"{timings['importance'] * 1000:.1f}",
+            })
+        conn.close()
+    print_table(rows, ['users', 'feature_rows', 'build_rows_s', 'sample_rows', 'on_demand_s', 'store_sample_s',
+                       'filtered_sample_s', 'player_ms', 'importance_ms'])
+
+
+if __name__ == '__main__':
+    main()
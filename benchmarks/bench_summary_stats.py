@@ -0,0 +1,133 @@
+# Check the GAME_360 summary tables of streamlit/summary_stats.py against the pandas groupby and corr over
+# every player on a local SQLite engine, then time the static demographics charts read from all players
+# against the same charts read from the merged segment summaries
+#
+#   python benchmarks/bench_summary_stats.py --users 10000 100000 1000000 --build-max-users 100000
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from common import print_table, timer
+from local_engine import connect, read_sql
+from query_builder import churn_rate_query, eda_query
+from reference import churn_rates
+from summary_stats import (SEGMENT_COLUMNS, SUMMARY_COLUMNS, churn_segments_query, column_pairs, correlation_matrix,
+                           correlation_moments_query, merged_moments_query, segment_churn_rate_query)
+from synthetic import make_player_tables
+
+
+def build_summaries(conn):
+    # the dynamic tables of scripts/summary_tables_build.sql as plain tables
+    for name, query in [('CHURN_SEGMENTS', churn_segments_query(None)), ('CORRELATION_MOMENTS', correlation_moments_query(None))]:
+        conn.execute(f"DROP TABLE IF EXISTS ANALYTIC.{name}")
+        conn.execute(f"CREATE TABLE ANALYTIC.{name} AS {query}")
+    conn.commit()
+
+
+def summary_charts(conn):
+    rates = {by: read_sql(conn, *segment_churn_rate_query(None, by)) for by in SEGMENT_COLUMNS}
+    moments_df = read_sql(conn, *merged_moments_query(None))
+    return rates, correlation_matrix(moments_df), sum(len(df) for df in rates.values()) + len(moments_df)
+
+
+def player_charts(conn):
+    eda_df = read_sql(conn, *eda_query(None))
+    return churn_rates(eda_df), eda_df[SUMMARY_COLUMNS].corr(), len(eda_df)
+
+
+def check_summary_stats(n_users, seed=0):
+    tables = make_player_tables(n_users, n_feature_days=1, seed=seed)
+    # players without a birthdate have no age, pandas correlates every pair over the players where both are set
+    tables['ANALYTIC.DEMOGRAPHICS'].loc[tables['ANALYTIC.DEMOGRAPHICS'].sample(frac=0.05, random_state=seed).index, 'AGE'] = np.nan
+    conn = connect(tables)
+    build_summaries(conn)
+    eda_df = read_sql(conn, *eda_query(None))
+
+    rates, corr, rows_read = summary_charts(conn)
+    for by, expected in churn_rates(eda_df).items():
+        result = rates[by]
+        assert list(result['GROUP_KEY']) == [str(key) for key in expected.index], by
+        np.testing.assert_allclose(result['CHURN_RATE'], expected.to_numpy())
+        # same rows as the per-player query the page ran before
+        pd.testing.assert_frame_equal(result, read_sql(conn, *churn_rate_query(None, by)), check_dtype=False)
+    pd.testing.assert_frame_equal(corr, eda_df[SUMMARY_COLUMNS].corr(), rtol=1e-9, atol=1e-12)
+    assert rows_read == len(column_pairs()) + sum(len(rates[by]) for by in SEGMENT_COLUMNS)
+
+    # the segments merge in python as well as in the warehouse, and the moments of disjoint player sets add up
+    segment_rows = read_sql(conn, "SELECT * FROM ANALYTIC.CORRELATION_MOMENTS")
+    pd.testing.assert_frame_equal(correlation_matrix(segment_rows), corr, rtol=1e-9, atol=1e-12)
+    parts = []
+    for half in (tables['ANALYTIC.RETENTION']['USER_ID'] % 2 == 0, tables['ANALYTIC.RETENTION']['USER_ID'] % 2 == 1):
+        users = tables['ANALYTIC.RETENTION'].loc[half, 'USER_ID']
+        part_conn = connect({name: df[df['USER_ID'].isin(users)] for name, df in tables.items()})
+        parts.append(read_sql(part_conn, correlation_moments_query(None)))
+        part_conn.close()
+    pd.testing.assert_frame_equal(correlation_matrix(pd.concat(parts)), corr, rtol=1e-9, atol=1e-12)
+
+    # a constant column has no correlation, like in pandas
+    constant = pd.DataFrame({'COLUMN_A': ['AGE', 'AGE', 'CHURNED'], 'COLUMN_B': ['AGE', 'CHURNED', 'CHURNED'],
+                             'N': [3, 3, 3], 'MEAN_A': [2.0, 2.0, 1 / 3], 'MEAN_B': [2.0, 1 / 3, 1 / 3],
+                             'M2_A': [0.0, 0.0, 2 / 3], 'M2_B': [0.0, 2 / 3, 2 / 3], 'C_AB': [0.0, 0.0, 2 / 3]})
+    matrix = correlation_matrix(constant, ['AGE', 'CHURNED'])
+    assert matrix.isna().sum().sum() == 3 and matrix.loc['CHURNED', 'CHURNED'] == 1.0
+    conn.close()
+
+    # columns far from zero keep their correlations, n * sum(ab) - sum(a) * sum(b) of raw sums would cancel
+    tables['ANALYTIC.USER_RANKINGS']['TOTAL_POINTS'] += 1e9
+    for df in tables.values():
+        df['USER_ID'] += 10**9
+    conn = connect(tables)
+    build_summaries(conn)
+    _, shifted_corr, _ = summary_charts(conn)
+    pd.testing.assert_frame_equal(shifted_corr, read_sql(conn, *eda_query(None))[SUMMARY_COLUMNS].corr(), rtol=1e-7, atol=1e-9)
+    conn.close()
+    print(f"summary stats checks passed on {n_users:,} users")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--check-users', type=int, default=5_000)
+    parser.add_argument('--build-max-users', type=int, default=100_000, help="largest playerbase to build the summaries from")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_summary_stats(args.check_users, args.seed)
+    rows = []
+    for n_users in args.users:
+        tables = make_player_tables(n_users, n_feature_days=1, seed=args.seed)
+        conn = connect(tables)
+        timings = {}
+        with timer(timings, 'players'):
+            _, _, player_rows = player_charts(conn)
+        if n_users <= args.build_max_users:
+            with timer(timings, 'build'):
+                build_summaries(conn)
+        else:
+            # the summaries have at most one row per segment and column pair whatever the playerbase,
+            # stand in for them with the summaries of a smaller playerbase
+            small_conn = connect(make_player_tables(args.build_max_users, n_feature_days=1, seed=args.seed))
+            build_summaries(small_conn)
+            for name in ('CHURN_SEGMENTS', 'CORRELATION_MOMENTS'):
+                read_sql(small_conn, f"SELECT * FROM ANALYTIC.{name}").to_sql(f"_load_{name}", conn, index=False)
+                conn.execute(f"CREATE TABLE ANALYTIC.{name} AS SELECT * FROM _load_{name}")
+            small_conn.close()
+        with timer(timings, 'summary'):
+            _, _, summary_rows = summary_charts(conn)
+        stored = read_sql(conn, "SELECT COUNT(*) AS N FROM ANALYTIC.CORRELATION_MOMENTS")['N'].iloc[0]
+        rows.append({
+            'users': f"{n_users:,}",
+            'players_rows_read': f"{player_rows:,}",
+            'summary_rows_read': f"{summary_rows:,}",
+            'moment_rows_stored': f"{stored:,}",
+            'players_s': f"{timings['players']:.3f}",
+            'summary_s': f"{timings['summary']:.3f}",
+            'build_s': f"{timings['build']:.1f}" if 'build' in timings else 'skipped',
+        })
+        conn.close()
+    print_table(rows, ['users', 'players_rows_read', 'summary_rows_read', 'moment_rows_stored', 'players_s', 'summary_s', 'build_s'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# Check the PLAYER_360 window aggregator against the save_filter metric block and time both
+#
+#   python benchmarks/bench_window_metrics.py --rows 1000 100000 1000000
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from common import print_table, timer
+from reference import player_metric_deltas
+from synthetic import make_raw_activity
+from window_metrics import METRICS, PlayerWindows
+
+WINDOWS = [7, 30, 45, 60, 90, 200, 365]
+
+
+def make_player_frames(n_rows, seed=0):
+    # one player's POINTS_PER_EVENT and PURCHASES rows over two years, in random order
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2023-01-01T00:00:00')
+    log_in = start + rng.integers(0, 730 * 24 * 3600, size=n_rows).astype('timedelta64[s]')
+    points_df = pd.DataFrame({'LOG_IN': pd.to_datetime(log_in), 'TOTAL_POINTS': np.round(rng.gamma(2.0, 40.0, size=n_rows), 1)})
+    n_ads = max(n_rows // 2, 1)
+    purchase_type = rng.choice(['none', 'skin', 'battle_pass'], p=[0.7, 0.15, 0.15], size=n_ads)
+    purchases_df = pd.DataFrame({
+        'TIMESTAMP_OF_PURCHASE': pd.to_datetime(start + rng.integers(0, 730 * 24 * 3600, size=n_ads).astype('timedelta64[s]')),
+        'PURCHASE_TYPE': purchase_type,
+        'PURCHASE_AMOUNT': np.where(purchase_type == 'none', 0.0, rng.choice([0.99, 4.99, 9.99], size=n_ads)),
+        'AD_ENGAGEMENT_TIME': np.round(rng.gamma(2.0, 8.0, size=n_ads), 2),
+    })
+    return points_df, purchases_df
+
+
+def assert_metrics_close(result, expected):
+    for metric in METRICS:
+        np.testing.assert_allclose(result[metric][0], expected[metric][0], rtol=1e-9, atol=1e-6, err_msg=metric)
+        np.testing.assert_allclose(result[metric][1], expected[metric][1], atol=0.011, err_msg=metric)
+
+
+def check_equivalence(seed, n_players=300):
+    sessions_df, points_df, purchases_df = make_raw_activity(n_players, seed=seed)
+    points_df = points_df.merge(sessions_df[['SESSION_ID', 'LOG_IN']], on='SESSION_ID')
+    rng = np.random.default_rng(seed)
+    checked = 0
+    for user_id, player_points_df in points_df.groupby('USER_ID'):
+        player_purchases_df = purchases_df[purchases_df['USER_ID'] == user_id]
+        windows = PlayerWindows(player_points_df, player_purchases_df)
+        last_login = player_points_df['LOG_IN'].max()
+        for days in rng.choice(WINDOWS, size=2, replace=False):
+            start_date = last_login - pd.Timedelta(days=int(days))
+            assert_metrics_close(windows.compare(start_date, int(days)), player_metric_deltas(player_points_df, player_purchases_df, start_date, int(days)))
+            checked += 1
+
+    # both windows are closed on the start side and the previous one on start too, like the save_filter block,
+    # so rows exactly on either boundary count where they did
+    points_df = pd.DataFrame({'LOG_IN': pd.to_datetime(['2024-01-01', '2024-01-31', '2024-02-15']), 'TOTAL_POINTS': [1.0, 2.0, 4.0]})
+    purchases_df = pd.DataFrame({'TIMESTAMP_OF_PURCHASE': pd.to_datetime(['2024-01-31']), 'PURCHASE_TYPE': ['skin'],
+                                 'PURCHASE_AMOUNT': [4.99], 'AD_ENGAGEMENT_TIME': [10.0]})
+    start_date = pd.Timestamp('2024-01-31')
+    metrics = PlayerWindows(points_df, purchases_df).compare(start_date, 30)
+    assert metrics['TOTAL_POINTS'] == (6.0, 3.0) and metrics['TOTAL_LOGINS'] == (2, 0) and metrics['TOTAL_ADS'] == (1, 0)
+    assert_metrics_close(metrics, player_metric_deltas(points_df, purchases_df, start_date, 30))
+    print(f"equivalence check passed on {checked} player windows and the window boundaries")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check_equivalence(args.seed)
+
+    rows = []
+    for n_rows in args.rows:
+        points_df, purchases_df = make_player_frames(n_rows, seed=args.seed)
+        start_date = points_df['LOG_IN'].max() - pd.Timedelta(days=30)
+        timings = {}
+        with timer(timings, 'masks'):
+            for days in WINDOWS:
+                player_metric_deltas(points_df, purchases_df, points_df['LOG_IN'].max() - pd.Timedelta(days=days), days)
+        with timer(timings, 'build'):
+            windows = PlayerWindows(points_df, purchases_df)
+        with timer(timings, 'windows'):
+            for days in WINDOWS:
+                windows.compare(points_df['LOG_IN'].max() - pd.Timedelta(days=days), days)
+        assert_metrics_close(windows.compare(start_date, 30), player_metric_deltas(points_df, purchases_df, start_date, 30))
+        rows.append({
+            'rows': f"{n_rows:,}",
+            'masks_ms_per_window': f"{timings['masks'] / len(WINDOWS) * 1000:.2f}",
+            'build_ms': f"{timings['build'] * 1000:.2f}",
+            'aggregator_ms_per_window': f"{timings['windows'] / len(WINDOWS) * 1000:.3f}",
+        })
+    print_table(rows, ['rows', 'masks_ms_per_window', 'build_ms', 'aggregator_ms_per_window'])
+
+
+if __name__ == '__main__':
+    main()
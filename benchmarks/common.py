@@ -0,0 +1,26 @@
+# Shared helpers for the benchmark scripts
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# the notebook and app helpers are deployed as flat modules, so import them the same way
+for folder in ('notebooks', 'streamlit', 'scripts'):
+    if str(REPO_ROOT / folder) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT / folder))
+
+
+@contextmanager
+def timer(results, name):
+    start = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - start
+
+
+def print_table(rows, columns):
+    widths = [max(len(str(col)), *(len(str(row.get(col, ''))) for row in rows)) for col in columns]
+    print('  '.join(str(col).ljust(width) for col, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(str(row.get(col, '')).ljust(width) for col, width in zip(columns, widths)))
@@ -0,0 +1,116 @@
+# SQLite stand-in for the Snowflake tables used by the local parity checks and benchmarks
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import pandas as pd
+
+
+def connect(frames, path=':memory:'):
+    # load each frame as a table named after its key, timestamps are stored as ISO text.
+    # keys like 'ANALYTIC.RETENTION' are loaded into an attached in-memory database per schema,
+    # so queries can use the same SCHEMA.TABLE names as in Snowflake
+    # LocalSession runs queries from worker threads, one at a time
+    conn = sqlite3.connect(path, check_same_thread=False)
+    schemas = set()
+    for table_name, df in frames.items():
+        if '.' not in table_name:
+            df.to_sql(table_name, conn, index=False, if_exists='replace')
+            continue
+        schema, name = table_name.split('.')
+        if schema not in schemas:
+            conn.execute(f"ATTACH DATABASE ':memory:' AS {schema}")
+            schemas.add(schema)
+        df.to_sql(f"_load_{name}", conn, index=False, if_exists='replace')
+        conn.execute(f"DROP TABLE IF EXISTS {schema}.{name}")
+        conn.execute(f"CREATE TABLE {schema}.{name} AS SELECT * FROM _load_{name}")
+        conn.execute(f"DROP TABLE _load_{name}")
+    conn.commit()
+    return conn
+
+
+def read_sql(conn, query, params=None, parse_dates=None):
+    return pd.read_sql_query(query, conn, params=params, parse_dates=parse_dates)
+
+
+def read_sql_batches(conn, query, params=None, parse_dates=None, chunk_rows=100_000):
+    # the stand-in for the connector's fetch_arrow_batches, frames of at most chunk_rows rows
+    return pd.read_sql_query(query, conn, params=params, parse_dates=parse_dates, chunksize=chunk_rows)
+
+
+class LocalJob:
+    def __init__(self, future):
+        self._future = future
+
+    def result(self):
+        return self._future.result()
+
+
+class LocalDataFrame:
+    def __init__(self, session, query, params):
+        self._session = session
+        self._query = query
+        self._params = params
+
+    def to_pandas(self, block=True):
+        if block:
+            return self._session._run(self._query, self._params)
+        return LocalJob(self._session._pool.submit(self._session._run, self._query, self._params))
+
+
+class LocalQueryRecord(NamedTuple):
+    query_id: str
+    sql_text: str
+
+
+class LocalQueryHistory:
+    # like the QueryHistory of Session.query_history(), records the queries run while the block is open
+    def __init__(self, session):
+        self.session = session
+        self.queries = []
+
+    def __enter__(self):
+        with self.session._lock:
+            self.session._histories.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        with self.session._lock:
+            self.session._histories.remove(self)
+        return False
+
+
+class LocalSession:
+    """Stand-in for a Snowpark session over SQLite, for the code paths that only use session.sql(...).to_pandas().
+
+    Every query first waits ``latency`` seconds, a number or a function of the query, to stand for the
+    warehouse and network round trip, then runs on the shared connection one at a time.
+    """
+
+    def __init__(self, conn, latency=0.0, max_workers=8):
+        self.conn = conn
+        self.latency = latency
+        self.queries = []
+        self._histories = []
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def sql(self, query, params=None):
+        return LocalDataFrame(self, query, params)
+
+    def query_history(self):
+        return LocalQueryHistory(self)
+
+    def _run(self, query, params):
+        time.sleep(self.latency(query) if callable(self.latency) else self.latency)
+        with self._lock:
+            self.queries.append((query, params))
+            record = LocalQueryRecord(f"local-{len(self.queries)}", query)
+            for history in self._histories:
+                history.queries.append(record)
+            return read_sql(self.conn, query, params=params)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
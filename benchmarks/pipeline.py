@@ -0,0 +1,393 @@
+# The Player 360 pipeline stages on the local SQLite engine, run one after the other by benchmarks/run.py.
+# Every stage reads what the stages before it left on the PipelineState and returns the rows it processed.
+#
+#   generate          scripts/generate_data.py writes the @SUPPORT stage layout
+#   ingest            scripts/ingest_raw.py loads it into RAW
+#   analytic_sql      POINTS_PER_EVENT and RETENTION of analytic_build.sql, rendered for SQLite
+#   rolling_sql       the rolling features dynamic table of rolling_features_sql.py
+#   notebook_features the pandas feature engineering of the rolling churn notebook
+#   train             the XGBoost churn model of the notebook
+#   batch_score       churn likelihood of the test split, and APP.CHURN_PREDICTIONS of batch_score.py for the players to predict
+#   game_360_prep     GAME_360 filters, sort and first page
+#   player_360_prep   PLAYER_360 window metrics of a sample of players
+import pandas as pd
+
+from batch_explain import LocalShapStore
+from batch_score import HASHED_COLUMNS, LocalBatchScorer
+from bench_demographic_filters import make_demographic_columns
+from demographic_filters import age_range_codes, filter_players
+from feature_schema import DAY_PURCHASES, DAY_SESSIONS, PURCHASES, ROLLING_FEATURES, SESSION_POINTS, compact_batches, \
+    compact_frame
+from generate_data import generate
+from holdout import anti_join_user_days, holdout_split
+from ingest_raw import LocalIngest
+from local_engine import read_sql, read_sql_batches
+from pagination import frame_page, sort_permutation
+from query_builder import EdaFilters
+from rolling_features import daily_session_totals, densify_user_days, drop_warmup_days, latest_user_rows, \
+    login_next_7_days, rolling_whole_total, user_login_bounds
+from rolling_features_sql import DIALECTS, rolling_features_query
+from shap_store import ROLLING_MODEL
+from window_metrics import PlayerWindows
+
+# generated history ends on END, the ingest moves it to end the day before TODAY
+END = '2024-12-31'
+TODAY = '2025-01-01'
+WINDOW = 30
+
+# the model_creation cell of the rolling notebook
+FEATURE_LABELS = [
+    'TOTAL_SESSION_DURATION_ROLLING_30_DAYS',
+    'TOTAL_SESSIONS_ROLLING_30_DAYS',
+    'AVERAGE_SESSION_LEN_ROLLING_30_DAYS',
+    'TOTAL_POINTS_ROLLING_30_DAYS',
+    'AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS',
+    'TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+    'TOTAL_PURCHASES_ROLLING_30_DAYS',
+    'AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+    'TOTAL_ADS_ROLLING_30_DAYS',
+    'AD_CONVERSION_RATE_ROLLING_30_DAYS',
+    'TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS',
+    'AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS',
+]
+TARGET = 'LOGIN_NEXT_7_DAYS'
+
+POINTS_MAPPING = [('Assists', 0.2), ('Boosts', 0.1), ('Damage Dealt', .1), ('Kills', 1.0), ('Distance Traveled', .2),
+                  ('Weapons Acquired', .1), ('Head Shots', .3), ('Heals', .2)]
+# GAME_EVENTS column and points name of every event
+POINTS_EVENTS = [('ASSISTS', 'Assists', 'ASSISTS_POINTS'), ('BOOSTS', 'Boosts', 'BOOSTS_POINTS'),
+                 ('DAMAGE_DEALT', 'Damage Dealt', 'DAMAGE_POINTS'), ('DISTANCE_TRAVELED', 'Distance Traveled', 'DISTANCE_POINTS'),
+                 ('KILLS', 'Kills', 'KILLS_POINTS'), ('WEAPONS_ACQUIRED', 'Weapons Acquired', 'WEAPONS_POINTS'),
+                 ('HEADSHOTS', 'Head Shots', 'HEADSHOTS_POINTS'), ('HEALS', 'Heals', 'HEALS_POINTS')]
+
+# the sidebar selections timed on GAME_360
+PAGE_FILTERS = [
+    EdaFilters(),
+    EdaFilters(playerbase='Inactive', gender='Female'),
+    EdaFilters(age_ranges=('18-24', '25-34'), country_ranges=('USA', 'UK'), player_type='Hardcore'),
+]
+PLAYER_SAMPLE = 200
+
+
+def analytic_sqlite(today=TODAY):
+    """POINTS_PER_EVENT and RETENTION of analytic_build.sql as SQLite statements, ``today`` stands for CURRENT_DATE."""
+    mapping = ",\n       ".join(f"('{event}', {points})" for event, points in POINTS_MAPPING)
+    event_points = ",\n        ".join(
+        f"ge.{col} * (SELECT POINTS FROM ANALYTIC.POINTS_MAPPING_TABLE WHERE EVENT = '{event}') AS {name}"
+        for col, event, name in POINTS_EVENTS)
+    point_sums = ",\n        ".join(f"SUM({name}) AS {name}" for _, _, name in POINTS_EVENTS)
+    total = " + ".join(name for _, _, name in POINTS_EVENTS)
+    days_after = "JULIANDAY(DATE(e.LOG_IN)) - JULIANDAY(DATE(f.FIRST_LOGIN_DATE))"
+    return [
+        # Snowflake hash joins SESSIONS, SQLite needs the join keys indexed to avoid a nested loop scan
+        "CREATE INDEX RAW.SESSIONS_SESSION_ID ON SESSIONS (SESSION_ID)",
+        "CREATE INDEX RAW.SESSIONS_USER_ID ON SESSIONS (USER_ID)",
+        "CREATE TABLE ANALYTIC.POINTS_MAPPING_TABLE (EVENT TEXT, POINTS REAL)",
+        f"INSERT INTO ANALYTIC.POINTS_MAPPING_TABLE (EVENT, POINTS)\nVALUES {mapping}",
+        f"""CREATE TABLE ANALYTIC.POINTS_PER_EVENT AS
+WITH player_points_per_event AS (
+    SELECT
+        ge.USER_ID,
+        ge.SESSION_ID,
+        {event_points}
+    FROM RAW.GAME_EVENTS ge
+),
+player_points_per_session AS (
+    SELECT
+        USER_ID,
+        SESSION_ID,
+        {point_sums},
+        SUM({total}) AS TOTAL_POINTS
+    FROM player_points_per_event
+    GROUP BY USER_ID, SESSION_ID
+)
+SELECT
+    pps.*,
+    s.LOG_IN,
+    s.LOG_OUT,
+    s.SESSION_DURATION_MINUTES
+FROM player_points_per_session pps
+LEFT JOIN RAW.SESSIONS s ON pps.SESSION_ID = s.SESSION_ID""",
+        f"""CREATE TABLE ANALYTIC.RETENTION AS
+WITH first_login AS (
+    SELECT
+        USER_ID,
+        MIN(LOG_IN) AS FIRST_LOGIN_DATE,
+        MAX(LOG_IN) AS LAST_LOGIN_DATE,
+        COUNT(*) AS TOTAL_LOGINS
+    FROM RAW.SESSIONS
+    GROUP BY USER_ID
+),
+login_activity AS (
+    SELECT
+        f.USER_ID,
+        f.FIRST_LOGIN_DATE,
+        f.LAST_LOGIN_DATE,
+        f.TOTAL_LOGINS,
+        MAX({days_after} >= 1) AS LOGGED_IN_AFTER_1_DAY,
+        MAX({days_after} >= 7) AS LOGGED_IN_AFTER_7_DAYS,
+        MAX({days_after} >= 30) AS LOGGED_IN_AFTER_30_DAYS,
+        MAX(e.LOG_IN >= DATE('{today}', '-30 days')) AS LOGGED_IN_IN_LAST_30_DAYS,
+        CAST(JULIANDAY('{today}') - JULIANDAY(DATE(f.LAST_LOGIN_DATE)) AS INTEGER) AS DAYS_SINCE_LAST_LOGIN
+    FROM first_login f
+    LEFT JOIN RAW.SESSIONS e ON e.USER_ID = f.USER_ID
+    GROUP BY f.USER_ID, f.FIRST_LOGIN_DATE, f.LAST_LOGIN_DATE, f.TOTAL_LOGINS
+)
+SELECT *,
+    CASE WHEN DAYS_SINCE_LAST_LOGIN > 30 THEN 1 ELSE 0 END AS CHURNED
+FROM login_activity""",
+    ]
+
+
+def _rolling_sum(df, col, window):
+    return df.groupby('USER_ID')[col].rolling(window=window, min_periods=1).sum().reset_index(level=0, drop=True)
+
+
+def _keep(df, dtypes):
+    return df
+
+
+def notebook_features(session_points_df, purchases_df, window=WINDOW, compact=True):
+    """features_df of the rolling notebook, cells sessions_by_days to create_labels.
+
+    With ``compact`` every intermediate takes the dtypes of notebooks/feature_schema.py like the cells do,
+    without it the frames keep the default widths and are downcast at the end like compress_data_size did.
+    """
+    schema = compact_frame if compact else _keep
+    df = session_points_df
+    # normalize keeps the days datetime64, .dt.date makes a python date object per session
+    df['DAY'] = df['LOG_IN'].dt.normalize() if compact else pd.to_datetime(df['LOG_IN'].dt.date)
+    df = df.sort_values(by=['USER_ID', 'DAY', 'LOG_IN'])
+    day_sessions_df = densify_user_days(schema(daily_session_totals(df), DAY_SESSIONS), user_login_bounds(df))
+    for col in ['TOTAL_SESSION_DURATION', 'TOTAL_SESSIONS', 'TOTAL_POINTS']:
+        day_sessions_df[f'{col}_ROLLING_30_DAYS'] = _rolling_sum(day_sessions_df, col, window)
+    day_sessions_df['AVERAGE_SESSION_LEN_ROLLING_30_DAYS'] = day_sessions_df['TOTAL_SESSION_DURATION_ROLLING_30_DAYS'] / day_sessions_df['TOTAL_SESSIONS_ROLLING_30_DAYS']
+    day_sessions_df['AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS'] = day_sessions_df['TOTAL_POINTS_ROLLING_30_DAYS'] / day_sessions_df['TOTAL_SESSIONS_ROLLING_30_DAYS']
+    rolling_sessions_df = drop_warmup_days(schema(day_sessions_df[[
+        'USER_ID', 'DAY', 'SESSION_INACTIVE', 'TOTAL_SESSION_DURATION_ROLLING_30_DAYS', 'TOTAL_SESSIONS_ROLLING_30_DAYS',
+        'AVERAGE_SESSION_LEN_ROLLING_30_DAYS', 'TOTAL_POINTS_ROLLING_30_DAYS', 'AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS']],
+        ROLLING_FEATURES), days=window)
+
+    purchased_df = purchases_df[purchases_df['PURCHASE_TYPE'] != 'none'].copy()
+    purchases_df['DAY'] = purchases_df['TIMESTAMP_OF_PURCHASE'].dt.normalize() if compact else \
+        pd.to_datetime(purchases_df['TIMESTAMP_OF_PURCHASE'].dt.date)
+    day_purchases_df = purchases_df.groupby(['USER_ID', 'DAY']).agg(
+        total_ad_engagement_time=('AD_ENGAGEMENT_TIME', 'sum'),
+        total_ad_conversions=('AD_CONVERSION', 'sum'),
+        total_ads=('AD_INTERACTION_ID', 'count')
+    ).reset_index()
+    day_purchases_df['PURCHASE_INACTIVE'] = 0
+    day_purchases_df = pd.merge(day_sessions_df, day_purchases_df, how="left")[list(day_purchases_df.columns)]
+    day_purchases_df[list(day_purchases_df.columns)[:-1]] = day_purchases_df[list(day_purchases_df.columns)[:-1]].fillna(0)
+    day_purchases_df['PURCHASE_INACTIVE'] = day_purchases_df['PURCHASE_INACTIVE'].fillna(1)
+    day_purchases_df = schema(day_purchases_df, DAY_PURCHASES)
+
+    purchased_df['DAY'] = purchased_df['TIMESTAMP_OF_PURCHASE'].dt.normalize() if compact else \
+        pd.to_datetime(purchased_df['TIMESTAMP_OF_PURCHASE'].dt.date)
+    day_purchased_df = purchased_df.groupby(['USER_ID', 'DAY']).agg(
+        total_purchase_amount=('PURCHASE_AMOUNT', 'sum'),
+        average_purchase_amount=('PURCHASE_AMOUNT', 'mean'),
+        total_purchases=('PURCHASE_ID', 'count')
+    ).reset_index()
+    day_purchased_df = schema(day_purchased_df, DAY_PURCHASES)
+    result_df = pd.merge(day_purchases_df, day_purchased_df, on=['USER_ID', 'DAY'], how='left').fillna(0)
+    result_df.columns = [u.upper() for u in result_df.columns]
+    result_df = schema(result_df, DAY_PURCHASES)
+    for col in ['TOTAL_PURCHASE_AMOUNT', 'TOTAL_PURCHASES', 'TOTAL_ADS', 'TOTAL_AD_ENGAGEMENT_TIME']:
+        result_df[f'{col}_ROLLING_30_DAYS'] = _rolling_sum(result_df, col, window)
+    result_df['AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS'] = (result_df['TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS'] / result_df['TOTAL_PURCHASES_ROLLING_30_DAYS']).fillna(0)
+    result_df['AD_CONVERSION_RATE_ROLLING_30_DAYS'] = (result_df['TOTAL_PURCHASES_ROLLING_30_DAYS'] / result_df['TOTAL_ADS_ROLLING_30_DAYS']).fillna(0)
+    result_df['AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS'] = (result_df['TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS'] / result_df['TOTAL_ADS_ROLLING_30_DAYS']).fillna(0)
+    for col in ['TOTAL_PURCHASE_AMOUNT', 'TOTAL_AD_ENGAGEMENT_TIME']:
+        result_df[f'{col}_ROLLING_30_DAYS'] = rolling_whole_total(result_df, col, window)
+    rolling_purchases_df = drop_warmup_days(schema(result_df[[
+        'USER_ID', 'DAY', 'PURCHASE_INACTIVE', 'TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS', 'TOTAL_PURCHASES_ROLLING_30_DAYS',
+        'AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS', 'TOTAL_ADS_ROLLING_30_DAYS', 'AD_CONVERSION_RATE_ROLLING_30_DAYS',
+        'TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS', 'AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS']],
+        ROLLING_FEATURES), days=window)
+
+    features_df = pd.merge(rolling_sessions_df, rolling_purchases_df, on=["USER_ID", "DAY"], how="outer")
+    if compact:
+        # the outer merge keeps the dtypes when every day of one side is on the other
+        features_df = compact_frame(features_df, ROLLING_FEATURES)
+    else:
+        features_df['USER_ID'] = features_df['USER_ID'].astype('int32')
+        binary_list = ['SESSION_INACTIVE', 'PURCHASE_INACTIVE']
+        features_df[binary_list] = features_df[binary_list].astype('int8')
+        integer_columns = [u for u in features_df.columns if 'TOTAL' in u and u != 'TOTAL_POINTS_ROLLING_30_DAYS'] + ['USER_ID']
+        features_df[integer_columns] = features_df[integer_columns].astype('int32')
+        float_columns = set(features_df.columns) - set(integer_columns) - set(binary_list) - {'DAY'}
+        features_df[list(float_columns)] = features_df[list(float_columns)].astype('float32')
+
+    features_df = features_df.sort_values(by=['USER_ID', 'DAY'])
+    features_df[TARGET] = login_next_7_days(features_df)
+    return schema(features_df, ROLLING_FEATURES)
+
+
+class PipelineState:
+    def __init__(self, folder, n_users, seed=0, workers=1):
+        self.folder = folder
+        self.n_users = n_users
+        self.seed = seed
+        self.workers = workers
+        self.conn = None
+        self.features_df = None
+        self.to_pred_df = None
+        self.model = None
+        self.test_df = None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+def stage_generate(state):
+    counts = generate(state.folder / 'stage', state.n_users, seed=state.seed, end=END, workers=state.workers)
+    return sum(counts.values())
+
+
+def stage_ingest(state):
+    import sqlite3
+
+    state.conn = sqlite3.connect(':memory:', check_same_thread=False)
+    for schema in ['RAW', 'ANALYTIC']:
+        state.conn.execute(f"ATTACH DATABASE ':memory:' AS {schema}")
+    loaded = LocalIngest(state.folder / 'stage', state.conn, max_workers=4, today=TODAY).run()
+    assert all(loaded.values())
+    return state.conn.execute("SELECT SUM(ROWS_LOADED) FROM RAW.INGEST_LOG").fetchone()[0]
+
+
+def stage_analytic_sql(state):
+    with state.conn:
+        for statement in analytic_sqlite():
+            state.conn.execute(statement)
+    return sum(state.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+               for table in ['RAW.GAME_EVENTS', 'RAW.SESSIONS'])
+
+
+def stage_rolling_sql(state):
+    tables = {'sessions': 'RAW.SESSIONS', 'points_per_event': 'ANALYTIC.POINTS_PER_EVENT', 'purchases': 'RAW.PURCHASES'}
+    with state.conn:
+        state.conn.execute("CREATE TABLE ANALYTIC.ROLLING_CHURN_FEATURES AS\n" + rolling_features_query('sqlite', tables=tables))
+    return state.conn.execute("SELECT COUNT(*) FROM ANALYTIC.ROLLING_CHURN_FEATURES").fetchone()[0]
+
+
+SESSION_POINTS_SQL = """SELECT
+s.SESSION_ID,
+s.USER_ID,
+s.LOG_IN,
+s.SESSION_DURATION_MINUTES,
+s.DEVICE_TYPE,
+ppe.TOTAL_POINTS AS TOTAL_POINTS_PER_SESSION
+FROM RAW.SESSIONS s
+LEFT JOIN ANALYTIC.POINTS_PER_EVENT ppe ON s.SESSION_ID = ppe.SESSION_ID"""
+PURCHASES_SQL = "SELECT * FROM RAW.PURCHASES"
+
+
+def fetch_notebook_inputs(conn, compact=True):
+    """session_points_df and purchases_df of the sessions_df_pandas and get_purchases_df cells.
+
+    With ``compact`` they are read in batches cast to notebooks/feature_schema.py one at a time.
+    """
+    if not compact:
+        return (read_sql(conn, SESSION_POINTS_SQL, parse_dates=['LOG_IN']),
+                read_sql(conn, PURCHASES_SQL, parse_dates=['TIMESTAMP_OF_PURCHASE']))
+    return (compact_batches(read_sql_batches(conn, SESSION_POINTS_SQL, parse_dates=['LOG_IN']), SESSION_POINTS),
+            compact_batches(read_sql_batches(conn, PURCHASES_SQL, parse_dates=['TIMESTAMP_OF_PURCHASE']), PURCHASES))
+
+
+def stage_notebook_features(state):
+    # the sessions_df_pandas and get_purchases_df cells, then the feature cells up to removed_to_pred_df
+    session_points_df, purchases_df = fetch_notebook_inputs(state.conn)
+    n_rows = len(session_points_df) + len(purchases_df)
+    features_df = notebook_features(session_points_df, purchases_df)
+
+    retention_df = read_sql(state.conn, "SELECT USER_ID, CHURNED FROM ANALYTIC.RETENTION")
+    active_users = retention_df[retention_df['CHURNED'] == 0]
+    state.to_pred_df = latest_user_rows(features_df[features_df['USER_ID'].isin(active_users['USER_ID'])])
+    state.features_df = anti_join_user_days(features_df, state.to_pred_df)
+    return n_rows
+
+
+def stage_train(state):
+    # the booster behind snowflake.ml's XGBClassifier, with its default 100 rounds
+    import xgboost as xgb
+
+    # the split_dataset cell, the last 30 days are the test set and training labels end before them
+    training_df, state.test_df, _ = holdout_split(state.features_df)
+    zero_class_count = int((training_df[TARGET] == 0).sum())
+    one_class_count = int((training_df[TARGET] == 1).sum())
+    params = {'objective': 'binary:logistic', 'scale_pos_weight': zero_class_count / max(one_class_count, 1), 'nthread': 1}
+    state.model = xgb.train(params, xgb.DMatrix(training_df[FEATURE_LABELS], label=training_df[TARGET]), num_boost_round=100)
+    return len(training_df)
+
+
+def stage_batch_score(state):
+    import xgboost as xgb
+
+    # PREDICT_PROBA_0, the likelihood of not logging in within 7 days
+    churn_likelihood = 1 - state.model.predict(xgb.DMatrix(state.test_df[FEATURE_LABELS]))
+    assert len(churn_likelihood) == len(state.test_df)
+    # the players to predict are written to APP.TO_BE_PREDICTED_CHURN_FEATURES like in the notebook and batch scored
+    state.conn.execute("ATTACH DATABASE ':memory:' AS APP")
+    with state.conn:
+        state.to_pred_df[HASHED_COLUMNS].to_sql('_load_to_predict', state.conn, index=False)
+        state.conn.execute("CREATE TABLE APP.TO_BE_PREDICTED_CHURN_FEATURES AS SELECT * FROM _load_to_predict")
+        state.conn.execute("DROP TABLE _load_to_predict")
+    run = LocalBatchScorer(state.conn, state.model, max_workers=state.workers).run()
+    assert run.written == len(state.to_pred_df)
+    return len(state.test_df) + run.written
+
+
+def stage_explain(state):
+    # the SHAP values of every feature row of the rolling model, written to APP.ROLLING_CHURN_SHAP
+    with state.conn:
+        state.features_df[['USER_ID', 'DAY', TARGET] + FEATURE_LABELS].to_sql('_load_features', state.conn, index=False)
+        state.conn.execute("CREATE TABLE APP.ROLLING_CHURN_FEATURES AS SELECT * FROM _load_features")
+        state.conn.execute("DROP TABLE _load_features")
+    run = LocalShapStore(state.conn, state.model, ROLLING_MODEL, max_workers=state.workers).run()
+    assert run.written == len(state.features_df)
+    return run.written
+
+
+def stage_game_360_prep(state):
+    eda_df = make_demographic_columns(state.n_users, seed=state.seed)
+    # the page looks the age ranges up once per loaded frame
+    age_codes = age_range_codes(eda_df['AGE'])
+    for filters in PAGE_FILTERS:
+        filtered_df = filter_players(eda_df, filters, age_codes)
+        frame_page(filtered_df, 1, 25, sort_permutation(filtered_df['AGE'], False))
+    return len(eda_df) * len(PAGE_FILTERS)
+
+
+def stage_player_360_prep(state):
+    user_ids = [user_id for (user_id,) in state.conn.execute(
+        f"SELECT USER_ID FROM RAW.USERS ORDER BY USER_ID LIMIT {PLAYER_SAMPLE}")]
+    params = [min(user_ids), max(user_ids)]
+    points_df = read_sql(state.conn, "SELECT USER_ID, LOG_IN, TOTAL_POINTS FROM ANALYTIC.POINTS_PER_EVENT "
+                                     "WHERE USER_ID BETWEEN ? AND ?", params=params)
+    purchases_df = read_sql(state.conn, "SELECT USER_ID, TIMESTAMP_OF_PURCHASE, PURCHASE_TYPE, PURCHASE_AMOUNT, AD_ENGAGEMENT_TIME "
+                                        "FROM RAW.PURCHASES WHERE USER_ID BETWEEN ? AND ?", params=params)
+    points_by_user = dict(list(points_df.groupby('USER_ID')))
+    purchases_by_user = dict(list(purchases_df.groupby('USER_ID')))
+    start = pd.Timestamp(TODAY) - pd.Timedelta(days=30)
+    for user_id in user_ids:
+        windows = PlayerWindows(points_by_user.get(user_id, points_df.iloc[:0]), purchases_by_user.get(user_id, purchases_df.iloc[:0]))
+        for days in [7, 30, 90]:
+            windows.compare(pd.Timestamp(TODAY) - pd.Timedelta(days=days), days)
+        windows.compare(start, 30)
+    return len(points_df) + len(purchases_df)
+
+
+STAGES = [
+    ('generate', stage_generate),
+    ('ingest', stage_ingest),
+    ('analytic_sql', stage_analytic_sql),
+    ('rolling_sql', stage_rolling_sql),
+    ('notebook_features', stage_notebook_features),
+    ('train', stage_train),
+    ('batch_score', stage_batch_score),
+    ('explain', stage_explain),
+    ('game_360_prep', stage_game_360_prep),
+    ('player_360_prep', stage_player_360_prep),
+]
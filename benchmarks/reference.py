@@ -0,0 +1,358 @@
+# Copies of the notebook and app code as it was before each optimization,
+# used as the oracle for the equivalence checks in the benchmark scripts
+import pandas as pd
+
+
+def fill_date_range_loop(day_sessions_df, users_logins_df):
+    # notebooks/1_Rolling_Churn_Prediction_Model.ipynb: fill_date_range
+    full_day_sessions = []
+    for _, row in users_logins_df.iterrows():
+        user_id = row['USER_ID']
+        start_date = row['FIRST_LOGIN_DAY']
+        end_date = row['LAST_LOGIN_DAY']
+
+        date_range = pd.date_range(start=start_date, end=end_date, freq='D')
+
+        user_days_df = pd.DataFrame({'USER_ID': user_id, 'DAY': date_range})
+        user_day_sessions = pd.merge(user_days_df, day_sessions_df[day_sessions_df['USER_ID'] == user_id],
+                                     on=['USER_ID', 'DAY'], how='left')
+
+        user_day_sessions['TOTAL_SESSION_DURATION'] = user_day_sessions['TOTAL_SESSION_DURATION'].fillna(0)
+        user_day_sessions['TOTAL_SESSIONS'] = user_day_sessions['TOTAL_SESSIONS'].fillna(0)
+        user_day_sessions['TOTAL_POINTS'] = user_day_sessions['TOTAL_POINTS'].fillna(0)
+        user_day_sessions['SESSION_INACTIVE'] = user_day_sessions['SESSION_INACTIVE'].fillna(1)
+
+        full_day_sessions.append(user_day_sessions)
+
+    return pd.concat(full_day_sessions).reset_index(drop=True)
+
+
+def remove_first_30_days(df):
+    # notebooks/1_Rolling_Churn_Prediction_Model.ipynb: remove_30_days
+    df = df.sort_values(by=['USER_ID', 'DAY'])
+    df = df.groupby('USER_ID').apply(lambda x: x.iloc[30:]).reset_index(drop=True)
+    return df
+
+
+def calculate_login_within_7_days(user_data):
+    # notebooks/1_Rolling_Churn_Prediction_Model.ipynb: calculate_label
+    user_data.loc[:, 'future_sessions_sum'] = user_data['SESSION_INACTIVE'].shift(-7).rolling(window=7, min_periods=1).sum()
+    user_data.loc[:, 'LOGIN_NEXT_7_DAYS'] = (user_data['future_sessions_sum'] < 7).astype(int)
+    user_data.drop(columns=['future_sessions_sum'], inplace=True)
+    return user_data
+
+
+def notebook_rolling_features(session_points_df, purchases_df, window=30):
+    # the rolling notebook from sessions_by_days to create_labels, before any rows are held out
+    from rolling_features import densify_user_days, rolling_whole_total
+
+    df = session_points_df.copy()
+    df['DAY'] = pd.to_datetime(df['LOG_IN'].dt.date)
+    df = df.sort_values(by=['USER_ID', 'DAY', 'LOG_IN'])
+
+    day_sessions_df = df.groupby(['USER_ID', 'DAY']).agg(
+        total_session_duration=('SESSION_DURATION_MINUTES', 'sum'),
+        total_sessions=('SESSION_ID', 'count'),
+        total_points=('TOTAL_POINTS_PER_SESSION', 'sum')
+    ).reset_index()
+    day_sessions_df['SESSION_INACTIVE'] = 0
+    day_sessions_df.columns = [u.upper() for u in list(day_sessions_df.columns)]
+
+    users_logins_df = df.groupby('USER_ID').agg(
+        first_login_day=('DAY', 'first'),
+        last_login_day=('DAY', 'last')
+    ).reset_index()
+    users_logins_df.columns = [u.upper() for u in list(users_logins_df.columns)]
+    day_sessions_df = densify_user_days(day_sessions_df, users_logins_df)
+
+    day_sessions_df['TOTAL_SESSION_DURATION_ROLLING_30_DAYS'] = day_sessions_df.groupby('USER_ID')['TOTAL_SESSION_DURATION'].rolling(
+        window=window, min_periods=1).sum().reset_index(level=0, drop=True)
+    day_sessions_df['TOTAL_SESSIONS_ROLLING_30_DAYS'] = day_sessions_df.groupby('USER_ID')['TOTAL_SESSIONS'].rolling(
+        window=window, min_periods=1).sum().reset_index(level=0, drop=True)
+    day_sessions_df['AVERAGE_SESSION_LEN_ROLLING_30_DAYS'] = day_sessions_df['TOTAL_SESSION_DURATION_ROLLING_30_DAYS'] / day_sessions_df['TOTAL_SESSIONS_ROLLING_30_DAYS']
+    day_sessions_df['TOTAL_POINTS_ROLLING_30_DAYS'] = day_sessions_df.groupby('USER_ID')['TOTAL_POINTS'].rolling(
+        window=window, min_periods=1).sum().reset_index(level=0, drop=True)
+    day_sessions_df['AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS'] = day_sessions_df['TOTAL_POINTS_ROLLING_30_DAYS'] / day_sessions_df['TOTAL_SESSIONS_ROLLING_30_DAYS']
+
+    rolling_sessions_df = day_sessions_df[['USER_ID', 'DAY', 'SESSION_INACTIVE',
+                                           'TOTAL_SESSION_DURATION_ROLLING_30_DAYS',
+                                           'TOTAL_SESSIONS_ROLLING_30_DAYS',
+                                           'AVERAGE_SESSION_LEN_ROLLING_30_DAYS',
+                                           'TOTAL_POINTS_ROLLING_30_DAYS',
+                                           'AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS']]
+    rolling_sessions_df = remove_first_30_days(rolling_sessions_df)
+
+    purchases_df = purchases_df.copy()
+    purchased_df = purchases_df[purchases_df['PURCHASE_TYPE'] != 'none'].copy()
+
+    purchases_df['DAY'] = pd.to_datetime(purchases_df['TIMESTAMP_OF_PURCHASE'].dt.date)
+    day_purchases_df = purchases_df.groupby(['USER_ID', 'DAY']).agg(
+        total_ad_engagement_time=('AD_ENGAGEMENT_TIME', 'sum'),
+        total_ad_conversions=('AD_CONVERSION', 'sum'),
+        total_ads=('AD_INTERACTION_ID', 'count')
+    ).reset_index()
+    day_purchases_df['PURCHASE_INACTIVE'] = 0
+    day_purchases_df = pd.merge(day_sessions_df, day_purchases_df, how="left")[list(day_purchases_df.columns)]
+    day_purchases_df[list(day_purchases_df.columns)[:-1]] = day_purchases_df[list(day_purchases_df.columns)[:-1]].fillna(0)
+    day_purchases_df['PURCHASE_INACTIVE'] = day_purchases_df['PURCHASE_INACTIVE'].fillna(1)
+
+    purchased_df['DAY'] = pd.to_datetime(purchased_df['TIMESTAMP_OF_PURCHASE'].dt.date)
+    day_purchased_df = purchased_df.groupby(['USER_ID', 'DAY']).agg(
+        total_purchase_amount=('PURCHASE_AMOUNT', 'sum'),
+        average_purchase_amount=('PURCHASE_AMOUNT', 'mean'),
+        total_purchases=('PURCHASE_ID', 'count')
+    ).reset_index()
+
+    result_df = pd.merge(day_purchases_df, day_purchased_df, on=['USER_ID', 'DAY'], how='left').fillna(0)
+    result_df.columns = [u.upper() for u in result_df.columns]
+
+    result_df['TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS'] = result_df.groupby('USER_ID')['TOTAL_PURCHASE_AMOUNT'].rolling(window, min_periods=1).sum().reset_index(level=0, drop=True)
+    result_df['TOTAL_PURCHASES_ROLLING_30_DAYS'] = result_df.groupby('USER_ID')['TOTAL_PURCHASES'].rolling(window, min_periods=1).sum().reset_index(level=0, drop=True)
+    result_df['AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS'] = result_df['TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS'] / result_df['TOTAL_PURCHASES_ROLLING_30_DAYS']
+    result_df['TOTAL_ADS_ROLLING_30_DAYS'] = result_df.groupby('USER_ID')['TOTAL_ADS'].rolling(window, min_periods=1).sum().reset_index(level=0, drop=True)
+    result_df['AD_CONVERSION_RATE_ROLLING_30_DAYS'] = result_df['TOTAL_PURCHASES_ROLLING_30_DAYS'] / result_df['TOTAL_ADS_ROLLING_30_DAYS']
+    result_df['TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS'] = result_df.groupby('USER_ID')['TOTAL_AD_ENGAGEMENT_TIME'].rolling(window, min_periods=1).sum().reset_index(level=0, drop=True)
+    result_df['AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS'] = result_df['TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS'] / result_df['TOTAL_ADS_ROLLING_30_DAYS']
+    result_df['AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS'] = result_df['AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS'].fillna(0)
+    result_df['AD_CONVERSION_RATE_ROLLING_30_DAYS'] = result_df['AD_CONVERSION_RATE_ROLLING_30_DAYS'].fillna(0)
+    result_df['AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS'] = result_df['AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS'].fillna(0)
+    # result_rolling_30_days truncates these two totals from integer hundredths
+    for col in ['TOTAL_PURCHASE_AMOUNT', 'TOTAL_AD_ENGAGEMENT_TIME']:
+        result_df[f'{col}_ROLLING_30_DAYS'] = rolling_whole_total(result_df, col, window)
+
+    rolling_purchases_df = result_df[['USER_ID', 'DAY', 'PURCHASE_INACTIVE',
+                                      'TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+                                      'TOTAL_PURCHASES_ROLLING_30_DAYS',
+                                      'AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+                                      'TOTAL_ADS_ROLLING_30_DAYS',
+                                      'AD_CONVERSION_RATE_ROLLING_30_DAYS',
+                                      'TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS',
+                                      'AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS']]
+    rolling_purchases_df = remove_first_30_days(rolling_purchases_df)
+
+    features_df = pd.merge(rolling_sessions_df, rolling_purchases_df, on=["USER_ID", "DAY"], how="outer")
+
+    features_df['USER_ID'] = features_df['USER_ID'].astype('int32')
+    binary_list = ['SESSION_INACTIVE', 'PURCHASE_INACTIVE']
+    features_df[binary_list] = features_df[binary_list].astype('int8')
+    integer_columns = [u for u in features_df.columns if 'TOTAL' in u] + ['USER_ID']
+    integer_columns = [col for col in integer_columns if 'TOTAL_POINTS_ROLLING_30_DAYS' != col]
+    features_df[integer_columns] = features_df[integer_columns].astype('int32')
+    float_columns = set(features_df.columns) - set(integer_columns) - set(binary_list) - set(['DAY'])
+    features_df[list(float_columns)] = features_df[list(float_columns)].astype('float32')
+
+    features_df = features_df.sort_values(by=['USER_ID', 'DAY'])
+    features_df['LOGIN_NEXT_7_DAYS'] = 0
+    features_df['LOGIN_NEXT_7_DAYS'] = features_df['LOGIN_NEXT_7_DAYS'].astype(int)
+    features_df['LOGIN_NEXT_7_DAYS'] = features_df.groupby('USER_ID', group_keys=False).apply(calculate_login_within_7_days)['LOGIN_NEXT_7_DAYS']
+    return features_df
+
+
+AGE_RANGES_DICT = {
+    '0-11': (0, 11),
+    '12-17': (12, 17),
+    '18-24': (18, 24),
+    '25-34': (25, 34),
+    '35-44': (35, 44),
+    '45-54': (45, 54),
+    '55-64': (55, 64),
+    '65+': (65, 100)
+}
+
+
+def filter_dataframe(df, playerbase, age_ranges, gender, country_ranges, player_type, support_ticket, rank_range):
+    # streamlit/pages/GAME_360.py: filter_dataframe, which read the age_ranges and country_ranges
+    # sidebar globals, so they are the arguments here
+    if playerbase == "Active":
+        df = df[df['CHURNED'] == 0]
+    elif playerbase == 'Inactive':
+        df = df[df['CHURNED'] == 1]
+
+    if age_ranges:
+        selected_age_filters = [
+            (AGE_RANGES_DICT[range][0], AGE_RANGES_DICT[range][1]) for range in age_ranges
+        ]
+        df = df[
+            df['AGE'].apply(
+                lambda x: any(lower <= x <= upper for lower, upper in selected_age_filters)
+            )
+        ]
+
+    if gender == "Male":
+        df = df[df['GENDER'] == 'Male']
+    elif gender == 'Female':
+        df = df[df['GENDER'] == 'Female']
+
+    if country_ranges:
+        df = df[df['LOCATION'].isin(country_ranges)]
+
+    if player_type == 'Hardcore':
+        df = df[df['PLAYER_TYPE'] == 'Hardcore']
+    elif player_type == 'Casual':
+        df = df[df['PLAYER_TYPE'] == 'Casual']
+
+    if support_ticket == "Yes":
+        df = df[df['HAS_SUPPORT_TICKET'] == True]
+    elif support_ticket == "No":
+        df = df[df['HAS_SUPPORT_TICKET'] == False]
+
+    if rank_range:
+        df = df[df['RANK_NAME'].isin(rank_range)]
+
+    return df
+
+
+def churn_rates(eda_df):
+    # streamlit/pages/GAME_360.py: the churn rate bar charts of the static demographics tab
+    age_group = pd.cut(eda_df['AGE'], bins=[0, 12, 18, 24, 34, 44, 54, 64, 100], labels=['0_11', '12_17', '18_24', '25_34', '35_44', '45_54', '55_64', '65+'])
+    return {
+        'AGE_GROUP': eda_df.groupby(age_group, observed=True)['CHURNED'].mean() * 100,
+        'LOCATION': eda_df.groupby('LOCATION')['CHURNED'].mean() * 100,
+        'PLAYER_TYPE': eda_df.groupby('PLAYER_TYPE')['CHURNED'].mean() * 100,
+    }
+
+
+def player_sidebar(users_df, retention_df, ranking_df, demographics_df, support_ticket_df, user_id):
+    # streamlit/PLAYER_360.py: the per-player lookups of the sidebar, lifetime metrics and support ticket tab
+    active_users = retention_df[retention_df['CHURNED'] == 0]
+    user_info = users_df[users_df['USER_ID'] == user_id]
+    status = 'Active' if user_id in list(active_users['USER_ID']) else 'Inactive'
+    users_ranking_df = ranking_df[ranking_df['USER_ID'] == user_id]
+    user_support_ticket_df = support_ticket_df[support_ticket_df['USER_ID'] == user_id]
+    return {
+        "Player Status": status,
+        "Name": user_info['FIRST_NAME'].values[0] + ' ' + user_info['LAST_NAME'].values[0],
+        "Email": user_info['EMAIL'].values[0],
+        "Photo": user_info['PHOTO_URL'].values[0],
+        # the page read the first row of DEMOGRAPHICS instead of the selected player's
+        "Player Type": demographics_df['PLAYER_TYPE'].values[0],
+        "Rank Name": users_ranking_df['RANK_NAME'].values[0],
+        "Rank Percentile": users_ranking_df['PERCENTILE'].values[0].round(2),
+        "First Login": pd.to_datetime(retention_df.loc[retention_df['USER_ID'] == user_id, 'FIRST_LOGIN_DATE'].values[0]),
+        "Last Login": pd.to_datetime(retention_df.loc[retention_df['USER_ID'] == user_id, 'LAST_LOGIN_DATE'].values[0]),
+        "Days Inactive": retention_df.loc[retention_df['USER_ID'] == user_id, 'DAYS_SINCE_LAST_LOGIN'].values[0],
+        "Total Logins": retention_df[retention_df['USER_ID'] == user_id]['TOTAL_LOGINS'].values[0],
+        "Total Points": users_ranking_df['TOTAL_POINTS'].values[0].round(2),
+        "Has Support Ticket": len(user_support_ticket_df) > 0,
+    }
+
+
+def player_queries_sequential(load_query, database, user_id, active):
+    # streamlit/PLAYER_360.py: the per-player queries, run one after another with USER_ID formatted in
+    frames = {
+        'achievements': load_query(f"SELECT * FROM {database}.RAW.ACHIEVEMENTS WHERE USER_ID = {user_id}"),
+        'points_per_event': load_query(f'SELECT * FROM {database}.ANALYTIC.POINTS_PER_EVENT WHERE USER_ID = {user_id} ORDER BY LOG_IN ASC'),
+        'sessions': load_query(f"SELECT * FROM {database}.RAW.SESSIONS WHERE USER_ID = {user_id} ORDER BY LOG_IN ASC"),
+        'purchases': load_query(f"SELECT * FROM {database}.RAW.PURCHASES WHERE USER_ID = {user_id} ORDER BY TIMESTAMP_OF_PURCHASE ASC"),
+    }
+    if active:
+        frames['to_predict'] = load_query(f"SELECT * FROM {database}.APP.TO_BE_PREDICTED_CHURN_FEATURES WHERE USER_ID = {user_id}")
+    frames['rolling_features'] = load_query(f"SELECT * FROM {database}.APP.ROLLING_CHURN_FEATURES WHERE USER_ID = {user_id}")
+    return frames
+
+
+def save_filter(input_df, param, start_date, end_date=None):
+    # streamlit/PLAYER_360.py: save_filter without st.cache_data
+    if end_date:
+        df = input_df[
+            (input_df[param] >= start_date) &
+            (input_df[param] <= end_date)]
+    else:
+        df = input_df[input_df[param] >= start_date]
+    return df
+
+
+def player_metric_deltas(player_events_points_df, purchases_df, start_date, date_range):
+    # streamlit/PLAYER_360.py: the metric delta block, current window [start, ...) and previous [start - range, start]
+    def safe_divide(numerator, denominator, default_value=0):
+        return default_value if denominator == 0 else numerator / denominator
+
+    purchased_df = purchases_df[purchases_df['PURCHASE_TYPE'] != 'none']
+    prev_seq_start_date = start_date - pd.Timedelta(days=date_range)
+    results = {}
+
+    last_seq_total_points = save_filter(player_events_points_df, 'LOG_IN', start_date)['TOTAL_POINTS'].sum()
+    prev_seq_total_points = save_filter(player_events_points_df, 'LOG_IN', prev_seq_start_date, start_date)['TOTAL_POINTS'].sum()
+    results['TOTAL_POINTS'] = (last_seq_total_points, (last_seq_total_points - prev_seq_total_points).round(2))
+
+    last_seq_total_ads = len(save_filter(purchases_df, 'TIMESTAMP_OF_PURCHASE', start_date))
+    prev_seq_total_ads = len(save_filter(purchases_df, 'TIMESTAMP_OF_PURCHASE', prev_seq_start_date, start_date))
+    results['TOTAL_ADS'] = (last_seq_total_ads, last_seq_total_ads - prev_seq_total_ads)
+
+    last_seq_total_logins = len(save_filter(player_events_points_df, 'LOG_IN', start_date))
+    prev_seq_total_logins = len(save_filter(player_events_points_df, 'LOG_IN', prev_seq_start_date, start_date))
+    results['TOTAL_LOGINS'] = (last_seq_total_logins, last_seq_total_logins - prev_seq_total_logins)
+
+    last_seq_total_purchases = len(save_filter(purchased_df, 'TIMESTAMP_OF_PURCHASE', start_date))
+    prev_seq_total_purchases = len(save_filter(purchased_df, 'TIMESTAMP_OF_PURCHASE', prev_seq_start_date, start_date))
+    results['TOTAL_PURCHASES'] = (last_seq_total_purchases, last_seq_total_purchases - prev_seq_total_purchases)
+
+    last_seq_prop_purchased = safe_divide(last_seq_total_purchases, last_seq_total_ads, default_value=0) * 100
+    prev_seq_prop_purchased = safe_divide(prev_seq_total_purchases, prev_seq_total_ads, default_value=0) * 100
+    results['PROPORTION_PURCHASED'] = (last_seq_prop_purchased, round(last_seq_prop_purchased - prev_seq_prop_purchased, 2))
+
+    last_seq_total_purchase_amount = save_filter(purchases_df, 'TIMESTAMP_OF_PURCHASE', start_date)['PURCHASE_AMOUNT'].sum()
+    prev_seq_total_purchase_amount = save_filter(purchases_df, 'TIMESTAMP_OF_PURCHASE', prev_seq_start_date, start_date)['PURCHASE_AMOUNT'].sum()
+    results['TOTAL_PURCHASE_AMOUNT'] = (last_seq_total_purchase_amount, round(last_seq_total_purchase_amount - prev_seq_total_purchase_amount, 2))
+
+    last_seq_average_purchase_amount = safe_divide(last_seq_total_purchase_amount, last_seq_total_purchases, default_value=0)
+    prev_seq_average_purchase_amount = safe_divide(prev_seq_total_purchase_amount, prev_seq_total_purchases, default_value=0)
+    results['AVERAGE_PURCHASE_AMOUNT'] = (last_seq_average_purchase_amount, round(last_seq_average_purchase_amount - prev_seq_average_purchase_amount, 2))
+
+    last_seq_total_ad_duration = save_filter(purchases_df, 'TIMESTAMP_OF_PURCHASE', start_date)['AD_ENGAGEMENT_TIME'].sum()
+    prev_seq_total_ad_duration = save_filter(purchases_df, 'TIMESTAMP_OF_PURCHASE', prev_seq_start_date, start_date)['AD_ENGAGEMENT_TIME'].sum()
+    last_seq_average_ad_duration = safe_divide(last_seq_total_ad_duration, last_seq_total_ads, default_value=0)
+    prev_seq_average_ad_duration = safe_divide(prev_seq_total_ad_duration, prev_seq_total_ads, default_value=0)
+    results['AVERAGE_AD_ENGAGEMENT_TIME'] = (last_seq_average_ad_duration, round(last_seq_average_ad_duration - prev_seq_average_ad_duration, 2))
+    return results
+
+
+def split_frame(input_df, rows):
+    # streamlit/PLAYER_360.py and streamlit/pages/GAME_360.py: split_frame without st.cache_data
+    df = [input_df.loc[i : i + rows - 1, :] for i in range(0, len(input_df), rows)]
+    return df
+
+
+def pagination_page(dataset, batch_size, current_page, sort_field=None, ascending=True):
+    # the sort, page count and page pick of create_pagination / create_saved_pagination
+    if sort_field is not None:
+        dataset = dataset.sort_values(by=sort_field, ascending=ascending, ignore_index=True)
+    total_pages = int(len(dataset) / batch_size) if int(len(dataset) / batch_size) > 0 else 1
+    pages = split_frame(dataset, batch_size)
+    return total_pages, pages[current_page - 1]
+
+
+def raw_build_local(folder, conn, today):
+    # scripts/raw_build.sql on SQLite: load every file of every table, then shift the timestamps with UPDATEs
+    import gzip
+    import json
+    from pathlib import Path
+
+    folder = Path(folder)
+    files = {
+        'USERS': ['users.csv'], 'ACHIEVEMENTS': ['users_achievement_final.csv'], 'SUPPORT_TICKETS': ['support_tickets.csv'],
+        'PURCHASES': sorted(p.relative_to(folder).as_posix() for p in (folder / 'purchases_output').iterdir()),
+        'SESSIONS': sorted(p.relative_to(folder).as_posix() for p in (folder / 'sessions_output').iterdir()),
+        'GAME_EVENTS': sorted(p.relative_to(folder).as_posix() for p in (folder / 'game_events_output').iterdir()),
+    }
+    for table, names in files.items():
+        conn.execute(f"DROP TABLE IF EXISTS RAW.{table}")
+        for name in names:
+            if name.endswith('.json.gz'):
+                with gzip.open(folder / name, 'rt') as handle:
+                    df = pd.DataFrame(json.load(handle))
+            else:
+                df = pd.read_csv(folder / name)
+            df.columns = [col.upper() for col in df.columns]
+            df.to_sql('_load', conn, index=False, if_exists='replace')
+            if conn.execute(f"SELECT COUNT(*) FROM RAW.sqlite_master WHERE name = '{table}'").fetchone()[0]:
+                conn.execute(f"INSERT INTO RAW.{table} SELECT * FROM _load")
+            else:
+                conn.execute(f"CREATE TABLE RAW.{table} AS SELECT * FROM _load")
+    days = conn.execute("SELECT CAST(julianday(?) - julianday(date(MAX(LOG_OUT))) AS INTEGER) FROM RAW.SESSIONS",
+                        [today.strftime('%Y-%m-%d')]).fetchone()[0]
+    conn.execute(f"UPDATE RAW.SESSIONS SET LOG_IN = datetime(LOG_IN, '+{days} days'), LOG_OUT = datetime(LOG_OUT, '+{days} days')")
+    conn.execute(f"UPDATE RAW.PURCHASES SET TIMESTAMP_OF_PURCHASE = datetime(TIMESTAMP_OF_PURCHASE, '+{days} days')")
+    conn.execute("DROP TABLE _load")
+    conn.commit()
+    return days
@@ -0,0 +1,160 @@
+# Runs the pipeline stages of benchmarks/pipeline.py at several sizes and records wall time, peak RSS and
+# rows per second of every stage. Each run is appended to a JSON lines history file and compared with a
+# stored baseline, stages slower or larger than the baseline by more than --tolerance are flagged.
+#
+#   python benchmarks/run.py --users 1000 10000 --save-baseline
+#   python benchmarks/run.py --users 1000 10000 --fail-on-regression
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from common import REPO_ROOT, print_table
+from pipeline import STAGES, PipelineState
+
+HISTORY = Path(__file__).resolve().parent / 'history.jsonl'
+BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+# differences below these are noise whatever the tolerance
+MIN_SECONDS = 0.1
+MIN_RSS_MB = 20
+
+
+def reset_peak_rss():
+    # writing 5 to clear_refs resets VmHWM on Linux, elsewhere the peak is the process peak so far
+    try:
+        with open('/proc/self/clear_refs', 'w') as handle:
+            handle.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as handle:
+            for line in handle:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result):
+    return f"{result['stage']}@{result['users']}"
+
+
+def run_size(n_users, stages, seed=0, workers=1):
+    """Results of ``stages`` at ``n_users`` players, the stages before them run unmeasured."""
+    last = max(position for position, (name, _) in enumerate(STAGES) if name in stages)
+    results = []
+    with tempfile.TemporaryDirectory() as work:
+        state = PipelineState(Path(work), n_users, seed=seed, workers=workers)
+        try:
+            for name, stage in STAGES[:last + 1]:
+                reset_peak_rss()
+                start = time.perf_counter()
+                n_rows = stage(state)
+                seconds = time.perf_counter() - start
+                if name in stages:
+                    results.append({
+                        'stage': name,
+                        'users': n_users,
+                        'rows': int(n_rows),
+                        'seconds': round(seconds, 4),
+                        'rows_per_s': round(n_rows / seconds, 1) if seconds > 0 else None,
+                        'peak_rss_mb': round(peak_rss_mb(), 1),
+                    })
+        finally:
+            state.close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """{key: flags} of the results slower or larger than the baseline by more than ``tolerance``."""
+    flags = {}
+    for result in results:
+        base = baseline.get(result_key(result))
+        if base is None:
+            continue
+        found = []
+        if result['seconds'] > base['seconds'] * (1 + tolerance) and result['seconds'] - base['seconds'] > MIN_SECONDS:
+            found.append(f"time +{result['seconds'] / base['seconds'] - 1:.0%}")
+        if result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance) and result['peak_rss_mb'] - base['peak_rss_mb'] > MIN_RSS_MB:
+            found.append(f"rss +{result['peak_rss_mb'] / base['peak_rss_mb'] - 1:.0%}")
+        if found:
+            flags[result_key(result)] = found
+    return flags
+
+
+def load_baseline(path):
+    if not path.exists():
+        return {}
+    with open(path) as handle:
+        return json.load(handle)['results']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, nargs='+', default=[1_000, 10_000])
+    parser.add_argument('--stages', nargs='+', choices=[name for name, _ in STAGES], default=[name for name, _ in STAGES])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1, help="processes generating the data")
+    parser.add_argument('--history', type=Path, default=HISTORY)
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown or growth over the baseline")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    results = []
+    for n_users in args.users:
+        results.extend(run_size(n_users, args.stages, seed=args.seed, workers=args.workers))
+
+    run = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'results': results,
+    }
+    with open(args.history, 'a') as handle:
+        handle.write(json.dumps(run) + '\n')
+
+    flags = compare(results, load_baseline(args.baseline), args.tolerance)
+    rows = [{**result, 'flags': ', '.join(flags.get(result_key(result), []))} for result in results]
+    for row in rows:
+        row['rows'] = f"{row['rows']:,}"
+        row['rows_per_s'] = f"{row['rows_per_s']:,.0f}" if row['rows_per_s'] is not None else ''
+    print_table(rows, ['stage', 'users', 'rows', 'seconds', 'rows_per_s', 'peak_rss_mb', 'flags'])
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as handle:
+            json.dump({**run, 'results': {result_key(result): result for result in results}}, handle, indent=1)
+        print(f"baseline saved to {args.baseline}")
+    if flags:
+        print(f"{len(flags)} regressions over {args.tolerance:.0%} against {args.baseline}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
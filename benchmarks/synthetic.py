@@ -0,0 +1,230 @@
+# Small synthetic frames shaped like the notebook intermediates
+import numpy as np
+import pandas as pd
+
+
+def make_day_sessions(n_users, max_span_days=60, active_rate=0.3, seed=0):
+    # one row per (USER_ID, DAY) the user was active, first and last day always active
+    rng = np.random.default_rng(seed)
+    spans = rng.integers(1, max_span_days + 1, size=n_users)
+    first_days = np.datetime64('2024-01-01') + rng.integers(0, 365, size=n_users).astype('timedelta64[D]')
+
+    starts = np.cumsum(spans) - spans
+    offsets = np.arange(spans.sum()) - np.repeat(starts, spans)
+    active = rng.random(spans.sum()) < active_rate
+    active[starts] = True
+    active[starts + spans - 1] = True
+
+    n_rows = int(active.sum())
+    user_ids = np.repeat(np.arange(1001, 1001 + n_users), spans)[active]
+    days = (np.repeat(first_days, spans) + offsets.astype('timedelta64[D]'))[active]
+    sessions = rng.integers(1, 6, size=n_rows)
+    return pd.DataFrame({
+        'USER_ID': user_ids,
+        'DAY': pd.to_datetime(days),
+        'TOTAL_SESSION_DURATION': sessions * rng.integers(5, 60, size=n_rows),
+        'TOTAL_SESSIONS': sessions,
+        'TOTAL_POINTS': np.round(sessions * rng.gamma(2.0, 40.0, size=n_rows), 1),
+        'SESSION_INACTIVE': 0,
+    })
+
+
+def make_raw_activity(n_users, max_span_days=120, seed=0):
+    # RAW.SESSIONS, ANALYTIC.POINTS_PER_EVENT and RAW.PURCHASES shaped frames
+    rng = np.random.default_rng(seed)
+    user_ids = np.arange(1001, 1001 + n_users)
+    first_login = np.datetime64('2024-01-01T00:00:00') + rng.integers(0, 365 * 24 * 60, size=n_users).astype('timedelta64[m]')
+    spans = rng.integers(1, max_span_days + 1, size=n_users)
+
+    n_sessions = rng.integers(1, 3 * max_span_days // 4 + 2, size=n_users)
+    session_users = np.repeat(np.arange(n_users), n_sessions)
+    minutes = (rng.random(len(session_users)) * spans[session_users] * 24 * 60).astype('int64')
+    log_in = first_login[session_users] + minutes.astype('timedelta64[m]')
+    duration = rng.integers(1, 180, size=len(session_users))
+    sessions_df = pd.DataFrame({
+        'SESSION_ID': np.arange(1, len(session_users) + 1),
+        'USER_ID': user_ids[session_users],
+        'LOG_IN': pd.to_datetime(log_in),
+        'LOG_OUT': pd.to_datetime(log_in + duration.astype('timedelta64[m]')),
+        'SESSION_DURATION_MINUTES': duration,
+        'DEVICE_TYPE': rng.choice(['PC', 'Console', 'Mobile'], size=len(session_users)),
+    })
+
+    # about one session in ten has no game events, so no points
+    has_points = rng.random(len(sessions_df)) > 0.1
+    points_df = pd.DataFrame({
+        'USER_ID': sessions_df['USER_ID'].to_numpy()[has_points],
+        'SESSION_ID': sessions_df['SESSION_ID'].to_numpy()[has_points],
+        'TOTAL_POINTS': np.round(rng.gamma(2.0, 40.0, size=int(has_points.sum())), 1),
+    })
+
+    n_ads = rng.integers(0, max_span_days // 2 + 1, size=n_users)
+    ad_users = np.repeat(np.arange(n_users), n_ads)
+    minutes = (rng.random(len(ad_users)) * (spans[ad_users] + 2) * 24 * 60).astype('int64')
+    purchase_type = rng.choice(['none', 'skin', 'battle_pass', 'currency'], p=[0.7, 0.1, 0.1, 0.1], size=len(ad_users))
+    amount = np.where(purchase_type == 'none', 0.0, np.round(rng.choice([0.99, 4.99, 9.99, 19.99], size=len(ad_users)), 2))
+    purchases_df = pd.DataFrame({
+        'PURCHASE_ID': np.arange(1, len(ad_users) + 1),
+        'USER_ID': user_ids[ad_users],
+        'AD_INTERACTION_ID': np.arange(1, len(ad_users) + 1),
+        'TIMESTAMP_OF_PURCHASE': pd.to_datetime(first_login[ad_users] + minutes.astype('timedelta64[m]')),
+        'PURCHASE_TYPE': purchase_type,
+        'PURCHASE_AMOUNT': amount,
+        'AD_TYPE': rng.choice(['video', 'banner', 'interstitial'], size=len(ad_users)),
+        'AD_ENGAGEMENT_TIME': np.round(rng.gamma(2.0, 8.0, size=len(ad_users)), 2),
+        'AD_CONVERSION': (purchase_type != 'none').astype(int),
+    })
+    return sessions_df, points_df, purchases_df
+
+
+def session_points(sessions_df, points_df):
+    # the sessions_df_pandas cell of the rolling notebook
+    session_points_df = sessions_df.merge(points_df[['SESSION_ID', 'TOTAL_POINTS']], on='SESSION_ID', how='left')
+    return session_points_df.rename(columns={'TOTAL_POINTS': 'TOTAL_POINTS_PER_SESSION'})[
+        ['SESSION_ID', 'USER_ID', 'LOG_IN', 'SESSION_DURATION_MINUTES', 'DEVICE_TYPE', 'TOTAL_POINTS_PER_SESSION']]
+
+
+def make_feature_days(n_users, max_span_days=120, seed=0):
+    # dense (USER_ID, DAY) grid with SESSION_INACTIVE and a feature column, like features_df in the notebook
+    from rolling_features import densify_user_days
+
+    features_df = densify_user_days(make_day_sessions(n_users, max_span_days=max_span_days, seed=seed))
+    features_df['TOTAL_SESSIONS_ROLLING_30_DAYS'] = features_df.groupby('USER_ID')['TOTAL_SESSIONS'].cumsum()
+    return features_df[['USER_ID', 'DAY', 'SESSION_INACTIVE', 'TOTAL_SESSIONS_ROLLING_30_DAYS']]
+
+
+ACHIEVEMENT_COLUMNS = ['VICTORY_ROYALE', 'ELIMINATION_MILESTONES', 'SURVIVAL_ACHIEVEMENTS', 'BUILDING_RESOURCES',
+                       'EXPLORATION_TRAVEL', 'WEAPON_USAGE', 'ASSIST_TEAMMATES', 'EVENT_CHALLENGES', 'CREATIVE_MODE',
+                       'SOCIAL_ACHIEVEMENTS']
+LOCATIONS = ['China', 'Mexico', 'UK', 'USA', 'Canada', 'Brazil', 'France', 'Germany', 'Korea', 'Poland']
+RANKS = ['Bronze', 'Silver', 'Gold', 'Platinum', 'Diamond', 'Elite', 'Champion', 'Unreal']
+
+
+def make_player_tables(n_users, n_feature_days=3, seed=0):
+    # the per-player tables joined by GAME_360, keyed by SCHEMA.TABLE like in Snowflake
+    rng = np.random.default_rng(seed)
+    user_ids = np.arange(1001, 1001 + n_users)
+    total_logins = rng.integers(1, 400, size=n_users)
+    churned = (rng.random(n_users) < 0.3).astype(int)
+
+    retention_df = pd.DataFrame({
+        'USER_ID': user_ids,
+        'TOTAL_LOGINS': total_logins,
+        'LOGGED_IN_AFTER_1_DAY': (rng.random(n_users) < 0.8).astype(int),
+        'LOGGED_IN_AFTER_7_DAYS': (rng.random(n_users) < 0.6).astype(int),
+        'LOGGED_IN_AFTER_30_DAYS': (rng.random(n_users) < 0.4).astype(int),
+        'LOGGED_IN_IN_LAST_30_DAYS': 1 - churned,
+        'DAYS_SINCE_LAST_LOGIN': np.where(churned == 1, rng.integers(30, 400, size=n_users), rng.integers(0, 30, size=n_users)),
+        'CHURNED': churned,
+    })
+    demographics_df = pd.DataFrame({
+        'USER_ID': user_ids,
+        'AGE': rng.integers(8, 80, size=n_users),
+        'GENDER': rng.choice(['Male', 'Female'], size=n_users),
+        'LOCATION': rng.choice(LOCATIONS, size=n_users),
+        'AVERAGE_SESSIONS_PER_ACTIVE_WEEK': np.round(rng.gamma(2.0, 2.0, size=n_users), 2),
+        'AVERAGE_SESSION_DURATION': np.round(rng.gamma(2.0, 30.0, size=n_users), 2),
+        'PLAYER_TYPE': rng.choice(['Hardcore', 'Casual'], size=n_users),
+        'TOTAL_ADS': rng.integers(0, 200, size=n_users),
+        'AVG_PURCHASE_AMOUNT_PER_AD': np.round(rng.gamma(1.0, 2.0, size=n_users), 2),
+        'HAS_SUPPORT_TICKET': rng.random(n_users) < 0.2,
+    })
+    total_points = np.round(rng.gamma(2.0, 5000.0, size=n_users), 1)
+    rankings_df = pd.DataFrame({
+        'USER_ID': user_ids,
+        'TOTAL_POINTS': total_points,
+        'RANK_NAME': np.array(RANKS)[np.minimum((total_points // 4000).astype(int), len(RANKS) - 1)],
+    })
+    achievements_df = pd.DataFrame({'USER_ID': user_ids})
+    for col in ACHIEVEMENT_COLUMNS:
+        achievements_df[col] = rng.random(n_users) < 0.5
+    total_ads = demographics_df['TOTAL_ADS'].to_numpy()
+    total_purchases = rng.binomial(total_ads, 0.1)
+    ad_engagement_df = pd.DataFrame({
+        'USER_ID': user_ids,
+        'TOTAL_PURCHASES': total_purchases,
+        'PROPORTION_PURCHASED': np.divide(total_purchases, total_ads, out=np.zeros(n_users), where=total_ads > 0),
+        'AVERAGE_PURCHASE_AMOUNT': np.round(rng.gamma(2.0, 3.0, size=n_users), 2),
+        'AVERAGE_AD_ENGAGEMENT_TIME': np.round(rng.gamma(2.0, 8.0, size=n_users), 2),
+    })
+
+    feature_users = np.repeat(user_ids, n_feature_days)
+    features_df = pd.DataFrame({
+        'USER_ID': feature_users,
+        'DAY': np.tile(pd.date_range('2024-06-01', periods=n_feature_days).strftime('%Y-%m-%d'), n_users),
+        'TOTAL_SESSIONS_ROLLING_30_DAYS': rng.integers(0, 90, size=len(feature_users)),
+        'LOGIN_NEXT_7_DAYS': rng.integers(0, 2, size=len(feature_users)),
+    })
+    return {
+        'ANALYTIC.RETENTION': retention_df,
+        'ANALYTIC.DEMOGRAPHICS': demographics_df,
+        'ANALYTIC.USER_RANKINGS': rankings_df,
+        'RAW.ACHIEVEMENTS': achievements_df,
+        'ANALYTIC.AD_ENGAGEMENT': ad_engagement_df,
+        'APP.ROLLING_CHURN_FEATURES': features_df,
+    }
+
+
+def make_profile_tables(n_users, seed=0):
+    # make_player_tables plus the columns and tables only PLAYER_360 reads
+    tables = make_player_tables(n_users, n_feature_days=1, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    demographics_df = tables['ANALYTIC.DEMOGRAPHICS']
+    user_ids = demographics_df['USER_ID'].to_numpy()
+
+    first_login = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, size=n_users), unit='m')
+    tables['ANALYTIC.RETENTION']['FIRST_LOGIN_DATE'] = first_login
+    tables['ANALYTIC.RETENTION']['LAST_LOGIN_DATE'] = first_login + pd.to_timedelta(rng.integers(0, 400, size=n_users), unit='D')
+    tables['ANALYTIC.USER_RANKINGS']['PERCENTILE'] = tables['ANALYTIC.USER_RANKINGS']['TOTAL_POINTS'].rank(pct=True).to_numpy() * 100
+    ad_engagement_df = tables['ANALYTIC.AD_ENGAGEMENT']
+    ad_engagement_df['TOTAL_ADS'] = demographics_df['TOTAL_ADS'].to_numpy()
+    ad_engagement_df['TOTAL_PURCHASES_AMOUNT'] = np.round(ad_engagement_df['TOTAL_PURCHASES'] * ad_engagement_df['AVERAGE_PURCHASE_AMOUNT'], 2)
+
+    tables['RAW.USERS'] = pd.DataFrame({
+        'USER_ID': user_ids,
+        'FIRST_NAME': np.array(['Ana', 'Ben', 'Chen', 'Dara', 'Eli'], dtype=object)[user_ids % 5],
+        'LAST_NAME': np.array(['Kim', 'Lopez', 'Nowak', 'Smith'], dtype=object)[user_ids % 4],
+        'EMAIL': [f"player{user_id}@example.com" for user_id in user_ids],
+        'GENDER': demographics_df['GENDER'].to_numpy(),
+        'BIRTHDATE': [d.date() for d in pd.Timestamp('2024-01-01') - pd.to_timedelta(demographics_df['AGE'].to_numpy() * 365, unit='D')],
+        'LOCATION': demographics_df['LOCATION'].to_numpy(),
+        'PHOTO_URL': [f"https://example.com/photos/{user_id}.png" for user_id in user_ids],
+    })
+    ticket_users = user_ids[demographics_df['HAS_SUPPORT_TICKET'].to_numpy()]
+    tables['RAW.SUPPORT_TICKETS'] = pd.DataFrame({
+        'USER_ID': ticket_users,
+        'CATEGORY': rng.choice(['Billing', 'Bug', 'Account'], size=len(ticket_users)),
+        'CASE_DESCRIPTION': 'Cannot claim reward',
+        'SENTIMENT_ANALYSIS': np.round(rng.uniform(-1, 1, size=len(ticket_users)), 2),
+        'DATE_CREATED': pd.Timestamp('2024-03-01') + pd.to_timedelta(rng.integers(0, 200, size=len(ticket_users)), unit='D'),
+    })
+    return tables
+
+
+def make_player_activity_tables(n_users, seed=0):
+    # the per-player tables of the PLAYER_360 drill-down, keyed by SCHEMA.TABLE
+    sessions_df, points_df, purchases_df = make_raw_activity(n_users, seed=seed)
+    rng = np.random.default_rng(seed + 2)
+    points_per_event_df = points_df.merge(sessions_df[['SESSION_ID', 'LOG_IN', 'LOG_OUT', 'SESSION_DURATION_MINUTES']], on='SESSION_ID')
+    for col in ['ASSISTS_POINTS', 'BOOSTS_POINTS', 'DAMAGE_POINTS', 'DISTANCE_POINTS', 'KILLS_POINTS',
+                'WEAPONS_POINTS', 'HEADSHOTS_POINTS', 'HEALS_POINTS']:
+        points_per_event_df[col] = np.round(points_per_event_df['TOTAL_POINTS'] * rng.uniform(0, 0.25, size=len(points_per_event_df)), 2)
+
+    tables = make_player_tables(n_users, n_feature_days=60, seed=seed)
+    features_df = tables['APP.ROLLING_CHURN_FEATURES']
+    return {
+        'RAW.ACHIEVEMENTS': tables['RAW.ACHIEVEMENTS'],
+        'ANALYTIC.POINTS_PER_EVENT': points_per_event_df,
+        'RAW.SESSIONS': sessions_df,
+        'RAW.PURCHASES': purchases_df,
+        'APP.ROLLING_CHURN_FEATURES': features_df,
+        'APP.TO_BE_PREDICTED_CHURN_FEATURES': features_df.groupby('USER_ID').tail(1),
+    }
+
+
+def write_stage_layout(folder, n_users, n_files=4, seed=0):
+    # the @SUPPORT file layout read by scripts/raw_build.sql, with the folder file sets split in n_files parts
+    from generate_data import generate
+
+    generate(folder, n_users, chunk_users=-(-n_users // n_files), seed=seed, workers=1)
+    return folder
@@ -0,0 +1,193 @@
+# Compact dtypes of the rolling churn feature build, declared for every stage of the notebook so the frames
+# are narrow from the fetch on instead of being downcast once at the end. IDs are int32, flags int8, per day
+# counts int16, labels of a few values categoricals with fixed categories, and the rolling features take
+# the widths the compress_data_size cell gave them.
+#
+# Amounts with decimals (points, purchase amounts, ad engagement time) stay float64 until their rolling
+# sums are taken: the TOTAL_* rolling sums are truncated to int32, and float32 inputs move the sums that
+# land on whole numbers, so the features would no longer match the ones the model was trained on.
+#
+# Fetches read the query as Arrow batches and cast each batch before the next is converted, the raw tables
+# are never held at default widths or with python string objects.
+#
+# The APP feature tables are either written here by the notebook or kept as dynamic tables by
+# scripts/rolling_features_build.sql, write_features and read_features refuse the table of the other path.
+import numpy as np
+import pandas as pd
+
+DEVICE_TYPES = ['PC', 'Console', 'Mobile']
+PURCHASE_TYPES = ['none', 'skin', 'battle_pass', 'currency']
+AD_TYPES = ['video', 'banner', 'interstitial']
+
+# the sessions_df_pandas cell, one row per session
+SESSION_POINTS = {
+    'SESSION_ID': 'int64',
+    'USER_ID': 'int32',
+    'LOG_IN': 'datetime64[ns]',
+    'SESSION_DURATION_MINUTES': 'int16',
+    'DEVICE_TYPE': pd.CategoricalDtype(DEVICE_TYPES),
+    'TOTAL_POINTS_PER_SESSION': 'float64',
+}
+# the get_purchases_df cell, one row per ad interaction
+PURCHASES = {
+    'PURCHASE_ID': 'int64',
+    'USER_ID': 'int32',
+    'AD_INTERACTION_ID': 'int64',
+    'TIMESTAMP_OF_PURCHASE': 'datetime64[ns]',
+    'PURCHASE_TYPE': pd.CategoricalDtype(PURCHASE_TYPES),
+    'PURCHASE_AMOUNT': 'float64',
+    'AD_TYPE': pd.CategoricalDtype(AD_TYPES),
+    'AD_ENGAGEMENT_TIME': 'float64',
+    'AD_CONVERSION': 'int8',
+}
+# group_sessions_by_days and fill_date_range, one row per user and day
+DAY_SESSIONS = {
+    'USER_ID': 'int32',
+    'DAY': 'datetime64[ns]',
+    'TOTAL_SESSION_DURATION': 'int32',
+    'TOTAL_SESSIONS': 'int16',
+    'TOTAL_POINTS': 'float64',
+    'SESSION_INACTIVE': 'int8',
+}
+# group_purchases_by_day, group_purchased_by_day and merge_results
+DAY_PURCHASES = {
+    'USER_ID': 'int32',
+    'DAY': 'datetime64[ns]',
+    'TOTAL_AD_ENGAGEMENT_TIME': 'float64',
+    'TOTAL_AD_CONVERSIONS': 'int16',
+    'TOTAL_ADS': 'int16',
+    'PURCHASE_INACTIVE': 'int8',
+    'TOTAL_PURCHASE_AMOUNT': 'float64',
+    'AVERAGE_PURCHASE_AMOUNT': 'float64',
+    'TOTAL_PURCHASES': 'int16',
+}
+# drop_intermediates_sessions, drop_intermediates and create_labels, the columns of APP.ROLLING_CHURN_FEATURES
+ROLLING_FEATURES = {
+    'USER_ID': 'int32',
+    'DAY': 'datetime64[ns]',
+    'SESSION_INACTIVE': 'int8',
+    'TOTAL_SESSION_DURATION_ROLLING_30_DAYS': 'int32',
+    'TOTAL_SESSIONS_ROLLING_30_DAYS': 'int32',
+    'AVERAGE_SESSION_LEN_ROLLING_30_DAYS': 'float32',
+    'TOTAL_POINTS_ROLLING_30_DAYS': 'float32',
+    'AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS': 'float32',
+    'PURCHASE_INACTIVE': 'int8',
+    'TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS': 'int32',
+    'TOTAL_PURCHASES_ROLLING_30_DAYS': 'int32',
+    'AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS': 'float32',
+    'TOTAL_ADS_ROLLING_30_DAYS': 'int32',
+    'AD_CONVERSION_RATE_ROLLING_30_DAYS': 'float32',
+    'TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS': 'int32',
+    'AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS': 'float32',
+    'LOGIN_NEXT_7_DAYS': 'int8',
+}
+
+
+def _cast(values, dtype, name):
+    if isinstance(dtype, pd.CategoricalDtype):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # unordered dtypes with the same categories compare equal in any order, so astype would keep the
+            # order of the Arrow dictionary and batches would concat to object columns
+            cast = values.cat.set_categories(dtype.categories)
+        else:
+            cast = values.astype(dtype)
+        unknown = cast.isna() & values.notna()
+        if unknown.any():
+            raise ValueError(f"{name} has values outside its categories: {sorted(values[unknown].unique())[:5]}")
+        return cast
+    dtype = np.dtype(dtype)
+    if values.dtype == dtype:
+        return values
+    if dtype.kind in 'iu' and len(values):
+        # astype wraps integers that do not fit, check the range first
+        info = np.iinfo(dtype)
+        low, high = values.min(), values.max()
+        if low < info.min or high > info.max:
+            raise ValueError(f"{name} ranges from {low} to {high}, which does not fit {dtype}")
+    return values.astype(dtype)
+
+
+def compact_frame(df, schema):
+    """A shallow copy of ``df`` with the columns named in ``schema`` cast to their compact dtype.
+
+    Column names are matched case insensitively, the notebook upper cases some of them late. Integers that
+    do not fit and labels outside a column's categories raise ``ValueError``.
+    """
+    df = df.copy(deep=False)
+    for column in df.columns:
+        dtype = schema.get(column.upper())
+        if dtype is not None:
+            df[column] = _cast(df[column], dtype, column)
+    return df
+
+
+def empty_frame(schema):
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in schema.items()})
+
+
+def _batch_frame(batch, schema):
+    if isinstance(batch, pd.DataFrame):
+        return compact_frame(batch, schema)
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if isinstance(batch, pa.RecordBatch):
+        batch = pa.Table.from_batches([batch])
+    # labels are dictionary encoded in Arrow, so they reach pandas as codes without a python string per row
+    for position, field in enumerate(batch.schema):
+        if isinstance(schema.get(field.name.upper()), pd.CategoricalDtype) and \
+                (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+            batch = batch.set_column(position, field.name, pc.dictionary_encode(batch.column(position)))
+    return compact_frame(batch.to_pandas(), schema)
+
+
+def compact_batches(batches, schema):
+    """One frame of ``batches``, pyarrow tables or pandas frames, each cast to ``schema`` as it arrives."""
+    frames = [_batch_frame(batch, schema) for batch in batches]
+    if not frames:
+        return empty_frame(schema)
+    return pd.concat(frames, ignore_index=True)
+
+
+def fetch_compact(session, sql, schema):
+    """The result of ``sql`` at the dtypes of ``schema``, fetched as Arrow batches through the connector."""
+    cursor = session.connection.cursor()
+    try:
+        cursor.execute(sql)
+        return compact_batches(cursor.fetch_arrow_batches(), schema)
+    finally:
+        cursor.close()
+
+
+def memory_report(frames):
+    """Rows and deep memory in MB of named frames, for the memory report cell."""
+    return pd.DataFrame([{'FRAME': name, 'ROWS': len(df), 'MB': round(df.memory_usage(deep=True).sum() / 2**20, 1)}
+                         for name, df in frames.items()])
+
+
+def is_dynamic_table(session, table_name, database='PLAYER_360', schema='APP'):
+    """Whether ``table_name`` is a dynamic table, as scripts/rolling_features_build.sql keeps the feature tables."""
+    return bool(session.sql(f"SHOW DYNAMIC TABLES LIKE '{table_name}' IN SCHEMA {database}.{schema}").collect())
+
+
+def write_features(session, df, table_name, database='PLAYER_360', schema='APP'):
+    """Overwrite ``table_name`` with ``df`` through write_pandas, the save cells of the pandas path.
+
+    Raises ``ValueError`` instead of replacing a dynamic table of the SQL build.
+    """
+    if is_dynamic_table(session, table_name, database, schema):
+        raise ValueError(f"{database}.{schema}.{table_name} is a dynamic table of scripts/rolling_features_build.sql, "
+                         "set SQL_FEATURES = True to train on it instead of overwriting it")
+    return session.write_pandas(df=df, table_name=table_name, database=database, schema=schema,
+                                quote_identifiers=False, auto_create_table=True, overwrite=True)
+
+
+def read_features(session, table_name, database='PLAYER_360', schema='APP'):
+    """The Snowpark table ``table_name`` of the SQL build.
+
+    Raises ``ValueError`` when it is not a dynamic table, a table an earlier pandas run wrote would be stale.
+    """
+    if not is_dynamic_table(session, table_name, database, schema):
+        raise ValueError(f"{database}.{schema}.{table_name} is not a dynamic table, run scripts/rolling_features_build.sql "
+                         "or set SQL_FEATURES = False")
+    return session.table(f"{database}.{schema}.{table_name}")
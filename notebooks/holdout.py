@@ -0,0 +1,57 @@
+# Keyed hold-out and time based splits for the rolling churn features
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from rolling_features import latest_user_rows
+
+# days since 1970-01-01 are stored in the low bits of the packed key
+DAY_BITS = 20
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+class HoldoutSplit(NamedTuple):
+    train: pd.DataFrame
+    test: pd.DataFrame
+    predict: pd.DataFrame
+
+
+def user_day_keys(df):
+    """Pack USER_ID and DAY into one int64 per row, USER_ID in the high bits and the day ordinal in the low bits."""
+    days = (df['DAY'].to_numpy().astype('datetime64[D]') - EPOCH).astype(np.int64)
+    if len(days) and (days.min() < 0 or days.max() >= 1 << DAY_BITS):
+        raise ValueError("DAY must be between 1970-01-01 and the year 4840 to be packed into a key")
+    return (df['USER_ID'].to_numpy().astype(np.int64) << DAY_BITS) | days
+
+
+def anti_join_user_days(df, exclude_df):
+    """Return the rows of ``df`` whose (USER_ID, DAY) pair is not in ``exclude_df``, in one hashed pass."""
+    excluded = pd.Series(user_day_keys(df)).isin(user_day_keys(exclude_df)).to_numpy()
+    return df[~excluded]
+
+
+def holdout_split(features_df, active_user_ids=None, test_start=None, test_days=30, horizon=7):
+    """Split the labeled rolling features into train, test and to-be-predicted rows by time.
+
+    ``predict`` is the latest day of every active user. The remaining rows from ``test_start`` on
+    are the test set, and training only keeps days whose ``horizon`` day label window ends before
+    ``test_start``, so no training label is computed from days in the test period. Without
+    ``active_user_ids`` the rows to predict were already held out, as in APP.ROLLING_CHURN_FEATURES,
+    and ``predict`` is empty.
+    """
+    if active_user_ids is None:
+        predict_df = features_df.iloc[:0]
+        labeled_df = features_df
+    else:
+        active_df = features_df[features_df['USER_ID'].isin(active_user_ids)]
+        predict_df = latest_user_rows(active_df)
+        labeled_df = anti_join_user_days(features_df, predict_df)
+
+    if test_start is None:
+        test_start = labeled_df['DAY'].max() - pd.Timedelta(days=test_days - 1)
+    test_start = pd.Timestamp(test_start)
+
+    train_df = labeled_df[labeled_df['DAY'] < test_start - pd.Timedelta(days=horizon)]
+    test_df = labeled_df[labeled_df['DAY'] >= test_start]
+    return HoldoutSplit(train=train_df, test=test_df, predict=predict_df)
@@ -0,0 +1,130 @@
+# Feature engineering helpers for the rolling churn model notebook
+import numpy as np
+import pandas as pd
+
+# default values for the days a user did not log in
+INACTIVE_DAY_FILL = {
+    'TOTAL_SESSION_DURATION': 0,
+    'TOTAL_SESSIONS': 0,
+    'TOTAL_POINTS': 0,
+    'SESSION_INACTIVE': 1,
+}
+
+
+def daily_session_totals(session_points_df):
+    # aggregate the sessions of each user per day, every row is an active day
+    day_sessions_df = session_points_df.groupby(['USER_ID', 'DAY']).agg(
+        total_session_duration=('SESSION_DURATION_MINUTES', 'sum'),
+        total_sessions=('SESSION_ID', 'count'),
+        total_points=('TOTAL_POINTS_PER_SESSION', 'sum')
+    ).reset_index()
+    day_sessions_df['SESSION_INACTIVE'] = 0
+    day_sessions_df.columns = [u.upper() for u in list(day_sessions_df.columns)]
+    return day_sessions_df
+
+
+def user_login_bounds(df):
+    # first and last login day of each user, sorted by USER_ID
+    users_logins_df = df.groupby('USER_ID').agg(
+        first_login_day=('DAY', 'min'),
+        last_login_day=('DAY', 'max')
+    ).reset_index()
+    users_logins_df.columns = [u.upper() for u in list(users_logins_df.columns)]
+    return users_logins_df
+
+
+def _grid_layout(users_logins_df):
+    # number of days per user and the offset of each user's first row in the grid
+    first_days = users_logins_df['FIRST_LOGIN_DAY'].to_numpy()
+    last_days = users_logins_df['LAST_LOGIN_DAY'].to_numpy()
+    n_days = ((last_days - first_days) // np.timedelta64(1, 'D')).astype(np.int64) + 1
+    starts = np.cumsum(n_days) - n_days
+    return first_days, n_days, starts
+
+
+def user_day_grid(users_logins_df):
+    """Return a (USER_ID, DAY) MultiIndex with one entry per day between each user's first and last login."""
+    first_days, n_days, starts = _grid_layout(users_logins_df)
+    offsets = np.arange(n_days.sum()) - np.repeat(starts, n_days)
+    user_ids = np.repeat(users_logins_df['USER_ID'].to_numpy(), n_days)
+    days = np.repeat(first_days, n_days) + offsets.astype('timedelta64[D]')
+    return pd.MultiIndex.from_arrays([user_ids, days], names=['USER_ID', 'DAY'])
+
+
+def densify_user_days(day_sessions_df, users_logins_df=None, fill_values=None):
+    """Fill every user's date range in one pass, inactive days get ``fill_values``.
+
+    Because the grid is ordered by user and day, the grid row of an active day is
+    ``start of its user + days since the user's first login``, so the active rows are
+    scattered into preallocated columns instead of being merged user by user.
+    """
+    if users_logins_df is None:
+        users_logins_df = user_login_bounds(day_sessions_df)
+    if fill_values is None:
+        fill_values = INACTIVE_DAY_FILL
+
+    first_days, n_days, starts = _grid_layout(users_logins_df)
+    grid = user_day_grid(users_logins_df)
+
+    # locate every active row in the grid, rows outside a user's range are dropped like a left merge would
+    user_pos = pd.Index(users_logins_df['USER_ID']).get_indexer(day_sessions_df['USER_ID'])
+    known = user_pos >= 0
+    day_offsets = np.zeros(len(day_sessions_df), dtype=np.int64)
+    day_offsets[known] = (day_sessions_df['DAY'].to_numpy()[known] - first_days[user_pos[known]]) // np.timedelta64(1, 'D')
+    valid = known & (day_offsets >= 0) & (day_offsets < n_days[np.where(known, user_pos, 0)])
+    positions = starts[user_pos[valid]] + day_offsets[valid]
+
+    dense_df = grid.to_frame(index=False)
+    for col in day_sessions_df.columns.drop(['USER_ID', 'DAY']):
+        values = day_sessions_df[col].to_numpy()[valid]
+        if col in fill_values:
+            fill = fill_values[col]
+            column = np.full(len(grid), fill, dtype=np.result_type(values.dtype, np.min_scalar_type(fill)))
+            column[positions] = values
+            dense_df[col] = column
+        else:
+            dense_df[col] = pd.Series(values, index=positions).reindex(np.arange(len(grid))).to_numpy()
+    return dense_df
+
+
+def rolling_whole_total(df, col, window=30):
+    """Rolling ``window`` day sum of the two decimal amount ``col`` per user, truncated to whole units.
+
+    The amounts are summed as integer hundredths, a float sum of amounts adding up to a whole number can land
+    just below it and truncate to the unit under it. scripts/rolling_features_sql.py sums them the same way.
+    """
+    hundredths = pd.Series(np.round(df[col].to_numpy(dtype=np.float64) * 100).astype(np.int64), index=df.index)
+    totals = hundredths.groupby(df['USER_ID']).rolling(window, min_periods=1).sum().reset_index(level=0, drop=True)
+    # the sums of integers are exact in float64, amounts are not negative so floor division truncates
+    return totals.astype(np.int64) // 100
+
+
+def drop_warmup_days(df, days=30):
+    """Drop the first ``days`` rows of every user, like ``groupby('USER_ID').apply(lambda x: x.iloc[days:])``."""
+    df = df.sort_values(by=['USER_ID', 'DAY'])
+    return df[df.groupby('USER_ID').cumcount().to_numpy() >= days].reset_index(drop=True)
+
+
+def login_next_7_days(df, horizon=7):
+    """Label whether a user logged in within the next ``horizon`` days, ``df`` sorted by USER_ID and DAY.
+
+    Matches the per-user ``SESSION_INACTIVE.shift(-horizon).rolling(horizon, min_periods=1).sum() < horizon``
+    of the notebook, computed for all users at once with grouped shifts of cumulative sums.
+    """
+    users = df['USER_ID']
+    inactive_ahead = df.groupby(users)['SESSION_INACTIVE'].shift(-horizon)
+
+    # rolling sum and count of the shifted values over the last `horizon` rows of each user
+    known = inactive_ahead.notna().astype(np.int64)
+    inactive_sum = inactive_ahead.fillna(0).groupby(users).cumsum()
+    known_count = known.groupby(users).cumsum()
+    inactive_sum = inactive_sum - inactive_sum.groupby(users).shift(horizon, fill_value=0)
+    known_count = known_count - known_count.groupby(users).shift(horizon, fill_value=0)
+
+    return ((known_count > 0) & (inactive_sum < horizon)).astype(int)
+
+
+def latest_user_rows(df):
+    """Return the last row of every user, like ``groupby('USER_ID').apply(lambda x: x.iloc[-1])``."""
+    df = df.sort_values(by=['USER_ID', 'DAY'])
+    return df.groupby('USER_ID').tail(1).reset_index(drop=True)
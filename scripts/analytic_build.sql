@@ -389,6 +389,92 @@ FROM
 GROUP BY 
     USER_ID;
 
+-- 9. One pre-joined row per player with everything the PLAYER_360 sidebar cards and lifetime metrics show
+CREATE OR REPLACE DYNAMIC TABLE PLAYER_360.ANALYTIC.PLAYER_PROFILES(
+    USER_ID,
+    FIRST_NAME,
+    LAST_NAME,
+    EMAIL,
+    GENDER,
+    BIRTHDATE,
+    LOCATION,
+    PHOTO_URL,
+    PLAYER_TYPE,
+    FIRST_LOGIN_DATE,
+    LAST_LOGIN_DATE,
+    TOTAL_LOGINS,
+    DAYS_SINCE_LAST_LOGIN,
+    CHURNED,
+    TOTAL_POINTS,
+    RANK_NAME,
+    PERCENTILE,
+    TOTAL_ADS,
+    TOTAL_PURCHASES,
+    TOTAL_PURCHASES_AMOUNT,
+    PROPORTION_PURCHASED,
+    AVERAGE_PURCHASE_AMOUNT,
+    AVERAGE_AD_ENGAGEMENT_TIME,
+    TOTAL_SUPPORT_TICKETS,
+    TICKET_CATEGORY,
+    TICKET_CASE_DESCRIPTION,
+    TICKET_SENTIMENT_ANALYSIS,
+    TICKET_DATE_CREATED
+) TARGET_LAG = '1 days' refresh_mode = AUTO initialize = ON_CREATE warehouse = PLAYER_360_BUILD_WH
+AS
+WITH player_types AS (
+    -- DEMOGRAPHICS has a row per support ticket, the player type is the same on all of them
+    SELECT DISTINCT USER_ID, PLAYER_TYPE
+    FROM PLAYER_360.ANALYTIC.DEMOGRAPHICS
+),
+first_ticket AS (
+    -- the oldest support ticket of each player and how many they opened
+    SELECT
+        USER_ID,
+        COUNT(*) OVER (PARTITION BY USER_ID) AS total_support_tickets,
+        CATEGORY,
+        CASE_DESCRIPTION,
+        SENTIMENT_ANALYSIS,
+        DATE_CREATED
+    FROM PLAYER_360.RAW.SUPPORT_TICKETS
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY USER_ID ORDER BY DATE_CREATED) = 1
+)
+SELECT
+    u.USER_ID,
+    u.FIRST_NAME,
+    u.LAST_NAME,
+    u.EMAIL,
+    u.GENDER,
+    u.BIRTHDATE,
+    u.LOCATION,
+    u.PHOTO_URL,
+    pt.PLAYER_TYPE,
+    r.FIRST_LOGIN_DATE,
+    r.LAST_LOGIN_DATE,
+    r.TOTAL_LOGINS,
+    r.DAYS_SINCE_LAST_LOGIN,
+    r.CHURNED,
+    ur.TOTAL_POINTS,
+    ur.RANK_NAME,
+    ur.PERCENTILE,
+    -- players who never saw an ad have no AD_ENGAGEMENT row
+    COALESCE(ae.TOTAL_ADS, 0) AS total_ads,
+    COALESCE(ae.TOTAL_PURCHASES, 0) AS total_purchases,
+    COALESCE(ae.TOTAL_PURCHASES_AMOUNT, 0) AS total_purchases_amount,
+    COALESCE(ae.PROPORTION_PURCHASED, 0) AS proportion_purchased,
+    COALESCE(ae.AVERAGE_PURCHASE_AMOUNT, 0) AS average_purchase_amount,
+    COALESCE(ae.AVERAGE_AD_ENGAGEMENT_TIME, 0) AS average_ad_engagement_time,
+    COALESCE(ft.total_support_tickets, 0) AS total_support_tickets,
+    ft.CATEGORY AS ticket_category,
+    ft.CASE_DESCRIPTION AS ticket_case_description,
+    ft.SENTIMENT_ANALYSIS AS ticket_sentiment_analysis,
+    ft.DATE_CREATED AS ticket_date_created
+FROM PLAYER_360.RAW.USERS u
+LEFT JOIN player_types pt ON u.USER_ID = pt.USER_ID
+LEFT JOIN PLAYER_360.ANALYTIC.RETENTION r ON u.USER_ID = r.USER_ID
+LEFT JOIN PLAYER_360.ANALYTIC.USER_RANKINGS ur ON u.USER_ID = ur.USER_ID
+LEFT JOIN PLAYER_360.ANALYTIC.AD_ENGAGEMENT ae ON u.USER_ID = ae.USER_ID
+LEFT JOIN first_ticket ft ON u.USER_ID = ft.USER_ID;
+
 USE ROLE SYSADMIN;
 USE WAREHOUSE PLAYER_360_BUILD_WH;
 USE SCHEMA PLAYER_360.ANALYTIC;
@@ -0,0 +1,326 @@
+# Precomputes the SHAP explanations of the two churn models that the "Get Global Shap" forms of the pages read
+# through streamlit/shap_store.py.
+#
+# APP.ROLLING_CHURN_SHAP explains every row of APP.ROLLING_CHURN_FEATURES with the rolling model and
+# APP.CHURN_SHAP every player of the GAME_360 EDA join with the static classifier. Rows are keyed by
+# (USER_ID, DAY, MODEL_VERSION) and keep the feature values they explain, the SHAP value of every feature,
+# the base value, the churn label as STRATUM and a uniform SAMPLE_KEY. The values are the booster's own
+# pred_contribs, the tree path of TreeExplainer. Like scripts/batch_score.py, with the plumbing of
+# scripts/incremental.py, a rerun only explains rows whose features changed or every row for a new version,
+# and drops rows that left the source. A <table>_SUMMARY table keeps per version, stratum and feature the
+# count, sum and sum of absolute SHAP values, so the global importance is read from a few dozen rows.
+#
+#   python scripts/batch_explain.py --connection default
+#   python scripts/batch_explain.py --local app_folder --rolling-model churn_model.json --static-model churn_classifier.json
+import argparse
+import sqlite3
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from incremental import (BatchRun, delete_departed_sql, load_booster, merge_sql, partition_count, pending_rows,
+                         pending_sql, row_hashes, run_chunks, run_partitions)
+
+# the explained models, the store layout and the GAME_360 EDA join are the pages', read from the app folder
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'streamlit'))
+from query_builder import AGE_GROUP_BINS, EDA_COLUMNS, _table, eda_from  # noqa: E402
+from shap_store import MODELS, ROLLING_MODEL, STATIC_MODEL, shap_columns  # noqa: E402
+
+DATABASE = 'PLAYER_360'
+SCHEMA = 'APP'
+CHUNK_ROWS = 50_000
+STORE_KEYS = ['USER_ID', 'DAY', 'MODEL_VERSION']
+
+# the categories of the OrdinalEncoder of notebook 0 and of GAME_360
+ORDINAL_CATEGORIES = {
+    'RANK_NAME': ["Bronze", "Silver", "Gold", "Platinum", "Diamond", "Elite", "Champion", "Unreal"],
+    'PLAYER_TYPE': ["Casual", "Hardcore"],
+    'GENDER': ["Female", "Male"],
+}
+
+
+def store_columns(model):
+    return (STORE_KEYS + ['FEATURE_HASH', 'STRATUM', 'SAMPLE_KEY', 'BASE_VALUE']
+            + model.features + shap_columns(model) + ['EXPLAINED_AT'])
+
+
+def hashed_columns(model):
+    # what a row is explained from, a change in any of these explains it again
+    return ['USER_ID', 'DAY'] + model.features
+
+
+# -- sources ----------------------------------------------------------------------------------------
+
+def _ordinal_expression(column, categories):
+    cases = " ".join(f"WHEN '{category}' THEN {code}" for code, category in enumerate(categories))
+    return f"CASE {column} {cases} END"
+
+
+def _age_group_code_expression(column='AGE'):
+    # the codes of the pd.cut age groups, -1 for players without an age like cat.codes
+    cases = "\n        ".join(f"WHEN {column} > {lower} AND {column} <= {upper} THEN {code}"
+                              for code, (lower, upper) in enumerate(zip(AGE_GROUP_BINS[:-1], AGE_GROUP_BINS[1:])))
+    return f"CASE\n        {cases}\n        ELSE -1\n    END"
+
+
+def source_query(database, model):
+    """USER_ID, DAY, STRATUM and the model features of every row ``model`` explains."""
+    if model.table == ROLLING_MODEL.table:
+        features = ",\n    ".join(model.features)
+        return f"""SELECT
+    USER_ID,
+    DAY,
+    LOGIN_NEXT_7_DAYS AS STRATUM,
+    {features}
+FROM {_table(database, 'APP', 'ROLLING_CHURN_FEATURES')}"""
+    # the encoding of notebook 0, LOCATION codes follow the sorted locations of all players. The rows are dated
+    # by the run, a run on a later day explains every player again and drops the rows of the day before
+    ordinals = ",\n    ".join(f"{_ordinal_expression(column, categories)} AS {column}_OE"
+                               for column, categories in ORDINAL_CATEGORIES.items())
+    return f"""SELECT
+    USER_ID,
+    CURRENT_DATE AS DAY,
+    CHURNED AS STRATUM,
+    {_age_group_code_expression()} AS AGE_GROUP,
+    CASE WHEN LOCATION IS NULL THEN -1 ELSE DENSE_RANK() OVER (PARTITION BY LOCATION IS NULL ORDER BY LOCATION) - 1 END AS LOCATION,
+    AVERAGE_SESSIONS_PER_ACTIVE_WEEK,
+    AVERAGE_SESSION_DURATION,
+    CASE WHEN HAS_SUPPORT_TICKET THEN 1 ELSE 0 END AS HAS_SUPPORT_TICKET,
+    ACHIEVEMENTS_PERCENTAGE,
+    PROPORTION_PURCHASED,
+    AVERAGE_PURCHASE_AMOUNT,
+    AVERAGE_AD_ENGAGEMENT_TIME,
+    {ordinals}
+FROM (
+SELECT
+    {EDA_COLUMNS}
+{eda_from(database)}
+) p"""
+
+
+def contributions(booster, X):
+    """SHAP values of every row of ``X`` and the base value, from the booster's tree path."""
+    import xgboost as xgb
+
+    values = booster.predict(xgb.DMatrix(X), pred_contribs=True)
+    # the last column is the bias, the expected margin of the model
+    return values[:, :-1], values[:, -1]
+
+
+def sample_keys(df):
+    """A uniform number in [0, 1) per (USER_ID, DAY), the same for the same row on every run."""
+    hashes = pd.util.hash_pandas_object(df[['USER_ID', 'DAY']].astype(str), index=False).to_numpy()
+    return (hashes >> np.uint64(11)).astype(np.float64) / 2.0 ** 53
+
+
+def explain_frame(booster, model, pending_df):
+    """The store rows of ``pending_df``, which has the source columns and FEATURE_HASH."""
+    features = pending_df[model.features].astype(np.float64)
+    values, base = contributions(booster, features)
+    explained = pending_df[['USER_ID', 'DAY']].copy()
+    explained['MODEL_VERSION'] = model.version
+    explained['FEATURE_HASH'] = pending_df['FEATURE_HASH'].to_numpy()
+    explained['STRATUM'] = pending_df['STRATUM'].to_numpy()
+    explained['SAMPLE_KEY'] = sample_keys(pending_df)
+    explained['BASE_VALUE'] = base
+    explained[model.features] = features.to_numpy()
+    explained[shap_columns(model)] = values
+    explained['EXPLAINED_AT'] = pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')
+    return explained
+
+
+def summary_query(database, model, schema='APP'):
+    """Rows, sum and sum of absolute SHAP values per version, stratum and feature, the source of <table>_SUMMARY."""
+    table = _table(database, schema, model.table)
+    return "\nUNION ALL\n".join(f"""SELECT
+    MODEL_VERSION,
+    STRATUM,
+    '{feature}' AS FEATURE,
+    COUNT(*) AS N,
+    SUM({feature}_SHAP) AS SUM_SHAP,
+    SUM(ABS({feature}_SHAP)) AS SUM_ABS_SHAP
+FROM {table}
+GROUP BY MODEL_VERSION, STRATUM""" for feature in model.features)
+
+
+# -- Snowflake --------------------------------------------------------------------------------------
+
+def store_ddl(model, schema=f"{DATABASE}.{SCHEMA}"):
+    values = ",\n    ".join(f"{column} FLOAT" for column in ['SAMPLE_KEY', 'BASE_VALUE'] + model.features + shap_columns(model))
+    return f"""CREATE TABLE IF NOT EXISTS {schema}.{model.table} (
+    USER_ID NUMBER,
+    DAY TIMESTAMP_NTZ,
+    MODEL_VERSION VARCHAR,
+    FEATURE_HASH NUMBER,
+    STRATUM NUMBER,
+    {values},
+    EXPLAINED_AT TIMESTAMP_NTZ
+)"""
+
+
+def store_pending_sql(model, database=DATABASE, schema=f"{DATABASE}.{SCHEMA}", partitions=1, partition=None):
+    """Source rows without a stored row of the bound model version for their current hash."""
+    return pending_sql(source_query(database, model), f"{schema}.{model.table}", ['USER_ID', 'DAY'],
+                       hashed_columns(model), ['MODEL_VERSION'], partitions, partition)
+
+
+def store_merge_sql(model, source, schema=f"{DATABASE}.{SCHEMA}"):
+    return merge_sql(f"{schema}.{model.table}", source, STORE_KEYS, store_columns(model))
+
+
+def store_delete_sql(model, database=DATABASE, schema=f"{DATABASE}.{SCHEMA}"):
+    # feature days that aged out and players that left keep no explanation
+    return delete_departed_sql(f"{schema}.{model.table}", source_query(database, model), ['USER_ID', 'DAY'])
+
+
+class SnowflakeShapStore:
+    def __init__(self, session, booster, model=ROLLING_MODEL, database=DATABASE, schema=SCHEMA,
+                 chunk_rows=CHUNK_ROWS, max_workers=4):
+        # booster is the xgboost Booster of the model version, explained in this process
+        self.session = session
+        self.booster = booster
+        self.model = model
+        self.database = database
+        self.schema = schema
+        self.chunk_rows = chunk_rows
+        self.max_workers = max_workers
+
+    @property
+    def qualified(self):
+        return f"{self.database}.{self.schema}"
+
+    def _explain_partition(self, partitions, partition):
+        pending_df = self.session.sql(store_pending_sql(self.model, self.database, self.qualified, partitions, partition),
+                                      params=[self.model.version]).to_pandas()
+        if not len(pending_df):
+            return 0
+        explained = explain_frame(self.booster, self.model, pending_df)
+        # each partition is staged in its own temporary table, the MERGE commits it in one statement
+        staged = f"SHAP_ROWS_{uuid.uuid4().hex[:12].upper()}"
+        self.session.write_pandas(explained, staged, database=self.database, schema=self.schema,
+                                  auto_create_table=True, table_type='temporary', overwrite=True)
+        self.session.sql(store_merge_sql(self.model, f"{self.qualified}.{staged}", self.qualified)).collect()
+        self.session.sql(f"DROP TABLE IF EXISTS {self.qualified}.{staged}").collect()
+        return len(explained)
+
+    def run(self):
+        """Explain every pending source row, drop the rows of departed players and rebuild the summary."""
+        start = time.perf_counter()
+        self.session.sql(store_ddl(self.model, self.qualified)).collect()
+        total = self.session.sql(f"SELECT COUNT(*) AS N FROM (\n{source_query(self.database, self.model)}\n)").collect()[0]['N']
+        pending = self.session.sql(f"SELECT COUNT(*) AS N FROM (\n{store_pending_sql(self.model, self.database, self.qualified)}\n)",
+                                   params=[self.model.version]).collect()[0]['N']
+        partitions = partition_count(pending, self.chunk_rows)
+        explained = run_partitions(self._explain_partition, partitions, self.max_workers)
+        deleted = self.session.sql(store_delete_sql(self.model, self.database, self.qualified)).collect()[0][0]
+        self.session.sql(f"CREATE OR REPLACE TABLE {self.qualified}.{self.model.table}_SUMMARY AS\n"
+                         f"{summary_query(self.database, self.model, self.schema)}").collect()
+        return BatchRun(int(total), explained, int(deleted), partitions, time.perf_counter() - start)
+
+
+# -- local ------------------------------------------------------------------------------------------
+
+class LocalShapStore:
+    def __init__(self, conn, booster, model=ROLLING_MODEL, schema=SCHEMA, chunk_rows=CHUNK_ROWS, max_workers=4):
+        # conn has the APP, ANALYTIC and RAW schemas attached, like benchmarks/local_engine.py
+        self.conn = conn
+        self.booster = booster
+        self.model = model
+        self.schema = schema
+        self.chunk_rows = chunk_rows
+        self.max_workers = max_workers
+        values = ", ".join(f"{column} REAL" for column in ['SAMPLE_KEY', 'BASE_VALUE'] + model.features + shap_columns(model))
+        self.conn.execute(f"""CREATE TABLE IF NOT EXISTS {schema}.{model.table} (
+    USER_ID INTEGER, DAY TEXT, MODEL_VERSION TEXT, FEATURE_HASH INTEGER, STRATUM INTEGER, {values}, EXPLAINED_AT TEXT,
+    PRIMARY KEY (USER_ID, DAY, MODEL_VERSION))""")
+        # the samples read the smallest SAMPLE_KEYs of a stratum
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.{model.table}_SAMPLE "
+                          f"ON {model.table} (MODEL_VERSION, STRATUM, SAMPLE_KEY)")
+        self.conn.commit()
+
+    def source(self):
+        return pd.read_sql_query(source_query(None, self.model), self.conn)
+
+    def pending(self, source_df):
+        """The rows of ``source_df`` without a stored row of this model version for their current hash."""
+        source_df = source_df.assign(FEATURE_HASH=row_hashes(source_df, hashed_columns(self.model)))
+        stored = pd.read_sql_query(f"SELECT USER_ID, DAY, FEATURE_HASH FROM {self.schema}.{self.model.table} "
+                                   f"WHERE MODEL_VERSION = ?", self.conn, params=[self.model.version])
+        return pending_rows(source_df, stored, ['USER_ID', 'DAY'])
+
+    def _explain(self, chunk):
+        explained = explain_frame(self.booster, self.model, chunk)
+        return list(explained.itertuples(index=False, name=None))
+
+    def _write(self, rows):
+        columns = store_columns(self.model)
+        with self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO {self.schema}.{self.model.table} ({', '.join(columns)}) "
+                                  f"VALUES ({', '.join('?' for _ in columns)})", rows)
+
+    def _delete_departed(self, source_df):
+        stored = pd.read_sql_query(f"SELECT USER_ID, DAY FROM {self.schema}.{self.model.table}", self.conn)
+        departed = stored.merge(source_df[['USER_ID', 'DAY']], how='left', indicator=True)
+        departed = departed[departed['_merge'] == 'left_only']
+        with self.conn:
+            self.conn.executemany(f"DELETE FROM {self.schema}.{self.model.table} WHERE USER_ID = ? AND DAY = ?",
+                                  list(departed[['USER_ID', 'DAY']].itertuples(index=False, name=None)))
+        return len(departed)
+
+    def _write_summary(self):
+        summary = f"{self.schema}.{self.model.table}_SUMMARY"
+        with self.conn:
+            self.conn.execute(f"DROP TABLE IF EXISTS {summary}")
+            self.conn.execute(f"CREATE TABLE {summary} AS\n{summary_query(None, self.model, self.schema)}")
+
+    def run(self):
+        """Explain every pending source row, drop the rows of departed players and rebuild the summary."""
+        start = time.perf_counter()
+        source_df = self.source()
+        pending_df = self.pending(source_df)
+        partitions = run_chunks(self._explain, self._write, pending_df, self.chunk_rows, self.max_workers)
+        deleted = self._delete_departed(source_df)
+        self._write_summary()
+        return BatchRun(len(source_df), len(pending_df), deleted, partitions, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connection', help="Snowflake connection name from connections.toml")
+    parser.add_argument('--local', help="folder with APP.db, ANALYTIC.db and RAW.db, explained with the saved boosters instead")
+    parser.add_argument('--rolling-model', default='churn_model.json', help="saved booster of the rolling model, for --local")
+    parser.add_argument('--static-model', default='churn_classifier.json', help="saved booster of the static classifier, for --local")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    if args.local:
+        conn = sqlite3.connect(':memory:', check_same_thread=False)
+        for schema in ('APP', 'ANALYTIC', 'RAW'):
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", [str(Path(args.local) / f"{schema}.db")])
+        paths = {ROLLING_MODEL.name: args.rolling_model, STATIC_MODEL.name: args.static_model}
+        stores = [LocalShapStore(conn, load_booster(paths[model.name]), model, chunk_rows=args.chunk_rows,
+                                 max_workers=args.workers) for model in MODELS]
+    else:
+        from snowflake.ml.registry import Registry
+        from snowflake.snowpark import Session
+
+        from model_cache import ModelCache
+
+        session = Session.builder.config('connection_name', args.connection).create() if args.connection \
+            else Session.builder.getOrCreate()
+        models = ModelCache(lambda: Registry(session=session))
+        stores = [SnowflakeShapStore(session, models.booster(model.name, model.version), model, chunk_rows=args.chunk_rows,
+                                     max_workers=args.workers) for model in MODELS]
+    for store in stores:
+        result = store.run()
+        print(f"{store.model.table}: {result.written:,} of {result.rows:,} rows explained in {result.partitions} partitions, "
+              f"{result.deleted:,} departed rows dropped, {result.seconds:.1f}s, {result.rows_per_second:,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+# Scores the rolling churn model on every row of APP.TO_BE_PREDICTED_CHURN_FEATURES, the latest feature
+# row of each active player, into APP.CHURN_PREDICTIONS, which PLAYER_360 reads instead of running the
+# model when a player is opened.
+#
+# Every prediction keeps a hash of the feature row it was scored from and the model version that scored
+# it. A rerun only scores the rows whose features changed since, or every row for a new model version,
+# and drops the players that left the feature table. Pending rows are split into partitions of about
+# --chunk-rows that are scored on --workers threads, with the plumbing of scripts/incremental.py.
+#
+# In Snowflake each partition runs the registered model version in the warehouse and is MERGEd into the
+# table. The local mode scores a SQLite copy of the feature table with the booster of the logged model,
+# saved from the rolling notebook with model.to_xgboost().save_model('churn_model.json').
+#
+#   python scripts/batch_score.py --connection default
+#   python scripts/batch_score.py --local app.db --model churn_model.json
+import argparse
+import sqlite3
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from incremental import (BatchRun, delete_departed_sql, load_booster, merge_sql, partition_count, pending_rows,
+                         pending_sql, row_hashes, run_chunks, run_partitions)
+
+MODEL_NAME = 'Player360_RollingChurn_Classifier'
+MODEL_VERSION = 'v1'
+# the Features_label list of the rolling notebook and of PLAYER_360
+FEATURE_COLUMNS = [
+    'TOTAL_SESSION_DURATION_ROLLING_30_DAYS',
+    'TOTAL_SESSIONS_ROLLING_30_DAYS',
+    'AVERAGE_SESSION_LEN_ROLLING_30_DAYS',
+    'TOTAL_POINTS_ROLLING_30_DAYS',
+    'AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS',
+    'TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+    'TOTAL_PURCHASES_ROLLING_30_DAYS',
+    'AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+    'TOTAL_ADS_ROLLING_30_DAYS',
+    'AD_CONVERSION_RATE_ROLLING_30_DAYS',
+    'TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS',
+    'AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS',
+]
+# what a prediction is scored from, a change in any of these rescores the player. PLAYER_360 joins on HASH() of the
+# same list in the same order, PREDICTION_HASH_COLUMNS of streamlit/player_loader.py must stay equal to it
+HASHED_COLUMNS = [
+    'USER_ID',
+    'DAY',
+    'TOTAL_SESSION_DURATION_ROLLING_30_DAYS',
+    'TOTAL_SESSIONS_ROLLING_30_DAYS',
+    'AVERAGE_SESSION_LEN_ROLLING_30_DAYS',
+    'TOTAL_POINTS_ROLLING_30_DAYS',
+    'AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS',
+    'TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+    'TOTAL_PURCHASES_ROLLING_30_DAYS',
+    'AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+    'TOTAL_ADS_ROLLING_30_DAYS',
+    'AD_CONVERSION_RATE_ROLLING_30_DAYS',
+    'TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS',
+    'AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS',
+]
+PREDICTION_COLUMNS = ['USER_ID', 'DAY', 'FEATURE_HASH', 'PREDICT_PROBA_0', 'PREDICT_PROBA_1', 'MODEL_NAME',
+                      'MODEL_VERSION', 'SCORED_AT']
+
+FEATURES_TABLE = 'TO_BE_PREDICTED_CHURN_FEATURES'
+PREDICTIONS_TABLE = 'CHURN_PREDICTIONS'
+CHUNK_ROWS = 50_000
+
+DATABASE = 'PLAYER_360'
+SCHEMA = 'APP'
+
+
+# -- Snowflake --------------------------------------------------------------------------------------
+
+def predictions_ddl(schema=f"{DATABASE}.{SCHEMA}"):
+    return f"""CREATE TABLE IF NOT EXISTS {schema}.{PREDICTIONS_TABLE} (
+    USER_ID NUMBER,
+    DAY TIMESTAMP_NTZ,
+    FEATURE_HASH NUMBER,
+    PREDICT_PROBA_0 FLOAT,
+    PREDICT_PROBA_1 FLOAT,
+    MODEL_NAME VARCHAR,
+    MODEL_VERSION VARCHAR,
+    SCORED_AT TIMESTAMP_NTZ
+)"""
+
+
+def features_sql(schema=f"{DATABASE}.{SCHEMA}"):
+    return f"SELECT {', '.join(HASHED_COLUMNS)} FROM {schema}.{FEATURES_TABLE}"
+
+
+def predictions_pending_sql(schema=f"{DATABASE}.{SCHEMA}", partitions=1, partition=None):
+    """Feature rows without a prediction of the bound model name and version for their current hash."""
+    return pending_sql(features_sql(schema), f"{schema}.{PREDICTIONS_TABLE}", ['USER_ID'], HASHED_COLUMNS,
+                       ['MODEL_NAME', 'MODEL_VERSION'], partitions, partition)
+
+
+def predictions_merge_sql(source, schema=f"{DATABASE}.{SCHEMA}"):
+    """Upsert the scored rows of ``source`` by USER_ID, the model name and version are bound."""
+    return merge_sql(f"{schema}.{PREDICTIONS_TABLE}", source, ['USER_ID'], PREDICTION_COLUMNS,
+                     {'MODEL_NAME': '?', 'MODEL_VERSION': '?', 'SCORED_AT': 'CURRENT_TIMESTAMP()'})
+
+
+def predictions_delete_sql(schema=f"{DATABASE}.{SCHEMA}"):
+    # players that churned or were dropped from the feature table keep no prediction
+    return delete_departed_sql(f"{schema}.{PREDICTIONS_TABLE}", f"SELECT USER_ID FROM {schema}.{FEATURES_TABLE}",
+                               ['USER_ID'])
+
+
+class SnowflakeBatchScorer:
+    def __init__(self, session, model_version, model_name=MODEL_NAME, version=MODEL_VERSION,
+                 schema=f"{DATABASE}.{SCHEMA}", chunk_rows=CHUNK_ROWS, max_workers=4):
+        # model_version is the registry ModelVersion, reg.get_model(model_name).version(version)
+        self.session = session
+        self.model_version = model_version
+        self.model_name = model_name
+        self.version = version
+        self.schema = schema
+        self.chunk_rows = chunk_rows
+        self.max_workers = max_workers
+
+    def _score_partition(self, partitions, partition):
+        pending = self.session.sql(predictions_pending_sql(self.schema, partitions, partition),
+                                   params=[self.model_name, self.version])
+        scored = self.model_version.run(pending, function_name="predict_proba")
+        # each partition is staged in its own temporary table, the MERGE commits it in one statement
+        staged = f"{self.schema}.CHURN_SCORES_{uuid.uuid4().hex[:12].upper()}"
+        scored.select('USER_ID', 'DAY', 'FEATURE_HASH', 'PREDICT_PROBA_0', 'PREDICT_PROBA_1') \
+            .write.save_as_table(staged, mode='overwrite', table_type='temporary')
+        params = [self.model_name, self.version] * 2
+        rows = self.session.sql(predictions_merge_sql(staged, self.schema), params=params).collect()
+        self.session.sql(f"DROP TABLE IF EXISTS {staged}").collect()
+        return int(rows[0][0]) + int(rows[0][1]) if rows else 0
+
+    def run(self):
+        """Score every pending feature row and drop the predictions of departed players."""
+        start = time.perf_counter()
+        self.session.sql(predictions_ddl(self.schema)).collect()
+        total = self.session.sql(f"SELECT COUNT(*) AS N FROM {self.schema}.{FEATURES_TABLE}").collect()[0]['N']
+        pending = self.session.sql(f"SELECT COUNT(*) AS N FROM (\n{predictions_pending_sql(self.schema)}\n)",
+                                   params=[self.model_name, self.version]).collect()[0]['N']
+        partitions = partition_count(pending, self.chunk_rows)
+        scored = run_partitions(self._score_partition, partitions, self.max_workers)
+        deleted = self.session.sql(predictions_delete_sql(self.schema)).collect()[0][0]
+        return BatchRun(int(total), scored, int(deleted), partitions, time.perf_counter() - start)
+
+
+# -- local ------------------------------------------------------------------------------------------
+
+class LocalBatchScorer:
+    def __init__(self, conn, booster, model_name=MODEL_NAME, version=MODEL_VERSION, schema=SCHEMA,
+                 chunk_rows=CHUNK_ROWS, max_workers=4):
+        # conn has ``schema`` attached with the feature table, booster is the xgboost Booster of the model
+        self.conn = conn
+        self.booster = booster
+        self.model_name = model_name
+        self.version = version
+        self.schema = schema
+        self.chunk_rows = chunk_rows
+        self.max_workers = max_workers
+        self.conn.execute(f"""CREATE TABLE IF NOT EXISTS {schema}.{PREDICTIONS_TABLE} (
+    USER_ID INTEGER PRIMARY KEY, DAY TEXT, FEATURE_HASH INTEGER, PREDICT_PROBA_0 REAL, PREDICT_PROBA_1 REAL,
+    MODEL_NAME TEXT, MODEL_VERSION TEXT, SCORED_AT TEXT)""")
+        self.conn.commit()
+
+    def features(self):
+        return pd.read_sql_query(features_sql(self.schema), self.conn)
+
+    def pending(self, features_df):
+        """The rows of ``features_df`` without a prediction of this model version for their current hash."""
+        features_df = features_df.assign(FEATURE_HASH=row_hashes(features_df, HASHED_COLUMNS))
+        scored = pd.read_sql_query(f"SELECT USER_ID, FEATURE_HASH FROM {self.schema}.{PREDICTIONS_TABLE} "
+                                   f"WHERE MODEL_NAME = ? AND MODEL_VERSION = ?", self.conn,
+                                   params=[self.model_name, self.version])
+        return pending_rows(features_df, scored, ['USER_ID'])
+
+    def _score(self, chunk):
+        # inplace_predict is thread safe and skips building a DMatrix, it gives PREDICT_PROBA_1
+        proba_1 = self.booster.inplace_predict(chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float64))
+        scored_at = pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')
+        return list(zip(chunk['USER_ID'].tolist(), chunk['DAY'].tolist(), chunk['FEATURE_HASH'].tolist(),
+                        (1 - proba_1).tolist(), proba_1.tolist(), [self.model_name] * len(chunk),
+                        [self.version] * len(chunk), [scored_at] * len(chunk)))
+
+    def _write(self, rows):
+        with self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO {self.schema}.{PREDICTIONS_TABLE} ({', '.join(PREDICTION_COLUMNS)}) "
+                                  f"VALUES ({', '.join('?' for _ in PREDICTION_COLUMNS)})", rows)
+
+    def run(self):
+        """Score every pending feature row and drop the predictions of departed players."""
+        start = time.perf_counter()
+        features_df = self.features()
+        pending_df = self.pending(features_df)
+        partitions = run_chunks(self._score, self._write, pending_df, self.chunk_rows, self.max_workers)
+        with self.conn:
+            deleted = self.conn.execute(f"DELETE FROM {self.schema}.{PREDICTIONS_TABLE} "
+                                        f"WHERE USER_ID NOT IN (SELECT USER_ID FROM {self.schema}.{FEATURES_TABLE})").rowcount
+        return BatchRun(len(features_df), len(pending_df), deleted, partitions, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connection', help="Snowflake connection name from connections.toml")
+    parser.add_argument('--local', help="SQLite file with the APP schema, scored with --model instead of in Snowflake")
+    parser.add_argument('--model', default='churn_model.json', help="saved XGBoost booster of the logged model, for --local")
+    parser.add_argument('--model-name', default=MODEL_NAME)
+    parser.add_argument('--version', default=MODEL_VERSION)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    if args.local:
+        conn = sqlite3.connect(':memory:', check_same_thread=False)
+        conn.execute(f"ATTACH DATABASE ? AS {SCHEMA}", [args.local])
+        result = LocalBatchScorer(conn, load_booster(args.model), args.model_name, args.version,
+                                  chunk_rows=args.chunk_rows, max_workers=args.workers).run()
+    else:
+        from snowflake.ml.registry import Registry
+        from snowflake.snowpark import Session
+
+        session = Session.builder.config('connection_name', args.connection).create() if args.connection \
+            else Session.builder.getOrCreate()
+        model_version = Registry(session=session).get_model(args.model_name).version(args.version)
+        result = SnowflakeBatchScorer(session, model_version, args.model_name, args.version,
+                                      chunk_rows=args.chunk_rows, max_workers=args.workers).run()
+    print(f"{result.written:,} of {result.rows:,} players scored in {result.partitions} partitions, "
+          f"{result.deleted:,} departed players dropped, {result.seconds:.1f}s, {result.rows_per_second:,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+# Generates synthetic player telemetry in the @SUPPORT stage layout read by scripts/raw_build.sql and
+# scripts/ingest_raw.py, at any number of players, for scale and load tests of the notebooks and apps.
+#
+# Players are generated in chunks of --chunk-users on a process pool, each chunk with its own random
+# stream derived from (seed, chunk), so the output only depends on --seed and --chunk-users and not on
+# the number of workers. Every chunk writes one gzipped part of each folder file set, the single file
+# tables (users.csv, ...) are joined from the chunk parts in order. A worker needs about 70MB per
+# 1000 players of its chunk, so --workers * --chunk-users bounds the memory of a run.
+#
+# Players are Hardcore or Casual, play for a while from their signup day and then churn with a rate that
+# depends on how engaged they are, so RETENTION, DEMOGRAPHICS and the churn model see realistic mixes.
+#
+#   python scripts/generate_data.py --users 1000000 --output data/
+#   python scripts/generate_data.py --users 1000000 --output data/ --format parquet
+import argparse
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# the columns of each RAW table, in file order
+RAW_COLUMNS = {
+    'USERS': ['USER_ID', 'FIRST_NAME', 'LAST_NAME', 'EMAIL', 'GENDER', 'BIRTHDATE', 'LOCATION', 'PHOTO_URL'],
+    'ACHIEVEMENTS': ['USER_ID', 'VICTORY_ROYALE', 'ELIMINATION_MILESTONES', 'SURVIVAL_ACHIEVEMENTS', 'BUILDING_RESOURCES',
+                     'EXPLORATION_TRAVEL', 'WEAPON_USAGE', 'ASSIST_TEAMMATES', 'EVENT_CHALLENGES', 'CREATIVE_MODE',
+                     'SOCIAL_ACHIEVEMENTS'],
+    'PURCHASES': ['PURCHASE_ID', 'USER_ID', 'AD_INTERACTION_ID', 'TIMESTAMP_OF_PURCHASE', 'PURCHASE_TYPE', 'PURCHASE_AMOUNT',
+                  'AD_TYPE', 'AD_ENGAGEMENT_TIME', 'AD_CONVERSION'],
+    'SESSIONS': ['SESSION_ID', 'USER_ID', 'LOG_IN', 'LOG_OUT', 'SESSION_DURATION_MINUTES', 'DEVICE_TYPE'],
+    'GAME_EVENTS': ['USER_ID', 'SESSION_ID', 'ASSISTS', 'BOOSTS', 'DAMAGE_DEALT', 'DISTANCE_TRAVELED', 'KILLS',
+                    'WEAPONS_ACQUIRED', 'HEADSHOTS', 'HEALS'],
+    'SUPPORT_TICKETS': ['USER_ID', 'CATEGORY', 'CASE_DESCRIPTION', 'SENTIMENT_ANALYSIS', 'DATE_CREATED'],
+}
+# where each table goes in the stage layout, folder file sets end with '/'
+STAGE_PATHS = {
+    'USERS': 'users.csv',
+    'ACHIEVEMENTS': 'users_achievement_final.csv',
+    'PURCHASES': 'purchases_output/',
+    'SESSIONS': 'sessions_output/',
+    'GAME_EVENTS': 'game_events_output/',
+    'SUPPORT_TICKETS': 'support_tickets.csv',
+}
+FIRST_USER_ID = 1001
+# session, purchase and ad interaction ids of chunk i start at i * CHUNK_ID_SPACE + 1
+CHUNK_ID_SPACE = 10**9
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# gzip level 9 spends most of a run compressing for files about 10% smaller
+GZIP = {'method': 'gzip', 'compresslevel': 1, 'mtime': 0}
+
+FIRST_NAMES = ['Ana', 'Ben', 'Chen', 'Dara', 'Eli', 'Fatima', 'Gus', 'Hana', 'Ivan', 'Jade', 'Kofi', 'Lena', 'Mateo',
+               'Nora', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sven', 'Tariq', 'Uma', 'Viktor', 'Wen', 'Yara', 'Zoe']
+LAST_NAMES = ['Kim', 'Lopez', 'Nowak', 'Smith', 'Garcia', 'Muller', 'Rossi', 'Silva', 'Tanaka', 'Dubois', 'Okafor',
+              'Novak', 'Ivanova', 'Chen', 'Patel', 'Jones']
+LOCATIONS = ['USA', 'China', 'UK', 'Mexico', 'Canada', 'Brazil', 'France', 'Germany', 'Korea', 'Poland']
+LOCATION_WEIGHTS = [0.24, 0.16, 0.1, 0.09, 0.08, 0.08, 0.07, 0.07, 0.06, 0.05]
+DEVICE_TYPES = ['PC', 'Console', 'Mobile']
+DEVICE_WEIGHTS = [0.45, 0.3, 0.25]
+# share of each hour of the day in logins, players mostly log in in the evening
+HOUR_WEIGHTS = np.array([3, 2, 1, 1, 1, 1, 1, 2, 2, 2, 3, 3, 4, 4, 4, 5, 6, 7, 8, 9, 9, 8, 7, 5], dtype=float)
+HOUR_WEIGHTS /= HOUR_WEIGHTS.sum()
+
+HARDCORE_SHARE = 0.25
+# median sessions per day while a player is playing, and mean days they keep playing
+SESSIONS_PER_DAY = {'Hardcore': 3.0, 'Casual': 0.25}
+MEAN_LIFETIME_DAYS = {'Hardcore': 90, 'Casual': 120}
+MEAN_SESSION_MINUTES = {'Hardcore': 70, 'Casual': 30}
+# DATEDIFF(day, LAST_LOGIN_DATE, CURRENT_DATE) > 30 in RETENTION
+CHURN_DAYS = 30
+
+# events per minute of play for an average player, scaled by the player's skill
+EVENT_RATES = {'ASSISTS': 0.05, 'BOOSTS': 0.1, 'DAMAGE_DEALT': 2.0, 'DISTANCE_TRAVELED': 5.0, 'KILLS': 0.08,
+               'WEAPONS_ACQUIRED': 0.1, 'HEADSHOTS': 0.03, 'HEALS': 0.06}
+# share of sessions that record no game events
+NO_EVENT_SHARE = 0.08
+ADS_PER_SESSION = 0.4
+CONVERSION_RATE = {'Hardcore': 0.15, 'Casual': 0.05}
+PURCHASE_PRICES = {'skin': [4.99, 9.99, 19.99], 'battle_pass': [9.99], 'currency': [0.99, 4.99, 9.99, 19.99]}
+PURCHASE_WEIGHTS = [0.4, 0.2, 0.4]
+AD_TYPES = ['video', 'banner', 'interstitial']
+# tickets a churned and an active player open on average
+TICKET_RATE = {'churned': 0.5, 'active': 0.15}
+TICKET_CASES = {
+    'Billing': 'Charged twice for a battle pass',
+    'Bug': 'Game crashes when the match starts',
+    'Account': 'Cannot log in after changing my email',
+    'Gameplay': 'Matchmaking puts me against much stronger players',
+    'Connectivity': 'High ping and disconnects during matches',
+}
+
+
+def _chunk_bounds(n_users, chunk_users):
+    return [(chunk, start, min(start + chunk_users, n_users)) for chunk, start in enumerate(range(0, n_users, chunk_users))]
+
+
+def generate_chunk(chunk, n_users, first_user_id=FIRST_USER_ID, seed=0, end='2024-12-31', days=365):
+    """{table: frame} for ``n_users`` players from ``first_user_id``, deterministic for (seed, chunk)."""
+    rng = np.random.default_rng([seed, chunk])
+    user_ids = first_user_id + np.arange(n_users, dtype='int64')
+    start = np.datetime64(pd.Timestamp(end).normalize() - pd.Timedelta(days=days - 1), 's')
+    day = np.timedelta64(1, 'D').astype('timedelta64[s]')
+
+    # engagement, signup and the last day each player plays
+    hardcore = rng.random(n_users) < HARDCORE_SHARE
+    engagement = rng.lognormal(0.0, 0.5, n_users)
+    sessions_per_day = engagement * np.where(hardcore, SESSIONS_PER_DAY['Hardcore'], SESSIONS_PER_DAY['Casual'])
+    # players more engaged than others of their type keep playing longer
+    lifetime_days = rng.exponential(np.where(hardcore, MEAN_LIFETIME_DAYS['Hardcore'], MEAN_LIFETIME_DAYS['Casual'])
+                                    * np.sqrt(engagement))
+    signup_day = rng.integers(0, days, n_users)
+    last_day = np.minimum(signup_day + lifetime_days.astype('int64'), days - 1)
+    active_days = last_day - signup_day + 1
+    churned = last_day < days - CHURN_DAYS
+    skill = rng.lognormal(0.0, 0.4, n_users)
+
+    # sessions, the first on the signup day and the last on the last day
+    n_sessions = np.maximum(rng.poisson(sessions_per_day * active_days), 1)
+    session_users = np.repeat(np.arange(n_users), n_sessions)
+    n_rows = len(session_users)
+    firsts = np.cumsum(n_sessions) - n_sessions
+    session_day = signup_day[session_users] + (rng.random(n_rows) * active_days[session_users]).astype('int64')
+    session_day[firsts] = signup_day
+    session_day[firsts + n_sessions - 1] = last_day
+    seconds = rng.choice(24, size=n_rows, p=HOUR_WEIGHTS) * 3600 + rng.integers(0, 3600, n_rows)
+    log_in = start + session_day * day + seconds.astype('timedelta64[s]')
+    order = np.lexsort((log_in, session_users))
+    log_in = log_in[order]
+    mean_minutes = np.where(hardcore, MEAN_SESSION_MINUTES['Hardcore'], MEAN_SESSION_MINUTES['Casual'])[session_users]
+    duration = np.clip(rng.gamma(2.0, mean_minutes / 2.0), 1, 600).astype('int64')
+    preferred_device = rng.choice(len(DEVICE_TYPES), size=n_users, p=DEVICE_WEIGHTS)
+    device = np.where(rng.random(n_rows) < 0.85, preferred_device[session_users], rng.choice(len(DEVICE_TYPES), size=n_rows))
+    session_ids = chunk * CHUNK_ID_SPACE + np.arange(1, n_rows + 1)
+    sessions_df = pd.DataFrame({
+        'SESSION_ID': session_ids,
+        'USER_ID': user_ids[session_users],
+        'LOG_IN': log_in,
+        'LOG_OUT': log_in + (duration * 60).astype('timedelta64[s]'),
+        'SESSION_DURATION_MINUTES': duration,
+        'DEVICE_TYPE': np.array(DEVICE_TYPES)[device],
+    })
+
+    # one row of event counts per session that recorded any
+    has_events = rng.random(n_rows) >= NO_EVENT_SHARE
+    game_events_df = pd.DataFrame({'USER_ID': user_ids[session_users][has_events], 'SESSION_ID': session_ids[has_events]})
+    expected_minutes = (duration * skill[session_users])[has_events]
+    for col, rate in EVENT_RATES.items():
+        game_events_df[col] = rng.poisson(rate * expected_minutes)
+
+    # ads are shown during sessions, Hardcore players convert more often
+    n_ads = rng.poisson(ADS_PER_SESSION, n_rows)
+    ad_sessions = np.repeat(np.arange(n_rows), n_ads)
+    n_purchases = len(ad_sessions)
+    ad_users = session_users[ad_sessions]
+    converted = rng.random(n_purchases) < np.where(hardcore, CONVERSION_RATE['Hardcore'], CONVERSION_RATE['Casual'])[ad_users]
+    kinds = list(PURCHASE_PRICES)
+    kind = rng.choice(len(kinds), size=n_purchases, p=PURCHASE_WEIGHTS)
+    amount = np.zeros(n_purchases)
+    for position, name in enumerate(kinds):
+        matched = converted & (kind == position)
+        amount[matched] = rng.choice(PURCHASE_PRICES[name], size=int(matched.sum()))
+    purchase_ids = chunk * CHUNK_ID_SPACE + np.arange(1, n_purchases + 1)
+    purchase_seconds = (rng.random(n_purchases) * duration[ad_sessions] * 60).astype('int64')
+    purchases_df = pd.DataFrame({
+        'PURCHASE_ID': purchase_ids,
+        'USER_ID': user_ids[ad_users],
+        'AD_INTERACTION_ID': purchase_ids,
+        'TIMESTAMP_OF_PURCHASE': log_in[ad_sessions] + purchase_seconds.astype('timedelta64[s]'),
+        'PURCHASE_TYPE': np.where(converted, np.array(kinds)[kind], 'none'),
+        'PURCHASE_AMOUNT': amount,
+        'AD_TYPE': rng.choice(AD_TYPES, size=n_purchases),
+        'AD_ENGAGEMENT_TIME': np.round(rng.gamma(2.0, np.where(converted, 15.0, 6.0)), 2),
+        'AD_CONVERSION': converted.astype('int64'),
+    })
+
+    first = rng.integers(0, len(FIRST_NAMES), n_users)
+    last = rng.integers(0, len(LAST_NAMES), n_users)
+    age = np.clip(rng.normal(26, 9, n_users), 10, 70).astype('int64')
+    birthdate = start + (days - 1 - age * 365 - rng.integers(0, 365, n_users)) * day
+    users_df = pd.DataFrame({
+        'USER_ID': user_ids,
+        'FIRST_NAME': np.array(FIRST_NAMES)[first],
+        'LAST_NAME': np.array(LAST_NAMES)[last],
+        'EMAIL': [f"{FIRST_NAMES[f].lower()}.{LAST_NAMES[l].lower()}{user_id}@example.com" for f, l, user_id in zip(first, last, user_ids)],
+        'GENDER': rng.choice(['Male', 'Female'], size=n_users, p=[0.6, 0.4]),
+        'BIRTHDATE': pd.to_datetime(birthdate).strftime('%Y-%m-%d'),
+        'LOCATION': rng.choice(LOCATIONS, size=n_users, p=LOCATION_WEIGHTS),
+        'PHOTO_URL': [f"https://example.com/photos/{user_id}.png" for user_id in user_ids],
+    })
+
+    # players with more sessions hold more achievements
+    achievements_df = pd.DataFrame({'USER_ID': user_ids})
+    for position, col in enumerate(RAW_COLUMNS['ACHIEVEMENTS'][1:]):
+        probability = 1 / (1 + np.exp(-(np.log1p(n_sessions) - 2.5 - 0.2 * position)))
+        achievements_df[col] = rng.random(n_users) < probability
+
+    # churned players open more tickets and are less happy in them
+    n_tickets = rng.poisson(np.where(churned, TICKET_RATE['churned'], TICKET_RATE['active']))
+    ticket_users = np.repeat(np.arange(n_users), n_tickets)
+    categories = list(TICKET_CASES)
+    category = np.array(categories)[rng.integers(0, len(categories), len(ticket_users))]
+    ticket_day = signup_day[ticket_users] + (rng.random(len(ticket_users)) * active_days[ticket_users]).astype('int64')
+    support_tickets_df = pd.DataFrame({
+        'USER_ID': user_ids[ticket_users],
+        'CATEGORY': category,
+        'CASE_DESCRIPTION': [TICKET_CASES[name] for name in category],
+        'SENTIMENT_ANALYSIS': np.round(np.clip(rng.normal(np.where(churned, -0.4, 0.1)[ticket_users], 0.4), -1, 1), 2),
+        'DATE_CREATED': start + ticket_day * day + rng.integers(0, 86400, len(ticket_users)).astype('timedelta64[s]'),
+    })
+
+    return {
+        'USERS': users_df,
+        'ACHIEVEMENTS': achievements_df,
+        'PURCHASES': purchases_df,
+        'SESSIONS': sessions_df,
+        'GAME_EVENTS': game_events_df,
+        'SUPPORT_TICKETS': support_tickets_df,
+    }
+
+
+def _part_path(folder, table, chunk, file_format):
+    # the stage file of a chunk, single file tables go to a parts folder joined after all chunks
+    path = STAGE_PATHS[table]
+    if file_format == 'parquet':
+        return folder / table.lower() / f"data_{chunk}.parquet"
+    if table == 'GAME_EVENTS':
+        return folder / path / f"data_{chunk}.json.gz"
+    if path.endswith('/'):
+        return folder / path / f"data_{chunk}.csv.gz"
+    return folder / '_parts' / path / f"data_{chunk}.csv"
+
+
+def write_chunk(folder, chunk, n_users, first_user_id, seed, end, days, file_format):
+    """Generate one chunk and write its parts, {table: rows}."""
+    folder = Path(folder)
+    tables = generate_chunk(chunk, n_users, first_user_id, seed=seed, end=end, days=days)
+    for table, df in tables.items():
+        path = _part_path(folder, table, chunk, file_format)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if file_format == 'parquet':
+            df.to_parquet(path, index=False)
+        elif table == 'GAME_EVENTS':
+            # mtime 0 keeps the gzip bytes the same from run to run
+            df.to_json(path, orient='records', compression=GZIP)
+        else:
+            compression = GZIP if path.suffix == '.gz' else None
+            df.to_csv(path, index=False, header=chunk == 0 or compression is not None, date_format=DATE_FORMAT,
+                      compression=compression)
+    return {table: len(df) for table, df in tables.items()}
+
+
+def _join_parts(folder, n_chunks):
+    # the single file tables are the chunk parts in order, only the first part has a header
+    parts = folder / '_parts'
+    for table, path in STAGE_PATHS.items():
+        if path.endswith('/'):
+            continue
+        with open(folder / path, 'wb') as output:
+            for chunk in range(n_chunks):
+                with open(parts / path / f"data_{chunk}.csv", 'rb') as part:
+                    shutil.copyfileobj(part, output)
+    shutil.rmtree(parts)
+
+
+def generate(folder, n_users, chunk_users=10_000, seed=0, end='2024-12-31', days=365, file_format='csv', workers=None):
+    """Write ``n_users`` players to ``folder`` in the stage layout, {table: rows}."""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    bounds = _chunk_bounds(n_users, chunk_users)
+    args = [(folder, chunk, stop - start, FIRST_USER_ID + start, seed, end, days, file_format) for chunk, start, stop in bounds]
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        counts = [write_chunk(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counts = list(pool.map(write_chunk, *zip(*args)))
+    if file_format == 'csv':
+        _join_parts(folder, len(bounds))
+    return {table: sum(count[table] for count in counts) for table in RAW_COLUMNS}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, required=True)
+    parser.add_argument('--output', required=True, help="folder the stage layout is written to")
+    parser.add_argument('--chunk-users', type=int, default=10_000, help="players per chunk and per file")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--end', default='2024-12-31', help="last day of history, raw_build.sql moves it to today")
+    parser.add_argument('--days', type=int, default=365, help="days of history")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="csv is the stage layout, parquet writes a folder of parts per table for pandas")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--format parquet needs pyarrow")
+    counts = generate(args.output, args.users, chunk_users=args.chunk_users, seed=args.seed, end=args.end,
+                      days=args.days, file_format=args.format, workers=args.workers)
+    for table, n_rows in counts.items():
+        print(f"{table}: {n_rows:,} rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# The incremental batch plumbing of scripts/batch_score.py and scripts/batch_explain.py, which write model
+# output for every row of a source table into an APP table.
+#
+# Every row written keeps a hash of the source row it came from and the model version that wrote it. A rerun
+# only processes the rows whose hash changed, or every row for a new model version, and drops the rows whose
+# source row left. Pending rows are split into partitions of about chunk_rows that run on a thread pool. In
+# Snowflake each partition is MERGEd into the table, locally the partitions are written in order to SQLite.
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class BatchRun(NamedTuple):
+    rows: int
+    written: int
+    deleted: int
+    partitions: int
+    seconds: float
+
+    @property
+    def rows_per_second(self):
+        return self.written / self.seconds if self.seconds else 0.0
+
+
+def partition_count(pending, chunk_rows):
+    return max(math.ceil(pending / chunk_rows), 1) if pending else 0
+
+
+# -- Snowflake --------------------------------------------------------------------------------------
+
+def hash_sql(columns, alias):
+    return f"HASH({', '.join(f'{alias}.{column}' for column in columns)})"
+
+
+def partition_sql(partitions, partition, alias):
+    """The rows of one hash partition of USER_ID out of ``partitions``."""
+    return f"MOD(ABS(HASH({alias}.USER_ID)), {int(partitions)}) = {int(partition)}"
+
+
+def pending_sql(source, table, keys, hashed, bound, partitions=1, partition=None):
+    """The rows of the ``source`` query with their FEATURE_HASH of the ``hashed`` columns, unless ``table`` has
+    a row of the same ``keys`` and hash whose ``bound`` columns, the model name or version, equal the bound values.
+
+    With a ``partition`` only the rows of that hash partition of USER_ID out of ``partitions``.
+    """
+    on = " AND ".join([f"t.{key} = s.{key}" for key in keys] + [f"t.FEATURE_HASH = {hash_sql(hashed, 's')}"]
+                      + [f"t.{column} = ?" for column in bound])
+    where = f"t.{keys[0]} IS NULL"
+    if partition is not None:
+        where += f"\n  AND {partition_sql(partitions, partition, 's')}"
+    return f"""WITH source AS (
+{source}
+)
+SELECT s.*, {hash_sql(hashed, 's')} AS FEATURE_HASH
+FROM source s
+LEFT JOIN {table} t
+  ON {on}
+WHERE {where}"""
+
+
+def merge_sql(table, source, keys, columns, values=None):
+    """Upsert the rows of ``source`` into ``table`` by ``keys``.
+
+    ``values`` maps a column to the expression it is set to, ``s.<column>`` otherwise. Bind parameters in them
+    are bound twice, once for the update and once for the insert.
+    """
+    values = {column: (values or {}).get(column, f"s.{column}") for column in columns}
+    on = " AND ".join(f"t.{key} = s.{key}" for key in keys)
+    updates = ",\n    ".join(f"{column} = {values[column]}" for column in columns if column not in keys)
+    return f"""MERGE INTO {table} t
+USING {source} s ON {on}
+WHEN MATCHED THEN UPDATE SET
+    {updates}
+WHEN NOT MATCHED THEN INSERT ({', '.join(columns)})
+VALUES ({', '.join(values.values())})"""
+
+
+def delete_departed_sql(table, source, keys):
+    """Delete the rows of ``table`` whose ``keys`` are no longer in the ``source`` query."""
+    on = " AND ".join(f"s.{key} = t.{key}" for key in keys)
+    return f"""DELETE FROM {table} t
+WHERE NOT EXISTS (
+SELECT 1 FROM (
+{source}
+) s WHERE {on}
+)"""
+
+
+def run_partitions(process, partitions, max_workers):
+    """Sum of ``process(partitions, partition)`` over all partitions, on ``max_workers`` threads."""
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return sum(pool.map(lambda partition: process(partitions, partition), range(partitions)))
+
+
+# -- local ------------------------------------------------------------------------------------------
+
+def row_hashes(df, columns):
+    """One hash per row of ``df[columns]``, as a signed 64 bit integer so SQLite stores it as an INTEGER."""
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy().view(np.int64)
+
+
+def pending_rows(source_df, stored_df, keys):
+    """The rows of ``source_df`` without a row of ``stored_df`` of the same ``keys`` and FEATURE_HASH."""
+    current = source_df.merge(stored_df, on=keys + ['FEATURE_HASH'], how='left', indicator=True)['_merge'] == 'both'
+    return source_df[~current.to_numpy()]
+
+
+def run_chunks(process, write, pending_df, chunk_rows, max_workers):
+    """Process ``pending_df`` in chunks on the pool and write them in order from this thread, returns the chunks."""
+    partitions = partition_count(len(pending_df), chunk_rows)
+    chunks = [pending_df.iloc[i * chunk_rows:(i + 1) * chunk_rows] for i in range(partitions)]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for rows in pool.map(process, chunks):
+            write(rows)
+    return partitions
+
+
+def load_booster(path, nthread=1):
+    import xgboost as xgb
+
+    booster = xgb.Booster()
+    booster.load_model(path)
+    # the partitions run on threads, one core each
+    booster.set_param({'nthread': nthread})
+    return booster
@@ -0,0 +1,354 @@
+# Loads the RAW tables of scripts/raw_build.sql from the @SUPPORT stage, or from a local folder with
+# the same layout (users.csv, sessions_output/*.csv.gz, game_events_output/*.json.gz, ...).
+#
+# The file sets are loaded in parallel and every loaded file is recorded in RAW.INGEST_LOG, so a rerun
+# after a failure or after new files land only loads the files that are not in the log yet.
+# SESSIONS and PURCHASES timestamps are shifted by days_since_max_log_out inside the COPY transform
+# instead of by UPDATEs that rewrite both tables after the load. The shift is taken from the staged
+# session files on the first load and reused from the log afterwards, so later files line up.
+#
+#   python scripts/ingest_raw.py --connection default
+#   python scripts/ingest_raw.py --local data/ --sqlite raw.db
+import argparse
+import gzip
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+import pandas as pd
+
+
+class RawSource(NamedTuple):
+    table: str
+    # relative to the stage or folder, folders end with '/'
+    path: str
+    file_format: str
+    # timestamp columns moved by days_since_max_log_out
+    shift_columns: tuple = ()
+
+
+RAW_SOURCES = [
+    RawSource('USERS', 'users.csv', 'csv'),
+    RawSource('ACHIEVEMENTS', 'users_achievement_final.csv', 'csv'),
+    RawSource('PURCHASES', 'purchases_output/', 'csv', ('TIMESTAMP_OF_PURCHASE',)),
+    RawSource('SESSIONS', 'sessions_output/', 'csv', ('LOG_IN', 'LOG_OUT')),
+    RawSource('GAME_EVENTS', 'game_events_output/', 'json'),
+    RawSource('SUPPORT_TICKETS', 'support_tickets.csv', 'csv'),
+]
+# days_since_max_log_out = DATEDIFF(day, MAX(SESSIONS.LOG_OUT), CURRENT_DATE)
+SHIFT_TABLE = 'SESSIONS'
+SHIFT_COLUMN = 'LOG_OUT'
+
+INGEST_LOG = 'INGEST_LOG'
+# COPY accepts at most 1000 names in FILES
+COPY_BATCH_FILES = 1000
+
+DATABASE = 'PLAYER_360'
+SCHEMA = 'RAW'
+STAGE = '@PLAYER_360.RAW.SUPPORT'
+
+
+def _source_files(source, names):
+    # the names under the source path, a single file source matches only itself
+    if source.path.endswith('/'):
+        return sorted(name for name in names if name.startswith(source.path) and name != source.path)
+    return [name for name in names if name == source.path]
+
+
+# -- Snowflake --------------------------------------------------------------------------------------
+
+FILE_FORMATS_SQL = [
+    """CREATE FILE FORMAT IF NOT EXISTS {schema}.json_format
+    TYPE = json
+    COMPRESSION = GZIP
+    STRIP_OUTER_ARRAY = TRUE""",
+    """CREATE FILE FORMAT IF NOT EXISTS {schema}.csv_format
+    TYPE = csv
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"'
+    PARSE_HEADER = TRUE""",
+    """CREATE FILE FORMAT IF NOT EXISTS {schema}.csv_gz_format
+    TYPE = csv
+    COMPRESSION = GZIP
+    FIELD_OPTIONALLY_ENCLOSED_BY = '"'
+    PARSE_HEADER = TRUE""",
+    # for reading staged csv files by position, like the COPY statements do
+    """CREATE FILE FORMAT IF NOT EXISTS {schema}.csv_skip_header_format
+    TYPE = csv
+    COMPRESSION = AUTO
+    SKIP_HEADER = 1""",
+]
+
+
+def _infer_format(source):
+    if source.file_format == 'json':
+        return 'json_format'
+    return 'csv_gz_format' if source.path.endswith('/') else 'csv_format'
+
+
+def create_table_sql(source, schema=f"{DATABASE}.{SCHEMA}", stage=STAGE):
+    return f"""CREATE TABLE IF NOT EXISTS {schema}.{source.table}
+USING TEMPLATE (
+    SELECT ARRAY_AGG(OBJECT_CONSTRUCT(*))
+    WITHIN GROUP (ORDER BY order_id)
+      FROM TABLE(
+        INFER_SCHEMA(
+          LOCATION=>'{stage}/{source.path}',
+          FILE_FORMAT=>'{schema}.{_infer_format(source)}',
+          IGNORE_CASE => TRUE
+        )
+    ))"""
+
+
+def ingest_log_ddl(schema=f"{DATABASE}.{SCHEMA}"):
+    return f"""CREATE TABLE IF NOT EXISTS {schema}.{INGEST_LOG} (
+    TABLE_NAME VARCHAR,
+    FILE_NAME VARCHAR,
+    ROWS_LOADED NUMBER,
+    DAYS_SHIFTED NUMBER,
+    LOADED_AT TIMESTAMP_NTZ
+)"""
+
+
+def days_shift_sql(columns, schema=f"{DATABASE}.{SCHEMA}", stage=STAGE):
+    """days_since_max_log_out read straight from the staged session files, before anything is loaded."""
+    source = next(source for source in RAW_SOURCES if source.table == SHIFT_TABLE)
+    position = columns.index(SHIFT_COLUMN) + 1
+    return f"""SELECT DATEDIFF(day, MAX(TRY_TO_TIMESTAMP_NTZ(${position})), CURRENT_DATE) AS DAYS_SHIFTED
+FROM {stage}/{source.path} (FILE_FORMAT => '{schema}.csv_skip_header_format')"""
+
+
+def copy_sql(source, columns, files, days_shifted=0, schema=f"{DATABASE}.{SCHEMA}", stage=STAGE):
+    """COPY of ``files`` into the source table, the shifted columns go through a DATEADD transform."""
+    file_list = ", ".join(f"'{name}'" for name in files)
+    if source.file_format == 'json':
+        return f"""COPY INTO {schema}.{source.table}
+FROM {stage}/
+FILES = ({file_list})
+FILE_FORMAT = '{schema}.json_format'
+MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE"""
+    if not source.shift_columns:
+        return f"""COPY INTO {schema}.{source.table}
+FROM {stage}/
+FILES = ({file_list})
+FILE_FORMAT = (TYPE = 'CSV', SKIP_HEADER = 1)"""
+    select = ",\n    ".join(
+        f"DATEADD(day, {int(days_shifted)}, ${position}::TIMESTAMP_NTZ)" if column in source.shift_columns else f"${position}"
+        for position, column in enumerate(columns, start=1))
+    return f"""COPY INTO {schema}.{source.table} ({", ".join(columns)})
+FROM (
+    SELECT
+    {select}
+    FROM {stage}/
+)
+FILES = ({file_list})
+FILE_FORMAT = (TYPE = 'CSV', SKIP_HEADER = 1)"""
+
+
+class SnowflakeIngest:
+    def __init__(self, session, schema=f"{DATABASE}.{SCHEMA}", stage=STAGE, max_workers=4):
+        self.session = session
+        self.schema = schema
+        self.stage = stage
+        self.max_workers = max_workers
+
+    def _columns(self, table):
+        database, schema = self.schema.split('.')
+        rows = self.session.sql(f"""SELECT COLUMN_NAME FROM {database}.INFORMATION_SCHEMA.COLUMNS
+WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ? ORDER BY ORDINAL_POSITION""", params=[schema, table]).collect()
+        return [row['COLUMN_NAME'] for row in rows]
+
+    def _stage_names(self, source):
+        # LIST returns full urls of an external stage, keep the part from the source path on
+        rows = self.session.sql(f"LIST {self.stage}/{source.path}").collect()
+        prefix = source.path.rstrip('/')
+        names = []
+        for row in rows:
+            name = row['name']
+            start = name.rfind(prefix)
+            names.append(name[start:] if start >= 0 else name)
+        return _source_files(source, names)
+
+    def _loaded(self, table):
+        rows = self.session.sql(f"SELECT FILE_NAME FROM {self.schema}.{INGEST_LOG} WHERE TABLE_NAME = ?",
+                                params=[table]).collect()
+        return {row['FILE_NAME'] for row in rows}
+
+    def days_shifted(self):
+        rows = self.session.sql(f"SELECT MAX(DAYS_SHIFTED) AS DAYS_SHIFTED FROM {self.schema}.{INGEST_LOG} "
+                                f"WHERE TABLE_NAME IN ('SESSIONS', 'PURCHASES')").collect()
+        if rows and rows[0]['DAYS_SHIFTED'] is not None:
+            return int(rows[0]['DAYS_SHIFTED'])
+        columns = self._columns(SHIFT_TABLE)
+        return int(self.session.sql(days_shift_sql(columns, self.schema, self.stage)).collect()[0]['DAYS_SHIFTED'])
+
+    def load_source(self, source, days_shifted):
+        loaded_files = self._loaded(source.table)
+        files = [name for name in self._stage_names(source) if name not in loaded_files]
+        columns = self._columns(source.table)
+        shift = days_shifted if source.shift_columns else None
+        loaded = 0
+        for start in range(0, len(files), COPY_BATCH_FILES):
+            batch = files[start:start + COPY_BATCH_FILES]
+            results = [row.as_dict() for row in self.session.sql(
+                copy_sql(source, columns, batch, days_shifted or 0, self.schema, self.stage)).collect()]
+            # COPY names files by their full url, map them back to the stage relative names
+            log_rows = []
+            for result in results:
+                if result.get('status') not in ('LOADED', 'PARTIALLY_LOADED'):
+                    continue
+                name = next((name for name in batch if result['file'].endswith(name)), result['file'])
+                log_rows.append((source.table, name, int(result.get('rows_loaded') or 0), shift))
+            if log_rows:
+                values = ", ".join("(?, ?, ?, ?, CURRENT_TIMESTAMP())" for _ in log_rows)
+                self.session.sql(f"INSERT INTO {self.schema}.{INGEST_LOG} (TABLE_NAME, FILE_NAME, ROWS_LOADED, DAYS_SHIFTED, LOADED_AT) "
+                                 f"VALUES {values}", params=[value for row in log_rows for value in row]).collect()
+            loaded += len(log_rows)
+        return loaded
+
+    def run(self, sources=RAW_SOURCES):
+        """Load every source not loaded yet, {table: files loaded}."""
+        for statement in FILE_FORMATS_SQL:
+            self.session.sql(statement.format(schema=self.schema)).collect()
+        self.session.sql(ingest_log_ddl(self.schema)).collect()
+        for source in sources:
+            self.session.sql(create_table_sql(source, self.schema, self.stage)).collect()
+        days_shifted = self.days_shifted()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {source.table: pool.submit(self.load_source, source, days_shifted) for source in sources}
+            return {table: future.result() for table, future in futures.items()}
+
+
+# -- local ------------------------------------------------------------------------------------------
+
+def read_raw_file(path, file_format, usecols=None):
+    """One staged file as a frame with upper case column names, like INFER_SCHEMA(IGNORE_CASE => TRUE)."""
+    if file_format == 'json':
+        with gzip.open(path, 'rt') as handle:
+            df = pd.DataFrame(json.load(handle))
+        df.columns = [col.upper() for col in df.columns]
+        return df[usecols] if usecols else df
+    df = pd.read_csv(path, usecols=(lambda col: col.upper() in usecols) if usecols else None)
+    df.columns = [col.upper() for col in df.columns]
+    return df
+
+
+def _sqlite_type(series):
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(series):
+        return 'REAL'
+    return 'TEXT'
+
+
+def _sqlite_rows(df):
+    # plain python values with missing values as NULL, built column by column on the worker threads
+    values = [df[col].astype(object).where(df[col].notna(), None).tolist() if df[col].hasnans else df[col].tolist()
+              for col in df.columns]
+    return list(zip(*values))
+
+
+class LocalRows(NamedTuple):
+    columns: list
+    types: list
+    rows: list
+
+
+class LocalIngest:
+    def __init__(self, folder, conn, schema=SCHEMA, max_workers=4, today=None):
+        # conn has ``schema`` attached, today stands in for CURRENT_DATE
+        self.folder = Path(folder)
+        self.conn = conn
+        self.schema = schema
+        self.max_workers = max_workers
+        self.today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+        self.conn.execute(f"""CREATE TABLE IF NOT EXISTS {schema}.{INGEST_LOG} (
+    TABLE_NAME TEXT, FILE_NAME TEXT, ROWS_LOADED INTEGER, DAYS_SHIFTED INTEGER, LOADED_AT TEXT)""")
+        self.conn.commit()
+
+    def files(self, source):
+        names = [path.relative_to(self.folder).as_posix() for path in self.folder.rglob('*') if path.is_file()]
+        return _source_files(source, names)
+
+    def loaded(self, table):
+        return {name for (name,) in self.conn.execute(
+            f"SELECT FILE_NAME FROM {self.schema}.{INGEST_LOG} WHERE TABLE_NAME = ?", [table])}
+
+    def days_shifted(self, pool):
+        row = self.conn.execute(f"SELECT MAX(DAYS_SHIFTED) FROM {self.schema}.{INGEST_LOG} "
+                                f"WHERE TABLE_NAME IN ('SESSIONS', 'PURCHASES')").fetchone()
+        if row[0] is not None:
+            return int(row[0])
+        # only the LOG_OUT column of every session file is read, before anything is loaded
+        source = next(source for source in RAW_SOURCES if source.table == SHIFT_TABLE)
+        maxima = pool.map(lambda name: pd.to_datetime(read_raw_file(self.folder / name, source.file_format, [SHIFT_COLUMN])[SHIFT_COLUMN]).max(),
+                          self.files(source))
+        max_log_out = max((value for value in maxima if pd.notna(value)), default=None)
+        return 0 if max_log_out is None else (self.today - max_log_out.normalize()).days
+
+    def _transform(self, source, name):
+        df = read_raw_file(self.folder / name, source.file_format)
+        return LocalRows(list(df.columns), [_sqlite_type(df[col]) for col in df.columns], _sqlite_rows(df))
+
+    def _write(self, source, name, data, days_shifted):
+        # the shift is applied by the INSERT itself, and the rows and log entry of a file are committed together
+        table = f"{self.schema}.{source.table}"
+        columns = ", ".join(f'"{col}"' for col in data.columns)
+        values = ", ".join(f"datetime(?, '{days_shifted:+d} days')" if col in source.shift_columns else "?"
+                           for col in data.columns)
+        with self.conn:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ("
+                              + ", ".join(f'"{col}" {sqlite_type}' for col, sqlite_type in zip(data.columns, data.types)) + ")")
+            self.conn.executemany(f"INSERT INTO {table} ({columns}) VALUES ({values})", data.rows)
+            self.conn.execute(f"INSERT INTO {self.schema}.{INGEST_LOG} VALUES (?, ?, ?, ?, ?)",
+                              [source.table, name, len(data.rows), days_shifted if source.shift_columns else None,
+                               pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')])
+
+    def run(self, sources=RAW_SOURCES):
+        """Load every file not in the log yet, {table: files loaded}."""
+        loaded = {source.table: 0 for source in sources}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            days_shifted = self.days_shifted(pool)
+            pending = []
+            for source in sources:
+                loaded_files = self.loaded(source.table)
+                pending.extend((source, name) for name in self.files(source) if name not in loaded_files)
+            # files are parsed on the pool, at most 2 * max_workers at a time, and written in order
+            window = 2 * self.max_workers
+            futures = [pool.submit(self._transform, source, name) for source, name in pending[:window]]
+            for position, (source, name) in enumerate(pending):
+                data = futures[position].result()
+                futures[position] = None
+                if position + window < len(pending):
+                    next_source, next_name = pending[position + window]
+                    futures.append(pool.submit(self._transform, next_source, next_name))
+                self._write(source, name, data, days_shifted)
+                loaded[source.table] += 1
+        return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connection', help="Snowflake connection name from connections.toml")
+    parser.add_argument('--local', help="folder with the stage layout, loaded into --sqlite instead of Snowflake")
+    parser.add_argument('--sqlite', default='raw.db', help="SQLite file the RAW schema is kept in with --local")
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    if args.local:
+        conn = sqlite3.connect(':memory:')
+        conn.execute(f"ATTACH DATABASE ? AS {SCHEMA}", [args.sqlite])
+        loaded = LocalIngest(args.local, conn, max_workers=args.workers).run()
+    else:
+        from snowflake.snowpark import Session
+
+        session = Session.builder.config('connection_name', args.connection).create() if args.connection \
+            else Session.builder.getOrCreate()
+        loaded = SnowflakeIngest(session, max_workers=args.workers).run()
+    for table, n_files in loaded.items():
+        print(f"{table}: {n_files} new files loaded")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,9 @@ USE ROLE SYSADMIN;
 USE SCHEMA PLAYER_360.RAW;
 USE WAREHOUSE PLAYER_360_BUILD_WH;
 
+-- scripts/ingest_raw.py runs the same load with the file sets in parallel, only loads files that are not
+-- in RAW.INGEST_LOG yet, and shifts the SESSIONS and PURCHASES dates inside COPY instead of the UPDATEs below
+
 CREATE OR REPLACE FILE FORMAT json_format
     TYPE = json
     COMPRESSION = GZIP
@@ -0,0 +1,226 @@
+-- Generated by scripts/rolling_features_sql.py, edit the generator and rerun it instead of this file.
+-- Run after analytic_build.sql, it reads RAW.SESSIONS, RAW.PURCHASES, ANALYTIC.POINTS_PER_EVENT and ANALYTIC.RETENTION.
+-- It keeps APP.ROLLING_CHURN_FEATURES and APP.TO_BE_PREDICTED_CHURN_FEATURES as dynamic tables, set SQL_FEATURES = True
+-- in the rolling notebook so it trains on them instead of building the features in pandas and writing them. The script
+-- stops if an earlier run of the notebook wrote tables of the same names, drop them first.
+USE ROLE SYSADMIN;
+USE WAREHOUSE PLAYER_360_BUILD_WH;
+USE SCHEMA PLAYER_360.ANALYTIC;
+
+-- 0. Stop before building anything if APP holds the write_pandas tables of the notebook
+EXECUTE IMMEDIATE $$
+DECLARE
+    written INTEGER;
+    notebook_tables EXCEPTION (-20001, 'APP has feature tables the rolling notebook wrote, drop them or keep SQL_FEATURES = False');
+BEGIN
+    SELECT COUNT(*) INTO :written
+    FROM PLAYER_360.INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_SCHEMA = 'APP' AND TABLE_NAME IN ('ROLLING_CHURN_FEATURES', 'TO_BE_PREDICTED_CHURN_FEATURES') AND IS_DYNAMIC = 'NO';
+    IF (written > 0) THEN
+        RAISE notebook_tables;
+    END IF;
+END;
+$$;
+
+-- 1. Rolling 30 day features and the LOGIN_NEXT_7_DAYS label per user and day,
+-- incremental refreshes only recompute the users with new sessions or purchases
+CREATE OR REPLACE DYNAMIC TABLE PLAYER_360.ANALYTIC.ROLLING_CHURN_FEATURES
+TARGET_LAG = '1 days'
+REFRESH_MODE = INCREMENTAL
+INITIALIZE = ON_CREATE
+WAREHOUSE = PLAYER_360_BUILD_WH
+AS
+WITH session_points AS (
+    -- sessions with their points, sessions without game events have no points
+    SELECT
+        s.USER_ID,
+        s.SESSION_ID,
+        s.SESSION_DURATION_MINUTES,
+        TO_DATE(s.LOG_IN) AS DAY,
+        ppe.TOTAL_POINTS
+    FROM PLAYER_360.RAW.SESSIONS s
+    LEFT JOIN PLAYER_360.ANALYTIC.POINTS_PER_EVENT ppe ON s.SESSION_ID = ppe.SESSION_ID
+),
+day_sessions AS (
+    SELECT
+        USER_ID,
+        DAY,
+        COALESCE(SUM(SESSION_DURATION_MINUTES), 0) AS TOTAL_SESSION_DURATION,
+        COUNT(SESSION_ID) AS TOTAL_SESSIONS,
+        COALESCE(SUM(TOTAL_POINTS), 0) AS TOTAL_POINTS
+    FROM session_points
+    GROUP BY USER_ID, DAY
+),
+user_logins AS (
+    SELECT
+        USER_ID,
+        MIN(DAY) AS FIRST_LOGIN_DAY,
+        MAX(DAY) AS LAST_LOGIN_DAY
+    FROM day_sessions
+    GROUP BY USER_ID
+),
+user_days AS (
+    -- date spine: one row per day between the first and last login of each user, however long the span
+    SELECT
+        ul.USER_ID,
+        o.VALUE::INT AS DAY_OFFSET,
+        DATEADD(day, o.VALUE::INT, ul.FIRST_LOGIN_DAY) AS DAY
+    FROM user_logins ul,
+    LATERAL FLATTEN(INPUT => ARRAY_GENERATE_RANGE(0, DATEDIFF(day, ul.FIRST_LOGIN_DAY, ul.LAST_LOGIN_DAY) + 1)) o
+),
+day_purchases AS (
+    -- all ads seen per day, and the ads that lead to a purchase, amounts in integer hundredths
+    SELECT
+        USER_ID,
+        TO_DATE(TIMESTAMP_OF_PURCHASE) AS DAY,
+        CAST(ROUND(COALESCE(SUM(AD_ENGAGEMENT_TIME), 0) * 100) AS INTEGER) AS TOTAL_AD_ENGAGEMENT_TIME,
+        COUNT(AD_INTERACTION_ID) AS TOTAL_ADS,
+        CAST(ROUND(COALESCE(SUM(CASE WHEN (PURCHASE_TYPE IS NULL OR PURCHASE_TYPE <> 'none') THEN PURCHASE_AMOUNT END), 0) * 100) AS INTEGER) AS TOTAL_PURCHASE_AMOUNT,
+        COUNT(CASE WHEN (PURCHASE_TYPE IS NULL OR PURCHASE_TYPE <> 'none') THEN PURCHASE_ID END) AS TOTAL_PURCHASES
+    FROM PLAYER_360.RAW.PURCHASES
+    GROUP BY USER_ID, TO_DATE(TIMESTAMP_OF_PURCHASE)
+),
+daily AS (
+    SELECT
+        ud.USER_ID,
+        ud.DAY,
+        ud.DAY_OFFSET,
+        CASE WHEN ds.USER_ID IS NULL THEN 1 ELSE 0 END AS SESSION_INACTIVE,
+        COALESCE(ds.TOTAL_SESSION_DURATION, 0) AS TOTAL_SESSION_DURATION,
+        COALESCE(ds.TOTAL_SESSIONS, 0) AS TOTAL_SESSIONS,
+        COALESCE(ds.TOTAL_POINTS, 0) AS TOTAL_POINTS,
+        CASE WHEN dp.USER_ID IS NULL THEN 1 ELSE 0 END AS PURCHASE_INACTIVE,
+        COALESCE(dp.TOTAL_PURCHASE_AMOUNT, 0) AS TOTAL_PURCHASE_AMOUNT,
+        COALESCE(dp.TOTAL_PURCHASES, 0) AS TOTAL_PURCHASES,
+        COALESCE(dp.TOTAL_ADS, 0) AS TOTAL_ADS,
+        COALESCE(dp.TOTAL_AD_ENGAGEMENT_TIME, 0) AS TOTAL_AD_ENGAGEMENT_TIME
+    FROM user_days ud
+    LEFT JOIN day_sessions ds ON ud.USER_ID = ds.USER_ID AND ud.DAY = ds.DAY
+    LEFT JOIN day_purchases dp ON ud.USER_ID = dp.USER_ID AND ud.DAY = dp.DAY
+),
+rolling AS (
+    SELECT
+        USER_ID,
+        DAY,
+        DAY_OFFSET,
+        SESSION_INACTIVE,
+        PURCHASE_INACTIVE,
+        SUM(TOTAL_SESSION_DURATION) OVER (PARTITION BY USER_ID ORDER BY DAY ROWS BETWEEN 29 PRECEDING AND CURRENT ROW) AS TOTAL_SESSION_DURATION_ROLLING_30_DAYS,
+        SUM(TOTAL_SESSIONS) OVER (PARTITION BY USER_ID ORDER BY DAY ROWS BETWEEN 29 PRECEDING AND CURRENT ROW) AS TOTAL_SESSIONS_ROLLING_30_DAYS,
+        SUM(TOTAL_POINTS) OVER (PARTITION BY USER_ID ORDER BY DAY ROWS BETWEEN 29 PRECEDING AND CURRENT ROW) AS TOTAL_POINTS_ROLLING_30_DAYS,
+        SUM(TOTAL_PURCHASE_AMOUNT) OVER (PARTITION BY USER_ID ORDER BY DAY ROWS BETWEEN 29 PRECEDING AND CURRENT ROW) AS TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS,
+        SUM(TOTAL_PURCHASES) OVER (PARTITION BY USER_ID ORDER BY DAY ROWS BETWEEN 29 PRECEDING AND CURRENT ROW) AS TOTAL_PURCHASES_ROLLING_30_DAYS,
+        SUM(TOTAL_ADS) OVER (PARTITION BY USER_ID ORDER BY DAY ROWS BETWEEN 29 PRECEDING AND CURRENT ROW) AS TOTAL_ADS_ROLLING_30_DAYS,
+        SUM(TOTAL_AD_ENGAGEMENT_TIME) OVER (PARTITION BY USER_ID ORDER BY DAY ROWS BETWEEN 29 PRECEDING AND CURRENT ROW) AS TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS
+    FROM daily
+),
+features AS (
+    -- drop the first 30 days of each user so every row has a full 30 day window
+    SELECT
+        USER_ID,
+        DAY,
+        SESSION_INACTIVE,
+        TOTAL_SESSION_DURATION_ROLLING_30_DAYS,
+        TOTAL_SESSIONS_ROLLING_30_DAYS,
+        CAST(TOTAL_SESSION_DURATION_ROLLING_30_DAYS AS FLOAT) / NULLIF(TOTAL_SESSIONS_ROLLING_30_DAYS, 0) AS AVERAGE_SESSION_LEN_ROLLING_30_DAYS,
+        TOTAL_POINTS_ROLLING_30_DAYS,
+        CAST(TOTAL_POINTS_ROLLING_30_DAYS AS FLOAT) / NULLIF(TOTAL_SESSIONS_ROLLING_30_DAYS, 0) AS AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS,
+        PURCHASE_INACTIVE,
+        TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS,
+        TOTAL_PURCHASES_ROLLING_30_DAYS,
+        COALESCE(CAST(TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS / 100.0 AS FLOAT) / NULLIF(TOTAL_PURCHASES_ROLLING_30_DAYS, 0), 0) AS AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS,
+        TOTAL_ADS_ROLLING_30_DAYS,
+        COALESCE(CAST(TOTAL_PURCHASES_ROLLING_30_DAYS AS FLOAT) / NULLIF(TOTAL_ADS_ROLLING_30_DAYS, 0), 0) AS AD_CONVERSION_RATE_ROLLING_30_DAYS,
+        TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS,
+        COALESCE(CAST(TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS / 100.0 AS FLOAT) / NULLIF(TOTAL_ADS_ROLLING_30_DAYS, 0), 0) AS AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS,
+        -- SESSION_INACTIVE 7 days ahead, used for the label below
+        LEAD(SESSION_INACTIVE, 7) OVER (PARTITION BY USER_ID ORDER BY DAY) AS FUTURE_SESSION_INACTIVE
+    FROM rolling
+    WHERE DAY_OFFSET >= 30
+)
+SELECT
+    USER_ID,
+    DAY,
+    SESSION_INACTIVE,
+    CAST(TRUNC(TOTAL_SESSION_DURATION_ROLLING_30_DAYS) AS INT) AS TOTAL_SESSION_DURATION_ROLLING_30_DAYS,
+    CAST(TRUNC(TOTAL_SESSIONS_ROLLING_30_DAYS) AS INT) AS TOTAL_SESSIONS_ROLLING_30_DAYS,
+    AVERAGE_SESSION_LEN_ROLLING_30_DAYS,
+    TOTAL_POINTS_ROLLING_30_DAYS,
+    AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS,
+    PURCHASE_INACTIVE,
+    CAST(TRUNC(TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS / 100) AS INT) AS TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS,
+    CAST(TRUNC(TOTAL_PURCHASES_ROLLING_30_DAYS) AS INT) AS TOTAL_PURCHASES_ROLLING_30_DAYS,
+    AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS,
+    CAST(TRUNC(TOTAL_ADS_ROLLING_30_DAYS) AS INT) AS TOTAL_ADS_ROLLING_30_DAYS,
+    AD_CONVERSION_RATE_ROLLING_30_DAYS,
+    CAST(TRUNC(TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS / 100) AS INT) AS TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS,
+    AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS,
+    -- same as the notebook: shift(-7).rolling(7, min_periods=1).sum() < 7
+    CASE WHEN SUM(FUTURE_SESSION_INACTIVE) OVER (
+        PARTITION BY USER_ID ORDER BY DAY ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
+    ) < 7 THEN 1 ELSE 0 END AS LOGIN_NEXT_7_DAYS
+FROM features;
+
+-- 2. The latest day of every active user, the rows PLAYER_360 and scripts/batch_score.py score
+CREATE OR REPLACE DYNAMIC TABLE PLAYER_360.APP.TO_BE_PREDICTED_CHURN_FEATURES
+TARGET_LAG = '1 days'
+REFRESH_MODE = AUTO
+INITIALIZE = ON_CREATE
+WAREHOUSE = PLAYER_360_BUILD_WH
+AS
+SELECT
+    USER_ID,
+    DAY,
+    SESSION_INACTIVE,
+    TOTAL_SESSION_DURATION_ROLLING_30_DAYS,
+    TOTAL_SESSIONS_ROLLING_30_DAYS,
+    AVERAGE_SESSION_LEN_ROLLING_30_DAYS,
+    TOTAL_POINTS_ROLLING_30_DAYS,
+    AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS,
+    PURCHASE_INACTIVE,
+    TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS,
+    TOTAL_PURCHASES_ROLLING_30_DAYS,
+    AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS,
+    TOTAL_ADS_ROLLING_30_DAYS,
+    AD_CONVERSION_RATE_ROLLING_30_DAYS,
+    TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS,
+    AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS,
+    LOGIN_NEXT_7_DAYS
+FROM (
+    SELECT
+        f.*,
+        ROW_NUMBER() OVER (PARTITION BY f.USER_ID ORDER BY f.DAY DESC) AS DAY_RANK
+    FROM PLAYER_360.ANALYTIC.ROLLING_CHURN_FEATURES f
+    JOIN PLAYER_360.ANALYTIC.RETENTION r ON r.USER_ID = f.USER_ID
+    WHERE r.CHURNED = 0
+) latest
+WHERE DAY_RANK = 1;
+
+-- 3. Every other row, the training set of the rolling notebook
+CREATE OR REPLACE DYNAMIC TABLE PLAYER_360.APP.ROLLING_CHURN_FEATURES
+TARGET_LAG = '1 days'
+REFRESH_MODE = AUTO
+INITIALIZE = ON_CREATE
+WAREHOUSE = PLAYER_360_BUILD_WH
+AS
+SELECT
+    f.USER_ID,
+    f.DAY,
+    f.SESSION_INACTIVE,
+    f.TOTAL_SESSION_DURATION_ROLLING_30_DAYS,
+    f.TOTAL_SESSIONS_ROLLING_30_DAYS,
+    f.AVERAGE_SESSION_LEN_ROLLING_30_DAYS,
+    f.TOTAL_POINTS_ROLLING_30_DAYS,
+    f.AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS,
+    f.PURCHASE_INACTIVE,
+    f.TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS,
+    f.TOTAL_PURCHASES_ROLLING_30_DAYS,
+    f.AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS,
+    f.TOTAL_ADS_ROLLING_30_DAYS,
+    f.AD_CONVERSION_RATE_ROLLING_30_DAYS,
+    f.TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS,
+    f.AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS,
+    f.LOGIN_NEXT_7_DAYS
+FROM PLAYER_360.ANALYTIC.ROLLING_CHURN_FEATURES f
+LEFT JOIN PLAYER_360.APP.TO_BE_PREDICTED_CHURN_FEATURES p ON p.USER_ID = f.USER_ID AND p.DAY = f.DAY
+WHERE p.USER_ID IS NULL;
@@ -0,0 +1,370 @@
+# Generates the SQL pipeline for the 30 day rolling churn features.
+#
+# The same statements are rendered for Snowflake, where they are deployed as an incrementally
+# refreshed dynamic table by scripts/rolling_features_build.sql, and for SQLite, which the
+# parity check in benchmarks/bench_rolling_features_sql.py runs against the pandas notebook path.
+# The build script also splits the features into APP.ROLLING_CHURN_FEATURES and
+# APP.TO_BE_PREDICTED_CHURN_FEATURES, the tables the notebook otherwise writes with write_pandas.
+#
+#   python scripts/rolling_features_sql.py            # rewrite scripts/rolling_features_build.sql
+#   python scripts/rolling_features_sql.py --dialect sqlite
+import argparse
+from pathlib import Path
+
+WINDOW = 30
+LABEL_HORIZON = 7
+
+SESSION_TOTALS = ['TOTAL_SESSION_DURATION', 'TOTAL_SESSIONS', 'TOTAL_POINTS']
+PURCHASE_TOTALS = ['TOTAL_PURCHASE_AMOUNT', 'TOTAL_PURCHASES', 'TOTAL_ADS', 'TOTAL_AD_ENGAGEMENT_TIME']
+# amounts with two decimals, summed as integer hundredths so their truncated totals match the notebook exactly
+HUNDREDTHS_TOTALS = ['TOTAL_PURCHASE_AMOUNT', 'TOTAL_AD_ENGAGEMENT_TIME']
+
+# the notebook stores these rolling totals as int32 (truncated), TOTAL_POINTS stays a float
+INTEGER_FEATURES = [
+    'TOTAL_SESSION_DURATION_ROLLING_30_DAYS',
+    'TOTAL_SESSIONS_ROLLING_30_DAYS',
+    'TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+    'TOTAL_PURCHASES_ROLLING_30_DAYS',
+    'TOTAL_ADS_ROLLING_30_DAYS',
+    'TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS',
+]
+
+FEATURE_COLUMNS = [
+    'USER_ID',
+    'DAY',
+    'SESSION_INACTIVE',
+    'TOTAL_SESSION_DURATION_ROLLING_30_DAYS',
+    'TOTAL_SESSIONS_ROLLING_30_DAYS',
+    'AVERAGE_SESSION_LEN_ROLLING_30_DAYS',
+    'TOTAL_POINTS_ROLLING_30_DAYS',
+    'AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS',
+    'PURCHASE_INACTIVE',
+    'TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+    'TOTAL_PURCHASES_ROLLING_30_DAYS',
+    'AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+    'TOTAL_ADS_ROLLING_30_DAYS',
+    'AD_CONVERSION_RATE_ROLLING_30_DAYS',
+    'TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS',
+    'AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS',
+    'LOGIN_NEXT_7_DAYS',
+]
+
+
+class SnowflakeDialect:
+    name = 'snowflake'
+    tables = {
+        'sessions': 'PLAYER_360.RAW.SESSIONS',
+        'points_per_event': 'PLAYER_360.ANALYTIC.POINTS_PER_EVENT',
+        'purchases': 'PLAYER_360.RAW.PURCHASES',
+        'retention': 'PLAYER_360.ANALYTIC.RETENTION',
+        'rolling_features': 'PLAYER_360.ANALYTIC.ROLLING_CHURN_FEATURES',
+        'training_features': 'PLAYER_360.APP.ROLLING_CHURN_FEATURES',
+        'to_predict': 'PLAYER_360.APP.TO_BE_PREDICTED_CHURN_FEATURES',
+    }
+
+    def to_date(self, expr):
+        return f"TO_DATE({expr})"
+
+    def add_days(self, days, expr):
+        return f"DATEADD(day, {days}, {expr})"
+
+    def days_between(self, start, end):
+        return f"DATEDIFF(day, {start}, {end})"
+
+    def trunc_int(self, expr):
+        return f"CAST(TRUNC({expr}) AS INT)"
+
+    def user_days(self, logins):
+        # one row per offset of ARRAY_GENERATE_RANGE, sized by each user's own span
+        return f"""SELECT
+        ul.USER_ID,
+        o.VALUE::INT AS DAY_OFFSET,
+        {self.add_days('o.VALUE::INT', 'ul.FIRST_LOGIN_DAY')} AS DAY
+    FROM {logins} ul,
+    LATERAL FLATTEN(INPUT => ARRAY_GENERATE_RANGE(0, {self.days_between('ul.FIRST_LOGIN_DAY', 'ul.LAST_LOGIN_DAY')} + 1)) o"""
+
+
+class SQLiteDialect:
+    name = 'sqlite'
+    tables = {
+        'sessions': 'SESSIONS',
+        'points_per_event': 'POINTS_PER_EVENT',
+        'purchases': 'PURCHASES',
+        'retention': 'RETENTION',
+        'rolling_features': 'ROLLING_CHURN_FEATURES',
+        'training_features': 'APP_ROLLING_CHURN_FEATURES',
+        'to_predict': 'TO_BE_PREDICTED_CHURN_FEATURES',
+    }
+
+    def to_date(self, expr):
+        return f"DATE({expr})"
+
+    def add_days(self, days, expr):
+        return f"DATE({expr}, '+' || {days} || ' days')"
+
+    def days_between(self, start, end):
+        return f"CAST(JULIANDAY({end}) - JULIANDAY({start}) AS INTEGER)"
+
+    def trunc_int(self, expr):
+        # CAST to INTEGER truncates towards zero like pandas astype('int32'), integer division already does
+        return f"CAST({expr} AS INTEGER)"
+
+    def user_days(self, logins):
+        # SQLite takes a CTE that selects from itself as recursive without the RECURSIVE keyword
+        return f"""SELECT USER_ID, 0 AS DAY_OFFSET, FIRST_LOGIN_DAY AS DAY, LAST_LOGIN_DAY
+    FROM {logins}
+    UNION ALL
+    SELECT USER_ID, DAY_OFFSET + 1, {self.add_days(1, 'DAY')}, LAST_LOGIN_DAY
+    FROM user_days
+    WHERE DAY < LAST_LOGIN_DAY"""
+
+
+DIALECTS = {'snowflake': SnowflakeDialect(), 'sqlite': SQLiteDialect()}
+
+
+def _rolling(expr, window):
+    # the day grid is dense, so the last `window` rows are the last `window` days
+    return f"SUM({expr}) OVER (PARTITION BY USER_ID ORDER BY DAY ROWS BETWEEN {window - 1} PRECEDING AND CURRENT ROW)"
+
+
+def _ratio(numerator, denominator):
+    return f"CAST({numerator} AS FLOAT) / NULLIF({denominator}, 0)"
+
+
+def _hundredths(expr):
+    return f"CAST(ROUND({expr} * 100) AS INTEGER)"
+
+
+def _amount(column, window):
+    # rolling totals of HUNDREDTHS_TOTALS back in whole units, for the averages
+    total = f"{column}_ROLLING_{window}_DAYS"
+    return f"{total} / 100.0" if column in HUNDREDTHS_TOTALS else total
+
+
+def rolling_features_query(dialect='snowflake', window=WINDOW, label_horizon=LABEL_HORIZON, tables=None):
+    """Return the SELECT producing the rolling churn features, one row per user and day."""
+    d = DIALECTS[dialect] if isinstance(dialect, str) else dialect
+    t = dict(d.tables, **(tables or {}))
+    purchased = "(PURCHASE_TYPE IS NULL OR PURCHASE_TYPE <> 'none')"
+
+    rolling_columns = ',\n        '.join(
+        f"{_rolling(col, window)} AS {col}_ROLLING_{window}_DAYS" for col in SESSION_TOTALS + PURCHASE_TOTALS)
+    hundredths = [f"{col}_ROLLING_{window}_DAYS" for col in HUNDREDTHS_TOTALS]
+    feature_columns = []
+    for col in FEATURE_COLUMNS[:-1]:
+        if col in hundredths:
+            # integer division of the integer sum, exact where a float sum can land just below a whole amount
+            feature_columns.append(f"{d.trunc_int(f'{col} / 100')} AS {col}")
+        elif col in INTEGER_FEATURES:
+            feature_columns.append(f"{d.trunc_int(col)} AS {col}")
+        else:
+            feature_columns.append(col)
+    feature_columns = ',\n    '.join(feature_columns)
+
+    return f"""WITH session_points AS (
+    -- sessions with their points, sessions without game events have no points
+    SELECT
+        s.USER_ID,
+        s.SESSION_ID,
+        s.SESSION_DURATION_MINUTES,
+        {d.to_date('s.LOG_IN')} AS DAY,
+        ppe.TOTAL_POINTS
+    FROM {t['sessions']} s
+    LEFT JOIN {t['points_per_event']} ppe ON s.SESSION_ID = ppe.SESSION_ID
+),
+day_sessions AS (
+    SELECT
+        USER_ID,
+        DAY,
+        COALESCE(SUM(SESSION_DURATION_MINUTES), 0) AS TOTAL_SESSION_DURATION,
+        COUNT(SESSION_ID) AS TOTAL_SESSIONS,
+        COALESCE(SUM(TOTAL_POINTS), 0) AS TOTAL_POINTS
+    FROM session_points
+    GROUP BY USER_ID, DAY
+),
+user_logins AS (
+    SELECT
+        USER_ID,
+        MIN(DAY) AS FIRST_LOGIN_DAY,
+        MAX(DAY) AS LAST_LOGIN_DAY
+    FROM day_sessions
+    GROUP BY USER_ID
+),
+user_days AS (
+    -- date spine: one row per day between the first and last login of each user, however long the span
+    {d.user_days('user_logins')}
+),
+day_purchases AS (
+    -- all ads seen per day, and the ads that lead to a purchase, amounts in integer hundredths
+    SELECT
+        USER_ID,
+        {d.to_date('TIMESTAMP_OF_PURCHASE')} AS DAY,
+        {_hundredths('COALESCE(SUM(AD_ENGAGEMENT_TIME), 0)')} AS TOTAL_AD_ENGAGEMENT_TIME,
+        COUNT(AD_INTERACTION_ID) AS TOTAL_ADS,
+        {_hundredths(f'COALESCE(SUM(CASE WHEN {purchased} THEN PURCHASE_AMOUNT END), 0)')} AS TOTAL_PURCHASE_AMOUNT,
+        COUNT(CASE WHEN {purchased} THEN PURCHASE_ID END) AS TOTAL_PURCHASES
+    FROM {t['purchases']}
+    GROUP BY USER_ID, {d.to_date('TIMESTAMP_OF_PURCHASE')}
+),
+daily AS (
+    SELECT
+        ud.USER_ID,
+        ud.DAY,
+        ud.DAY_OFFSET,
+        CASE WHEN ds.USER_ID IS NULL THEN 1 ELSE 0 END AS SESSION_INACTIVE,
+        COALESCE(ds.TOTAL_SESSION_DURATION, 0) AS TOTAL_SESSION_DURATION,
+        COALESCE(ds.TOTAL_SESSIONS, 0) AS TOTAL_SESSIONS,
+        COALESCE(ds.TOTAL_POINTS, 0) AS TOTAL_POINTS,
+        CASE WHEN dp.USER_ID IS NULL THEN 1 ELSE 0 END AS PURCHASE_INACTIVE,
+        COALESCE(dp.TOTAL_PURCHASE_AMOUNT, 0) AS TOTAL_PURCHASE_AMOUNT,
+        COALESCE(dp.TOTAL_PURCHASES, 0) AS TOTAL_PURCHASES,
+        COALESCE(dp.TOTAL_ADS, 0) AS TOTAL_ADS,
+        COALESCE(dp.TOTAL_AD_ENGAGEMENT_TIME, 0) AS TOTAL_AD_ENGAGEMENT_TIME
+    FROM user_days ud
+    LEFT JOIN day_sessions ds ON ud.USER_ID = ds.USER_ID AND ud.DAY = ds.DAY
+    LEFT JOIN day_purchases dp ON ud.USER_ID = dp.USER_ID AND ud.DAY = dp.DAY
+),
+rolling AS (
+    SELECT
+        USER_ID,
+        DAY,
+        DAY_OFFSET,
+        SESSION_INACTIVE,
+        PURCHASE_INACTIVE,
+        {rolling_columns}
+    FROM daily
+),
+features AS (
+    -- drop the first {window} days of each user so every row has a full {window} day window
+    SELECT
+        USER_ID,
+        DAY,
+        SESSION_INACTIVE,
+        TOTAL_SESSION_DURATION_ROLLING_{window}_DAYS,
+        TOTAL_SESSIONS_ROLLING_{window}_DAYS,
+        {_ratio(f'TOTAL_SESSION_DURATION_ROLLING_{window}_DAYS', f'TOTAL_SESSIONS_ROLLING_{window}_DAYS')} AS AVERAGE_SESSION_LEN_ROLLING_{window}_DAYS,
+        TOTAL_POINTS_ROLLING_{window}_DAYS,
+        {_ratio(f'TOTAL_POINTS_ROLLING_{window}_DAYS', f'TOTAL_SESSIONS_ROLLING_{window}_DAYS')} AS AVERAGE_POINTS_PER_SESSION_ROLLING_{window}_DAYS,
+        PURCHASE_INACTIVE,
+        TOTAL_PURCHASE_AMOUNT_ROLLING_{window}_DAYS,
+        TOTAL_PURCHASES_ROLLING_{window}_DAYS,
+        COALESCE({_ratio(_amount('TOTAL_PURCHASE_AMOUNT', window), f'TOTAL_PURCHASES_ROLLING_{window}_DAYS')}, 0) AS AVG_PURCHASE_AMOUNT_ROLLING_{window}_DAYS,
+        TOTAL_ADS_ROLLING_{window}_DAYS,
+        COALESCE({_ratio(f'TOTAL_PURCHASES_ROLLING_{window}_DAYS', f'TOTAL_ADS_ROLLING_{window}_DAYS')}, 0) AS AD_CONVERSION_RATE_ROLLING_{window}_DAYS,
+        TOTAL_AD_ENGAGEMENT_TIME_ROLLING_{window}_DAYS,
+        COALESCE({_ratio(_amount('TOTAL_AD_ENGAGEMENT_TIME', window), f'TOTAL_ADS_ROLLING_{window}_DAYS')}, 0) AS AVERAGE_ENGAGEMENT_TIME_ROLLING_{window}_DAYS,
+        -- SESSION_INACTIVE {label_horizon} days ahead, used for the label below
+        LEAD(SESSION_INACTIVE, {label_horizon}) OVER (PARTITION BY USER_ID ORDER BY DAY) AS FUTURE_SESSION_INACTIVE
+    FROM rolling
+    WHERE DAY_OFFSET >= {window}
+)
+SELECT
+    {feature_columns},
+    -- same as the notebook: shift(-{label_horizon}).rolling({label_horizon}, min_periods=1).sum() < {label_horizon}
+    CASE WHEN SUM(FUTURE_SESSION_INACTIVE) OVER (
+        PARTITION BY USER_ID ORDER BY DAY ROWS BETWEEN {label_horizon - 1} PRECEDING AND CURRENT ROW
+    ) < {label_horizon} THEN 1 ELSE 0 END AS LOGIN_NEXT_{label_horizon}_DAYS
+FROM features"""
+
+
+def to_predict_query(dialect='snowflake', tables=None):
+    """Return the SELECT of the latest feature row of every active user, the predicted_df cell of the notebook."""
+    d = DIALECTS[dialect] if isinstance(dialect, str) else dialect
+    t = dict(d.tables, **(tables or {}))
+    columns = ',\n    '.join(FEATURE_COLUMNS)
+    return f"""SELECT
+    {columns}
+FROM (
+    SELECT
+        f.*,
+        ROW_NUMBER() OVER (PARTITION BY f.USER_ID ORDER BY f.DAY DESC) AS DAY_RANK
+    FROM {t['rolling_features']} f
+    JOIN {t['retention']} r ON r.USER_ID = f.USER_ID
+    WHERE r.CHURNED = 0
+) latest
+WHERE DAY_RANK = 1"""
+
+
+def training_features_query(dialect='snowflake', tables=None):
+    """Return the SELECT of every feature row but the ones to predict, the removed_to_pred_df cell of the notebook."""
+    d = DIALECTS[dialect] if isinstance(dialect, str) else dialect
+    t = dict(d.tables, **(tables or {}))
+    columns = ',\n    '.join(f"f.{col}" for col in FEATURE_COLUMNS)
+    return f"""SELECT
+    {columns}
+FROM {t['rolling_features']} f
+LEFT JOIN {t['to_predict']} p ON p.USER_ID = f.USER_ID AND p.DAY = f.DAY
+WHERE p.USER_ID IS NULL"""
+
+
+def _dynamic_table(name, refresh_mode, query):
+    return f"""CREATE OR REPLACE DYNAMIC TABLE {name}
+TARGET_LAG = '1 days'
+REFRESH_MODE = {refresh_mode}
+INITIALIZE = ON_CREATE
+WAREHOUSE = PLAYER_360_BUILD_WH
+AS
+{query};"""
+
+
+def _refuse_notebook_tables(tables):
+    # the notebook writes the same names with write_pandas when SQL_FEATURES = False, stop before mixing the two
+    database, schema, _ = tables[0].split('.')
+    names = ', '.join(f"'{table.split('.')[-1]}'" for table in tables)
+    return f"""EXECUTE IMMEDIATE $$
+DECLARE
+    written INTEGER;
+    notebook_tables EXCEPTION (-20001, '{schema} has feature tables the rolling notebook wrote, drop them or keep SQL_FEATURES = False');
+BEGIN
+    SELECT COUNT(*) INTO :written
+    FROM {database}.INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_SCHEMA = '{schema}' AND TABLE_NAME IN ({names}) AND IS_DYNAMIC = 'NO';
+    IF (written > 0) THEN
+        RAISE notebook_tables;
+    END IF;
+END;
+$$;"""
+
+
+def build_script(window=WINDOW, label_horizon=LABEL_HORIZON):
+    """Return the Snowflake deployment script for the rolling features dynamic tables."""
+    d = DIALECTS['snowflake']
+    return f"""-- Generated by scripts/rolling_features_sql.py, edit the generator and rerun it instead of this file.
+-- Run after analytic_build.sql, it reads RAW.SESSIONS, RAW.PURCHASES, ANALYTIC.POINTS_PER_EVENT and ANALYTIC.RETENTION.
+-- It keeps APP.ROLLING_CHURN_FEATURES and APP.TO_BE_PREDICTED_CHURN_FEATURES as dynamic tables, set SQL_FEATURES = True
+-- in the rolling notebook so it trains on them instead of building the features in pandas and writing them. The script
+-- stops if an earlier run of the notebook wrote tables of the same names, drop them first.
+USE ROLE SYSADMIN;
+USE WAREHOUSE PLAYER_360_BUILD_WH;
+USE SCHEMA PLAYER_360.ANALYTIC;
+
+-- 0. Stop before building anything if APP holds the write_pandas tables of the notebook
+{_refuse_notebook_tables([d.tables['training_features'], d.tables['to_predict']])}
+
+-- 1. Rolling {window} day features and the LOGIN_NEXT_{label_horizon}_DAYS label per user and day,
+-- incremental refreshes only recompute the users with new sessions or purchases
+{_dynamic_table(d.tables['rolling_features'], 'INCREMENTAL', rolling_features_query(d, window, label_horizon))}
+
+-- 2. The latest day of every active user, the rows PLAYER_360 and scripts/batch_score.py score
+{_dynamic_table(d.tables['to_predict'], 'AUTO', to_predict_query(d))}
+
+-- 3. Every other row, the training set of the rolling notebook
+{_dynamic_table(d.tables['training_features'], 'AUTO', training_features_query(d))}
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dialect', choices=sorted(DIALECTS), default='snowflake')
+    parser.add_argument('--output', type=Path, default=Path(__file__).with_name('rolling_features_build.sql'))
+    args = parser.parse_args()
+
+    if args.dialect == 'snowflake':
+        args.output.write_text(build_script())
+        print(f"wrote {args.output}")
+    else:
+        print(rolling_features_query(args.dialect) + ';')
+
+
+if __name__ == '__main__':
+    main()
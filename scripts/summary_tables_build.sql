@@ -0,0 +1,303 @@
+-- Generated by streamlit/summary_stats.py, edit the generator and rerun it instead of this file.
+-- Run after analytic_build.sql, it reads ANALYTIC.RETENTION, DEMOGRAPHICS, USER_RANKINGS, AD_ENGAGEMENT and RAW.ACHIEVEMENTS.
+-- RETENTION is refreshed in full since it depends on CURRENT_DATE, refresh_mode AUTO picks what the upstream tables allow.
+USE ROLE SYSADMIN;
+USE WAREHOUSE PLAYER_360_BUILD_WH;
+USE SCHEMA PLAYER_360.ANALYTIC;
+
+-- 1. Players and churned players per age group, location and player type for the churn rate charts
+CREATE OR REPLACE DYNAMIC TABLE PLAYER_360.ANALYTIC.CHURN_SEGMENTS(
+    AGE_GROUP, LOCATION, PLAYER_TYPE,
+    PLAYERS,
+    CHURNED_PLAYERS,
+    MIN_AGE
+) TARGET_LAG = '1 days' refresh_mode = AUTO initialize = ON_CREATE warehouse = PLAYER_360_BUILD_WH
+AS
+WITH players AS (
+    SELECT
+    CASE
+        WHEN d.AGE > 0 AND d.AGE <= 12 THEN '0_11'
+        WHEN d.AGE > 12 AND d.AGE <= 18 THEN '12_17'
+        WHEN d.AGE > 18 AND d.AGE <= 24 THEN '18_24'
+        WHEN d.AGE > 24 AND d.AGE <= 34 THEN '25_34'
+        WHEN d.AGE > 34 AND d.AGE <= 44 THEN '35_44'
+        WHEN d.AGE > 44 AND d.AGE <= 54 THEN '45_54'
+        WHEN d.AGE > 54 AND d.AGE <= 64 THEN '55_64'
+        WHEN d.AGE > 64 AND d.AGE <= 100 THEN '65+'
+    END AS AGE_GROUP,
+    r.USER_ID,
+    r.TOTAL_LOGINS,
+    r.LOGGED_IN_AFTER_1_DAY,
+    r.LOGGED_IN_AFTER_7_DAYS,
+    r.LOGGED_IN_AFTER_30_DAYS,
+    r.LOGGED_IN_IN_LAST_30_DAYS,
+    r.DAYS_SINCE_LAST_LOGIN,
+    d.AGE,
+    d.GENDER,
+    d.LOCATION,
+    d.AVERAGE_SESSIONS_PER_ACTIVE_WEEK,
+    d.AVERAGE_SESSION_DURATION,
+    d.PLAYER_TYPE,
+    d.TOTAL_ADS,
+    d.AVG_PURCHASE_AMOUNT_PER_AD,
+    d.HAS_SUPPORT_TICKET,
+    ur.TOTAL_POINTS,
+    ur.RANK_NAME,
+    (
+        CASE WHEN a.VICTORY_ROYALE THEN 1 ELSE 0 END +
+        CASE WHEN a.ELIMINATION_MILESTONES THEN 1 ELSE 0 END +
+        CASE WHEN a.SURVIVAL_ACHIEVEMENTS THEN 1 ELSE 0 END +
+        CASE WHEN a.BUILDING_RESOURCES THEN 1 ELSE 0 END +
+        CASE WHEN a.EXPLORATION_TRAVEL THEN 1 ELSE 0 END +
+        CASE WHEN a.WEAPON_USAGE THEN 1 ELSE 0 END +
+        CASE WHEN a.ASSIST_TEAMMATES THEN 1 ELSE 0 END +
+        CASE WHEN a.EVENT_CHALLENGES THEN 1 ELSE 0 END +
+        CASE WHEN a.CREATIVE_MODE THEN 1 ELSE 0 END +
+        CASE WHEN a.SOCIAL_ACHIEVEMENTS THEN 1 ELSE 0 END
+    ) / 11.0 AS ACHIEVEMENTS_PERCENTAGE,
+    ae.TOTAL_PURCHASES,
+    ae.PROPORTION_PURCHASED,
+    ae.AVERAGE_PURCHASE_AMOUNT,
+    ae.AVERAGE_AD_ENGAGEMENT_TIME,
+    r.CHURNED
+FROM PLAYER_360.ANALYTIC.RETENTION r
+JOIN PLAYER_360.ANALYTIC.DEMOGRAPHICS d ON r.USER_ID = d.USER_ID
+JOIN PLAYER_360.ANALYTIC.USER_RANKINGS ur ON r.USER_ID = ur.USER_ID
+JOIN PLAYER_360.RAW.ACHIEVEMENTS a ON r.USER_ID = a.USER_ID
+JOIN PLAYER_360.ANALYTIC.AD_ENGAGEMENT ae ON r.USER_ID = ae.USER_ID
+)
+SELECT
+    AGE_GROUP, LOCATION, PLAYER_TYPE,
+    COUNT(*) AS PLAYERS,
+    SUM(CHURNED) AS CHURNED_PLAYERS,
+    MIN(AGE) AS MIN_AGE
+FROM players
+GROUP BY AGE_GROUP, LOCATION, PLAYER_TYPE;
+
+-- 2. Count, means, centered second moments and co-moment per segment and column pair for the correlation matrix
+CREATE OR REPLACE DYNAMIC TABLE PLAYER_360.ANALYTIC.CORRELATION_MOMENTS(
+    AGE_GROUP, LOCATION, PLAYER_TYPE,
+    COLUMN_A,
+    COLUMN_B,
+    N, MEAN_A, MEAN_B, M2_A, M2_B, C_AB
+) TARGET_LAG = '1 days' refresh_mode = AUTO initialize = ON_CREATE warehouse = PLAYER_360_BUILD_WH
+AS
+WITH players AS (
+    SELECT
+    CASE
+        WHEN d.AGE > 0 AND d.AGE <= 12 THEN '0_11'
+        WHEN d.AGE > 12 AND d.AGE <= 18 THEN '12_17'
+        WHEN d.AGE > 18 AND d.AGE <= 24 THEN '18_24'
+        WHEN d.AGE > 24 AND d.AGE <= 34 THEN '25_34'
+        WHEN d.AGE > 34 AND d.AGE <= 44 THEN '35_44'
+        WHEN d.AGE > 44 AND d.AGE <= 54 THEN '45_54'
+        WHEN d.AGE > 54 AND d.AGE <= 64 THEN '55_64'
+        WHEN d.AGE > 64 AND d.AGE <= 100 THEN '65+'
+    END AS AGE_GROUP,
+    r.USER_ID,
+    r.TOTAL_LOGINS,
+    r.LOGGED_IN_AFTER_1_DAY,
+    r.LOGGED_IN_AFTER_7_DAYS,
+    r.LOGGED_IN_AFTER_30_DAYS,
+    r.LOGGED_IN_IN_LAST_30_DAYS,
+    r.DAYS_SINCE_LAST_LOGIN,
+    d.AGE,
+    d.GENDER,
+    d.LOCATION,
+    d.AVERAGE_SESSIONS_PER_ACTIVE_WEEK,
+    d.AVERAGE_SESSION_DURATION,
+    d.PLAYER_TYPE,
+    d.TOTAL_ADS,
+    d.AVG_PURCHASE_AMOUNT_PER_AD,
+    d.HAS_SUPPORT_TICKET,
+    ur.TOTAL_POINTS,
+    ur.RANK_NAME,
+    (
+        CASE WHEN a.VICTORY_ROYALE THEN 1 ELSE 0 END +
+        CASE WHEN a.ELIMINATION_MILESTONES THEN 1 ELSE 0 END +
+        CASE WHEN a.SURVIVAL_ACHIEVEMENTS THEN 1 ELSE 0 END +
+        CASE WHEN a.BUILDING_RESOURCES THEN 1 ELSE 0 END +
+        CASE WHEN a.EXPLORATION_TRAVEL THEN 1 ELSE 0 END +
+        CASE WHEN a.WEAPON_USAGE THEN 1 ELSE 0 END +
+        CASE WHEN a.ASSIST_TEAMMATES THEN 1 ELSE 0 END +
+        CASE WHEN a.EVENT_CHALLENGES THEN 1 ELSE 0 END +
+        CASE WHEN a.CREATIVE_MODE THEN 1 ELSE 0 END +
+        CASE WHEN a.SOCIAL_ACHIEVEMENTS THEN 1 ELSE 0 END
+    ) / 11.0 AS ACHIEVEMENTS_PERCENTAGE,
+    ae.TOTAL_PURCHASES,
+    ae.PROPORTION_PURCHASED,
+    ae.AVERAGE_PURCHASE_AMOUNT,
+    ae.AVERAGE_AD_ENGAGEMENT_TIME,
+    r.CHURNED
+FROM PLAYER_360.ANALYTIC.RETENTION r
+JOIN PLAYER_360.ANALYTIC.DEMOGRAPHICS d ON r.USER_ID = d.USER_ID
+JOIN PLAYER_360.ANALYTIC.USER_RANKINGS ur ON r.USER_ID = ur.USER_ID
+JOIN PLAYER_360.RAW.ACHIEVEMENTS a ON r.USER_ID = a.USER_ID
+JOIN PLAYER_360.ANALYTIC.AD_ENGAGEMENT ae ON r.USER_ID = ae.USER_ID
+),
+player_values AS (
+    SELECT
+        AGE_GROUP, LOCATION, PLAYER_TYPE,
+        CAST(USER_ID AS FLOAT) AS USER_ID,
+        CAST(TOTAL_LOGINS AS FLOAT) AS TOTAL_LOGINS,
+        CAST(DAYS_SINCE_LAST_LOGIN AS FLOAT) AS DAYS_SINCE_LAST_LOGIN,
+        CAST(AGE AS FLOAT) AS AGE,
+        CAST(AVERAGE_SESSIONS_PER_ACTIVE_WEEK AS FLOAT) AS AVERAGE_SESSIONS_PER_ACTIVE_WEEK,
+        CAST(AVERAGE_SESSION_DURATION AS FLOAT) AS AVERAGE_SESSION_DURATION,
+        CAST(TOTAL_ADS AS FLOAT) AS TOTAL_ADS,
+        CAST(AVG_PURCHASE_AMOUNT_PER_AD AS FLOAT) AS AVG_PURCHASE_AMOUNT_PER_AD,
+        CAST(TOTAL_POINTS AS FLOAT) AS TOTAL_POINTS,
+        CAST(ACHIEVEMENTS_PERCENTAGE AS FLOAT) AS ACHIEVEMENTS_PERCENTAGE,
+        CAST(TOTAL_PURCHASES AS FLOAT) AS TOTAL_PURCHASES,
+        CAST(PROPORTION_PURCHASED AS FLOAT) AS PROPORTION_PURCHASED,
+        CAST(AVERAGE_PURCHASE_AMOUNT AS FLOAT) AS AVERAGE_PURCHASE_AMOUNT,
+        CAST(AVERAGE_AD_ENGAGEMENT_TIME AS FLOAT) AS AVERAGE_AD_ENGAGEMENT_TIME,
+        CAST(CHURNED AS FLOAT) AS CHURNED
+    FROM players
+),
+shifted_values AS (
+    SELECT
+        AGE_GROUP, LOCATION, PLAYER_TYPE,
+        USER_ID - AVG(USER_ID) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS USER_ID,
+        AVG(USER_ID) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS USER_ID_SHIFT,
+        TOTAL_LOGINS - AVG(TOTAL_LOGINS) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS TOTAL_LOGINS,
+        AVG(TOTAL_LOGINS) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS TOTAL_LOGINS_SHIFT,
+        DAYS_SINCE_LAST_LOGIN - AVG(DAYS_SINCE_LAST_LOGIN) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS DAYS_SINCE_LAST_LOGIN,
+        AVG(DAYS_SINCE_LAST_LOGIN) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS DAYS_SINCE_LAST_LOGIN_SHIFT,
+        AGE - AVG(AGE) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS AGE,
+        AVG(AGE) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS AGE_SHIFT,
+        AVERAGE_SESSIONS_PER_ACTIVE_WEEK - AVG(AVERAGE_SESSIONS_PER_ACTIVE_WEEK) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS AVERAGE_SESSIONS_PER_ACTIVE_WEEK,
+        AVG(AVERAGE_SESSIONS_PER_ACTIVE_WEEK) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS AVERAGE_SESSIONS_PER_ACTIVE_WEEK_SHIFT,
+        AVERAGE_SESSION_DURATION - AVG(AVERAGE_SESSION_DURATION) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS AVERAGE_SESSION_DURATION,
+        AVG(AVERAGE_SESSION_DURATION) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS AVERAGE_SESSION_DURATION_SHIFT,
+        TOTAL_ADS - AVG(TOTAL_ADS) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS TOTAL_ADS,
+        AVG(TOTAL_ADS) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS TOTAL_ADS_SHIFT,
+        AVG_PURCHASE_AMOUNT_PER_AD - AVG(AVG_PURCHASE_AMOUNT_PER_AD) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS AVG_PURCHASE_AMOUNT_PER_AD,
+        AVG(AVG_PURCHASE_AMOUNT_PER_AD) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS AVG_PURCHASE_AMOUNT_PER_AD_SHIFT,
+        TOTAL_POINTS - AVG(TOTAL_POINTS) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS TOTAL_POINTS,
+        AVG(TOTAL_POINTS) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS TOTAL_POINTS_SHIFT,
+        ACHIEVEMENTS_PERCENTAGE - AVG(ACHIEVEMENTS_PERCENTAGE) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS ACHIEVEMENTS_PERCENTAGE,
+        AVG(ACHIEVEMENTS_PERCENTAGE) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS ACHIEVEMENTS_PERCENTAGE_SHIFT,
+        TOTAL_PURCHASES - AVG(TOTAL_PURCHASES) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS TOTAL_PURCHASES,
+        AVG(TOTAL_PURCHASES) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS TOTAL_PURCHASES_SHIFT,
+        PROPORTION_PURCHASED - AVG(PROPORTION_PURCHASED) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS PROPORTION_PURCHASED,
+        AVG(PROPORTION_PURCHASED) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS PROPORTION_PURCHASED_SHIFT,
+        AVERAGE_PURCHASE_AMOUNT - AVG(AVERAGE_PURCHASE_AMOUNT) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS AVERAGE_PURCHASE_AMOUNT,
+        AVG(AVERAGE_PURCHASE_AMOUNT) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS AVERAGE_PURCHASE_AMOUNT_SHIFT,
+        AVERAGE_AD_ENGAGEMENT_TIME - AVG(AVERAGE_AD_ENGAGEMENT_TIME) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS AVERAGE_AD_ENGAGEMENT_TIME,
+        AVG(AVERAGE_AD_ENGAGEMENT_TIME) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS AVERAGE_AD_ENGAGEMENT_TIME_SHIFT,
+        CHURNED - AVG(CHURNED) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS CHURNED,
+        AVG(CHURNED) OVER (PARTITION BY AGE_GROUP, LOCATION, PLAYER_TYPE) AS CHURNED_SHIFT
+    FROM player_values
+),
+column_names AS (
+    SELECT 0 AS I, 'USER_ID' AS NAME
+    UNION ALL SELECT 1 AS I, 'TOTAL_LOGINS' AS NAME
+    UNION ALL SELECT 2 AS I, 'DAYS_SINCE_LAST_LOGIN' AS NAME
+    UNION ALL SELECT 3 AS I, 'AGE' AS NAME
+    UNION ALL SELECT 4 AS I, 'AVERAGE_SESSIONS_PER_ACTIVE_WEEK' AS NAME
+    UNION ALL SELECT 5 AS I, 'AVERAGE_SESSION_DURATION' AS NAME
+    UNION ALL SELECT 6 AS I, 'TOTAL_ADS' AS NAME
+    UNION ALL SELECT 7 AS I, 'AVG_PURCHASE_AMOUNT_PER_AD' AS NAME
+    UNION ALL SELECT 8 AS I, 'TOTAL_POINTS' AS NAME
+    UNION ALL SELECT 9 AS I, 'ACHIEVEMENTS_PERCENTAGE' AS NAME
+    UNION ALL SELECT 10 AS I, 'TOTAL_PURCHASES' AS NAME
+    UNION ALL SELECT 11 AS I, 'PROPORTION_PURCHASED' AS NAME
+    UNION ALL SELECT 12 AS I, 'AVERAGE_PURCHASE_AMOUNT' AS NAME
+    UNION ALL SELECT 13 AS I, 'AVERAGE_AD_ENGAGEMENT_TIME' AS NAME
+    UNION ALL SELECT 14 AS I, 'CHURNED' AS NAME
+),
+pairs AS (
+    SELECT a.NAME AS COLUMN_A, b.NAME AS COLUMN_B
+    FROM column_names a
+    JOIN column_names b ON a.I <= b.I
+),
+pair_values AS (
+    SELECT
+        v.AGE_GROUP, v.LOCATION, v.PLAYER_TYPE,
+        p.COLUMN_A,
+        p.COLUMN_B,
+        CASE p.COLUMN_A
+            WHEN 'USER_ID' THEN v.USER_ID
+            WHEN 'TOTAL_LOGINS' THEN v.TOTAL_LOGINS
+            WHEN 'DAYS_SINCE_LAST_LOGIN' THEN v.DAYS_SINCE_LAST_LOGIN
+            WHEN 'AGE' THEN v.AGE
+            WHEN 'AVERAGE_SESSIONS_PER_ACTIVE_WEEK' THEN v.AVERAGE_SESSIONS_PER_ACTIVE_WEEK
+            WHEN 'AVERAGE_SESSION_DURATION' THEN v.AVERAGE_SESSION_DURATION
+            WHEN 'TOTAL_ADS' THEN v.TOTAL_ADS
+            WHEN 'AVG_PURCHASE_AMOUNT_PER_AD' THEN v.AVG_PURCHASE_AMOUNT_PER_AD
+            WHEN 'TOTAL_POINTS' THEN v.TOTAL_POINTS
+            WHEN 'ACHIEVEMENTS_PERCENTAGE' THEN v.ACHIEVEMENTS_PERCENTAGE
+            WHEN 'TOTAL_PURCHASES' THEN v.TOTAL_PURCHASES
+            WHEN 'PROPORTION_PURCHASED' THEN v.PROPORTION_PURCHASED
+            WHEN 'AVERAGE_PURCHASE_AMOUNT' THEN v.AVERAGE_PURCHASE_AMOUNT
+            WHEN 'AVERAGE_AD_ENGAGEMENT_TIME' THEN v.AVERAGE_AD_ENGAGEMENT_TIME
+            WHEN 'CHURNED' THEN v.CHURNED
+        END AS A,
+        CASE p.COLUMN_B
+            WHEN 'USER_ID' THEN v.USER_ID
+            WHEN 'TOTAL_LOGINS' THEN v.TOTAL_LOGINS
+            WHEN 'DAYS_SINCE_LAST_LOGIN' THEN v.DAYS_SINCE_LAST_LOGIN
+            WHEN 'AGE' THEN v.AGE
+            WHEN 'AVERAGE_SESSIONS_PER_ACTIVE_WEEK' THEN v.AVERAGE_SESSIONS_PER_ACTIVE_WEEK
+            WHEN 'AVERAGE_SESSION_DURATION' THEN v.AVERAGE_SESSION_DURATION
+            WHEN 'TOTAL_ADS' THEN v.TOTAL_ADS
+            WHEN 'AVG_PURCHASE_AMOUNT_PER_AD' THEN v.AVG_PURCHASE_AMOUNT_PER_AD
+            WHEN 'TOTAL_POINTS' THEN v.TOTAL_POINTS
+            WHEN 'ACHIEVEMENTS_PERCENTAGE' THEN v.ACHIEVEMENTS_PERCENTAGE
+            WHEN 'TOTAL_PURCHASES' THEN v.TOTAL_PURCHASES
+            WHEN 'PROPORTION_PURCHASED' THEN v.PROPORTION_PURCHASED
+            WHEN 'AVERAGE_PURCHASE_AMOUNT' THEN v.AVERAGE_PURCHASE_AMOUNT
+            WHEN 'AVERAGE_AD_ENGAGEMENT_TIME' THEN v.AVERAGE_AD_ENGAGEMENT_TIME
+            WHEN 'CHURNED' THEN v.CHURNED
+        END AS B,
+        CASE p.COLUMN_A
+            WHEN 'USER_ID' THEN v.USER_ID_SHIFT
+            WHEN 'TOTAL_LOGINS' THEN v.TOTAL_LOGINS_SHIFT
+            WHEN 'DAYS_SINCE_LAST_LOGIN' THEN v.DAYS_SINCE_LAST_LOGIN_SHIFT
+            WHEN 'AGE' THEN v.AGE_SHIFT
+            WHEN 'AVERAGE_SESSIONS_PER_ACTIVE_WEEK' THEN v.AVERAGE_SESSIONS_PER_ACTIVE_WEEK_SHIFT
+            WHEN 'AVERAGE_SESSION_DURATION' THEN v.AVERAGE_SESSION_DURATION_SHIFT
+            WHEN 'TOTAL_ADS' THEN v.TOTAL_ADS_SHIFT
+            WHEN 'AVG_PURCHASE_AMOUNT_PER_AD' THEN v.AVG_PURCHASE_AMOUNT_PER_AD_SHIFT
+            WHEN 'TOTAL_POINTS' THEN v.TOTAL_POINTS_SHIFT
+            WHEN 'ACHIEVEMENTS_PERCENTAGE' THEN v.ACHIEVEMENTS_PERCENTAGE_SHIFT
+            WHEN 'TOTAL_PURCHASES' THEN v.TOTAL_PURCHASES_SHIFT
+            WHEN 'PROPORTION_PURCHASED' THEN v.PROPORTION_PURCHASED_SHIFT
+            WHEN 'AVERAGE_PURCHASE_AMOUNT' THEN v.AVERAGE_PURCHASE_AMOUNT_SHIFT
+            WHEN 'AVERAGE_AD_ENGAGEMENT_TIME' THEN v.AVERAGE_AD_ENGAGEMENT_TIME_SHIFT
+            WHEN 'CHURNED' THEN v.CHURNED_SHIFT
+        END AS SHIFT_A,
+        CASE p.COLUMN_B
+            WHEN 'USER_ID' THEN v.USER_ID_SHIFT
+            WHEN 'TOTAL_LOGINS' THEN v.TOTAL_LOGINS_SHIFT
+            WHEN 'DAYS_SINCE_LAST_LOGIN' THEN v.DAYS_SINCE_LAST_LOGIN_SHIFT
+            WHEN 'AGE' THEN v.AGE_SHIFT
+            WHEN 'AVERAGE_SESSIONS_PER_ACTIVE_WEEK' THEN v.AVERAGE_SESSIONS_PER_ACTIVE_WEEK_SHIFT
+            WHEN 'AVERAGE_SESSION_DURATION' THEN v.AVERAGE_SESSION_DURATION_SHIFT
+            WHEN 'TOTAL_ADS' THEN v.TOTAL_ADS_SHIFT
+            WHEN 'AVG_PURCHASE_AMOUNT_PER_AD' THEN v.AVG_PURCHASE_AMOUNT_PER_AD_SHIFT
+            WHEN 'TOTAL_POINTS' THEN v.TOTAL_POINTS_SHIFT
+            WHEN 'ACHIEVEMENTS_PERCENTAGE' THEN v.ACHIEVEMENTS_PERCENTAGE_SHIFT
+            WHEN 'TOTAL_PURCHASES' THEN v.TOTAL_PURCHASES_SHIFT
+            WHEN 'PROPORTION_PURCHASED' THEN v.PROPORTION_PURCHASED_SHIFT
+            WHEN 'AVERAGE_PURCHASE_AMOUNT' THEN v.AVERAGE_PURCHASE_AMOUNT_SHIFT
+            WHEN 'AVERAGE_AD_ENGAGEMENT_TIME' THEN v.AVERAGE_AD_ENGAGEMENT_TIME_SHIFT
+            WHEN 'CHURNED' THEN v.CHURNED_SHIFT
+        END AS SHIFT_B
+    FROM shifted_values v
+    CROSS JOIN pairs p
+)
+SELECT
+    AGE_GROUP, LOCATION, PLAYER_TYPE,
+    COLUMN_A,
+    COLUMN_B,
+    COUNT(*) AS N,
+    MAX(SHIFT_A) + AVG(A) AS MEAN_A,
+    MAX(SHIFT_B) + AVG(B) AS MEAN_B,
+    SUM(A * A) - SUM(A) * SUM(A) / COUNT(*) AS M2_A,
+    SUM(B * B) - SUM(B) * SUM(B) / COUNT(*) AS M2_B,
+    SUM(A * B) - SUM(A) * SUM(B) / COUNT(*) AS C_AB
+FROM pair_values
+WHERE A IS NOT NULL AND B IS NOT NULL
+GROUP BY AGE_GROUP, LOCATION, PLAYER_TYPE, COLUMN_A, COLUMN_B;
@@ -1,6 +1,5 @@
 # Import python packages
 import streamlit as st
-import shap
 from snowflake.ml.registry import Registry
 from datetime import datetime
 from snowflake.snowpark.context import get_active_session
@@ -11,6 +10,19 @@ import plotly.graph_objects as go
 import streamlit.components.v1 as components
 from streamlit_extras.stylable_container import stylable_container
 import io
+import logging
+import time
+from player_loader import PLAYER_TABLES, load_player_bundle
+from player_store import PlayerStore
+from prefetch import PlayerPrefetcher, neighbour_ids
+from window_metrics import PlayerWindows
+from lineage_cache import LineageCache, derive, lineage, table_versions, table_versions_query
+from pagination import PAGE_SIZES, frame_page, page_count, sort_permutation
+from instrumentation import RenderHistory, RenderTrace, span, traced
+from lazy_sections import LazyTabs
+from model_cache import ModelCache
+from shap_store import ROLLING_MODEL, draw_shap_summary, player_shap_query, plot_values
+from plot_artifacts import PlotArtifacts
 
 # Write directly to the app
 st.set_page_config(layout='wide')
@@ -19,28 +31,129 @@ st.title("Player360")
 # Get the current credentials
 session = get_active_session()
 
+# players around the selected PLAYER_ID and the last few viewed are loaded in the background
+PREFETCH_RADIUS = 2
+PREFETCH_RECENT = 5
+PREFETCH_WORKERS = 2
+PREFETCH_MAX_BYTES = 128 * 2**20
+# filtered frames and sort orders are cached by lineage token, table versions are re-read every TABLE_VERSION_TTL seconds
+FRAME_CACHE_BYTES = 256 * 2**20
+FRAME_CACHE_TTL = 3600
+TABLE_VERSION_TTL = 60
+# every rerun is timed span by span and logged as JSON to player360.render, open the app with ?profile=1 for the sidebar
+RENDER_PROFILE_SIDEBAR = False
+RENDER_HISTORY_RUNS = 500
+logging.getLogger('player360.render').setLevel(logging.INFO)
+# active players show the churn likelihood scripts/batch_score.py wrote to APP.CHURN_PREDICTIONS, the model
+# only runs for players without a score of their current features. No setup step creates the table, set to
+# True once the batch has run
+PRECOMPUTED_PREDICTIONS = False
+# registry models are loaded once per process, warm at startup, and reloaded when a new default version is set,
+# which is checked every MODEL_STATE_TTL seconds
+WARM_MODELS = [("Player360_RollingChurn_Classifier", "v1")]
+MODEL_STATE_TTL = 60
+# the SHAP form runs the model version's explain function. Set to True once scripts/batch_explain.py has written
+# APP.ROLLING_CHURN_SHAP, which no setup step creates, to read the player's stored explanations instead, the
+# explain function then only runs for days the store does not have yet
+PRECOMPUTED_SHAP = False
+# SHAP summary plots are rendered off the script thread by PLOT_WORKERS processes and kept by their inputs in
+# PLOT_CACHE_BYTES of memory, and in PLOT_CACHE_DIR when set. The form shows a placeholder, checked every PLOT_POLL_SECONDS
+PLOT_WORKERS = 2
+PLOT_CACHE_BYTES = 64 * 2**20
+PLOT_CACHE_DIR = None
+PLOT_POLL_SECONDS = 0.25
+
+@traced('query', queries=True)
 @st.cache_data(show_spinner=False)
 def load_query(query):
     query = session.sql(query).to_pandas()
     return query
     
+@traced('query', queries=True)
 @st.cache_data(show_spinner=False)
 def load_table(table_name):
     table = session.table(table_name).to_pandas()
     return table
 
+@st.cache_resource(show_spinner=False)
+def frame_cache():
+    return LineageCache(max_bytes=FRAME_CACHE_BYTES, ttl=FRAME_CACHE_TTL)
+
+@traced('query', queries=True)
+@st.cache_data(show_spinner=False, ttl=TABLE_VERSION_TTL)
+def load_table_versions(database):
+    return table_versions(session.sql(table_versions_query(database)).to_pandas())
+
+@traced('transform', cache=frame_cache())
+@frame_cache().memoize
+def sort_order(input_df, column, ascending):
+    # one permutation per column and direction, every page of the sorted view reads through it
+    return sort_permutation(input_df[column], ascending)
+
+@traced('query', queries=True)
 @st.cache_data(show_spinner=False)
-def split_frame(input_df, rows):
-    df = [input_df.loc[i : i + rows - 1, :] for i in range(0, len(input_df), rows)]
-    return df
+def load_player_data(database, user_id, active):
+    return load_player_bundle(session, database, user_id, active, PRECOMPUTED_PREDICTIONS)
+
+@traced('query', queries=True)
+def load_player_shap(database, user_id):
+    return session.sql(*player_shap_query(database, ROLLING_MODEL, user_id)).to_pandas()
+
+@st.cache_resource(show_spinner=False)
+def player_prefetcher(database):
+    # keys are (user_id, active), shared by all sessions and bounded by PREFETCH_MAX_BYTES. Bundles are looked up
+    # with the lineage token of PLAYER_TABLES, a bundle read before a refresh of any of them is dropped
+    return PlayerPrefetcher(lambda key: load_player_bundle(session, database, *key, predictions=PRECOMPUTED_PREDICTIONS),
+                            max_workers=PREFETCH_WORKERS, max_bytes=PREFETCH_MAX_BYTES)
+
+@traced('query', queries=True)
+@st.cache_resource(show_spinner=False, ttl=3600)
+def load_player_store(database):
+    return PlayerStore.from_session(session, database)
+
+@st.cache_resource(show_spinner=False)
+def render_history():
+    # the span records of the last RENDER_HISTORY_RUNS reruns of all sessions, for the p95 table
+    return RenderHistory(max_runs=RENDER_HISTORY_RUNS)
+
+@st.cache_resource(show_spinner=False)
+def model_cache():
+    cache = ModelCache(lambda: Registry(session=session), state_ttl=MODEL_STATE_TTL)
+    cache.warm(WARM_MODELS)
+    return cache
+
+@st.cache_resource(show_spinner=False)
+def plot_artifacts():
+    return PlotArtifacts(max_bytes=PLOT_CACHE_BYTES, persist_dir=PLOT_CACHE_DIR, max_workers=PLOT_WORKERS)
+
+def show_artifact(key, caption):
+    # the placeholder is replaced once the PNG is ready. Every poll writes to the page, so a widget change
+    # stops this rerun and the render carries on in its worker for the next one
+    placeholder = st.empty()
+    artifacts = plot_artifacts()
+    started = time.monotonic()
+    while artifacts.wait(key, PLOT_POLL_SECONDS) == 'pending':
+        placeholder.info(f"Rendering {caption}, {time.monotonic() - started:.0f} s")
+    png = artifacts.get(key)
+    if png is None:
+        placeholder.error(f"{caption} could not be rendered: {artifacts.error(key)}")
+    else:
+        placeholder.image(png, caption=caption, use_column_width=True)
 
+@traced('model', queries=True, cache=model_cache())
 def cache_model(model_name,version,load=False):
-    mv = reg.get_model(model_name).version(version)
     if load:
-        mv = mv.load()
-    return mv
+        return model_cache().model(model_name, version)
+    return model_cache().version(model_name, version)
 
-@st.cache_data(show_spinner=False)
+@traced('transform', cache=frame_cache())
+@frame_cache().memoize
+def player_windows(points_df, purchases_df):
+    # the sorted timestamps and prefix sums of the player's frames, built once per player and table version
+    return PlayerWindows(points_df, purchases_df)
+
+@traced('transform', cache=frame_cache())
+@frame_cache().memoize
 def save_filter(input_df, param, start_date, end_date = None):
     if end_date:
         df = input_df[
@@ -50,7 +163,33 @@ def save_filter(input_df, param, start_date, end_date = None):
         df = input_df[input_df[param] >= start_date]
     return df
 
-def create_pagination(dataset :pd.DataFrame, key :str):
+def show_cache_stats():
+    cache = frame_cache()
+    with st.sidebar.expander("Frame Cache"):
+        st.caption(f"{cache.nbytes / 2**20:.1f} of {cache.max_bytes / 2**20:.0f} MB in {len(cache)} entries, "
+                   f"{cache.stats['evictions']} evicted, {cache.stats['expirations']} expired")
+        st.dataframe(cache.stats_frame(), hide_index=True, use_container_width=True)
+    models = model_cache()
+    with st.sidebar.expander("Model Cache"):
+        st.caption(f"{len(models)} entries, {models.stats['hits']} hits, {models.stats['misses']} loads "
+                   f"in {models.stats['load_seconds']:.1f} s, {models.stats['invalidations']} invalidated")
+        st.dataframe(models.stats_frame(), hide_index=True, use_container_width=True)
+    plots = plot_artifacts()
+    with st.sidebar.expander("Plot Artifacts"):
+        st.caption(f"{plots.nbytes / 2**20:.1f} of {plots.max_bytes / 2**20:.0f} MB in {len(plots)} PNGs, "
+                   f"{plots.stats['hits']} hits, {plots.stats['persisted_hits']} from disk, {plots.stats['misses']} "
+                   f"rendered in {plots.stats['render_seconds']:.1f} s, {plots.stats['errors']} failed")
+
+def show_render_profile(trace):
+    if not (RENDER_PROFILE_SIDEBAR or st.query_params.get('profile') == '1'):
+        return
+    with st.sidebar.expander("Render Profile"):
+        st.caption(f"rerun {trace.run_id} took {trace.root.seconds * 1000:.0f} ms")
+        st.dataframe(trace.frame(), hide_index=True, use_container_width=True)
+        st.caption(f"slowest spans over the last {len(render_history())} reruns")
+        st.dataframe(render_history().percentiles_frame(trace.page), hide_index=True, use_container_width=True)
+
+def create_pagination(dataset :pd.DataFrame, key :str, lineage=None):
     top_menu = st.columns(3)
     with top_menu[0]:
         sort = st.radio("Sort Data", options=["Yes", "No"], horizontal=1, index=1, key=f"{key}_sort")
@@ -61,34 +200,29 @@ def create_pagination(dataset :pd.DataFrame, key :str):
             sort_direction = st.radio(
                 "Direction", options=["⬆️", "⬇️"], horizontal=True,  key=f"{key}_sort_values"
             )
-        dataset = dataset.sort_values(
-            by=sort_field, ascending=sort_direction == "⬆️", ignore_index=True
-        )
+        order = sort_order(dataset, sort_field, sort_direction == "⬆️", lineage=lineage)
+    else:
+        order = None
     pagination = st.container()
     
     bottom_menu = st.columns((4, 1, 1))
     with bottom_menu[2]:
-        batch_size = st.selectbox("Page Size", options=[25, 50, 100], key=f"{key}_page_size")
+        batch_size = st.selectbox("Page Size", options=PAGE_SIZES, key=f"{key}_page_size")
     with bottom_menu[1]:
-        total_pages = (
-            int(len(dataset) / batch_size) if int(len(dataset) / batch_size) > 0 else 1
-        )
+        total_pages = page_count(len(dataset), batch_size)
         current_page = st.number_input(
             "Page", min_value=1, max_value=total_pages, step=1, key=f"{key}_page_number_input"
         )
     with bottom_menu[0]:
         st.markdown(f"Page **{current_page}** of **{total_pages}** ")
-    pages = split_frame(dataset, batch_size)
-    pagination.dataframe(data=pages[current_page - 1], use_container_width=True)
+    pagination.dataframe(data=frame_page(dataset, current_page, batch_size, order), use_container_width=True)
 
 
-users_df = load_table(f"{session.get_current_database()}.RAW.USERS")
-retention_df = load_query(f"SELECT * FROM {session.get_current_database()}.ANALYTIC.RETENTION")
-ranking_df = load_table(f"{session.get_current_database()}.ANALYTIC.USER_RANKINGS")
-demographics_df = load_query(f"SELECT * FROM {session.get_current_database()}.ANALYTIC.DEMOGRAPHICS" )
+# time this rerun, the spans below and the traced helpers above nest under it
+render_trace = RenderTrace('PLAYER_360', session, history=render_history()).start()
 
-active_users = retention_df[retention_df['CHURNED'] ==  0]
-inactive_users = retention_df[retention_df['CHURNED'] ==  1]
+# one pre-joined row per player, built once per refresh and shared by all sessions
+player_store = load_player_store(session.get_current_database())
 
 col1,col2,col3 = st.columns(3)
 
@@ -108,16 +242,17 @@ with st.sidebar:
     if user_id != st.session_state.user_id:
         st.session_state.user_id = user_id
         st.rerun()
-    if user_id not in users_df['USER_ID'].values:
+    profile = player_store.profile(user_id)
+    if profile is None:
         st.write("Invalid User ID")
+        st.stop()
 
-    user_info = users_df[users_df['USER_ID'] == user_id]
-    if user_id in list(active_users['USER_ID']):
+    if player_store.is_active(user_id):
         st.session_state.active_user = 1
         st.markdown(
             f"""
             <div style="border: 5px solid green; display: inline-block; padding: 10px; text-align: center; width: 100%;">
-                <img src="{user_info['PHOTO_URL'].values[0]}" style="display: inline-block; padding: 10px; text-align: center; width: 100%;">
+                <img src="{profile['PHOTO_URL']}" style="display: inline-block; padding: 10px; text-align: center; width: 100%;">
             </div>
             """,
             unsafe_allow_html=True
@@ -128,7 +263,7 @@ with st.sidebar:
         st.markdown(
             f"""
             <div style="border: 5px solid red; display: inline-block; padding: 10px; text-align: center; width: 100%;">
-                <img src="{user_info['PHOTO_URL'].values[0]}" style="display: inline-block; padding: 10px; text-align: center; width: 100%;">
+                <img src="{profile['PHOTO_URL']}" style="display: inline-block; padding: 10px; text-align: center; width: 100%;">
             </div>
             """,
             unsafe_allow_html=True
@@ -138,11 +273,11 @@ with st.sidebar:
     st.divider()
     
     # Calculate personal details
-    birthdate = user_info['BIRTHDATE'].values[0]
+    birthdate = profile['BIRTHDATE']
     current_date = datetime.now()
     age = current_date.year - birthdate.year - ((current_date.month, current_date.day) < (birthdate.month, birthdate.day))
-    first_login = pd.to_datetime(retention_df.loc[retention_df['USER_ID'] == user_id, 'FIRST_LOGIN_DATE'].values[0])
-    last_login = pd.to_datetime(retention_df.loc[retention_df['USER_ID'] == user_id, 'LAST_LOGIN_DATE'].values[0])
+    first_login = pd.to_datetime(profile['FIRST_LOGIN_DATE'])
+    last_login = pd.to_datetime(profile['LAST_LOGIN_DATE'])
 
 
     class UserProfileCard:
@@ -175,40 +310,56 @@ with st.sidebar:
     
     st.markdown(cards_css, unsafe_allow_html=True)
 
-    users_ranking_df = ranking_df[ranking_df['USER_ID'] == user_id]
-   
     player_info = {
         "Player Status":status,
-        "Name":user_info['FIRST_NAME'].values[0]+' '+user_info['LAST_NAME'].values[0],
-        "Gender":user_info['GENDER'].values[0],
-        "Email":user_info['EMAIL'].values[0],
+        "Name":profile['FIRST_NAME']+' '+profile['LAST_NAME'],
+        "Gender":profile['GENDER'],
+        "Email":profile['EMAIL'],
         "Age":age,
-        "Location":user_info['LOCATION'].values[0],
-        "Player Type":demographics_df['PLAYER_TYPE'].values[0],
-        "Rank Name": users_ranking_df['RANK_NAME'].values[0],
-        "Rank Percentile": users_ranking_df['PERCENTILE'].values[0].round(2),
+        "Location":profile['LOCATION'],
+        "Player Type":profile['PLAYER_TYPE'],
+        "Rank Name": profile['RANK_NAME'],
+        "Rank Percentile": profile['PERCENTILE'].round(2),
         "First Login": first_login,
         "Last Login": last_login,
-        "Days Inactive":retention_df.loc[retention_df['USER_ID'] == user_id, 'DAYS_SINCE_LAST_LOGIN'].values[0]
+        "Days Inactive":profile['DAYS_SINCE_LAST_LOGIN']
     }
     for k,v in player_info.items():
         UserProfileCard(key=k, value=v).render_card()
 
     
-ad_engagement_df = load_query(f"SELECT * FROM {session.get_current_database()}.ANALYTIC.AD_ENGAGEMENT WHERE USER_ID = {user_id}")
 # load dataframes here
-achievements_df = load_query(f"SELECT * FROM {session.get_current_database()}.RAW.ACHIEVEMENTS WHERE USER_ID = {user_id}")
-player_events_points_df = load_query(f'SELECT * FROM {session.get_current_database()}.ANALYTIC.POINTS_PER_EVENT WHERE USER_ID = {user_id} ORDER BY LOG_IN ASC')
-support_ticket_df = load_table(f"{session.get_current_database()}.RAW.SUPPORT_TICKETS")
-sessions_df = load_query(f"SELECT * FROM {session.get_current_database()}.RAW.SESSIONS WHERE USER_ID = {user_id} ORDER BY LOG_IN ASC")
+# all per-player queries are sent together and run concurrently, unless the player was prefetched
+# from the current versions of the tables
+player_key = (int(user_id), st.session_state.active_user == 1)
+table_version = load_table_versions(session.get_current_database())
+bundle_lineage = lineage(table_version, PLAYER_TABLES)
+with span('player_bundle', 'query', queries=True) as bundle_span:
+    player_bundle = player_prefetcher(session.get_current_database()).get(player_key, bundle_lineage)
+    if player_bundle is not None:
+        bundle_span.cache_hit = True
+    else:
+        player_bundle = load_player_data(session.get_current_database(), *player_key)
+achievements_df = player_bundle.achievements
+player_events_points_df = player_bundle.points_per_event
+sessions_df = player_bundle.sessions
 
 # all ads
-purchases_df = load_query(f"SELECT * FROM {session.get_current_database()}.RAW.PURCHASES WHERE USER_ID = {user_id} ORDER BY TIMESTAMP_OF_PURCHASE ASC")
+purchases_df = player_bundle.purchases
 # all ads that lead to purchases
 purchased_df = purchases_df[purchases_df['PURCHASE_TYPE'] != 'none']
 
+# where each frame came from, the cached helpers key on these instead of hashing the frames
+points_lineage = lineage(table_version, 'ANALYTIC.POINTS_PER_EVENT', user_id=player_key[0])
+sessions_lineage = lineage(table_version, 'RAW.SESSIONS', user_id=player_key[0])
+purchases_lineage = lineage(table_version, 'RAW.PURCHASES', user_id=player_key[0])
+purchased_lineage = derive(purchases_lineage, purchased=True)
+windows_lineage = lineage(table_version, ('ANALYTIC.POINTS_PER_EVENT', 'RAW.PURCHASES'), user_id=player_key[0])
+
 st.divider()
-date_range = st.radio(label='Active Date Range', options=[30, 60, 90, 365, 'Lifetime'], horizontal=True)
+date_range = st.radio(label='Active Date Range', options=[30, 60, 90, 365, 'Custom', 'Lifetime'], horizontal=True)
+if date_range == 'Custom':
+    date_range = st.number_input(label='Days', min_value=1, max_value=3650, value=14, step=1)
 
 # filter by start date in date range
 if date_range != 'Lifetime':
@@ -218,77 +369,43 @@ else:
     end_date = last_login
     start_date=None
 
-def safe_divide(numerator, denominator, default_value=0):
-    if denominator == 0:
-        return default_value
-    else:
-        return numerator / denominator
-
 # compute metric deltas
 # -----------------------------------------------------------------------------------
 if start_date:
-    last_seq_total_points = save_filter(player_events_points_df, 'LOG_IN', start_date)['TOTAL_POINTS'].sum()
-    prev_seq_start_date = start_date - pd.Timedelta(days=date_range)
-    prev_seq_total_points = save_filter(player_events_points_df, 'LOG_IN', prev_seq_start_date, start_date)['TOTAL_POINTS'].sum()
-    total_points_delta = last_seq_total_points - prev_seq_total_points
-    total_points_delta = total_points_delta.round(2)
-
-    last_seq_total_ads = len(save_filter(purchases_df, 'TIMESTAMP_OF_PURCHASE', start_date))
-    prev_seq_total_ads = len(save_filter(purchases_df, 'TIMESTAMP_OF_PURCHASE', prev_seq_start_date, start_date))
-    total_ads_delta = last_seq_total_ads - prev_seq_total_ads
-
-    last_seq_total_logins = len(save_filter(player_events_points_df, 'LOG_IN', start_date))
-    prev_seq_total_logins = len(save_filter(player_events_points_df, 'LOG_IN', prev_seq_start_date, start_date))
-    total_logins_delta = last_seq_total_logins - prev_seq_total_logins
-
-    last_seq_total_purchases = len(save_filter(purchased_df, 'TIMESTAMP_OF_PURCHASE', start_date))
-    prev_seq_total_purchases = len(save_filter(purchased_df, 'TIMESTAMP_OF_PURCHASE', prev_seq_start_date, start_date))
-    total_purchases_delta = last_seq_total_purchases - prev_seq_total_purchases
-
-    # Calculate proportions and averages with zero check
-    last_seq_prop_purchased = safe_divide(last_seq_total_purchases, last_seq_total_ads, default_value=0) * 100
-    prev_seq_prop_purchased = safe_divide(prev_seq_total_purchases, prev_seq_total_ads, default_value=0) * 100
-    prop_purchased_delta = round(last_seq_prop_purchased - prev_seq_prop_purchased, 2)
-    
-    # Calculate total purchase amount with zero check
-    last_seq_total_purchase_amount = save_filter(purchases_df, 'TIMESTAMP_OF_PURCHASE', start_date)['PURCHASE_AMOUNT'].sum()
-    prev_seq_total_purchase_amount = save_filter(purchases_df, 'TIMESTAMP_OF_PURCHASE', prev_seq_start_date, start_date)['PURCHASE_AMOUNT'].sum()
-    total_purchase_amount_delta = round(last_seq_total_purchase_amount - prev_seq_total_purchase_amount, 2)
-    
-    # Calculate average purchase amount with zero check
-    last_seq_average_purchase_amount = safe_divide(last_seq_total_purchase_amount, last_seq_total_purchases, default_value=0)
-    prev_seq_average_purchase_amount = safe_divide(prev_seq_total_purchase_amount, prev_seq_total_purchases, default_value=0)
-    average_purchase_amount_delta = round(last_seq_average_purchase_amount - prev_seq_average_purchase_amount, 2)
-    
-    # Calculate total ad duration with zero check
-    last_seq_total_ad_duration = save_filter(purchases_df, 'TIMESTAMP_OF_PURCHASE', start_date)['AD_ENGAGEMENT_TIME'].sum()
-    prev_seq_total_ad_duration = save_filter(purchases_df, 'TIMESTAMP_OF_PURCHASE', prev_seq_start_date, start_date)['AD_ENGAGEMENT_TIME'].sum()
-    last_seq_average_ad_duration = safe_divide(last_seq_total_ad_duration, last_seq_total_ads, default_value=0)
-    prev_seq_average_ad_duration = safe_divide(prev_seq_total_ad_duration, prev_seq_total_ads, default_value=0)
-    average_ad_duration_delta = round(last_seq_average_ad_duration - prev_seq_average_ad_duration, 2)
+    # every metric over the current window and its delta against the window before it, in one pass
+    with span('window_metrics'):
+        window_metrics = player_windows(player_events_points_df, purchases_df, lineage=windows_lineage).compare(start_date, date_range)
+    last_seq_total_points, total_points_delta = window_metrics['TOTAL_POINTS']
+    last_seq_total_ads, total_ads_delta = window_metrics['TOTAL_ADS']
+    last_seq_total_logins, total_logins_delta = window_metrics['TOTAL_LOGINS']
+    last_seq_total_purchases, total_purchases_delta = window_metrics['TOTAL_PURCHASES']
+    last_seq_prop_purchased, prop_purchased_delta = window_metrics['PROPORTION_PURCHASED']
+    last_seq_total_purchase_amount, total_purchase_amount_delta = window_metrics['TOTAL_PURCHASE_AMOUNT']
+    last_seq_average_purchase_amount, average_purchase_amount_delta = window_metrics['AVERAGE_PURCHASE_AMOUNT']
+    last_seq_average_ad_duration, average_ad_duration_delta = window_metrics['AVERAGE_AD_ENGAGEMENT_TIME']
 else:
-    last_seq_total_points = users_ranking_df['TOTAL_POINTS'].values[0].round(2)
+    last_seq_total_points = profile['TOTAL_POINTS'].round(2)
     total_points_delta = "~"
     
-    last_seq_total_ads = ad_engagement_df['TOTAL_ADS'].values[0]
+    last_seq_total_ads = profile['TOTAL_ADS']
     total_ads_delta = "~"
 
-    last_seq_total_logins = retention_df[retention_df['USER_ID'] == user_id]['TOTAL_LOGINS'].values[0]
+    last_seq_total_logins = profile['TOTAL_LOGINS']
     total_logins_delta = "~"
 
-    last_seq_total_purchases = ad_engagement_df['TOTAL_PURCHASES'].values[0]
+    last_seq_total_purchases = profile['TOTAL_PURCHASES']
     total_purchases_delta = "~"
 
-    last_seq_prop_purchased = (ad_engagement_df['PROPORTION_PURCHASED'].values[0] * 100).round(2)
+    last_seq_prop_purchased = (profile['PROPORTION_PURCHASED'] * 100).round(2)
     prop_purchased_delta = "~"
 
-    last_seq_total_purchase_amount = (ad_engagement_df['TOTAL_PURCHASES_AMOUNT'].values[0]).round(2)
+    last_seq_total_purchase_amount = (profile['TOTAL_PURCHASES_AMOUNT']).round(2)
     total_purchase_amount_delta = "~"
 
-    last_seq_average_purchase_amount = (ad_engagement_df['AVERAGE_PURCHASE_AMOUNT'].values[0]).round(2)
+    last_seq_average_purchase_amount = (profile['AVERAGE_PURCHASE_AMOUNT']).round(2)
     average_purchase_amount_delta = "~"
 
-    last_seq_average_ad_duration = (ad_engagement_df['AVERAGE_AD_ENGAGEMENT_TIME'].values[0]).round(2)
+    last_seq_average_ad_duration = (profile['AVERAGE_AD_ENGAGEMENT_TIME']).round(2)
     average_ad_duration_delta = "~"
     
 # Adds hoverable text explaining the the metric
@@ -382,230 +499,237 @@ if earned_badges:
 else:
     st.markdown("No achievements earned yet!")
 
-points, support_ticket, purchases, sessions, churn_likelihood = st.tabs(["POINTS",
-                                                                         "SUPPORT TICKET",
-                                                                         "PURCHASES",
-                                                                         "SESSIONS",
-                                                                       "CHURN LIKELIHOOD"])
-
-with points:
-    player_events_points_df['DAY'] = pd.to_datetime(player_events_points_df['LOG_IN'].dt.date)
-    if start_date:
-            player_events_points_df= save_filter(player_events_points_df, "LOG_IN", start_date, end_date)
-    aggregated_df = player_events_points_df.groupby(['DAY']).agg({
-        'DAMAGE_POINTS': 'sum',
-        'DISTANCE_POINTS': 'sum',
-        'KILLS_POINTS': 'sum',
-        'HEADSHOTS_POINTS': 'sum',
-        'HEALS_POINTS': 'sum',
-        'ASSISTS_POINTS': 'sum',
-        'BOOSTS_POINTS': 'sum',
-        'WEAPONS_POINTS': 'sum'
-    }).reset_index()
-    col1, col2 = st.columns(2)
-    with col1:
-        fig = px.line(
-            aggregated_df,
-            x='DAY', 
-            y=['DAMAGE_POINTS', 'DISTANCE_POINTS', 'KILLS_POINTS', 'HEADSHOTS_POINTS', 
-               'HEALS_POINTS', 'ASSISTS_POINTS', 'BOOSTS_POINTS', 'WEAPONS_POINTS'],
-            title="Points Over Time per User",
-            labels={"DAY": "Date", "value": "Points", "variable": "Point Type"},
-            markers=True,
-            render_mode='svg'
-        )
-        st.plotly_chart(fig)
+# only the selected section runs, the churn prediction is kept per lineage token of the features it scored
+player_tabs = LazyTabs(["POINTS",
+                        "SUPPORT TICKET",
+                        "PURCHASES",
+                        "SESSIONS",
+                        "CHURN LIKELIHOOD"], frame_cache())
+player_tabs.select(st.radio("Section", options=player_tabs.labels, horizontal=True, key="player_360_tab", label_visibility="collapsed"))
+
+if player_tabs.is_open("POINTS"):
+    with player_tabs.section("POINTS"):
+        player_events_points_df['DAY'] = pd.to_datetime(player_events_points_df['LOG_IN'].dt.date)
+        if start_date:
+                player_events_points_df= save_filter(player_events_points_df, "LOG_IN", start_date, end_date, lineage=points_lineage)
+        aggregated_df = player_events_points_df.groupby(['DAY']).agg({
+            'DAMAGE_POINTS': 'sum',
+            'DISTANCE_POINTS': 'sum',
+            'KILLS_POINTS': 'sum',
+            'HEADSHOTS_POINTS': 'sum',
+            'HEALS_POINTS': 'sum',
+            'ASSISTS_POINTS': 'sum',
+            'BOOSTS_POINTS': 'sum',
+            'WEAPONS_POINTS': 'sum'
+        }).reset_index()
+        col1, col2 = st.columns(2)
+        with col1:
+            fig = px.line(
+                aggregated_df,
+                x='DAY', 
+                y=['DAMAGE_POINTS', 'DISTANCE_POINTS', 'KILLS_POINTS', 'HEADSHOTS_POINTS', 
+                   'HEALS_POINTS', 'ASSISTS_POINTS', 'BOOSTS_POINTS', 'WEAPONS_POINTS'],
+                title="Points Over Time per User",
+                labels={"DAY": "Date", "value": "Points", "variable": "Point Type"},
+                markers=True,
+                render_mode='svg'
+            )
+            st.plotly_chart(fig)
         
-    with col2:
-        aggregated_user_df = aggregated_df[['DAMAGE_POINTS', 'DISTANCE_POINTS', 'KILLS_POINTS', 
-                                                      'HEADSHOTS_POINTS', 'HEALS_POINTS', 'ASSISTS_POINTS', 
-                                                      'BOOSTS_POINTS', 'WEAPONS_POINTS']].sum().reset_index()
-        aggregated_user_df.columns = ['Point Category', 'Points']
-        aggregated_user_df = aggregated_user_df.drop(aggregated_user_df.index[0]).reset_index(drop=True)
+        with col2:
+            aggregated_user_df = aggregated_df[['DAMAGE_POINTS', 'DISTANCE_POINTS', 'KILLS_POINTS', 
+                                                          'HEADSHOTS_POINTS', 'HEALS_POINTS', 'ASSISTS_POINTS', 
+                                                          'BOOSTS_POINTS', 'WEAPONS_POINTS']].sum().reset_index()
+            aggregated_user_df.columns = ['Point Category', 'Points']
+            aggregated_user_df = aggregated_user_df.drop(aggregated_user_df.index[0]).reset_index(drop=True)
         
-        fig = px.pie(aggregated_user_df, names='Point Category', values="Points", title=f"Points Breakdown For User {user_id}")
-        st.plotly_chart(fig,use_container_width=True)
+            fig = px.pie(aggregated_user_df, names='Point Category', values="Points", title=f"Points Breakdown For User {user_id}")
+            st.plotly_chart(fig,use_container_width=True)
     
 
-with support_ticket:
-    # SUPPORT_TICKETS
+if player_tabs.is_open("SUPPORT TICKET"):
+    with player_tabs.section("SUPPORT TICKET"):
+        # SUPPORT_TICKETS
     
-    user_support_ticket_df = support_ticket_df[support_ticket_df['USER_ID'] == user_id]
-    st.markdown("### Support Ticket")
-    if len(user_support_ticket_df) == 0:
-        st.markdown(f"**HAS SUPPORT TICKET:** FALSE")
-    else:
-        st.markdown(f"**HAS SUPPORT TICKET:** TRUE")
-        st.markdown(f"**CATEGORY:** {user_support_ticket_df['CATEGORY'].values[0]}")
-        st.markdown(f"**CASE DESCRIPTION:** {user_support_ticket_df['CASE_DESCRIPTION'].values[0]}")
-        st.markdown(f"**SENTIMENT ANALYSIS:** {user_support_ticket_df['SENTIMENT_ANALYSIS'].values[0]}")
-        st.markdown(f"**DATE CREATED:** {user_support_ticket_df['DATE_CREATED'].values[0]}")
-        # TODO summarize support ticket description
-    st.divider()
-
-with purchases:
-    # PURCHASES 
+        st.markdown("### Support Ticket")
+        if profile['TOTAL_SUPPORT_TICKETS'] == 0:
+            st.markdown(f"**HAS SUPPORT TICKET:** FALSE")
+        else:
+            st.markdown(f"**HAS SUPPORT TICKET:** TRUE")
+            st.markdown(f"**CATEGORY:** {profile['TICKET_CATEGORY']}")
+            st.markdown(f"**CASE DESCRIPTION:** {profile['TICKET_CASE_DESCRIPTION']}")
+            st.markdown(f"**SENTIMENT ANALYSIS:** {profile['TICKET_SENTIMENT_ANALYSIS']}")
+            st.markdown(f"**DATE CREATED:** {profile['TICKET_DATE_CREATED']}")
+            # TODO summarize support ticket description
+        st.divider()
+
+if player_tabs.is_open("PURCHASES"):
+    with player_tabs.section("PURCHASES"):
+        # PURCHASES 
    
-    purchases_df['DAY'] = pd.to_datetime(purchases_df['TIMESTAMP_OF_PURCHASE'].dt.date)
-    purchased_df['DAY'] = pd.to_datetime(purchased_df['TIMESTAMP_OF_PURCHASE'].dt.date)
-    if start_date:
-        purchases_df = save_filter(purchases_df, 'TIMESTAMP_OF_PURCHASE', start_date, end_date)
-        purchased_df = save_filter(purchased_df, 'TIMESTAMP_OF_PURCHASE', start_date, end_date)
+        purchases_df['DAY'] = pd.to_datetime(purchases_df['TIMESTAMP_OF_PURCHASE'].dt.date)
+        purchased_df['DAY'] = pd.to_datetime(purchased_df['TIMESTAMP_OF_PURCHASE'].dt.date)
+        if start_date:
+            purchases_df = save_filter(purchases_df, 'TIMESTAMP_OF_PURCHASE', start_date, end_date, lineage=purchases_lineage)
+            purchased_df = save_filter(purchased_df, 'TIMESTAMP_OF_PURCHASE', start_date, end_date, lineage=purchased_lineage)
+            purchases_lineage = derive(purchases_lineage, start_date=start_date, end_date=end_date)
     
-    # include total_ads seen and total_purchases over time to show behavior over  time
-    day_purchases_df = purchases_df.groupby('DAY').agg(
-        total_ads=('AD_INTERACTION_ID', 'count'),
-        total_ad_engagement_time=('AD_ENGAGEMENT_TIME', 'sum')
-    ).reset_index() 
-    day_purchased_df = purchased_df.groupby('DAY').agg(
-        total_purchase_amount=('PURCHASE_AMOUNT', 'sum'),
-        total_purchases = ('PURCHASE_ID', 'count')
-    ).reset_index()
+        # include total_ads seen and total_purchases over time to show behavior over  time
+        day_purchases_df = purchases_df.groupby('DAY').agg(
+            total_ads=('AD_INTERACTION_ID', 'count'),
+            total_ad_engagement_time=('AD_ENGAGEMENT_TIME', 'sum')
+        ).reset_index() 
+        day_purchased_df = purchased_df.groupby('DAY').agg(
+            total_purchase_amount=('PURCHASE_AMOUNT', 'sum'),
+            total_purchases = ('PURCHASE_ID', 'count')
+        ).reset_index()
     
-    col1, col2 = st.columns(2)
-    with col1:
-        # include player type for analytics breakdown
-        purchase_summary = purchases_df.groupby('PURCHASE_TYPE')['PURCHASE_AMOUNT'].sum().reset_index()
-        purchase_summary = purchase_summary[purchase_summary['PURCHASE_TYPE'] != 'none']
-        fig = px.pie(purchase_summary, 
-                 names='PURCHASE_TYPE', 
-                 values='PURCHASE_AMOUNT', 
-                 title='Purchase Amount by Category')
-        st.plotly_chart(fig,use_container_width=True)
-
-        purchase_amount_over_time_df = purchases_df.groupby(['DAY','PURCHASE_TYPE'])['PURCHASE_AMOUNT'].sum().reset_index()
-        purchase_amount_over_time_df = purchase_amount_over_time_df[purchase_amount_over_time_df['PURCHASE_TYPE'] != 'none']
+        col1, col2 = st.columns(2)
+        with col1:
+            # include player type for analytics breakdown
+            purchase_summary = purchases_df.groupby('PURCHASE_TYPE')['PURCHASE_AMOUNT'].sum().reset_index()
+            purchase_summary = purchase_summary[purchase_summary['PURCHASE_TYPE'] != 'none']
+            fig = px.pie(purchase_summary, 
+                     names='PURCHASE_TYPE', 
+                     values='PURCHASE_AMOUNT', 
+                     title='Purchase Amount by Category')
+            st.plotly_chart(fig,use_container_width=True)
+
+            purchase_amount_over_time_df = purchases_df.groupby(['DAY','PURCHASE_TYPE'])['PURCHASE_AMOUNT'].sum().reset_index()
+            purchase_amount_over_time_df = purchase_amount_over_time_df[purchase_amount_over_time_df['PURCHASE_TYPE'] != 'none']
         
-        fig = px.line(purchase_amount_over_time_df, 
-                  x='DAY', 
-                  y='PURCHASE_AMOUNT', 
-                  color='PURCHASE_TYPE', 
-                  title="Purchasing Behavior Over Time by Purchase Category",
-                      render_mode='svg')
-        st.plotly_chart(fig, use_container_width=True)
-
-    with col2:
-        # include ad type for engagement analytics
-        purchase_summary = purchases_df.groupby('AD_TYPE')['PURCHASE_AMOUNT'].sum().reset_index()
-        fig = px.pie(purchase_summary, 
-                 names='AD_TYPE', 
-                 values='PURCHASE_AMOUNT', 
-                 title='Purchase Amount by AD Type')
-        st.plotly_chart(fig,use_container=True)
-
-        purchase_amount_over_time_df = purchases_df.groupby(['DAY','AD_TYPE'])['PURCHASE_AMOUNT'].sum().reset_index()
-        fig = px.line(purchase_amount_over_time_df, 
-                    x='DAY', 
-                    y='PURCHASE_AMOUNT', 
-                    color='AD_TYPE', 
-                    title="Purchasing Behavior Over Time by AD Type",
-                     render_mode='svg')
-        st.plotly_chart(fig, use_container_width=True)
-
-    result_df = pd.merge(day_purchases_df, day_purchased_df, on=['DAY'], how='left').fillna(0)
-    result_df.columns = [u.upper() for u in result_df.columns]
-    st.markdown(f"**Customer Spending Over Time**")
-    st.line_chart(result_df, x='DAY', y=['TOTAL_ADS', 'TOTAL_PURCHASE_AMOUNT', 'TOTAL_AD_ENGAGEMENT_TIME', "TOTAL_PURCHASES"])
-
-
-
-    st.markdown("### ADS")
-    create_pagination(purchases_df, "purchases")
-
-
-with sessions:
+            fig = px.line(purchase_amount_over_time_df, 
+                      x='DAY', 
+                      y='PURCHASE_AMOUNT', 
+                      color='PURCHASE_TYPE', 
+                      title="Purchasing Behavior Over Time by Purchase Category",
+                          render_mode='svg')
+            st.plotly_chart(fig, use_container_width=True)
+
+        with col2:
+            # include ad type for engagement analytics
+            purchase_summary = purchases_df.groupby('AD_TYPE')['PURCHASE_AMOUNT'].sum().reset_index()
+            fig = px.pie(purchase_summary, 
+                     names='AD_TYPE', 
+                     values='PURCHASE_AMOUNT', 
+                     title='Purchase Amount by AD Type')
+            st.plotly_chart(fig,use_container=True)
+
+            purchase_amount_over_time_df = purchases_df.groupby(['DAY','AD_TYPE'])['PURCHASE_AMOUNT'].sum().reset_index()
+            fig = px.line(purchase_amount_over_time_df, 
+                        x='DAY', 
+                        y='PURCHASE_AMOUNT', 
+                        color='AD_TYPE', 
+                        title="Purchasing Behavior Over Time by AD Type",
+                         render_mode='svg')
+            st.plotly_chart(fig, use_container_width=True)
+
+        result_df = pd.merge(day_purchases_df, day_purchased_df, on=['DAY'], how='left').fillna(0)
+        result_df.columns = [u.upper() for u in result_df.columns]
+        st.markdown(f"**Customer Spending Over Time**")
+        st.line_chart(result_df, x='DAY', y=['TOTAL_ADS', 'TOTAL_PURCHASE_AMOUNT', 'TOTAL_AD_ENGAGEMENT_TIME', "TOTAL_PURCHASES"])
+
+
+
+        st.markdown("### ADS")
+        create_pagination(purchases_df, "purchases", lineage=purchases_lineage)
+
+
+if player_tabs.is_open("SESSIONS"):
+    with player_tabs.section("SESSIONS"):
    
-    sessions_df["DAY"] = pd.to_datetime(sessions_df["LOG_IN"].dt.date)
-    if start_date:
-        sessions_df = save_filter(sessions_df, "LOG_IN", start_date, end_date)
-    col1, col2 = st.columns(2)
-    with col1:
-        sessions_summary = sessions_df.groupby('DEVICE_TYPE')['SESSION_DURATION_MINUTES'].sum().reset_index()
-        fig = px.pie(sessions_summary, 
-                 names='DEVICE_TYPE', 
-                 values='SESSION_DURATION_MINUTES', 
-                 title='GAMETIME BY DEVICE TYPE')
-        st.plotly_chart(fig,use_container_width=True)
-
-    with col2:
+        sessions_df["DAY"] = pd.to_datetime(sessions_df["LOG_IN"].dt.date)
         if start_date:
-            date_range = pd.date_range(start_date, end_date, freq='D')
-        else:
-            date_range = pd.date_range(first_login, end_date, freq='D')
+            sessions_df = save_filter(sessions_df, "LOG_IN", start_date, end_date, lineage=sessions_lineage)
+            sessions_lineage = derive(sessions_lineage, start_date=start_date, end_date=end_date)
+        col1, col2 = st.columns(2)
+        with col1:
+            sessions_summary = sessions_df.groupby('DEVICE_TYPE')['SESSION_DURATION_MINUTES'].sum().reset_index()
+            fig = px.pie(sessions_summary, 
+                     names='DEVICE_TYPE', 
+                     values='SESSION_DURATION_MINUTES', 
+                     title='GAMETIME BY DEVICE TYPE')
+            st.plotly_chart(fig,use_container_width=True)
+
+        with col2:
+            if start_date:
+                date_range = pd.date_range(start_date, end_date, freq='D')
+            else:
+                date_range = pd.date_range(first_login, end_date, freq='D')
         
-        day_sessions_df = sessions_df.groupby('DAY').agg(
-            total_session_duration=('SESSION_DURATION_MINUTES', 'sum'),
-            total_sessions=('SESSION_ID', 'count')
-        ).reset_index()
+            day_sessions_df = sessions_df.groupby('DAY').agg(
+                total_session_duration=('SESSION_DURATION_MINUTES', 'sum'),
+                total_sessions=('SESSION_ID', 'count')
+            ).reset_index()
     
-        # for each user add in the days they were inactive as 0,0,0
-        day_sessions_df['SESSION_INACTIVE'] = 0
-        day_sessions_df.columns = [u.upper() for u in list(day_sessions_df.columns)]
+            # for each user add in the days they were inactive as 0,0,0
+            day_sessions_df['SESSION_INACTIVE'] = 0
+            day_sessions_df.columns = [u.upper() for u in list(day_sessions_df.columns)]
         
-        # Create a dataframe with all days for this user
-        user_days_df = pd.DataFrame({'DAY': date_range})
+            # Create a dataframe with all days for this user
+            user_days_df = pd.DataFrame({'DAY': date_range})
     
-        # Merge with existing day_sessions_df to get the corresponding session data
-        day_sessions_df = pd.merge(user_days_df, day_sessions_df, 
-                                     on=['DAY'], how='outer')
+            # Merge with existing day_sessions_df to get the corresponding session data
+            day_sessions_df = pd.merge(user_days_df, day_sessions_df, 
+                                         on=['DAY'], how='outer')
         
-        # Fill missing values with 0
-        day_sessions_df['TOTAL_SESSION_DURATION'] = day_sessions_df['TOTAL_SESSION_DURATION'].fillna(0)
-        day_sessions_df['TOTAL_SESSIONS'] = day_sessions_df['TOTAL_SESSIONS'].fillna(0)
-        day_sessions_df['SESSION_INACTIVE'] = day_sessions_df['SESSION_INACTIVE'].fillna(1)
+            # Fill missing values with 0
+            day_sessions_df['TOTAL_SESSION_DURATION'] = day_sessions_df['TOTAL_SESSION_DURATION'].fillna(0)
+            day_sessions_df['TOTAL_SESSIONS'] = day_sessions_df['TOTAL_SESSIONS'].fillna(0)
+            day_sessions_df['SESSION_INACTIVE'] = day_sessions_df['SESSION_INACTIVE'].fillna(1)
         
-        # Create the plotly figure
-        fig = go.Figure()
+            # Create the plotly figure
+            fig = go.Figure()
         
-        # Plot Total Sessions (blue line with markers)
-        fig.add_trace(go.Scatter(x=day_sessions_df['DAY'], 
-                                 y=day_sessions_df['TOTAL_SESSIONS'], 
-                                 mode='lines+markers', 
-                                 name='Total Sessions', 
-                                 line=dict(color='blue'), 
-                                 marker=dict(symbol='circle')))
+            # Plot Total Sessions (blue line with markers)
+            fig.add_trace(go.Scatter(x=day_sessions_df['DAY'], 
+                                     y=day_sessions_df['TOTAL_SESSIONS'], 
+                                     mode='lines+markers', 
+                                     name='Total Sessions', 
+                                     line=dict(color='blue'), 
+                                     marker=dict(symbol='circle')))
         
-        # Plot Total Session Duration (green line with x markers)
-        fig.add_trace(go.Scatter(x=day_sessions_df['DAY'], 
-                                 y=day_sessions_df['TOTAL_SESSION_DURATION'], 
-                                 mode='lines+markers', 
-                                 name='Total Session Duration', 
-                                 line=dict(color='red'), 
-                                 marker=dict(symbol='x')))
+            # Plot Total Session Duration (green line with x markers)
+            fig.add_trace(go.Scatter(x=day_sessions_df['DAY'], 
+                                     y=day_sessions_df['TOTAL_SESSION_DURATION'], 
+                                     mode='lines+markers', 
+                                     name='Total Session Duration', 
+                                     line=dict(color='red'), 
+                                     marker=dict(symbol='x')))
         
-        # Identify inactive periods
-        inactive_mask = day_sessions_df['SESSION_INACTIVE'] == 1
-
-        if start_date:
-            start_day = start_date
-        else:
-            start_day = first_login
-        end_day = None
+            # Identify inactive periods
+            inactive_mask = day_sessions_df['SESSION_INACTIVE'] == 1
+
+            if start_date:
+                start_day = start_date
+            else:
+                start_day = first_login
+            end_day = None
         
-        # Add shaded regions for inactivity periods
-        for i in range(1, len(day_sessions_df)):
-            if inactive_mask[i] and not inactive_mask[i-1]:
-                # Start of inactivity
-                start_day = day_sessions_df['DAY'].iloc[i]
-            elif not inactive_mask[i] and inactive_mask[i-1]:
-                # End of inactivity
-                end_day = day_sessions_df['DAY'].iloc[i-1]
-                fig.add_vrect(x0=start_day, x1=end_day, fillcolor="gray", opacity=0.3, line_width=0)
+            # Add shaded regions for inactivity periods
+            for i in range(1, len(day_sessions_df)):
+                if inactive_mask[i] and not inactive_mask[i-1]:
+                    # Start of inactivity
+                    start_day = day_sessions_df['DAY'].iloc[i]
+                elif not inactive_mask[i] and inactive_mask[i-1]:
+                    # End of inactivity
+                    end_day = day_sessions_df['DAY'].iloc[i-1]
+                    fig.add_vrect(x0=start_day, x1=end_day, fillcolor="gray", opacity=0.3, line_width=0)
         
-        fig.update_layout(
-            title=f'Session Metrics for User {user_id}',
-            xaxis_title='Day',
-            yaxis_title='Value',
-            xaxis_tickangle=45,  
-            legend_title="Metrics",
-            template="plotly",
-        )
+            fig.update_layout(
+                title=f'Session Metrics for User {user_id}',
+                xaxis_title='Day',
+                yaxis_title='Value',
+                xaxis_tickangle=45,  
+                legend_title="Metrics",
+                template="plotly",
+            )
 
        
-        st.plotly_chart(fig)
+            st.plotly_chart(fig)
 
-    st.markdown("### SESSIONS")
-    create_pagination(sessions_df, "sessions")
+        st.markdown("### SESSIONS")
+        create_pagination(sessions_df, "sessions", lineage=sessions_lineage)
 
 def create_rolling_plot(x_col, y_cols, chart_df, title):
     # Create a figure
@@ -649,116 +773,147 @@ def create_rolling_plot(x_col, y_cols, chart_df, title):
 
     return fig
 
-with churn_likelihood:
-    # ML Model
-    if st.session_state.active_user == 0:
-        features_df = load_query(f"SELECT * FROM {session.get_current_database()}.APP.ROLLING_CHURN_FEATURES WHERE USER_ID = {user_id}")
-        features_df['DAY'] = pd.to_datetime(features_df['DAY'])
-        features_df = features_df[features_df['DAY'] >= start_date]
-        chart_df = features_df
-    else:
-        features_df = load_query(f"SELECT * FROM {session.get_current_database()}.APP.TO_BE_PREDICTED_CHURN_FEATURES WHERE USER_ID = {user_id}")
-        chart_df = load_query(f"SELECT * FROM {session.get_current_database()}.APP.ROLLING_CHURN_FEATURES WHERE USER_ID = {user_id}")
-        chart_df['DAY'] = pd.to_datetime(chart_df['DAY'])
-        chart_df = chart_df[chart_df['DAY'] >= start_date]
+if player_tabs.is_open("CHURN LIKELIHOOD"):
+    with player_tabs.section("CHURN LIKELIHOOD"):
+        # ML Model
+        if st.session_state.active_user == 0:
+            features_df = player_bundle.rolling_features
+            features_df['DAY'] = pd.to_datetime(features_df['DAY'])
+            features_df = features_df[features_df['DAY'] >= start_date]
+            chart_df = features_df
+        else:
+            features_df = player_bundle.to_predict
+            chart_df = player_bundle.rolling_features
+            chart_df['DAY'] = pd.to_datetime(chart_df['DAY'])
+            chart_df = chart_df[chart_df['DAY'] >= start_date]
     
-    Features_label = [
-    "TOTAL_SESSION_DURATION_ROLLING_30_DAYS",
-    "TOTAL_SESSIONS_ROLLING_30_DAYS",
-    "AVERAGE_SESSION_LEN_ROLLING_30_DAYS",
-    "TOTAL_POINTS_ROLLING_30_DAYS",
-    "AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS",
-    "TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS",
-    "TOTAL_PURCHASES_ROLLING_30_DAYS",
-    "AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS",
-    "TOTAL_ADS_ROLLING_30_DAYS",
-    "AD_CONVERSION_RATE_ROLLING_30_DAYS",
-    "TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS",
-    "AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS"
-    ]
-
-    X_test = features_df[Features_label]
-
-    reg = Registry(session=session)
-
-    MODEL_NAME = "Player360_RollingChurn_Classifier"
-    MODEL_VERSION = "v1"
+        Features_label = [
+        "TOTAL_SESSION_DURATION_ROLLING_30_DAYS",
+        "TOTAL_SESSIONS_ROLLING_30_DAYS",
+        "AVERAGE_SESSION_LEN_ROLLING_30_DAYS",
+        "TOTAL_POINTS_ROLLING_30_DAYS",
+        "AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS",
+        "TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS",
+        "TOTAL_PURCHASES_ROLLING_30_DAYS",
+        "AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS",
+        "TOTAL_ADS_ROLLING_30_DAYS",
+        "AD_CONVERSION_RATE_ROLLING_30_DAYS",
+        "TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS",
+        "AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS"
+        ]
+
+        X_test = features_df[Features_label]
+
+        MODEL_NAME = "Player360_RollingChurn_Classifier"
+        MODEL_VERSION = "v1"
     
     
-    mv= cache_model(MODEL_NAME, MODEL_VERSION)
-    mv_prediction = mv.run(X_test, function_name="predict_proba")
-    prediction_value = mv_prediction['PREDICT_PROBA_1'].values[0]
-    if prediction_value >= .5:
-        st.markdown(f"""
-            <div style="padding: 10px; border-radius: 5px; background-color: #f8d7da; color: #721c24; font-size: 18px; font-weight: bold;">
-                🚨 <strong>Predicted Churn Likelihood:</strong> <span style="color: #d63384;">{prediction_value:.2f}</span>
+        def predict_churn():
+            # scored in the app process with the cached booster, no warehouse round trip
+            with span('predict_proba', 'model', queries=True):
+                mv_prediction = model_cache().predict_proba(MODEL_NAME, X_test, MODEL_VERSION)
+            return mv_prediction['PREDICT_PROBA_1'].values[0]
+        # the batch score of this player's feature row, if this model version scored the row on the page,
+        # the query drops scores whose feature hash no longer matches and a score of an older DAY is not shown
+        scored_df = player_bundle.churn_prediction
+        if scored_df is not None:
+            scored_df = scored_df[(scored_df['MODEL_NAME'] == MODEL_NAME) & (scored_df['MODEL_VERSION'] == MODEL_VERSION)
+                                  & pd.to_datetime(scored_df['DAY']).isin(pd.to_datetime(features_df['DAY']))]
+        if scored_df is not None and len(scored_df):
+            prediction_value = float(scored_df['PREDICT_PROBA_1'].iloc[0])
+            st.caption(f"Scored by {MODEL_NAME} {MODEL_VERSION} at {scored_df['SCORED_AT'].iloc[0]}")
+        else:
+            features_table = 'APP.ROLLING_CHURN_FEATURES' if st.session_state.active_user == 0 else 'APP.TO_BE_PREDICTED_CHURN_FEATURES'
+            prediction_lineage = lineage(table_version, features_table, user_id=player_key[0], start_date=start_date, model=(MODEL_NAME, MODEL_VERSION))
+            prediction_value = player_tabs.memo("CHURN LIKELIHOOD", 'prediction', prediction_lineage, predict_churn)
+        if prediction_value >= .5:
+            st.markdown(f"""
+                <div style="padding: 10px; border-radius: 5px; background-color: #f8d7da; color: #721c24; font-size: 18px; font-weight: bold;">
+                    🚨 <strong>Predicted Churn Likelihood:</strong> <span style="color: #d63384;">{prediction_value:.2f}</span>
+                </div>
+            """, unsafe_allow_html=True)
+        else:
+            st.markdown(f"""
+            <div style="padding: 10px; border-radius: 5px; background-color: #d4edda; color: #155724; font-size: 18px; font-weight: bold;">
+                ✅ <strong>Predicted Churn Likelihood:</strong> <span style="color: #28a745;">{prediction_value:.2f}</span>
             </div>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown(f"""
-        <div style="padding: 10px; border-radius: 5px; background-color: #d4edda; color: #155724; font-size: 18px; font-weight: bold;">
-            ✅ <strong>Predicted Churn Likelihood:</strong> <span style="color: #28a745;">{prediction_value:.2f}</span>
-        </div>
-        """, unsafe_allow_html=True)        
-
-    with st.form("Shap_form"):
-        sample_size = st.slider(label="Select Sampling Size",
-                                    min_value = 0,
-                                    max_value = len(chart_df),
-                                    value = 1)
-        selected_plot_type = st.selectbox(label='Select a summary plot type', \
-                                          options=['dot', 'bar', 'violin'])
-        submitted = st.form_submit_button("Get Global Shap")
-        if submitted:
-            sample_df = chart_df[Features_label]
-            mv_explanations = mv.run(sample_df[:sample_size], function_name="explain")
-            mv_explanations.columns = [u.replace("_explanation", "").strip('""') for u in mv_explanations.columns]
-            
-            def render_shap_plot():
-                plt.figure(figsize=(8, 4))
-                shap.summary_plot(-mv_explanations.values, sample_df[:sample_size], show=False, plot_type = selected_plot_type)
-                buf = io.BytesIO()
-                plt.tight_layout()
-                plt.savefig(buf, format='png')
-                buf.seek(0)
-                return buf
-            st.subheader("SHAP Summary Plot")
-            buf = render_shap_plot()
-            st.image(buf, caption='SHAP Summary Plot', use_column_width=True)
-
-    col1, col2 = st.columns(2)
-    with col1:
-
-        st.plotly_chart(create_rolling_plot('DAY', ["TOTAL_SESSION_DURATION_ROLLING_30_DAYS", \
-                                                            "TOTAL_SESSIONS_ROLLING_30_DAYS", \
-                                                            "AVERAGE_SESSION_LEN_ROLLING_30_DAYS"], chart_df, 
-                                                     'Rolling 30 Day Sessions Features Over Time'), 
-                        use_container_width=True)
-
-        fig = px.line(
-            data_frame=chart_df,
-            x='DAY', 
-            y=[ "TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS",
-                "TOTAL_PURCHASES_ROLLING_30_DAYS",
-                "AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS",],
-            title="Rolling 30 Day Purchases Features Over Time",
-            labels={"DAY": "Date", "value": "Points", "variable": "Feature"},
-            markers=True,
-            render_mode='svg'
-        )
-        st.plotly_chart(fig, use_container_width=True)
-
-    with col2:
-        st.plotly_chart(create_rolling_plot('DAY', 
-                                                     ["TOTAL_POINTS_ROLLING_30_DAYS","AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS"], 
-                                                     chart_df,
-                                            'Rolling 30 Day Points Features Over Time'), 
-                        use_container_width=True)
-        st.plotly_chart(create_rolling_plot('DAY', 
-                                                     ["TOTAL_ADS_ROLLING_30_DAYS",
-                                                    "AD_CONVERSION_RATE_ROLLING_30_DAYS",
-                                                    "TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS",
-                                                    "AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS"], 
-                                                     chart_df,
-                                                    'Rolling 30 Day Ads Features Over Time'), 
-                        use_container_width=True)
+            """, unsafe_allow_html=True)        
+
+        with st.form("Shap_form"):
+            sample_size = st.slider(label="Select Sampling Size",
+                                        min_value = 0,
+                                        max_value = len(chart_df),
+                                        value = 1)
+            selected_plot_type = st.selectbox(label='Select a summary plot type', \
+                                              options=['dot', 'bar', 'violin'])
+            submitted = st.form_submit_button("Get Global Shap")
+            if submitted:
+                sample_df = chart_df[Features_label]
+                stored_df = None
+                if PRECOMPUTED_SHAP:
+                    # the stored rows of the days on the chart, a rerun reads them again only when the table changed
+                    shap_lineage = lineage(table_version, f"APP.{ROLLING_MODEL.table}", user_id=player_key[0])
+                    stored_df = player_tabs.memo("CHURN LIKELIHOOD", 'shap_rows', shap_lineage,
+                                                 lambda: load_player_shap(session.get_current_database(), player_key[0]))
+                    stored_df = stored_df[pd.to_datetime(stored_df['DAY']) >= start_date]
+                if stored_df is not None and len(stored_df) >= sample_size:
+                    shap_values, shap_features = plot_values(ROLLING_MODEL, stored_df[:sample_size])
+                else:
+                    mv = cache_model(MODEL_NAME, MODEL_VERSION)
+                    with span('explain', 'model', queries=True):
+                        mv_explanations = mv.run(sample_df[:sample_size], function_name="explain")
+                    mv_explanations.columns = [u.replace("_explanation", "").strip('""') for u in mv_explanations.columns]
+                    shap_values, shap_features = -mv_explanations.values, sample_df[:sample_size]
+
+                st.subheader("SHAP Summary Plot")
+                with span('shap_summary_plot', 'chart'):
+                    key = plot_artifacts().submit('shap_summary', draw_shap_summary, shap_values, shap_features, selected_plot_type)
+                    show_artifact(key, 'SHAP Summary Plot')
+
+        col1, col2 = st.columns(2)
+        with col1:
+
+            st.plotly_chart(create_rolling_plot('DAY', ["TOTAL_SESSION_DURATION_ROLLING_30_DAYS", \
+                                                                "TOTAL_SESSIONS_ROLLING_30_DAYS", \
+                                                                "AVERAGE_SESSION_LEN_ROLLING_30_DAYS"], chart_df, 
+                                                         'Rolling 30 Day Sessions Features Over Time'), 
+                            use_container_width=True)
+
+            fig = px.line(
+                data_frame=chart_df,
+                x='DAY', 
+                y=[ "TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS",
+                    "TOTAL_PURCHASES_ROLLING_30_DAYS",
+                    "AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS",],
+                title="Rolling 30 Day Purchases Features Over Time",
+                labels={"DAY": "Date", "value": "Points", "variable": "Feature"},
+                markers=True,
+                render_mode='svg'
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+        with col2:
+            st.plotly_chart(create_rolling_plot('DAY', 
+                                                         ["TOTAL_POINTS_ROLLING_30_DAYS","AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS"], 
+                                                         chart_df,
+                                                'Rolling 30 Day Points Features Over Time'), 
+                            use_container_width=True)
+            st.plotly_chart(create_rolling_plot('DAY', 
+                                                         ["TOTAL_ADS_ROLLING_30_DAYS",
+                                                        "AD_CONVERSION_RATE_ROLLING_30_DAYS",
+                                                        "TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS",
+                                                        "AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS"], 
+                                                         chart_df,
+                                                        'Rolling 30 Day Ads Features Over Time'), 
+                            use_container_width=True)
+
+# warm the neighbouring and recently viewed players once the page is rendered
+recent_players = [uid for uid in st.session_state.get('recent_players', []) if uid != user_id]
+st.session_state.recent_players = [int(user_id)] + recent_players[:PREFETCH_RECENT - 1]
+player_prefetcher(session.get_current_database()).prefetch(
+    [(uid, player_store.is_active(uid)) for uid in neighbour_ids(int(user_id), PREFETCH_RADIUS) + recent_players
+     if uid in player_store], bundle_lineage)
+
+show_cache_stats()
+render_trace.finish()
+show_render_profile(render_trace)
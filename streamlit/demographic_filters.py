@@ -0,0 +1,64 @@
+# Vectorized version of the GAME_360 sidebar filters for player frames already in memory,
+# every selection is combined into one boolean mask and the frame is indexed once
+import numpy as np
+
+from query_builder import EdaFilters, age_ranges_dict
+
+AGE_RANGE_NAMES = list(age_ranges_dict)
+# the ranges are sorted and do not overlap, so an age falls into the last range starting at or below it
+AGE_RANGE_LOWER = np.array([age_ranges_dict[name][0] for name in AGE_RANGE_NAMES], dtype=float)
+AGE_RANGE_UPPER = np.array([age_ranges_dict[name][1] for name in AGE_RANGE_NAMES], dtype=float)
+
+
+def age_range_codes(ages):
+    """Position of every age's range in ``age_ranges_dict``, -1 when it is in none of them."""
+    ages = np.asarray(ages, dtype=float)
+    codes = np.searchsorted(AGE_RANGE_LOWER, ages, side='right') - 1
+    outside = (codes < 0) | ~(ages <= AGE_RANGE_UPPER[np.maximum(codes, 0)])
+    codes[outside] = -1
+    return codes
+
+
+def _equals(df, column, value):
+    return df[column].to_numpy() == value
+
+
+def demographic_mask(df, filters, age_codes=None):
+    """Boolean mask of the rows of ``df`` matching ``filters``, ``age_codes`` can be precomputed with age_range_codes."""
+    mask = np.ones(len(df), dtype=bool)
+
+    if filters.playerbase == 'Active':
+        mask &= _equals(df, 'CHURNED', 0)
+    elif filters.playerbase == 'Inactive':
+        mask &= _equals(df, 'CHURNED', 1)
+
+    if filters.age_ranges:
+        if age_codes is None:
+            age_codes = age_range_codes(df['AGE'])
+        # lookup table indexed by range code, the last entry is hit by -1
+        selected = np.zeros(len(AGE_RANGE_NAMES) + 1, dtype=bool)
+        selected[[AGE_RANGE_NAMES.index(name) for name in filters.age_ranges]] = True
+        mask &= selected[age_codes]
+
+    if filters.gender in ('Male', 'Female'):
+        mask &= _equals(df, 'GENDER', filters.gender)
+
+    if filters.country_ranges:
+        mask &= df['LOCATION'].isin(filters.country_ranges).to_numpy()
+
+    if filters.player_type in ('Hardcore', 'Casual'):
+        mask &= _equals(df, 'PLAYER_TYPE', filters.player_type)
+
+    if filters.support_ticket == 'Yes':
+        mask &= _equals(df, 'HAS_SUPPORT_TICKET', True)
+    elif filters.support_ticket == 'No':
+        mask &= _equals(df, 'HAS_SUPPORT_TICKET', False)
+
+    if filters.rank_range:
+        mask &= df['RANK_NAME'].isin(filters.rank_range).to_numpy()
+
+    return mask
+
+
+def filter_players(df, filters=EdaFilters(), age_codes=None):
+    return df[demographic_mask(df, filters, age_codes)]
@@ -0,0 +1,239 @@
+# Per-rerun timing of the two apps. Queries, transforms, charts and model calls run inside spans, the spans
+# of one rerun form a tree with wall times, cache hit flags and the Snowflake query IDs issued inside them.
+# A finished rerun is logged as one JSON line and kept in a bounded history that gives the p95 of every span.
+#
+#   render_trace = RenderTrace('PLAYER_360', session, history=render_history()).start()
+#   with span('player_bundle', 'query', queries=True):
+#       ...
+#   render_trace.finish()
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger('player360.render')
+
+SPAN_KINDS = ('page', 'section', 'query', 'transform', 'chart', 'model')
+
+# Streamlit runs the script of every browser session on its own thread, so the active trace is per thread.
+# Spans opened on other threads, like the prefetch pool, find no trace and are not recorded.
+_active = threading.local()
+
+
+class Span:
+    def __init__(self, name, kind):
+        if kind not in SPAN_KINDS:
+            raise ValueError(f"kind must be one of {SPAN_KINDS}, got {kind!r}")
+        self.name = name
+        self.kind = kind
+        self.seconds = None
+        self.children = []
+        # None when unknown, query spans without an explicit flag count as hits when they sent no query
+        self.cache_hit = None
+        self.query_ids = []
+        self.rows = None
+        self.error = None
+
+    @property
+    def self_seconds(self):
+        """Time not spent in the child spans."""
+        if self.seconds is None:
+            return None
+        return max(self.seconds - sum(child.seconds or 0 for child in self.children), 0.0)
+
+    def walk(self, path=(), depth=0):
+        """(path, depth, span) of this span and its descendants, parents first."""
+        path = path + (self.name,)
+        yield path, depth, self
+        for child in self.children:
+            yield from child.walk(path, depth + 1)
+
+
+def active_trace():
+    return getattr(_active, 'trace', None)
+
+
+class RenderTrace:
+    def __init__(self, page, session=None, history=None):
+        # session is a Snowpark session, its query history gives the query IDs of spans opened with queries=True
+        self.page = page
+        self.session = session
+        self.history = history
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.root = Span(page, 'page')
+        self._stack = [self.root]
+        self._start = self._last = time.perf_counter()
+
+    def start(self):
+        """Make this the active trace of the thread.
+
+        A rerun cut short by st.stop or st.rerun never reaches finish, it is logged as interrupted when the
+        next rerun of the session starts, timed up to its last closed span.
+        """
+        previous = active_trace()
+        if previous is not None and previous is not self:
+            previous.root.error = previous.root.error or 'interrupted'
+            previous.finish(end=previous._last)
+        _active.trace = self
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.root.error = exc_type.__name__
+        self.finish()
+        return False
+
+    @contextmanager
+    def span(self, name, kind='transform', queries=False, cache=None):
+        """Time the block as a child of the innermost open span.
+
+        ``queries=True`` records the query IDs the session sends inside the block. ``cache`` is a cache with
+        a ``stats`` dict of hits, like LineageCache, whose hit count tells whether the block was served from it.
+        Both are shared by every session of the app, so a concurrent rerun can blur the flag of a span.
+        """
+        span = Span(name, kind)
+        self._stack[-1].children.append(span)
+        self._stack.append(span)
+        hits = cache.stats['hits'] if cache is not None else None
+        recorder = self.session.query_history() if queries and self.session is not None else None
+        start = time.perf_counter()
+        try:
+            if recorder is None:
+                yield span
+            else:
+                with recorder as history:
+                    yield span
+                span.query_ids.extend(query.query_id for query in history.queries)
+        except Exception as exc:
+            span.error = type(exc).__name__
+            raise
+        finally:
+            self._last = time.perf_counter()
+            span.seconds = self._last - start
+            self._stack.pop()
+            if span.cache_hit is None:
+                if cache is not None:
+                    span.cache_hit = cache.stats['hits'] > hits
+                elif recorder is not None:
+                    # st.cache_data hits send nothing, the prefetch pool shares the session and may add queries
+                    span.cache_hit = not span.query_ids
+
+    def finish(self, end=None):
+        if self.root.seconds is not None:
+            return
+        self.root.seconds = (end or time.perf_counter()) - self._start
+        if getattr(_active, 'trace', None) is self:
+            _active.trace = None
+        logger.info(json.dumps(self.to_dict(), default=str))
+        if self.history is not None:
+            self.history.add(self)
+
+    def records(self):
+        """One row per span, the path joins the span names from the page down."""
+        return [{
+            'RUN_ID': self.run_id,
+            'PAGE': self.page,
+            'PATH': '/'.join(path),
+            'KIND': span.kind,
+            'DEPTH': depth,
+            'SECONDS': span.seconds,
+            'SELF_SECONDS': span.self_seconds,
+            'CACHE_HIT': span.cache_hit,
+            'QUERY_IDS': list(span.query_ids),
+            'ROWS': span.rows,
+            'ERROR': span.error,
+        } for path, depth, span in self.root.walk()]
+
+    def to_dict(self):
+        return {
+            'event': 'render',
+            'run_id': self.run_id,
+            'page': self.page,
+            'started_at': self.started_at,
+            'seconds': self.root.seconds,
+            'error': self.root.error,
+            'spans': [{key.lower(): value for key, value in record.items() if key not in ('RUN_ID', 'PAGE')}
+                      for record in self.records()],
+        }
+
+    def frame(self):
+        """The span tree of this rerun, names indented by depth, for the debug sidebar."""
+        df = pd.DataFrame(self.records(), columns=['PATH', 'KIND', 'DEPTH', 'SECONDS', 'SELF_SECONDS',
+                                                   'CACHE_HIT', 'QUERY_IDS', 'ROWS', 'ERROR'])
+        df.insert(0, 'SPAN', ['  ' * depth + path.rsplit('/', 1)[-1] for path, depth in zip(df['PATH'], df['DEPTH'])])
+        df['MS'] = (df['SECONDS'] * 1000).round(1)
+        df['QUERY_IDS'] = df['QUERY_IDS'].map(', '.join)
+        return df[['SPAN', 'KIND', 'MS', 'CACHE_HIT', 'QUERY_IDS', 'ROWS', 'ERROR']]
+
+
+@contextmanager
+def span(name, kind='transform', queries=False, cache=None):
+    """RenderTrace.span on the active trace of this thread, a detached span when there is none."""
+    trace = active_trace()
+    if trace is None:
+        yield Span(name, kind)
+        return
+    with trace.span(name, kind, queries=queries, cache=cache) as opened:
+        yield opened
+
+
+def traced(kind='transform', name=None, queries=False, cache=None):
+    """Decorator running every call of the function in a span named after it."""
+    def decorate(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, kind, queries=queries, cache=cache):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class RenderHistory:
+    def __init__(self, max_runs=500):
+        # span records of the last max_runs reruns over all sessions
+        self.max_runs = max_runs
+        self._runs = deque(maxlen=max_runs)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._runs)
+
+    def add(self, trace):
+        records = trace.records()
+        with self._lock:
+            self._runs.append(records)
+
+    def percentiles_frame(self, page=None):
+        """Count, p50, p95 and max milliseconds and the cache hit rate per span path, slowest p95 first."""
+        with self._lock:
+            records = [record for run in self._runs for record in run]
+        columns = ['PATH', 'KIND', 'CALLS', 'P50_MS', 'P95_MS', 'MAX_MS', 'CACHE_HIT_RATE']
+        if page is not None:
+            records = [record for record in records if record['PAGE'] == page]
+        if not records:
+            return pd.DataFrame(columns=columns)
+        df = pd.DataFrame(records)
+        df['MS'] = df['SECONDS'] * 1000
+        # cache hits of spans without a flag are left out of the rate
+        df['CACHE_HIT'] = df['CACHE_HIT'].astype('float')
+        summary = df.groupby(['PATH', 'KIND'], sort=False).agg(
+            CALLS=('MS', 'size'),
+            P50_MS=('MS', lambda ms: np.percentile(ms, 50)),
+            P95_MS=('MS', lambda ms: np.percentile(ms, 95)),
+            MAX_MS=('MS', 'max'),
+            CACHE_HIT_RATE=('CACHE_HIT', 'mean'),
+        ).reset_index()
+        return summary.sort_values('P95_MS', ascending=False, ignore_index=True).round(1)[columns]
@@ -0,0 +1,56 @@
+# Tabs whose bodies only run when they are selected. st.tabs hides the tabs that are not selected but runs
+# every body on every rerun, so a sidebar change redrew the profile reports, heatmaps and pair plots of all
+# tabs. Here the selected tab is a widget value the page branches on, and what a body builds is memoized
+# under the lineage token of the data it was built from, so a section is recomputed only when it is opened
+# after its data changed.
+import io
+
+from instrumentation import span
+
+
+def figure_png(draw, dpi=100):
+    """PNG bytes of the matplotlib figure ``draw()`` leaves current, every figure it opened is closed."""
+    import matplotlib.pyplot as plt
+
+    before = set(plt.get_fignums())
+    plt.figure()
+    draw()
+    buf = io.BytesIO()
+    plt.gcf().savefig(buf, format='png', dpi=dpi, bbox_inches='tight')
+    for number in set(plt.get_fignums()) - before:
+        plt.close(number)
+    return buf.getvalue()
+
+
+class LazyTabs:
+    def __init__(self, labels, cache):
+        # cache is a LineageCache, section outputs share its byte budget and show in its stats per label/part
+        self.labels = list(labels)
+        self.cache = cache
+        self.selected = None
+        self.stats = {'rendered': 0, 'skipped': 0}
+
+    def select(self, label):
+        """Make ``label``, the value of the tab selector, the one section that runs in this rerun."""
+        if label not in self.labels:
+            raise ValueError(f"unknown tab {label!r}, expected one of {self.labels}")
+        self.selected = label
+        self.stats['rendered'] += 1
+        self.stats['skipped'] += len(self.labels) - 1
+        return label
+
+    def is_open(self, label):
+        return label == self.selected
+
+    def section(self, label):
+        """Span of the selected section, for ``with tabs.section(label):`` inside ``if tabs.is_open(label):``."""
+        return span(label.replace(' ', '_'), 'section')
+
+    def memo(self, label, part, token, build):
+        """Output ``part`` of section ``label`` built from the data of ``token``, ``build()`` runs once per token.
+
+        A None token means the data has no lineage, the output is built every time.
+        """
+        if token is None:
+            return build()
+        return self.cache.get_or_put(f"{label}/{part}", (token,), build)
@@ -0,0 +1,183 @@
+# Cache of the frame helpers of both apps, keyed by where a frame came from instead of by its contents.
+# A lineage token names the source tables with their refresh versions plus every parameter applied on the
+# way, so a lookup hashes a few strings and timestamps however large the frame is. Frames themselves
+# are never hashed, the caller vouches for them by passing the token of the frame it hands in.
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+# the schemas whose tables the apps read
+VERSIONED_SCHEMAS = ('RAW', 'ANALYTIC', 'APP')
+
+
+def table_versions_query(database):
+    schemas = ", ".join(f"'{schema}'" for schema in VERSIONED_SCHEMAS)
+    return f"""SELECT TABLE_SCHEMA || '.' || TABLE_NAME AS TABLE_NAME, LAST_ALTERED
+FROM {database}.INFORMATION_SCHEMA.TABLES
+WHERE TABLE_SCHEMA IN ({schemas})"""
+
+
+def table_versions(versions_df):
+    """{'SCHEMA.TABLE': LAST_ALTERED}, dynamic tables get a new LAST_ALTERED on every refresh."""
+    return dict(zip(versions_df['TABLE_NAME'], versions_df['LAST_ALTERED']))
+
+
+def _freeze(value):
+    # a hashable stand-in for parameter values, multiselect lists become tuples
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset, pd.Index)):
+        items = [_freeze(item) for item in value]
+        return tuple(sorted(items, key=repr) if isinstance(value, (set, frozenset)) else items)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def lineage(versions, tables, **params):
+    """Token of a frame read from ``tables`` at their current ``versions`` with the query ``params``."""
+    if isinstance(tables, str):
+        tables = (tables,)
+    return (tuple((table, versions.get(table)) for table in tables), _freeze(params))
+
+
+def derive(token, **params):
+    """Token of a frame computed from the frame of ``token`` with ``params``, None stays None."""
+    if token is None:
+        return None
+    return token + (_freeze(params),)
+
+
+def value_nbytes(value):
+    # memory of a cached value, frames count their python strings too
+    if value is None:
+        return 0
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sum(value_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(value_nbytes(item) for item in value.values())
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    # objects holding arrays, like the window metric indexes, report their own size
+    return int(getattr(value, 'nbytes', 0))
+
+
+def _is_frame(value):
+    return isinstance(value, (pd.DataFrame, pd.Series, np.ndarray))
+
+
+class LineageCache:
+    def __init__(self, max_bytes=256 * 2**20, ttl=3600, max_entries=1000):
+        # entries older than ttl seconds are dropped on lookup, the least recently used go first past the budgets
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.nbytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'bypasses': 0, 'expirations': 0, 'evictions': 0}
+        self.function_stats = {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, count=False)[0]
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.monotonic() - stored_at > self.ttl
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.nbytes -= size
+
+    def get(self, key, count=True):
+        """(found, value) of ``key``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[2]):
+                self._drop(key)
+                self.stats['expirations'] += 1
+                entry = None
+            if entry is None:
+                if count:
+                    self.stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            if count:
+                self.stats['hits'] += 1
+            return True, entry[0]
+
+    def put(self, key, value):
+        size = value_nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            # a value larger than the whole budget is returned but not kept
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, time.monotonic())
+            self.nbytes += size
+            while self.nbytes > self.max_bytes or len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def memoize(self, func):
+        """Cache ``func`` under the ``lineage=`` token its caller passes.
+
+        Frame arguments are left out of the key, the token stands for them. Calls without a token
+        are not cached. The cached value is shared, callers must not modify it in place.
+        """
+        name = func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, lineage=None, **kwargs):
+            if lineage is None:
+                with self._lock:
+                    self.stats['bypasses'] += 1
+                return func(*args, **kwargs)
+            key = (lineage,
+                   tuple(None if _is_frame(arg) else _freeze(arg) for arg in args),
+                   tuple(sorted((k, None if _is_frame(v) else _freeze(v)) for k, v in kwargs.items())))
+            return self.get_or_put(name, key, lambda: func(*args, **kwargs))
+        return wrapper
+
+    def get_or_put(self, name, key, build):
+        """Value of ``key`` under ``name``, from ``build()`` on a miss, counted per name in stats_frame."""
+        found, value = self.get((name,) + key)
+        if not found:
+            value = build()
+            self.put((name,) + key, value)
+        with self._lock:
+            counts = self.function_stats.setdefault(name, {'hits': 0, 'misses': 0})
+            counts['hits' if found else 'misses'] += 1
+        return value
+
+    def stats_frame(self):
+        """Hits, misses, entries and bytes per cached function, for the cache panel."""
+        with self._lock:
+            entries = {}
+            for (name, *_), (_, size, _) in self._entries.items():
+                count, nbytes = entries.get(name, (0, 0))
+                entries[name] = (count + 1, nbytes + size)
+            rows = []
+            for name in sorted(set(self.function_stats) | set(entries)):
+                counts = self.function_stats.get(name, {'hits': 0, 'misses': 0})
+                count, nbytes = entries.get(name, (0, 0))
+                rows.append({'FUNCTION': name, 'HITS': counts['hits'], 'MISSES': counts['misses'],
+                             'ENTRIES': count, 'MB': round(nbytes / 2**20, 2)})
+        return pd.DataFrame(rows, columns=['FUNCTION', 'HITS', 'MISSES', 'ENTRIES', 'MB'])
@@ -0,0 +1,156 @@
+# Process wide cache of the registry models the Streamlit pages score and explain with.
+# Model version handles and the loaded models are kept per (model name, version, default version), so
+# one registry lookup and one download serve every rerun and session. The default version of a model is
+# re-read every state_ttl seconds and entries loaded under an older default are dropped when it changes.
+# Churn likelihoods are scored in the app process with the native booster's inplace_predict.
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import NamedTuple
+
+import pandas as pd
+
+
+class CachedModel(NamedTuple):
+    version: object       # the registry ModelVersion, for run(..., function_name="explain")
+    model: object         # the python model mv.load() returns, None unless loaded
+    booster: object       # the xgboost.Booster behind it, None unless loaded
+    seconds: float
+
+
+def native_booster(model):
+    """The ``xgboost.Booster`` behind a model loaded from the registry."""
+    if hasattr(model, 'to_xgboost'):
+        # snowflake.ml.modeling.xgboost estimators wrap an xgboost sklearn estimator
+        model = model.to_xgboost()
+    if hasattr(model, 'get_booster'):
+        model = model.get_booster()
+    if not hasattr(model, 'inplace_predict'):
+        raise TypeError(f"{type(model).__name__} is not an XGBoost model")
+    return model
+
+
+class ModelCache:
+    def __init__(self, registry, state_ttl=60, force=True, max_workers=2):
+        # registry is a callable returning the snowflake.ml Registry, it is created on first use
+        self.make_registry = registry
+        self.state_ttl = state_ttl
+        self.force = force
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'errors': 0, 'load_seconds': 0.0}
+        self._registry = None
+        self._defaults = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='model-cache')
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def registry(self):
+        with self._lock:
+            if self._registry is None:
+                self._registry = self.make_registry()
+            return self._registry
+
+    def default_version(self, model_name):
+        """The default version of ``model_name``, re-read from the registry every ``state_ttl`` seconds."""
+        with self._lock:
+            state = self._defaults.get(model_name)
+            if state is not None and time.monotonic() - state[0] < self.state_ttl:
+                return state[1]
+        default = self.registry.get_model(model_name).default.version_name.upper()
+        with self._lock:
+            previous = self._defaults.get(model_name)
+            self._defaults[model_name] = (time.monotonic(), default)
+            if previous is not None and previous[1] != default:
+                stale = [key for key in self._entries if key[0] == model_name and key[2] != default]
+                for key in stale:
+                    del self._entries[key]
+                self.stats['invalidations'] += len(stale)
+        return default
+
+    def key(self, model_name, version=None):
+        # unquoted version names are case insensitive and the registry reports them upper case
+        default = self.default_version(model_name)
+        return (model_name, default if version is None else version.upper(), default)
+
+    def _load(self, key, load):
+        model_name, version, _ = key
+        start = time.perf_counter()
+        mv = self.registry.get_model(model_name).version(version)
+        model = booster = None
+        if load:
+            model = mv.load(force=self.force)
+            booster = native_booster(model)
+        return CachedModel(mv, model, booster, time.perf_counter() - start)
+
+    def _get(self, model_name, version, load):
+        key = self.key(model_name, version)
+        with self._lock:
+            # a loaded entry also serves the version handle
+            future = self._entries.get(key + (True,)) or self._entries.get(key + (load,))
+            owner = future is None
+            if owner:
+                future = self._entries[key + (load,)] = Future()
+                self.stats['misses'] += 1
+            else:
+                self.stats['hits'] += 1
+        if owner:
+            # loaded in the calling thread, concurrent callers of the same key wait on the future
+            try:
+                cached = self._load(key, load)
+            except Exception as error:
+                with self._lock:
+                    if self._entries.get(key + (load,)) is future:
+                        del self._entries[key + (load,)]
+                    self.stats['errors'] += 1
+                future.set_exception(error)
+            else:
+                with self._lock:
+                    self.stats['load_seconds'] += cached.seconds
+                future.set_result(cached)
+        return future.result()
+
+    def version(self, model_name, version=None):
+        """The registry ModelVersion of ``model_name``, its default version when ``version`` is None."""
+        return self._get(model_name, version, load=False).version
+
+    def model(self, model_name, version=None):
+        """The python model ``mv.load()`` returns, loaded once per process."""
+        return self._get(model_name, version, load=True).model
+
+    def booster(self, model_name, version=None):
+        return self._get(model_name, version, load=True).booster
+
+    def predict_proba(self, model_name, X, version=None):
+        """``mv.run(X, function_name="predict_proba")`` of a binary classifier, scored in process."""
+        booster = self.booster(model_name, version)
+        # the booster checks the feature names, select them in its order
+        features = X[booster.feature_names] if booster.feature_names else X
+        proba_1 = booster.inplace_predict(features)
+        return pd.DataFrame({'PREDICT_PROBA_0': 1.0 - proba_1, 'PREDICT_PROBA_1': proba_1}, index=X.index)
+
+    def warm(self, models, load=True):
+        """Load ``models``, (name, version) pairs, in the background, a failed load is retried on first use."""
+        return [self._pool.submit(self._get, model_name, version, load) for model_name, version in models]
+
+    def clear(self):
+        with self._lock:
+            self.stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._defaults.clear()
+
+    def stats_frame(self):
+        """One row per cached model version, for the cache panel."""
+        rows = []
+        with self._lock:
+            for (model_name, version, default, load), future in self._entries.items():
+                cached = future.result() if future.done() and future.exception() is None else None
+                rows.append({'MODEL_NAME': model_name, 'VERSION': version, 'DEFAULT': version == default,
+                             'LOADED': load, 'STATE': 'ready' if cached else 'loading',
+                             'LOAD_S': round(cached.seconds, 2) if cached else None})
+        return pd.DataFrame(rows, columns=['MODEL_NAME', 'VERSION', 'DEFAULT', 'LOADED', 'STATE', 'LOAD_S'])
+
+    def close(self):
+        self._pool.shutdown(wait=True)
@@ -10,11 +10,24 @@ import plotly.graph_objects as go
 import shap
 import altair as alt
 import io
-import shap
-from ydata_profiling import ProfileReport
+import logging
+import time
+from profiling import ProfileCache, filter_signature, profile_html
 from streamlit_extras.stylable_container import stylable_container
 from datetime import datetime
 from snowflake.ml.modeling.preprocessing import OrdinalEncoder
+from demographic_filters import age_range_codes, filter_players
+from query_builder import EDA_TABLES, EdaFilters, eda_query, eda_page_query, count_query, churn_rate_query, filtered_features_query, save_filtered_query
+from lineage_cache import LineageCache, derive, lineage, table_versions, table_versions_query
+from pagination import PAGE_SIZES, frame_page, page_count, sort_permutation
+from instrumentation import RenderHistory, RenderTrace, span, traced
+from lazy_sections import LazyTabs, figure_png
+from plot_data import binned_pairs, draw_binned_pairplot, draw_pairplot, stratified_sample
+from summary_stats import SUMMARY_TABLES, correlation_matrix, merged_moments_query, segment_churn_rate_query
+from model_cache import ModelCache
+from shap_store import ROLLING_MODEL, STATIC_MODEL, draw_importance, draw_shap_summary, importance_query, plot_values, read_sample
+from plot_artifacts import PlotArtifacts
+from player_loader import compact_features
 
 
 st.set_page_config(layout="wide")
@@ -22,95 +35,204 @@ st.title("GAME 360")
 st.divider()
 session = get_active_session()
 
-age_ranges_dict = {
-    '0-11': (0,11),
-    '12-17': (12, 17),
-    '18-24': (18, 24),
-    '25-34': (25, 34),
-    '35-44': (35, 44),
-    '45-54': (45, 54),
-    '55-64': (55, 64),
-    '65+': (65, 100) 
-}
-
-
-
+# filter in Snowflake with query_builder, set to False to filter the full player table with pandas instead
+SERVER_SIDE_FILTERS = True
+EDA_SAMPLE_ROWS = 100000
+FILTERED_ROW_LIMIT = 100000
+# profile reports are kept per filter selection, set a stage like '@PLAYER_360.APP.PROFILE_REPORTS' to keep them across restarts
+PROFILE_CACHE_BYTES = 64 * 2**20
+PROFILE_STAGE = None
+# minimal reports are about 1.6 MB, a full one with correlations and interactions 12 to 26 MB, a few fill the cache
+PROFILE_MINIMAL = True
+# filtered and encoded frames and sort orders are cached by lineage token, table versions are re-read every TABLE_VERSION_TTL seconds
+FRAME_CACHE_BYTES = 512 * 2**20
+FRAME_CACHE_TTL = 3600
+TABLE_VERSION_TTL = 60
+# every rerun is timed span by span and logged as JSON to player360.render, open the app with ?profile=1 for the sidebar
+RENDER_PROFILE_SIDEBAR = False
+RENDER_HISTORY_RUNS = 500
+logging.getLogger('player360.render').setLevel(logging.INFO)
+# the player charts draw a sample of at most this many players, split between the churn classes in proportion
+SCATTER_POINTS = 20000
+PAIRPLOT_POINTS = 5000
+# 'sample' draws the kde pair plot of a sample, 'binned' draws histograms of every player with PAIRPLOT_BINS bins per axis
+PAIRPLOT_MODE = 'sample'
+PAIRPLOT_BINS = 40
+PAIRPLOT_COLUMNS = ['PROPORTION_PURCHASED', 'AVERAGE_PURCHASE_AMOUNT','AVERAGE_AD_ENGAGEMENT_TIME', 'CHURNED']
+CHURN_LABELS = {0: 'retained', 1: 'churned'}
+# the static churn rates and correlation matrix are computed from the players. Set to True once
+# scripts/summary_tables_build.sql, which no setup step runs, has deployed the segment summaries to read them instead
+STATIC_SUMMARY_TABLES = False
+# registry models are loaded once per process, warm at startup, and reloaded when a new default version is set,
+# which is checked every MODEL_STATE_TTL seconds
+WARM_MODELS = [("Player360_Churn_Classifier", "v1"), ("Player360_RollingChurn_Classifier", "v1")]
+MODEL_STATE_TTL = 60
+# the SHAP forms explain the filtered players in the form. Once scripts/batch_explain.py has written
+# APP.ROLLING_CHURN_SHAP, APP.CHURN_SHAP and their summary tables, which no setup step creates, set to True to
+# read a stratified sample of at most SHAP_SAMPLE_ROWS stored rows instead, and the bar plot of all players
+PRECOMPUTED_SHAP = False
+SHAP_SAMPLE_ROWS = 10000
+# SHAP summaries and pair plots are rendered off the script thread by PLOT_WORKERS processes and kept by their inputs
+# in PLOT_CACHE_BYTES of memory, and in PLOT_CACHE_DIR when set. Sections show a placeholder, checked every PLOT_POLL_SECONDS
+PLOT_WORKERS = 2
+PLOT_CACHE_BYTES = 64 * 2**20
+PLOT_CACHE_DIR = None
+PLOT_POLL_SECONDS = 0.25
+
+@traced('query', queries=True)
 @st.cache_data(show_spinner=False)
-def load_query(query):
-    query = session.sql(query).to_pandas()
+def load_query(query, params=None):
+    query = session.sql(query, params=params).to_pandas()
     return query
     
+@traced('query', queries=True)
 @st.cache_data(show_spinner=False)
 def load_table(table_name):
     table = session.table(table_name).to_pandas()
     return table
     
+@traced('query', queries=True)
 @st.cache_data(show_spinner=False)
-def save_eda(df):
-    html = ProfileReport(eda_df).to_html()
+def load_features(query, params=None):
+    # Arrow batches cast to the feature dtypes one at a time, the rows are never held at int64 and float64
+    batches = [compact_features(batch) for batch in session.sql(query, params=params).to_pandas_batches()]
+    if not batches:
+        return session.sql(query, params=params).to_pandas()
+    return pd.concat(batches, ignore_index=True)
+
+@st.cache_resource(show_spinner=False)
+def profile_cache():
+    return ProfileCache(max_bytes=PROFILE_CACHE_BYTES, stage=PROFILE_STAGE, session=session,
+                        render=lambda df: profile_html(df, minimal=PROFILE_MINIMAL))
+
+def save_eda(df, signature):
+    with span('profile_report', 'chart') as report_span:
+        misses = profile_cache().stats['misses']
+        html = profile_cache().report(signature, df)
+        report_span.cache_hit = profile_cache().stats['misses'] == misses
     return html
 
+@traced('query', queries=True)
 @st.cache_data(show_spinner=False)
-def split_frame(input_df, rows):
-    df = [input_df.loc[i : i + rows - 1, :] for i in range(0, len(input_df), rows)]
-    return df
-    
-def cache_model(model_name, version, load=False):
-    mv= reg.get_model(model_name).version(version)
-    if load:
-        mv = mv.load(force=True)
-    return mv
+def load_churn_rate(by):
+    if STATIC_SUMMARY_TABLES:
+        churn_rate_df = load_query(*segment_churn_rate_query(session.get_current_database(), by))
+    else:
+        churn_rate_df = load_query(*churn_rate_query(session.get_current_database(), by))
+    return churn_rate_df.set_index('GROUP_KEY')['CHURN_RATE'].rename_axis(by)
 
+@traced('query', queries=True)
 @st.cache_data(show_spinner=False)
-def filter_dataframe(df, playerbase, age_range, gender, country_range,player_type, support_ticket, rank_range):
-    # filter by playerbase_ranges
-    if playerbase == "Active":
-        df = df[df['CHURNED'] == 0]
-    elif playerbase == 'Inactive':
-        df = df[df['CHURNED'] == 1]
-
-    # filter by age_range
-    if age_ranges:
-        selected_age_filters = [
-            (age_ranges_dict[range][0], age_ranges_dict[range][1]) for range in age_ranges
-        ]
-        
-        # Apply the filter
-        df = df[
-            df['AGE'].apply(
-                lambda x: any(lower <= x <= upper for lower, upper in selected_age_filters)
-            )
-        ]
-
-    # filter by gender
-    if gender == "Male":
-        df = df[df['GENDER'] == 'Male']
-    elif gender == 'Female':
-        df = df[df['GENDER'] == 'Female']
-
-    # filter by country
-    if country_ranges:
-        df = df[df['LOCATION'].isin(country_ranges)]
-
-    # filter by player type
-    if player_type == 'Hardcore':
-        df = df[df['PLAYER_TYPE'] == 'Hardcore']
-    elif player_type == 'Casual':
-        df = df[df['PLAYER_TYPE'] == 'Casual']
-
-    # filter by support ticket
-    if support_ticket == "Yes":
-        df = df[df['HAS_SUPPORT_TICKET'] == True]
-    elif support_ticket == "No":
-        df = df[df['HAS_SUPPORT_TICKET'] == False]
-
-    if rank_range:
-        df = df[df['RANK_NAME'].isin(rank_range)]
+def load_static_correlation():
+    # about a hundred rows, the moments of every column pair summed over the segments
+    return correlation_matrix(load_query(*merged_moments_query(session.get_current_database())))
+
+@traced('model', queries=True)
+def load_shap_sample(model, filters, sample_size):
+    # one count per stratum and one bounded read, whatever the number of explained rows
+    return read_sample(load_query, session.get_current_database(), model, sample_size, filters)
+
+def submit_shap_summary(model, filters, sample_size, plot_type):
+    # the bar plot of all players comes from the summary table, the rest from a sample of the filtered players
+    if plot_type == 'bar' and filters == EdaFilters():
+        importance_df = load_query(*importance_query(session.get_current_database(), model))
+        key = plot_artifacts().submit('shap_importance', draw_importance, importance_df, model)
+        return key, f"all {int(importance_df['N'].max()):,} explained rows"
+    sample = load_shap_sample(model, filters, sample_size)
+    shap_values, shap_features = plot_values(model, sample.frame)
+    key = plot_artifacts().submit('shap_summary', draw_shap_summary, shap_values, shap_features, plot_type)
+    return key, sample.caption({0: 'retained', 1: 'churned'} if model is STATIC_MODEL else None)
+
+@st.cache_resource(show_spinner=False)
+def plot_artifacts():
+    return PlotArtifacts(max_bytes=PLOT_CACHE_BYTES, persist_dir=PLOT_CACHE_DIR, max_workers=PLOT_WORKERS)
+
+def memo_artifact(label, part, token, submit):
+    # the section memo keeps the (key, caption) of a submitted plot, a key the artifact cache dropped is submitted again
+    key, caption = game_tabs.memo(label, part, token, submit)
+    if plot_artifacts().status(key) == 'missing':
+        key, caption = submit()
+    return key, caption
+
+def show_artifact(key, caption):
+    # the placeholder is replaced once the PNG is ready. Every poll writes to the page, so a widget change
+    # stops this rerun and the render carries on in its worker for the next one
+    placeholder = st.empty()
+    artifacts = plot_artifacts()
+    started = time.monotonic()
+    while artifacts.wait(key, PLOT_POLL_SECONDS) == 'pending':
+        placeholder.info(f"Rendering {caption}, {time.monotonic() - started:.0f} s")
+    png = artifacts.get(key)
+    if png is None:
+        placeholder.error(f"{caption} could not be rendered: {artifacts.error(key)}")
+    else:
+        placeholder.image(png, caption=caption, use_column_width=True)
+
+@st.cache_resource(show_spinner=False)
+def frame_cache():
+    return LineageCache(max_bytes=FRAME_CACHE_BYTES, ttl=FRAME_CACHE_TTL)
+
+@st.cache_resource(show_spinner=False)
+def render_history():
+    # the span records of the last RENDER_HISTORY_RUNS reruns of all sessions, for the p95 table
+    return RenderHistory(max_runs=RENDER_HISTORY_RUNS)
+
+@traced('query', queries=True)
+@st.cache_data(show_spinner=False, ttl=TABLE_VERSION_TTL)
+def load_table_versions(database):
+    return table_versions(session.sql(table_versions_query(database)).to_pandas())
+
+@traced('transform', cache=frame_cache())
+@frame_cache().memoize
+def sort_order(input_df, column, ascending):
+    # one permutation per column and direction, every page of the sorted view reads through it
+    return sort_permutation(input_df[column], ascending)
+
+def load_filtered_page(key, page, page_size, sort_by=None, ascending=True):
+    # unsorted pages continue after the last USER_ID of the page before when it is known, sorted pages use OFFSET
+    page_keys = st.session_state.setdefault(f"{key}_page_keys", {})
+    signature = (filters, page_size)
+    if page_keys.get('signature') != signature:
+        page_keys.clear()
+        page_keys['signature'] = signature
+    after_user_id = page_keys.get(page - 1) if sort_by is None else None
+    page_df = load_query(*eda_page_query(session.get_current_database(), filters, page_size,
+                                         offset=(page - 1) * page_size, sort_by=sort_by, ascending=ascending,
+                                         after_user_id=after_user_id))
+    if sort_by is None and len(page_df):
+        page_keys[page] = int(page_df['USER_ID'].iloc[-1])
+    return page_df
     
-    return df
+@st.cache_resource(show_spinner=False)
+def model_cache():
+    cache = ModelCache(lambda: Registry(session=session), state_ttl=MODEL_STATE_TTL, force=True)
+    cache.warm(WARM_MODELS)
+    return cache
 
-@st.cache_data(show_spinner=False)
+@traced('model', queries=True, cache=model_cache())
+def cache_model(model_name, version, load=False):
+    if load:
+        return model_cache().model(model_name, version)
+    return model_cache().version(model_name, version)
+
+@traced('transform', cache=frame_cache())
+@frame_cache().memoize
+def eda_age_codes(df):
+    # the age range of every player, looked up once per loaded frame instead of on every age selection
+    return age_range_codes(df['AGE'])
+
+@traced('transform', cache=frame_cache())
+@frame_cache().memoize
+def filter_dataframe(df, playerbase, age_range, gender, country_range, player_type, support_ticket, rank_range, age_codes=None):
+    # the selections are arguments so the cache keys on them, the filters run as one vectorized mask
+    filters = EdaFilters(playerbase, tuple(age_range), gender, tuple(country_range), player_type, support_ticket, tuple(rank_range))
+    return filter_players(df, filters, age_codes)
+
+@traced('transform', cache=frame_cache())
+@frame_cache().memoize
 def preprocess_filtered_dataframe(filtered_df):
+    # the input may be a cached frame, so the age group goes on a copy
+    filtered_df = filtered_df.copy()
     filtered_df['AGE_GROUP'] = pd.cut(filtered_df['AGE'], bins=[0,12,18, 24, 34, 44, 54, 64, 100], labels=['0_11','12_17','18_24', '25_34', '35_44', '45_54', '55_64', '65+'])
     categories = {"RANK_NAME":["Bronze", "Silver", "Gold", "Platinum", "Diamond", "Elite", "Champion", "Unreal"],
          "PLAYER_TYPE":["Casual", "Hardcore"],
@@ -119,7 +241,33 @@ def preprocess_filtered_dataframe(filtered_df):
     encoded_feature_df = snowml_oe.fit(filtered_df).transform(filtered_df)
     return encoded_feature_df
 
-def create_saved_pagination(dataset :pd.DataFrame, key :str):
+def show_cache_stats():
+    cache = frame_cache()
+    with st.sidebar.expander("Frame Cache"):
+        st.caption(f"{cache.nbytes / 2**20:.1f} of {cache.max_bytes / 2**20:.0f} MB in {len(cache)} entries, "
+                   f"{cache.stats['evictions']} evicted, {cache.stats['expirations']} expired")
+        st.dataframe(cache.stats_frame(), hide_index=True, use_container_width=True)
+    models = model_cache()
+    with st.sidebar.expander("Model Cache"):
+        st.caption(f"{len(models)} entries, {models.stats['hits']} hits, {models.stats['misses']} loads "
+                   f"in {models.stats['load_seconds']:.1f} s, {models.stats['invalidations']} invalidated")
+        st.dataframe(models.stats_frame(), hide_index=True, use_container_width=True)
+    plots = plot_artifacts()
+    with st.sidebar.expander("Plot Artifacts"):
+        st.caption(f"{plots.nbytes / 2**20:.1f} of {plots.max_bytes / 2**20:.0f} MB in {len(plots)} PNGs, "
+                   f"{plots.stats['hits']} hits, {plots.stats['persisted_hits']} from disk, {plots.stats['misses']} "
+                   f"rendered in {plots.stats['render_seconds']:.1f} s, {plots.stats['errors']} failed")
+
+def show_render_profile(trace):
+    if not (RENDER_PROFILE_SIDEBAR or st.query_params.get('profile') == '1'):
+        return
+    with st.sidebar.expander("Render Profile"):
+        st.caption(f"rerun {trace.run_id} took {trace.root.seconds * 1000:.0f} ms")
+        st.dataframe(trace.frame(), hide_index=True, use_container_width=True)
+        st.caption(f"slowest spans over the last {len(render_history())} reruns")
+        st.dataframe(render_history().percentiles_frame(trace.page), hide_index=True, use_container_width=True)
+
+def create_saved_pagination(dataset :pd.DataFrame, key :str, lineage=None):
     top_menu = st.columns(3)
     with top_menu[0]:
         sort = st.radio("Sort Data", options=["Yes", "No"], horizontal=1, index=1, key=f"{key}_sort")
@@ -130,18 +278,16 @@ def create_saved_pagination(dataset :pd.DataFrame, key :str):
             sort_direction = st.radio(
                 "Direction", options=["⬆️", "⬇️"], horizontal=True,  key=f"{key}_sort_values"
             )
-        dataset = dataset.sort_values(
-            by=sort_field, ascending=sort_direction == "⬆️", ignore_index=True
-        )
+    else:
+        sort_field, sort_direction = None, "⬆️"
     pagination = st.container()
     
     bottom_menu = st.columns((4, 1, 1))
     with bottom_menu[2]:
-        batch_size = st.selectbox("Page Size", options=[25, 50, 100], key=f"{key}_page_size")
+        batch_size = st.selectbox("Page Size", options=PAGE_SIZES, key=f"{key}_page_size")
     with bottom_menu[1]:
-        total_pages = (
-            int(len(dataset) / batch_size) if int(len(dataset) / batch_size) > 0 else 1
-        )
+        # with server side filters the pages cover every matching player, not only the fetched rows
+        total_pages = page_count(total_filtered if SERVER_SIDE_FILTERS else len(dataset), batch_size)
         current_page = st.number_input(
             "Page", min_value=1, max_value=total_pages, step=1, key=f"{key}_page_number_input"
         )
@@ -150,17 +296,27 @@ def create_saved_pagination(dataset :pd.DataFrame, key :str):
         if st.button("Save to Snowflake"):
            with st.spinner('Saving to Snowflake...'):
                 # Real Snowflake operation
-                session.write_pandas(df=filtered_df, 
-                                     table_name="FILTERED_DF", 
-                                     database=f"{session.get_current_database()}", 
-                                     schema="APP", 
-                                     quote_identifiers=False,
-                                     auto_create_table=True,
-                                     overwrite=True)
+                if SERVER_SIDE_FILTERS:
+                    # create the table from the same query so rows beyond FILTERED_ROW_LIMIT are saved too
+                    save_query, save_params = save_filtered_query(session.get_current_database(), filters)
+                    session.sql(save_query, params=save_params).collect()
+                else:
+                    session.write_pandas(df=filtered_df, 
+                                         table_name="FILTERED_DF", 
+                                         database=f"{session.get_current_database()}", 
+                                         schema="APP", 
+                                         quote_identifiers=False,
+                                         auto_create_table=True,
+                                         overwrite=True)
                 st.success("Data saved successfully!")
             
-    pages = split_frame(dataset, batch_size)
-    pagination.dataframe(data=pages[current_page - 1], use_container_width=True)
+    if SERVER_SIDE_FILTERS:
+        with span('filtered_page', 'query', queries=True):
+            page_df = load_filtered_page(key, current_page, batch_size, sort_field, sort_direction == "⬆️")
+    else:
+        order = sort_order(dataset, sort_field, sort_direction == "⬆️", lineage=lineage) if sort_field else None
+        page_df = frame_page(dataset, current_page, batch_size, order)
+    pagination.dataframe(data=page_df, use_container_width=True)
 
 class AltairCharts():
     def __init__(self):
@@ -202,6 +358,90 @@ class AltairCharts():
             
         return monthly_base, daily_base, other_charts
     
+def churn_rate_by(by):
+    # churn rate in percent per AGE_GROUP, LOCATION or PLAYER_TYPE of all players
+    if STATIC_SUMMARY_TABLES or SERVER_SIDE_FILTERS:
+        return load_churn_rate(by)
+    if by == 'AGE_GROUP':
+        groups = pd.cut(eda_df['AGE'], bins=[0,12,18, 24, 34, 44, 54, 64, 100], labels=['0_11','12_17','18_24', '25_34', '35_44', '45_54', '55_64', '65+']).rename('Age_Group')
+    else:
+        groups = eda_df[by]
+    return eda_df.groupby(groups, observed=False)['CHURNED'].mean() * 100
+
+def draw_churn_rate(churn_rate, title):
+    churn_rate.plot(kind='bar', title=title)
+    plt.ylabel("Churn Rate (%)")
+
+def correlation(df):
+    # features-metrics
+    return df[list(df.describe())].corr()
+
+def static_correlation():
+    # over every player from the summary tables, over the eda_df sample otherwise
+    if STATIC_SUMMARY_TABLES:
+        return load_static_correlation()
+    return correlation(eda_df)
+
+def draw_correlation_heatmap(corr, annotations):
+    sns.heatmap(corr, annot=annotations, cmap='coolwarm', fmt='.2f', linewidths=0.5, annot_kws={"size": 8})
+    plt.title("Correlation Matrix")
+    plt.xticks(fontsize=6)  # Set font size for x-axis ticks (feature names)
+    plt.yticks(fontsize=6) 
+
+def submit_churn_pairplot(df):
+    # the binning or sampling runs here, the drawing in a plot worker
+    title = 'Pair Plot of Purchases and Ad Engagement Information by Churn'
+    if PAIRPLOT_MODE == 'binned':
+        key = plot_artifacts().submit('pairplot', draw_binned_pairplot, binned_pairs(df, PAIRPLOT_COLUMNS[:-1], by='CHURNED', bins=PAIRPLOT_BINS),
+                                      title=f"{title}\n(all {len(df):,} players, {PAIRPLOT_BINS} bins per axis)")
+        return key, 'Pair Plot'
+    sample = stratified_sample(df, PAIRPLOT_POINTS, by='CHURNED')
+    key = plot_artifacts().submit('pairplot', draw_pairplot, sample.frame[PAIRPLOT_COLUMNS], hue='CHURNED',
+                                  title=f"{title}\n({sample.caption(CHURN_LABELS)})")
+    return key, 'Pair Plot'
+
+def churn_scatter_3d(df):
+    sample = stratified_sample(df, SCATTER_POINTS, by='CHURNED')
+    churned_data = sample.frame[sample.frame["CHURNED"] == 1]
+    non_churned_data = sample.frame[sample.frame["CHURNED"] == 0]
+    
+    fig = go.Figure()
+    
+    # Add churned data points (red 'x')
+    fig.add_trace(go.Scatter3d(
+        x=churned_data["TOTAL_LOGINS"],
+        y=churned_data["TOTAL_POINTS"],
+        z=churned_data["TOTAL_PURCHASES"],
+        mode='markers',
+        marker=dict(size=6, color='red', symbol='x'),
+        name='Churned'
+    ))
+    
+    # Add non-churned data points (blue markers)
+    fig.add_trace(go.Scatter3d(
+        x=non_churned_data["TOTAL_LOGINS"],
+        y=non_churned_data["TOTAL_POINTS"],
+        z=non_churned_data["TOTAL_PURCHASES"],
+        mode='markers',
+        marker=dict(size=6, color='blue'),
+        name='Non-Churned'
+    ))
+    
+    # Set axis labels and title
+    fig.update_layout(
+        title=f'Interactive 3D Plot of Total Logins, Total Points, and Total Purchases ({sample.caption(CHURN_LABELS)})',
+        scene=dict(
+            xaxis_title='Total Logins',
+            yaxis_title='Total Points',
+            zaxis_title='Total Purchases'
+        ),
+        legend=dict(x=0.1, y=0.9)
+    )
+    return fig
+
+
+# time this rerun, the spans below and the traced helpers above nest under it
+render_trace = RenderTrace('GAME_360', session, history=render_history()).start()
 
 # load the dataframes
 dau_df = load_query(f"SELECT * FROM {session.get_current_database()}.ANALYTIC.DAILY_ACTIVE_USERS ORDER BY ACTIVE_DATE ASC")
@@ -215,49 +455,17 @@ arpdau_df = load_query(f"SELECT * FROM {session.get_current_database()}.ANALYTIC
 darppu_df = load_query(f"SELECT * FROM {session.get_current_database()}.ANALYTIC.DARPPU ORDER BY ACTIVE_DATE ASC")
 cltv_cohort_df = load_query(f"SELECT * FROM {session.get_current_database()}.ANALYTIC.COHORT_CLTV ORDER BY TO_DATE(COHORT_MONTH || '-01', 'YYYY-MM-DD') ASC")
 ad_conversion_df = load_query(f"SELECT * FROM {session.get_current_database()}.ANALYTIC.AD_CONVERSION_OVER_TIME ORDER BY MONTH ASC")
-features_df = load_query(f"SELECT * FROM {session.get_current_database()}.APP.ROLLING_CHURN_FEATURES")
-eda_df = load_query(f"""SELECT 
-                        r.user_id, 
-                        r.total_logins,
-                        r.logged_in_after_1_day,
-                        r.logged_in_after_7_days,
-                        r.logged_in_after_30_days,
-                        r.logged_in_in_last_30_days,
-                        r.days_since_last_login,
-                        d.age,
-                        d.gender,
-                        d.location,
-                        d.average_sessions_per_active_week,
-                        d.average_session_duration,
-                        d.player_type,
-                        d.total_ads,
-                        d.avg_purchase_amount_per_ad,
-                        d.has_support_ticket,
-                        ur.total_points,
-                        ur.rank_name,
-                        ( 
-                                CASE WHEN VICTORY_ROYALE THEN 1 ELSE 0 END +
-                                CASE WHEN ELIMINATION_MILESTONES THEN 1 ELSE 0 END +
-                                CASE WHEN SURVIVAL_ACHIEVEMENTS THEN 1 ELSE 0 END +
-                                CASE WHEN BUILDING_RESOURCES THEN 1 ELSE 0 END +
-                                CASE WHEN EXPLORATION_TRAVEL THEN 1 ELSE 0 END +
-                                CASE WHEN WEAPON_USAGE THEN 1 ELSE 0 END +
-                                CASE WHEN ASSIST_TEAMMATES THEN 1 ELSE 0 END +
-                                CASE WHEN EVENT_CHALLENGES THEN 1 ELSE 0 END +
-                                CASE WHEN CREATIVE_MODE THEN 1 ELSE 0 END +
-                                CASE WHEN SOCIAL_ACHIEVEMENTS THEN 1 ELSE 0 END
-                            ) / 11.0 AS ACHIEVEMENTS_PERCENTAGE,
-                        ae.total_purchases,
-                        ae.proportion_purchased,
-                        ae.average_purchase_amount,
-                        ae.average_ad_engagement_time,
-                        r.churned
-                        FROM {session.get_current_database()}.ANALYTIC.RETENTION r 
-                        JOIN {session.get_current_database()}.ANALYTIC.DEMOGRAPHICS d ON r.user_id = d.user_id 
-                        JOIN {session.get_current_database()}.ANALYTIC.USER_RANKINGS ur ON r.user_id = ur.user_id
-                        JOIN {session.get_current_database()}.RAW.ACHIEVEMENTS a ON r.user_id = a.user_id
-                        JOIN {session.get_current_database()}.ANALYTIC.AD_ENGAGEMENT ae ON r.user_id = ae.user_id
-                        """)
+
+# the sidebar filters and churn rates run in the warehouse, only a sample of all players is pulled for the static charts
+if SERVER_SIDE_FILTERS:
+    eda_df = load_query(*eda_query(session.get_current_database(), limit=EDA_SAMPLE_ROWS, sample=True))
+else:
+    eda_df = load_query(*eda_query(session.get_current_database()))
+# where eda_df came from, the cached helpers key on this instead of hashing the frame
+table_version = load_table_versions(session.get_current_database())
+eda_lineage = lineage(table_version, EDA_TABLES, sample=EDA_SAMPLE_ROWS if SERVER_SIDE_FILTERS else None)
+# the static churn rates and heatmap change when the summary tables refresh
+static_lineage = lineage(table_version, SUMMARY_TABLES) if STATIC_SUMMARY_TABLES else eda_lineage
 
 components.html("""
   <script>
@@ -428,241 +636,207 @@ with stylable_container(
         )
 
 # implement filtering
-filtered_df = filter_dataframe(eda_df, playerbase, age_ranges, gender, country_ranges, player_type, support_ticket, rank_range)    
+filters = EdaFilters(playerbase, tuple(age_ranges), gender, tuple(country_ranges), player_type, support_ticket, tuple(rank_range))
+if SERVER_SIDE_FILTERS:
+    filtered_df = load_query(*eda_query(session.get_current_database(), filters, limit=FILTERED_ROW_LIMIT))
+    total_filtered = load_query(*count_query(session.get_current_database(), filters))['PLAYERS'].iloc[0]
+    filtered_lineage = lineage(table_version, EDA_TABLES, filters=filters, limit=FILTERED_ROW_LIMIT)
+else:
+    filtered_df = filter_dataframe(eda_df, playerbase, age_ranges, gender, country_ranges, player_type, support_ticket, rank_range,
+                                   age_codes=eda_age_codes(eda_df, lineage=eda_lineage), lineage=eda_lineage)
+    total_filtered = len(filtered_df)
+    filtered_lineage = derive(eda_lineage, filters=filters)
 
 
 st.markdown("### Filtered Dataframe")
-create_saved_pagination(filtered_df, "Filtered_Dataframe")
+if total_filtered > len(filtered_df):
+    st.caption(f"Churn likelihood below uses the first {len(filtered_df):,} of {total_filtered:,} matching players")
+create_saved_pagination(filtered_df, "Filtered_Dataframe", lineage=filtered_lineage)
 st.markdown("<br><br>", unsafe_allow_html=True)
 
 
-static_demographics, static_game_metrics, dynamic_demographics, dynamic_churn_likelihood = st.tabs(
-    ["STATIC DEMOGRAPHICS",
-    "STATIC GAME METRICS",
-    "DYNAMIC DEMOGRAPHICS",
-   "DYNAMIC CHURN LIKELIHOOD"])
+# only the selected section runs, what it draws is kept per lineage token of the data it was drawn from
+game_tabs = LazyTabs(["STATIC DEMOGRAPHICS",
+                      "STATIC GAME METRICS",
+                      "DYNAMIC DEMOGRAPHICS",
+                      "DYNAMIC CHURN LIKELIHOOD"], frame_cache())
+game_tabs.select(st.radio("Section", options=game_tabs.labels, horizontal=True, key="game_360_tab", label_visibility="collapsed"))
 
 # annotations on heatmap
 show_annotations = st.sidebar.checkbox("Show Annotations", value=False)
 
-with static_demographics:
-    # use Profile Report to summarize EDA
-    components.html(save_eda(eda_df), height=500, scrolling=True)
-
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        eda_df['Age_Group'] = pd.cut(eda_df['AGE'], bins=[0,12,18, 24, 34, 44, 54, 64, 100], labels=['0_11','12_17','18_24', '25_34', '35_44', '45_54', '55_64', '65+'])
-        churn_by_age = eda_df.groupby('Age_Group')['CHURNED'].mean() * 100
-        churn_by_age.plot(kind='bar', title="Churn Rate by Age Group")
-        plt.ylabel("Churn Rate (%)")
-        st.pyplot(plt,clear_figure=True)
-
-    with col2:
-        churn_by_location = eda_df.groupby('LOCATION')['CHURNED'].mean() * 100
-        churn_by_location.plot(kind='bar', title="Churn Rate by Location")
-        plt.ylabel("Churn Rate (%)")
-        plt.show()
-        st.pyplot(plt,clear_figure=True)
-
-    with col3:
-        churn_by_player_type = eda_df.groupby('PLAYER_TYPE')['CHURNED'].mean() * 100
-        churn_by_player_type.plot(kind='bar', title="Churn Rate by Player Type")
-        plt.ylabel("Churn Rate (%)")
-        st.pyplot(plt,clear_figure=True)
+if game_tabs.is_open("STATIC DEMOGRAPHICS"):
+    with game_tabs.section("STATIC DEMOGRAPHICS"):
+        # use Profile Report to summarize EDA
+        components.html(save_eda(eda_df, filter_signature(EdaFilters(), scope='static', n_rows=len(eda_df), columns=eda_df.columns, lineage=eda_lineage)), height=500, scrolling=True)
+
+        col1, col2, col3 = st.columns(3)
+        for col, by, title in [(col1, 'AGE_GROUP', "Churn Rate by Age Group"),
+                               (col2, 'LOCATION', "Churn Rate by Location"),
+                               (col3, 'PLAYER_TYPE', "Churn Rate by Player Type")]:
+            with col, span(f"churn_by_{by.lower()}", 'chart'):
+                st.image(game_tabs.memo("STATIC DEMOGRAPHICS", f"churn_by_{by.lower()}", static_lineage,
+                                        lambda: figure_png(lambda: draw_churn_rate(churn_rate_by(by), title))),
+                         use_column_width=True)
             
-    col1, col2 = st.columns(2)
-    with col1:
-        # features-metrics
-        sns.heatmap(eda_df[list(eda_df.describe())].corr(), annot=show_annotations, cmap='coolwarm', fmt='.2f', linewidths=0.5, annot_kws={"size": 8})
-        plt.title("Correlation Matrix")
-        plt.xticks(fontsize=6)  # Set font size for x-axis ticks (feature names)
-        plt.yticks(fontsize=6) 
-        st.pyplot(plt,clear_figure=True)
-        
-    with col2:
-        sns.pairplot(eda_df[['PROPORTION_PURCHASED', 'AVERAGE_PURCHASE_AMOUNT','AVERAGE_AD_ENGAGEMENT_TIME', 'CHURNED']], diag_kind='kde', hue="CHURNED",palette='husl')
-        plt.suptitle('Pair Plot of Purchases and Ad Engagement Information by Churn', y=1.02, fontsize=20)
-        plt.tight_layout()
-        plt.show()
-        st.pyplot(plt,clear_figure=True)
-        
-    churned_data = eda_df[eda_df["CHURNED"] == 1]
-    non_churned_data = eda_df[eda_df["CHURNED"] == 0]
-    
-    fig = go.Figure()
-    
-    # Add churned data points (red 'x')
-    fig.add_trace(go.Scatter3d(
-        x=churned_data["TOTAL_LOGINS"],
-        y=churned_data["TOTAL_POINTS"],
-        z=churned_data["TOTAL_PURCHASES"],
-        mode='markers',
-        marker=dict(size=6, color='red', symbol='x'),
-        name='Churned'
-    ))
-    
-    # Add non-churned data points (blue markers)
-    fig.add_trace(go.Scatter3d(
-        x=non_churned_data["TOTAL_LOGINS"],
-        y=non_churned_data["TOTAL_POINTS"],
-        z=non_churned_data["TOTAL_PURCHASES"],
-        mode='markers',
-        marker=dict(size=6, color='blue'),
-        name='Non-Churned'
-    ))
-    
-    # Set axis labels and title
-    fig.update_layout(
-        title='Interactive 3D Plot of Total Logins, Total Points, and Total Purchases',
-        scene=dict(
-            xaxis_title='Total Logins',
-            yaxis_title='Total Points',
-            zaxis_title='Total Purchases'
-        ),
-        legend=dict(x=0.1, y=0.9)
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-with static_game_metrics:
-    col1, col2 = st.columns(2)
-    with col1:
-        monthly_base, daily_base, other_charts = AltairCharts().plot_daily_monthly_breakdown("ACTIVE_DATE", "ACTIVE_USER_COUNT", dau_df, "Daily Active Users", "Monthly Active Users",
-                                                                                             ['ACTIVE_DATE', 'ACTIVE_DATE'],
-                                                                                             ["ARP_DAU", "DARPPU"],
-                                                                                             [arpdau_df, darppu_df],
-                                                                                            ['Average Revenue Per Daily Active User', 'Daily Average Revenue Per Paying Customer'])
-        st.altair_chart(alt.vconcat(monthly_base, daily_base, *other_charts), use_container_width=True)
-    with col2:
-        monthly_base, daily_base, other_charts= AltairCharts().plot_daily_monthly_breakdown("DATE", "CHURNED_USERS", dcr_df, "Daily Churned Users", "Monthly Churned Users")
-        st.altair_chart(alt.vconcat(monthly_base, daily_base, *other_charts), use_container_width=True)
-        monthly_base, daily_base, _ = AltairCharts().plot_daily_monthly_breakdown("DATE", "CHURN_RATE_PERCENTAGE", dcr_df, "Daily Churned Rate", "Monthly Churned Rate", override=True)
-        st.altair_chart(alt.vconcat(monthly_base,daily_base), use_container_width=True)
-
-
-    st.markdown("**Customer Lifetime Value by Cohort**")
-    st.line_chart(cltv_cohort_df, x='COHORT_MONTH', y=['TOTAL_PLAYERS','NORMALIZED_LTV'])
+        col1, col2 = st.columns(2)
+        with col1, span('heatmap', 'chart'):
+            st.image(game_tabs.memo("STATIC DEMOGRAPHICS", 'heatmap', derive(static_lineage, annotations=show_annotations),
+                                    lambda: figure_png(lambda: draw_correlation_heatmap(static_correlation(), show_annotations))),
+                     use_column_width=True)
+            
+        with col2, span('pairplot', 'chart'):
+            show_artifact(*memo_artifact("STATIC DEMOGRAPHICS", 'pairplot', eda_lineage, lambda: submit_churn_pairplot(eda_df)))
+
+        with span('scatter_3d', 'chart'):
+            st.plotly_chart(game_tabs.memo("STATIC DEMOGRAPHICS", 'scatter_3d', eda_lineage, lambda: churn_scatter_3d(eda_df)),
+                            use_container_width=True)
+
+if game_tabs.is_open("STATIC GAME METRICS"):
+    with game_tabs.section("STATIC GAME METRICS"):
+        col1, col2 = st.columns(2)
+        with col1:
+            monthly_base, daily_base, other_charts = AltairCharts().plot_daily_monthly_breakdown("ACTIVE_DATE", "ACTIVE_USER_COUNT", dau_df, "Daily Active Users", "Monthly Active Users",
+                                                                                                 ['ACTIVE_DATE', 'ACTIVE_DATE'],
+                                                                                                 ["ARP_DAU", "DARPPU"],
+                                                                                                 [arpdau_df, darppu_df],
+                                                                                                ['Average Revenue Per Daily Active User', 'Daily Average Revenue Per Paying Customer'])
+            st.altair_chart(alt.vconcat(monthly_base, daily_base, *other_charts), use_container_width=True)
+        with col2:
+            monthly_base, daily_base, other_charts= AltairCharts().plot_daily_monthly_breakdown("DATE", "CHURNED_USERS", dcr_df, "Daily Churned Users", "Monthly Churned Users")
+            st.altair_chart(alt.vconcat(monthly_base, daily_base, *other_charts), use_container_width=True)
+            monthly_base, daily_base, _ = AltairCharts().plot_daily_monthly_breakdown("DATE", "CHURN_RATE_PERCENTAGE", dcr_df, "Daily Churned Rate", "Monthly Churned Rate", override=True)
+            st.altair_chart(alt.vconcat(monthly_base,daily_base), use_container_width=True)
+
+
+        st.markdown("**Customer Lifetime Value by Cohort**")
+        st.line_chart(cltv_cohort_df, x='COHORT_MONTH', y=['TOTAL_PLAYERS','NORMALIZED_LTV'])
 
 # model explanations
-with dynamic_demographics:
-    components.html(save_eda(filtered_df), height=500, scrolling=True)
-    col1, col2 = st.columns(2)
-    with col1:
-        # features-metrics
-        sns.heatmap(filtered_df[list(filtered_df.describe())].corr(), annot=show_annotations, cmap='coolwarm', fmt='.2f', linewidths=0.5, annot_kws={"size": 8})
-        plt.title("Correlation Matrix")
-        plt.xticks(fontsize=6)  # Set font size for x-axis ticks (feature names)
-        plt.yticks(fontsize=6) 
-        st.pyplot(plt,clear_figure=True)
-        
-    with col2:
-        sns.pairplot(filtered_df[['PROPORTION_PURCHASED', 'AVERAGE_PURCHASE_AMOUNT','AVERAGE_AD_ENGAGEMENT_TIME', 'CHURNED']], diag_kind='kde', hue="CHURNED",palette='husl')
-        plt.suptitle('Pair Plot of Purchases and Ad Engagement Information by Churn', y=1.02, fontsize=20)
-        plt.tight_layout()
-        plt.show()
-        st.pyplot(plt,clear_figure=True)
-    
-    
+if game_tabs.is_open("DYNAMIC DEMOGRAPHICS"):
+    with game_tabs.section("DYNAMIC DEMOGRAPHICS"):
+        components.html(save_eda(filtered_df, filter_signature(filters, n_rows=total_filtered, columns=filtered_df.columns, lineage=filtered_lineage)), height=500, scrolling=True)
+        col1, col2 = st.columns(2)
+        with col1, span('heatmap', 'chart'):
+            st.image(game_tabs.memo("DYNAMIC DEMOGRAPHICS", 'heatmap', derive(filtered_lineage, annotations=show_annotations),
+                                    lambda: figure_png(lambda: draw_correlation_heatmap(correlation(filtered_df), show_annotations))),
+                     use_column_width=True)
+            
+        with col2, span('pairplot', 'chart'):
+            show_artifact(*memo_artifact("DYNAMIC DEMOGRAPHICS", 'pairplot', filtered_lineage, lambda: submit_churn_pairplot(filtered_df)))
 
-with dynamic_churn_likelihood:
-
-    col1, col2 = st.columns(2)
-    with col1:
-        st.subheader("Rolling Churn Predictor")
-        # rolling model explanations
-        Features_label = [
-        "TOTAL_SESSION_DURATION_ROLLING_30_DAYS",
-        "TOTAL_SESSIONS_ROLLING_30_DAYS",
-        "AVERAGE_SESSION_LEN_ROLLING_30_DAYS",
-        "TOTAL_POINTS_ROLLING_30_DAYS",
-        "AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS",
-        "TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS",
-        "TOTAL_PURCHASES_ROLLING_30_DAYS",
-        "AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS",
-        "TOTAL_ADS_ROLLING_30_DAYS",
-        "AD_CONVERSION_RATE_ROLLING_30_DAYS",
-        "TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS",
-        "AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS"
-        ]
-        
-        reg = Registry(session=session)
-        
-        MODEL_NAME = "Player360_RollingChurn_Classifier"
-        MODEL_VERSION = "v1"
+if game_tabs.is_open("DYNAMIC CHURN LIKELIHOOD"):
+    with game_tabs.section("DYNAMIC CHURN LIKELIHOOD"):
 
-        # filter out the subset
-        filtered_features_df = pd.merge(features_df, filtered_df[['USER_ID']], on='USER_ID', how='inner')
-        
-        mv= cache_model(MODEL_NAME, MODEL_VERSION)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("Rolling Churn Predictor")
+            # rolling model explanations
+            Features_label = [
+            "TOTAL_SESSION_DURATION_ROLLING_30_DAYS",
+            "TOTAL_SESSIONS_ROLLING_30_DAYS",
+            "AVERAGE_SESSION_LEN_ROLLING_30_DAYS",
+            "TOTAL_POINTS_ROLLING_30_DAYS",
+            "AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS",
+            "TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS",
+            "TOTAL_PURCHASES_ROLLING_30_DAYS",
+            "AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS",
+            "TOTAL_ADS_ROLLING_30_DAYS",
+            "AD_CONVERSION_RATE_ROLLING_30_DAYS",
+            "TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS",
+            "AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS"
+            ]
         
-        with st.form("Shap_form"):
-            sample_size = st.slider(label="Select Sampling Size",
-                                        min_value = 0,
-                                        max_value = min(len(filtered_features_df), 100000),
-                                        value = 1)
-            selected_plot_type = st.selectbox(label='Select a summary plot type', \
-                                              options=['dot', 'bar', 'violin'])
-            submitted = st.form_submit_button("Get Global Shap")
-            if submitted:
-                sample_df = filtered_features_df[Features_label]
-                mv_explanations = mv.run(sample_df[:sample_size], function_name="explain")
-                mv_explanations.columns = [u.replace("_explanation", "").strip('""') for u in mv_explanations.columns]
-                
-                def render_shap_plot():
-                    plt.figure(figsize=(8, 4))
-                    shap.summary_plot(-mv_explanations.values, sample_df[:sample_size], show=False, plot_type = selected_plot_type)
-                    buf = io.BytesIO()
-                    plt.tight_layout()
-                    plt.savefig(buf, format='png')
-                    buf.seek(0)
-                    return buf
-                st.subheader("SHAP Summary Plot")
-                buf = render_shap_plot()
-                st.image(buf, caption='SHAP Summary Plot', use_column_width=True)
-                
-    with col2:
-        st.subheader("Churn Classifier")
-        reg = Registry(session=session)
-
-        train_df = preprocess_filtered_dataframe(filtered_df)
+            MODEL_NAME = "Player360_RollingChurn_Classifier"
+            MODEL_VERSION = "v1"
+
+            if PRECOMPUTED_SHAP:
+                max_sample_size = SHAP_SAMPLE_ROWS
+            else:
+                # filter out the subset
+                if SERVER_SIDE_FILTERS:
+                    filtered_features_df = load_features(*filtered_features_query(session.get_current_database(), filters, limit=100000))
+                else:
+                    features_df = load_features(f"SELECT * FROM {session.get_current_database()}.APP.ROLLING_CHURN_FEATURES")
+                    filtered_features_df = pd.merge(features_df, filtered_df[['USER_ID']], on='USER_ID', how='inner')
+                max_sample_size = min(len(filtered_features_df), 100000)
+                mv= cache_model(MODEL_NAME, MODEL_VERSION)
         
-        MODEL_NAME = "Player360_Churn_Classifier"
-        MODEL_VERSION = "v1"
-        mv= cache_model(MODEL_NAME, MODEL_VERSION, load=True)
-
-        with st.form("Shap_form2"):
-            sample_size = st.slider(label="Select Sampling Size",
-                                        min_value = 0,
-                                        max_value = min(len(train_df), 100000),
-                                        value = 1)
-            selected_plot_type = st.selectbox(label='Select a summary plot type', \
-                                              options=['dot', 'bar', 'violin'])
-            submitted = st.form_submit_button("Get Global Shap")
-            if submitted:
-                sample_df = train_df[['AGE_GROUP', 'LOCATION', 'AVERAGE_SESSIONS_PER_ACTIVE_WEEK',
-       'AVERAGE_SESSION_DURATION', 'HAS_SUPPORT_TICKET',
-       'ACHIEVEMENTS_PERCENTAGE', 'PROPORTION_PURCHASED',
-       'AVERAGE_PURCHASE_AMOUNT', 'AVERAGE_AD_ENGAGEMENT_TIME', 'RANK_NAME_OE',
-       'PLAYER_TYPE_OE', 'GENDER_OE']]
-                sample_df["AGE_GROUP"] = pd.Categorical(sample_df["AGE_GROUP"], ordered=False)
-                sample_df["LOCATION"] = pd.Categorical(sample_df["LOCATION"])
-                sample_df['AGE_GROUP'] = sample_df['AGE_GROUP'].cat.codes
-                sample_df['LOCATION'] = sample_df['LOCATION'].cat.codes
-                sample_df['HAS_SUPPORT_TICKET'] = sample_df['HAS_SUPPORT_TICKET'].astype(int)
+            with st.form("Shap_form"):
+                sample_size = st.slider(label="Select Sampling Size",
+                                            min_value = 0,
+                                            max_value = max_sample_size,
+                                            value = 1)
+                selected_plot_type = st.selectbox(label='Select a summary plot type', \
+                                                  options=['dot', 'bar', 'violin'])
+                submitted = st.form_submit_button("Get Global Shap")
+                if submitted and PRECOMPUTED_SHAP:
+                    shap_lineage = lineage(table_version, (f"APP.{ROLLING_MODEL.table}", f"APP.{ROLLING_MODEL.table}_SUMMARY") + EDA_TABLES,
+                                           filters=filters, sample_size=sample_size, plot_type=selected_plot_type)
+                    st.subheader("SHAP Summary Plot")
+                    with span('shap_summary_plot', 'chart'):
+                        key, caption = memo_artifact("DYNAMIC CHURN LIKELIHOOD", 'rolling_shap', shap_lineage,
+                                                     lambda: submit_shap_summary(ROLLING_MODEL, filters, sample_size, selected_plot_type))
+                        show_artifact(key, f"SHAP Summary Plot, {caption}")
+                elif submitted:
+                    sample_df = filtered_features_df[Features_label]
+                    with span('explain', 'model', queries=True):
+                        mv_explanations = mv.run(sample_df[:sample_size], function_name="explain")
+                    mv_explanations.columns = [u.replace("_explanation", "").strip('""') for u in mv_explanations.columns]
+
+                    st.subheader("SHAP Summary Plot")
+                    with span('shap_summary_plot', 'chart'):
+                        key = plot_artifacts().submit('shap_summary', draw_shap_summary, -mv_explanations.values, sample_df[:sample_size], selected_plot_type)
+                        show_artifact(key, 'SHAP Summary Plot')
                 
-                def render_shap_plot():
-                    plt.figure(figsize=(8, 4))
-                    explainer = shap.TreeExplainer(mv)
-
-                    # Calculate SHAP values
-                    shap_values = explainer(sample_df)
-                    
-                    # Plot SHAP values
-                    shap.summary_plot(shap_values, sample_df, show=False, plot_type=selected_plot_type) 
-                    buf = io.BytesIO()
-                    plt.tight_layout()
-                    plt.savefig(buf, format='png')
-                    buf.seek(0)
-                    return buf
-                st.subheader("SHAP Summary Plot")
-                buf = render_shap_plot()
-                st.image(buf, caption='SHAP Summary Plot', use_column_width=True)
\ No newline at end of file
+        with col2:
+            st.subheader("Churn Classifier")
+            MODEL_NAME = "Player360_Churn_Classifier"
+            MODEL_VERSION = "v1"
+            if PRECOMPUTED_SHAP:
+                max_sample_size = SHAP_SAMPLE_ROWS
+            else:
+                train_df = preprocess_filtered_dataframe(filtered_df, lineage=filtered_lineage)
+                max_sample_size = min(len(train_df), 100000)
+                mv= cache_model(MODEL_NAME, MODEL_VERSION, load=True)
+
+            with st.form("Shap_form2"):
+                sample_size = st.slider(label="Select Sampling Size",
+                                            min_value = 0,
+                                            max_value = max_sample_size,
+                                            value = 1)
+                selected_plot_type = st.selectbox(label='Select a summary plot type', \
+                                                  options=['dot', 'bar', 'violin'])
+                submitted = st.form_submit_button("Get Global Shap")
+                if submitted and PRECOMPUTED_SHAP:
+                    shap_lineage = lineage(table_version, (f"APP.{STATIC_MODEL.table}", f"APP.{STATIC_MODEL.table}_SUMMARY") + EDA_TABLES,
+                                           filters=filters, sample_size=sample_size, plot_type=selected_plot_type)
+                    st.subheader("SHAP Summary Plot")
+                    with span('shap_summary_plot', 'chart'):
+                        key, caption = memo_artifact("DYNAMIC CHURN LIKELIHOOD", 'churn_shap', shap_lineage,
+                                                     lambda: submit_shap_summary(STATIC_MODEL, filters, sample_size, selected_plot_type))
+                        show_artifact(key, f"SHAP Summary Plot, {caption}")
+                elif submitted:
+                    sample_df = train_df[['AGE_GROUP', 'LOCATION', 'AVERAGE_SESSIONS_PER_ACTIVE_WEEK',
+           'AVERAGE_SESSION_DURATION', 'HAS_SUPPORT_TICKET',
+           'ACHIEVEMENTS_PERCENTAGE', 'PROPORTION_PURCHASED',
+           'AVERAGE_PURCHASE_AMOUNT', 'AVERAGE_AD_ENGAGEMENT_TIME', 'RANK_NAME_OE',
+           'PLAYER_TYPE_OE', 'GENDER_OE']]
+                    sample_df["AGE_GROUP"] = pd.Categorical(sample_df["AGE_GROUP"], ordered=False)
+                    sample_df["LOCATION"] = pd.Categorical(sample_df["LOCATION"])
+                    sample_df['AGE_GROUP'] = sample_df['AGE_GROUP'].cat.codes
+                    sample_df['LOCATION'] = sample_df['LOCATION'].cat.codes
+                    sample_df['HAS_SUPPORT_TICKET'] = sample_df['HAS_SUPPORT_TICKET'].astype(int)
+
+                    with span('explain', 'model'):
+                        explainer = shap.TreeExplainer(mv)
+                        # Calculate SHAP values
+                        shap_values = explainer(sample_df)
+                    st.subheader("SHAP Summary Plot")
+                    with span('shap_summary_plot', 'chart'):
+                        key = plot_artifacts().submit('shap_summary', draw_shap_summary, shap_values.values, sample_df, selected_plot_type)
+                        show_artifact(key, 'SHAP Summary Plot')
+
+show_cache_stats()
+render_trace.finish()
+show_render_profile(render_trace)
@@ -0,0 +1,32 @@
+# Paging of the tables shown by both apps.
+# Only the rows of the requested page are copied out of the frame, through iloc, and a sorted view
+# reads its rows through a sort permutation that is computed once per column and direction.
+import numpy as np
+import pandas as pd
+
+PAGE_SIZES = [25, 50, 100]
+
+
+def page_count(n_rows, page_size):
+    """Pages needed for ``n_rows``, the last one may be partial, at least one page."""
+    return max(1, -(-int(n_rows) // int(page_size)))
+
+
+def page_bounds(page, page_size, n_rows):
+    """Row positions [start, stop) of the 1-based ``page``."""
+    start = min((int(page) - 1) * int(page_size), int(n_rows))
+    return start, min(start + int(page_size), int(n_rows))
+
+
+def sort_permutation(values, ascending=True):
+    """Row positions that sort ``values`` like sort_values(kind='stable'), missing values last."""
+    values = pd.Series(values).reset_index(drop=True)
+    return values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy(dtype=np.int64)
+
+
+def frame_page(df, page, page_size, order=None):
+    """The rows of ``page``, taken in ``order`` when a sort permutation is given."""
+    start, stop = page_bounds(page, page_size, len(df))
+    if order is None:
+        return df.iloc[start:stop]
+    return df.iloc[order[start:stop]]
@@ -0,0 +1,103 @@
+# Loads everything the PLAYER_360 drill-down needs for one player in a single round of concurrent queries.
+# Every query is submitted with to_pandas(block=False) before any result is awaited, and USER_ID is bound
+# as a parameter instead of being formatted into the SQL.
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+
+class PlayerBundle(NamedTuple):
+    achievements: pd.DataFrame
+    points_per_event: pd.DataFrame
+    sessions: pd.DataFrame
+    purchases: pd.DataFrame
+    rolling_features: pd.DataFrame
+    # the latest feature row to score, only loaded for active players
+    to_predict: Optional[pd.DataFrame] = None
+    # the score of that row written by scripts/batch_score.py, only loaded for active players when asked for
+    churn_prediction: Optional[pd.DataFrame] = None
+
+
+PLAYER_QUERIES = {
+    'achievements': "SELECT * FROM {prefix}RAW.ACHIEVEMENTS WHERE USER_ID = ?",
+    'points_per_event': "SELECT * FROM {prefix}ANALYTIC.POINTS_PER_EVENT WHERE USER_ID = ? ORDER BY LOG_IN ASC",
+    'sessions': "SELECT * FROM {prefix}RAW.SESSIONS WHERE USER_ID = ? ORDER BY LOG_IN ASC",
+    'purchases': "SELECT * FROM {prefix}RAW.PURCHASES WHERE USER_ID = ? ORDER BY TIMESTAMP_OF_PURCHASE ASC",
+    'rolling_features': "SELECT * FROM {prefix}APP.ROLLING_CHURN_FEATURES WHERE USER_ID = ?",
+    'to_predict': "SELECT * FROM {prefix}APP.TO_BE_PREDICTED_CHURN_FEATURES WHERE USER_ID = ?",
+    # only a score of the player's current feature row, a row rebuilt since the batch run hashes differently
+    'churn_prediction': """SELECT p.* FROM {prefix}APP.CHURN_PREDICTIONS p
+JOIN {prefix}APP.TO_BE_PREDICTED_CHURN_FEATURES f
+  ON f.USER_ID = p.USER_ID AND f.DAY = p.DAY AND p.FEATURE_HASH = HASH({hashed})
+WHERE p.USER_ID = ?""",
+}
+# the queries only run for active players
+ACTIVE_QUERIES = ('to_predict', 'churn_prediction')
+# the tables PLAYER_QUERIES read, a loaded bundle is current as long as their versions are
+PLAYER_TABLES = ('RAW.ACHIEVEMENTS', 'ANALYTIC.POINTS_PER_EVENT', 'RAW.SESSIONS', 'RAW.PURCHASES',
+                 'APP.ROLLING_CHURN_FEATURES', 'APP.TO_BE_PREDICTED_CHURN_FEATURES', 'APP.CHURN_PREDICTIONS')
+# the ROLLING_FEATURES dtypes of notebooks/feature_schema.py, the feature tables are read back at the widths
+# they were built with instead of int64 and float64
+FEATURE_DTYPES = {
+    'USER_ID': 'int32',
+    'SESSION_INACTIVE': 'int8',
+    'TOTAL_SESSION_DURATION_ROLLING_30_DAYS': 'int32',
+    'TOTAL_SESSIONS_ROLLING_30_DAYS': 'int32',
+    'AVERAGE_SESSION_LEN_ROLLING_30_DAYS': 'float32',
+    'TOTAL_POINTS_ROLLING_30_DAYS': 'float32',
+    'AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS': 'float32',
+    'PURCHASE_INACTIVE': 'int8',
+    'TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS': 'int32',
+    'TOTAL_PURCHASES_ROLLING_30_DAYS': 'int32',
+    'AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS': 'float32',
+    'TOTAL_ADS_ROLLING_30_DAYS': 'int32',
+    'AD_CONVERSION_RATE_ROLLING_30_DAYS': 'float32',
+    'TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS': 'int32',
+    'AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS': 'float32',
+    'LOGIN_NEXT_7_DAYS': 'int8',
+}
+FEATURE_QUERIES = ('rolling_features', 'to_predict')
+# the FEATURE_HASH of a prediction is HASH() of these, in this order. Must equal HASHED_COLUMNS of
+# scripts/batch_score.py or no precomputed prediction matches, benchmarks/bench_batch_score.py checks it
+PREDICTION_HASH_COLUMNS = [
+    'USER_ID',
+    'DAY',
+    'TOTAL_SESSION_DURATION_ROLLING_30_DAYS',
+    'TOTAL_SESSIONS_ROLLING_30_DAYS',
+    'AVERAGE_SESSION_LEN_ROLLING_30_DAYS',
+    'TOTAL_POINTS_ROLLING_30_DAYS',
+    'AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS',
+    'TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+    'TOTAL_PURCHASES_ROLLING_30_DAYS',
+    'AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+    'TOTAL_ADS_ROLLING_30_DAYS',
+    'AD_CONVERSION_RATE_ROLLING_30_DAYS',
+    'TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS',
+    'AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS',
+]
+
+
+def player_queries(database, active=True, predictions=False):
+    """(name, sql) of the queries of one player, ``database`` is None when the schemas are attached directly.
+
+    The precomputed churn prediction is read only with ``predictions``, APP.CHURN_PREDICTIONS exists once
+    scripts/batch_score.py ran.
+    """
+    prefix = f"{database}." if database else ""
+    hashed = ", ".join(f"f.{column}" for column in PREDICTION_HASH_COLUMNS)
+    return [(name, sql.format(prefix=prefix, hashed=hashed)) for name, sql in PLAYER_QUERIES.items()
+            if (active or name not in ACTIVE_QUERIES) and (predictions or name != 'churn_prediction')]
+
+
+def compact_features(df):
+    """``df`` with its feature columns at FEATURE_DTYPES, the other columns as they are."""
+    return df.astype({column: FEATURE_DTYPES[column] for column in df.columns if column in FEATURE_DTYPES}, copy=False)
+
+
+def load_player_bundle(session, database, user_id, active=True, predictions=False):
+    """Run the player's queries concurrently and wait for all of them."""
+    user_id = int(user_id)
+    jobs = {name: session.sql(sql, params=[user_id]).to_pandas(block=False)
+            for name, sql in player_queries(database, active, predictions)}
+    return PlayerBundle(**{name: compact_features(job.result()) if name in FEATURE_QUERIES else job.result()
+                           for name, job in jobs.items()})
@@ -0,0 +1,76 @@
+# In-memory store of ANALYTIC.PLAYER_PROFILES for the PLAYER_360 page.
+# The table is held column by column with a USER_ID -> row position index, so switching
+# players is an array lookup instead of filtering several full tables.
+import numpy as np
+import pandas as pd
+
+PROFILE_TABLE = 'ANALYTIC.PLAYER_PROFILES'
+
+# ids are mapped through a dense array when they are close to contiguous, else through a dict
+MAX_DENSE_SPAN_RATIO = 4
+
+
+class PlayerStore:
+    def __init__(self, profiles_df):
+        if profiles_df['USER_ID'].duplicated().any():
+            raise ValueError("PLAYER_PROFILES must have one row per USER_ID")
+        self.columns = {col: profiles_df[col].to_numpy() for col in profiles_df.columns}
+        user_ids = self.columns['USER_ID'].astype(np.int64)
+        self.n_players = len(user_ids)
+
+        self._min_id = int(user_ids.min()) if self.n_players else 0
+        span = int(user_ids.max()) - self._min_id + 1 if self.n_players else 0
+        if span <= MAX_DENSE_SPAN_RATIO * max(self.n_players, 1):
+            self._positions = np.full(span, -1, dtype=np.int64)
+            self._positions[user_ids - self._min_id] = np.arange(self.n_players)
+            self._position_dict = None
+        else:
+            self._positions = None
+            self._position_dict = dict(zip(user_ids.tolist(), range(self.n_players)))
+
+    @classmethod
+    def from_session(cls, session, database):
+        return cls(session.table(f"{database}.{PROFILE_TABLE}").to_pandas())
+
+    def __len__(self):
+        return self.n_players
+
+    def __contains__(self, user_id):
+        return self.position(user_id) >= 0
+
+    def position(self, user_id):
+        if self._positions is not None:
+            offset = int(user_id) - self._min_id
+            if 0 <= offset < len(self._positions):
+                return int(self._positions[offset])
+            return -1
+        return self._position_dict.get(int(user_id), -1)
+
+    @staticmethod
+    def _scalar(value):
+        # datetime columns come back as numpy datetime64, the page expects timestamps
+        if isinstance(value, np.datetime64):
+            return pd.Timestamp(value)
+        return value
+
+    def value(self, user_id, column):
+        position = self.position(user_id)
+        if position < 0:
+            raise KeyError(user_id)
+        return self._scalar(self.columns[column][position])
+
+    def profile(self, user_id):
+        """All columns of ``user_id`` as a dict, or None when the player does not exist."""
+        position = self.position(user_id)
+        if position < 0:
+            return None
+        return {col: self._scalar(values[position]) for col, values in self.columns.items()}
+
+    def is_active(self, user_id):
+        return user_id in self and self.value(user_id, 'CHURNED') == 0
+
+    @property
+    def nbytes(self):
+        # object columns only count their pointers
+        index_bytes = self._positions.nbytes if self._positions is not None else 0
+        return index_bytes + sum(values.nbytes for values in self.columns.values())
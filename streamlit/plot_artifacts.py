@@ -0,0 +1,258 @@
+# PNG artifacts of the heavy matplotlib and seaborn figures of the Streamlit pages, SHAP summaries and pair
+# plots, rendered on a process pool with the Agg backend so a rerun never draws them in the script thread.
+# An artifact is addressed by a hash of the draw function and of its inputs, frames and arrays by content, so
+# the same inputs give the same PNG in every session. PNGs are kept in a memory LRU bounded by max_bytes and,
+# with a persist_dir, in files bounded by max_disk_bytes that outlive the process. Pages submit a figure, show
+# a placeholder and poll until it is ready.
+import hashlib
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# bump when a draw function changes its picture, persisted PNGs of older versions are not read again
+ARTIFACT_VERSION = 1
+
+
+def _feed(digest, value):
+    if isinstance(value, pd.DataFrame):
+        digest.update(b'frame')
+        digest.update(repr([(str(column), str(dtype)) for column, dtype in value.dtypes.items()]).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        digest.update(b'series')
+        digest.update(repr((value.name, str(value.dtype))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(b'array')
+        digest.update(repr((str(value.dtype), value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        digest.update(b'dict')
+        for key in sorted(value, key=repr):
+            _feed(digest, key)
+            _feed(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _feed(digest, item)
+    elif callable(value) and hasattr(value, '__qualname__'):
+        digest.update(f"{value.__module__}.{value.__qualname__}".encode())
+    else:
+        digest.update(repr(value).encode())
+    digest.update(b'|')
+
+
+def artifact_key(*inputs, **params):
+    """Hex sha256 of ``inputs`` and ``params``, frames and arrays hashed by content."""
+    digest = hashlib.sha256(f"v{ARTIFACT_VERSION}".encode())
+    _feed(digest, inputs)
+    _feed(digest, params)
+    return digest.hexdigest()
+
+
+def _init_worker(path):
+    # spawned workers import the draw functions from the page's module path, and never open a window
+    sys.path[:] = path
+    os.environ['MPLBACKEND'] = 'Agg'
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_png(draw, args, kwargs, dpi=100):
+    """PNG bytes of ``draw(*args, **kwargs)``, run in a pool worker."""
+    from lazy_sections import figure_png
+
+    return figure_png(lambda: draw(*args, **kwargs), dpi=dpi)
+
+
+class PlotArtifacts:
+    def __init__(self, max_bytes=64 * 2**20, persist_dir=None, max_disk_bytes=512 * 2**20, max_workers=2, dpi=100,
+                 mp_context='spawn'):
+        # forking the threaded Streamlit server is unsafe, workers are spawned and import matplotlib once
+        self.max_bytes = max_bytes
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        self.max_disk_bytes = max_disk_bytes
+        self.max_workers = max_workers
+        self.dpi = dpi
+        self.mp_context = mp_context
+        self.pngs = OrderedDict()
+        self.nbytes = 0
+        self.stats = {'hits': 0, 'persisted_hits': 0, 'misses': 0, 'evictions': 0, 'errors': 0, 'render_seconds': 0.0}
+        self._pending = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        if self.persist_dir:
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+
+    def __len__(self):
+        return len(self.pngs)
+
+    def __contains__(self, key):
+        return key in self.pngs
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context(self.mp_context),
+                                                 initializer=_init_worker, initargs=(list(sys.path),))
+            return self._pool
+
+    def _path(self, key):
+        return self.persist_dir / f"{key}.png"
+
+    def _put(self, key, png):
+        with self._lock:
+            if key in self.pngs:
+                self.nbytes -= len(self.pngs.pop(key))
+            # a PNG larger than the whole budget is persisted but not kept in memory
+            if len(png) <= self.max_bytes:
+                self.pngs[key] = png
+                self.nbytes += len(png)
+            while self.nbytes > self.max_bytes:
+                _, evicted = self.pngs.popitem(last=False)
+                self.nbytes -= len(evicted)
+                self.stats['evictions'] += 1
+
+    def _persist(self, key, png):
+        if not self.persist_dir:
+            return
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(png)
+        tmp_path.replace(path)
+        # the oldest files go first once the folder is over its budget
+        files = sorted(self.persist_dir.glob('*.png'), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        for old in files:
+            if total <= self.max_disk_bytes or old == path:
+                break
+            total -= old.stat().st_size
+            old.unlink(missing_ok=True)
+
+    def _load_persisted(self, key):
+        if self.persist_dir:
+            path = self._path(key)
+            try:
+                png = path.read_bytes()
+            except FileNotFoundError:
+                return None
+            # a read refreshes the file's place in the disk LRU
+            os.utime(path)
+            return png
+        return None
+
+    def get(self, key):
+        """The PNG of ``key`` from memory or disk, None unless rendered."""
+        with self._lock:
+            png = self.pngs.get(key)
+            if png is not None:
+                self.pngs.move_to_end(key)
+                self.stats['hits'] += 1
+                return png
+        png = self._load_persisted(key)
+        if png is not None:
+            self._put(key, png)
+            with self._lock:
+                self.stats['persisted_hits'] += 1
+        return png
+
+    def status(self, key):
+        """'ready', 'pending', 'failed' or 'missing'."""
+        with self._lock:
+            if key in self.pngs:
+                return 'ready'
+            if key in self._pending:
+                return 'pending'
+            if key in self._errors:
+                return 'failed'
+        if self.persist_dir and self._path(key).exists():
+            return 'ready'
+        return 'missing'
+
+    def error(self, key):
+        return self._errors.get(key)
+
+    def _done(self, key, start, future):
+        # runs in the pool's result thread
+        try:
+            png = future.result()
+        except Exception as error:
+            with self._lock:
+                self._errors[key] = error
+                self.stats['errors'] += 1
+        else:
+            self._put(key, png)
+            self._persist(key, png)
+            with self._lock:
+                self.stats['render_seconds'] += time.perf_counter() - start
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def submit(self, kind, draw, *args, **kwargs):
+        """Render ``draw(*args, **kwargs)`` in the background unless it is cached, returns its key.
+
+        ``draw`` must be a module level function, it and its arguments are pickled to a worker.
+        """
+        key = artifact_key(kind, draw, args, kwargs, dpi=self.dpi)
+        if self.status(key) == 'ready':
+            return key
+        with self._lock:
+            if key in self._pending:
+                return key
+            # a failed render is tried again on the next submit
+            self._errors.pop(key, None)
+            self.stats['misses'] += 1
+        pool = self.pool
+        with self._lock:
+            start = time.perf_counter()
+            future = self._pending[key] = pool.submit(render_png, draw, args, kwargs, self.dpi)
+        future.add_done_callback(lambda future: self._done(key, start, future))
+        return key
+
+    def wait(self, key, timeout=None):
+        """Block for at most ``timeout`` seconds on the render of ``key``, returns its status."""
+        with self._lock:
+            future = self._pending.get(key)
+        if future is not None:
+            try:
+                future.result(timeout)
+            except FutureTimeout:
+                return 'pending'
+            except Exception:
+                pass
+            # the done callback may still be storing the PNG
+            deadline = time.monotonic() + 1.0
+            while key in self._pending and time.monotonic() < deadline:
+                time.sleep(0.001)
+        return self.status(key)
+
+    def render(self, kind, draw, *args, **kwargs):
+        """The PNG of ``draw(*args, **kwargs)``, waiting for the render, for notebooks and scripts."""
+        key = self.submit(kind, draw, *args, **kwargs)
+        if self.wait(key) == 'failed':
+            raise self._errors[key]
+        return self.get(key)
+
+    def clear(self):
+        with self._lock:
+            self.pngs.clear()
+            self.nbytes = 0
+            self._errors.clear()
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
@@ -0,0 +1,161 @@
+# Plot-sized data for the GAME_360 player charts. A scatter gets at most a fixed number of points, drawn per
+# churn class in proportion to the class sizes so the picture keeps the churn mix, and says which share of
+# the players it shows. Pair plots can instead be drawn from 1D and 2D histograms of every player, whose
+# size depends on the bin count only.
+from itertools import combinations
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class PlotSample(NamedTuple):
+    frame: pd.DataFrame
+    # {class: players} before and after sampling
+    totals: dict
+    shown: dict
+
+    @property
+    def rate(self):
+        total = sum(self.totals.values())
+        return sum(self.shown.values()) / total if total else 1.0
+
+    def caption(self, labels=None):
+        """'12,000 of 1,500,000 players (0.8%)', with the rate of every class when the classes differ."""
+        total, shown = sum(self.totals.values()), sum(self.shown.values())
+        if shown == total:
+            return f"all {total:,} players"
+        text = f"{shown:,} of {total:,} players ({self.rate:.1%})"
+        rates = {key: self.shown[key] / self.totals[key] for key in self.totals if self.totals[key]}
+        if len(set(round(rate, 3) for rate in rates.values())) > 1:
+            labels = labels or {}
+            text += ", " + ", ".join(f"{labels.get(key, key)} {rate:.1%}" for key, rate in rates.items())
+        return text
+
+
+def class_budgets(totals, budget, min_per_class=0):
+    """Points per class: ``budget`` split in proportion to ``totals``, at least ``min_per_class`` per class."""
+    keys = list(totals)
+    sizes = np.array([totals[key] for key in keys], dtype=np.int64)
+    if sizes.sum() <= budget:
+        return dict(zip(keys, sizes.tolist()))
+    floor = np.minimum(sizes, min_per_class)
+    rest = max(budget - int(floor.sum()), 0)
+    share = (sizes - floor) / max(int((sizes - floor).sum()), 1) * rest
+    counts = np.floor(share).astype(np.int64)
+    # the points lost to rounding go to the largest remainders
+    left = rest - int(counts.sum())
+    counts[np.argsort(-(share - counts), kind='stable')[:left]] += 1
+    return dict(zip(keys, np.minimum(floor + counts, sizes).tolist()))
+
+
+def stratified_sample(df, budget, by='CHURNED', min_per_class=0, seed=0):
+    """At most ``budget`` rows of ``df`` in the class proportions of ``by``, the same rows for the same frame and seed."""
+    codes, classes = pd.factorize(df[by], sort=True)
+    # rows without a class (code -1) are never drawn
+    totals = dict(zip(classes.tolist(), np.bincount(codes[codes >= 0], minlength=len(classes)).tolist()))
+    budgets = class_budgets(totals, budget, min_per_class)
+    if sum(budgets.values()) == len(df):
+        return PlotSample(df, totals, budgets)
+    # one random key per row, the rows with the smallest keys of each class are kept
+    keys = np.random.default_rng(seed).random(len(df))
+    keep = np.zeros(len(df), dtype=bool)
+    for code, cls in enumerate(classes.tolist()):
+        rows = np.flatnonzero(codes == code)
+        if budgets[cls] < len(rows):
+            rows = rows[np.argpartition(keys[rows], budgets[cls])[:budgets[cls]]]
+        keep[rows] = True
+    return PlotSample(df[keep], totals, budgets)
+
+
+class BinnedPairs(NamedTuple):
+    columns: list
+    classes: list
+    # {column: bin edges}, {column: counts[class, bin]} and {(column_x, column_y): counts[class, bin_x, bin_y]}
+    edges: dict
+    diagonal: dict
+    pairs: dict
+    totals: dict
+
+
+def bin_edges(values, bins, clip=0.01):
+    # the top and bottom clip share of players go into the outer bins instead of stretching the axis
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return np.linspace(0.0, 1.0, bins + 1)
+    low, high = np.quantile(values, [clip, 1 - clip])
+    if high <= low:
+        low, high = values.min(), values.max()
+    if high <= low:
+        high = low + 1
+    return np.linspace(low, high, bins + 1)
+
+
+def binned_pairs(df, columns, by='CHURNED', bins=40, clip=0.01):
+    """Histograms of ``columns`` and of every pair of them per class of ``by``, over all rows of ``df``."""
+    codes, classes = pd.factorize(df[by], sort=True)
+    values = {column: df[column].to_numpy(dtype=np.float64) for column in columns}
+    edges = {column: bin_edges(values[column], bins, clip) for column in columns}
+    # clipping after the edges are fixed puts outliers in the outer bins
+    clipped = {column: np.clip(values[column], edges[column][0], edges[column][-1]) for column in columns}
+    diagonal, pairs = {}, {}
+    for column in columns:
+        diagonal[column] = np.stack([np.histogram(clipped[column][codes == code], edges[column])[0]
+                                     for code in range(len(classes))])
+    for x, y in combinations(columns, 2):
+        pairs[(x, y)] = np.stack([np.histogram2d(clipped[x][codes == code], clipped[y][codes == code],
+                                                 [edges[x], edges[y]])[0]
+                                  for code in range(len(classes))])
+    totals = dict(zip(classes.tolist(), np.bincount(codes[codes >= 0], minlength=len(classes)).tolist()))
+    return BinnedPairs(list(columns), classes.tolist(), edges, diagonal, pairs, totals)
+
+
+def draw_binned_pairplot(binned, title=None, min_count=5, colors=None):
+    """Pair plot of ``binned``: class densities on the diagonal, the share of the last class per 2D bin elsewhere.
+
+    Bins holding fewer than ``min_count`` players are left blank.
+    """
+    import matplotlib.pyplot as plt
+
+    columns = binned.columns
+    colors = colors or plt.rcParams['axes.prop_cycle'].by_key()['color']
+    fig, axes = plt.subplots(len(columns), len(columns), figsize=(2.5 * len(columns), 2.5 * len(columns)), squeeze=False)
+    image = None
+    for i, row in enumerate(columns):
+        for j, col in enumerate(columns):
+            ax = axes[i, j]
+            if i == j:
+                edges = binned.edges[col]
+                widths = np.diff(edges)
+                for k, cls in enumerate(binned.classes):
+                    counts = binned.diagonal[col][k]
+                    density = counts / max(counts.sum(), 1) / widths
+                    ax.stairs(density, edges, color=colors[k % len(colors)], label=str(cls))
+            else:
+                # pairs are stored once, the lower triangle shows them transposed
+                counts = binned.pairs[(col, row)] if (col, row) in binned.pairs else binned.pairs[(row, col)].transpose(0, 2, 1)
+                total = counts.sum(axis=0)
+                share = np.where(total >= min_count, counts[-1] / np.maximum(total, 1), np.nan)
+                image = ax.pcolormesh(binned.edges[col], binned.edges[row], share.T, cmap='coolwarm', vmin=0, vmax=1)
+            if i == len(columns) - 1:
+                ax.set_xlabel(col, fontsize=7)
+            if j == 0:
+                ax.set_ylabel(row, fontsize=7)
+            ax.tick_params(labelsize=6)
+    axes[0, 0].legend(title=None, fontsize=6)
+    if image is not None:
+        fig.colorbar(image, ax=axes, shrink=0.6, label=f"share of {binned.classes[-1]}")
+    if title:
+        fig.suptitle(title, y=1.02, fontsize=14)
+    return fig
+
+
+def draw_pairplot(frame, hue='CHURNED', title=None, diag_kind='kde', palette='husl'):
+    """The seaborn pair plot of a sampled ``frame``, coloured by ``hue``."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.pairplot(frame, diag_kind=diag_kind, hue=hue, palette=palette)
+    if title:
+        plt.suptitle(title, y=1.02, fontsize=20)
+    plt.tight_layout()
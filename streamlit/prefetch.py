@@ -0,0 +1,130 @@
+# Background prefetching of the PLAYER_360 per-player data.
+# After a page renders, the players next to the current PLAYER_ID and the recently viewed ones are
+# loaded on a small thread pool, so stepping the number input finds their data already in memory.
+# Bundles are kept with the lineage token of the tables they were read from at the time, a lookup with
+# another token drops them, so a refresh of any of those tables is never served from memory.
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def neighbour_ids(user_id, radius=2):
+    """``user_id + 1, user_id - 1, user_id + 2, ...``, the order a +/- step through the ids reaches them."""
+    ids = []
+    for step in range(1, radius + 1):
+        ids.extend([user_id + step, user_id - step])
+    return ids
+
+
+def frames_nbytes(value):
+    # memory of a frame or of a tuple of frames, None entries count as nothing
+    if value is None:
+        return 0
+    if isinstance(value, tuple):
+        return sum(frames_nbytes(item) for item in value)
+    return int(value.memory_usage(deep=True).sum())
+
+
+def copy_frames(value):
+    # the page adds columns to the frames it gets, so every caller gets its own copy
+    if value is None:
+        return None
+    if isinstance(value, tuple):
+        return type(value)(*(copy_frames(item) for item in value))
+    return value.copy()
+
+
+class PlayerPrefetcher:
+    def __init__(self, load, max_workers=2, max_bytes=128 * 2**20):
+        # load(key) returns the frames of one player, keys are whatever the page looks players up by
+        self.load = load
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.stats = {'hits': 0, 'waits': 0, 'misses': 0, 'stale': 0, 'cancelled': 0, 'evictions': 0, 'errors': 0}
+        self._bundles = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='player-prefetch')
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._bundles
+
+    def get(self, key, lineage=None):
+        """A copy of the prefetched frames of ``key`` read at ``lineage``, waiting if they are being loaded, None
+        if not prefetched. Frames of ``key`` read at another lineage are dropped."""
+        with self._lock:
+            if key in self._bundles:
+                bundle, size, bundle_lineage = self._bundles[key]
+                if bundle_lineage == lineage:
+                    self._bundles.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return copy_frames(bundle)
+                del self._bundles[key]
+                self.nbytes -= size
+                self.stats['stale'] += 1
+            future, future_lineage = self._pending.get(key, (None, None))
+        if future is not None and future_lineage == lineage and not future.cancelled():
+            try:
+                bundle = future.result()
+            except Exception:
+                bundle = None
+            if bundle is not None:
+                with self._lock:
+                    self.stats['waits'] += 1
+                return copy_frames(bundle)
+        with self._lock:
+            self.stats['misses'] += 1
+        return None
+
+    def put(self, key, bundle, lineage=None):
+        size = frames_nbytes(bundle)
+        with self._lock:
+            if key in self._bundles:
+                self.nbytes -= self._bundles.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._bundles[key] = (bundle, size, lineage)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._bundles.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.stats['evictions'] += 1
+
+    def prefetch(self, keys, lineage=None):
+        """Load ``keys`` at ``lineage`` in the background, most wanted first, and cancel queued loads of keys no
+        longer wanted or of another lineage."""
+        wanted = list(dict.fromkeys(keys))
+        with self._lock:
+            for key, (future, future_lineage) in list(self._pending.items()):
+                if (key not in wanted or future_lineage != lineage) and future.cancel():
+                    del self._pending[key]
+                    self.stats['cancelled'] += 1
+            for key in wanted:
+                current = key in self._bundles and self._bundles[key][2] == lineage
+                if not current and key not in self._pending:
+                    self._pending[key] = (self._pool.submit(self._load, key, lineage), lineage)
+
+    def _load(self, key, lineage):
+        try:
+            bundle = self.load(key)
+        except Exception:
+            with self._lock:
+                self._pending.pop(key, None)
+                self.stats['errors'] += 1
+            return None
+        self.put(key, bundle, lineage)
+        with self._lock:
+            self._pending.pop(key, None)
+        return bundle
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def close(self):
+        with self._lock:
+            for future, _ in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,137 @@
+# Cache of the ydata-profiling reports shown by GAME_360, keyed by the filter selection.
+# Rendered reports are kept in memory up to a byte budget and can be persisted gzipped to a
+# local folder or a Snowflake stage so a restarted app does not profile the same selection again.
+import gzip
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# frames above SAMPLE_ROWS are sampled first. Reports are minimal unless asked for, a full report of the EDA
+# columns is 12 to 26 MB of HTML whatever the row count, a minimal one about 1.6 MB
+SAMPLE_ROWS = 200000
+# bump when the report settings change so persisted reports are regenerated
+REPORT_VERSION = 2
+
+
+def filter_signature(filters, scope='filtered', n_rows=None, columns=None, lineage=None):
+    """Stable hash of a filter selection, independent of the order the multiselect values were picked in.
+
+    ``lineage`` is the token of the tables the frame was read from, a refresh gives reports of new data a new
+    key in memory and on the stage instead of serving the persisted report of the old data.
+    """
+    selection = {name: sorted(value) if isinstance(value, (list, tuple)) else value
+                 for name, value in filters._asdict().items()}
+    payload = json.dumps({
+        'scope': scope,
+        'filters': selection,
+        'n_rows': None if n_rows is None else int(n_rows),
+        'columns': None if columns is None else list(columns),
+        'lineage': lineage,
+        'version': REPORT_VERSION,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def profile_html(df, minimal=True, sample_rows=SAMPLE_ROWS, seed=0):
+    """Render the profile report of ``df``, without correlations and interactions when ``minimal`` and on a
+    sample when the frame is large."""
+    from ydata_profiling import ProfileReport
+
+    title = "Pandas Profiling Report"
+    if len(df) > sample_rows:
+        title = f"{title} ({sample_rows:,} of {len(df):,} rows sampled)"
+        df = df.sample(n=sample_rows, random_state=seed)
+    return ProfileReport(df, title=title, minimal=minimal, progress_bar=False).to_html()
+
+
+class ProfileCache:
+    def __init__(self, max_bytes=64 * 2**20, persist_dir=None, stage=None, session=None, render=profile_html):
+        # stage is a location like '@PLAYER_360.APP.PROFILE_REPORTS', read and written through session.file
+        self.max_bytes = max_bytes
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        self.stage = stage.rstrip('/') if stage else None
+        self.session = session
+        self.render = render
+        self.reports = OrderedDict()
+        self.nbytes = 0
+        self.stats = {'hits': 0, 'persisted_hits': 0, 'misses': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        if self.persist_dir:
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+
+    def __len__(self):
+        with self._lock:
+            return len(self.reports)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self.reports
+
+    def get(self, key):
+        with self._lock:
+            html = self.reports.get(key)
+            if html is not None:
+                self.reports.move_to_end(key)
+            return html
+
+    def put(self, key, html):
+        size = len(html.encode())
+        with self._lock:
+            if key in self.reports:
+                self.nbytes -= len(self.reports.pop(key).encode())
+            # a report larger than the whole budget is persisted but not kept in memory
+            if size <= self.max_bytes:
+                self.reports[key] = html
+                self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self.reports.popitem(last=False)
+                self.nbytes -= len(evicted.encode())
+                self.stats['evictions'] += 1
+
+    def _load_persisted(self, key):
+        if self.persist_dir:
+            path = self.persist_dir / f"{key}.html.gz"
+            if path.exists():
+                return gzip.decompress(path.read_bytes()).decode()
+        if self.stage and self.session is not None:
+            try:
+                with self.session.file.get_stream(f"{self.stage}/{key}.html.gz") as stream:
+                    return gzip.decompress(stream.read()).decode()
+            except Exception:
+                # not on the stage yet
+                return None
+        return None
+
+    def _persist(self, key, html):
+        data = gzip.compress(html.encode())
+        if self.persist_dir:
+            path = self.persist_dir / f"{key}.html.gz"
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_bytes(data)
+            tmp_path.replace(path)
+        if self.stage and self.session is not None:
+            self.session.file.put_stream(io.BytesIO(data), f"{self.stage}/{key}.html.gz",
+                                         auto_compress=False, overwrite=True)
+
+    def report(self, key, df):
+        """HTML report for ``key`` from memory, then the persisted copy, and only then profiling ``df``."""
+        html = self.get(key)
+        if html is not None:
+            with self._lock:
+                self.stats['hits'] += 1
+            return html
+
+        html = self._load_persisted(key)
+        if html is not None:
+            with self._lock:
+                self.stats['persisted_hits'] += 1
+        else:
+            with self._lock:
+                self.stats['misses'] += 1
+            html = self.render(df)
+            self._persist(key, html)
+        self.put(key, html)
+        return html
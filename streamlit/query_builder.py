@@ -0,0 +1,224 @@
+# Turns the GAME_360 sidebar selections into parameterized SQL so the warehouse
+# filters and aggregates the players instead of the app container.
+# Every query is returned as (sql, params) with qmark binds for session.sql(sql, params=params),
+# row counts are cast to int and inlined since SAMPLE and LIMIT take literals.
+from typing import NamedTuple
+
+age_ranges_dict = {
+    '0-11': (0, 11),
+    '12-17': (12, 17),
+    '18-24': (18, 24),
+    '25-34': (25, 34),
+    '35-44': (35, 44),
+    '45-54': (45, 54),
+    '55-64': (55, 64),
+    '65+': (65, 100)
+}
+
+# same bins and labels as the pd.cut calls of the page, right edge inclusive
+AGE_GROUP_BINS = [0, 12, 18, 24, 34, 44, 54, 64, 100]
+AGE_GROUP_LABELS = ['0_11', '12_17', '18_24', '25_34', '35_44', '45_54', '55_64', '65+']
+
+EDA_COLUMNS = """r.USER_ID,
+    r.TOTAL_LOGINS,
+    r.LOGGED_IN_AFTER_1_DAY,
+    r.LOGGED_IN_AFTER_7_DAYS,
+    r.LOGGED_IN_AFTER_30_DAYS,
+    r.LOGGED_IN_IN_LAST_30_DAYS,
+    r.DAYS_SINCE_LAST_LOGIN,
+    d.AGE,
+    d.GENDER,
+    d.LOCATION,
+    d.AVERAGE_SESSIONS_PER_ACTIVE_WEEK,
+    d.AVERAGE_SESSION_DURATION,
+    d.PLAYER_TYPE,
+    d.TOTAL_ADS,
+    d.AVG_PURCHASE_AMOUNT_PER_AD,
+    d.HAS_SUPPORT_TICKET,
+    ur.TOTAL_POINTS,
+    ur.RANK_NAME,
+    (
+        CASE WHEN a.VICTORY_ROYALE THEN 1 ELSE 0 END +
+        CASE WHEN a.ELIMINATION_MILESTONES THEN 1 ELSE 0 END +
+        CASE WHEN a.SURVIVAL_ACHIEVEMENTS THEN 1 ELSE 0 END +
+        CASE WHEN a.BUILDING_RESOURCES THEN 1 ELSE 0 END +
+        CASE WHEN a.EXPLORATION_TRAVEL THEN 1 ELSE 0 END +
+        CASE WHEN a.WEAPON_USAGE THEN 1 ELSE 0 END +
+        CASE WHEN a.ASSIST_TEAMMATES THEN 1 ELSE 0 END +
+        CASE WHEN a.EVENT_CHALLENGES THEN 1 ELSE 0 END +
+        CASE WHEN a.CREATIVE_MODE THEN 1 ELSE 0 END +
+        CASE WHEN a.SOCIAL_ACHIEVEMENTS THEN 1 ELSE 0 END
+    ) / 11.0 AS ACHIEVEMENTS_PERCENTAGE,
+    ae.TOTAL_PURCHASES,
+    ae.PROPORTION_PURCHASED,
+    ae.AVERAGE_PURCHASE_AMOUNT,
+    ae.AVERAGE_AD_ENGAGEMENT_TIME,
+    r.CHURNED"""
+# the output names of EDA_COLUMNS, the only columns a page can be sorted by
+EDA_COLUMN_NAMES = [
+    'USER_ID', 'TOTAL_LOGINS', 'LOGGED_IN_AFTER_1_DAY', 'LOGGED_IN_AFTER_7_DAYS', 'LOGGED_IN_AFTER_30_DAYS',
+    'LOGGED_IN_IN_LAST_30_DAYS', 'DAYS_SINCE_LAST_LOGIN', 'AGE', 'GENDER', 'LOCATION',
+    'AVERAGE_SESSIONS_PER_ACTIVE_WEEK', 'AVERAGE_SESSION_DURATION', 'PLAYER_TYPE', 'TOTAL_ADS',
+    'AVG_PURCHASE_AMOUNT_PER_AD', 'HAS_SUPPORT_TICKET', 'TOTAL_POINTS', 'RANK_NAME', 'ACHIEVEMENTS_PERCENTAGE',
+    'TOTAL_PURCHASES', 'PROPORTION_PURCHASED', 'AVERAGE_PURCHASE_AMOUNT', 'AVERAGE_AD_ENGAGEMENT_TIME', 'CHURNED',
+]
+
+
+class EdaFilters(NamedTuple):
+    playerbase: str = 'All'
+    age_ranges: tuple = ()
+    gender: str = 'All'
+    country_ranges: tuple = ()
+    player_type: str = 'All'
+    support_ticket: str = 'All'
+    rank_range: tuple = ()
+
+
+def _table(database, schema, name):
+    # database is None when the schemas are attached directly, like the local SQLite engine
+    return f"{database}.{schema}.{name}" if database else f"{schema}.{name}"
+
+
+def _placeholders(values):
+    return ', '.join('?' for _ in values)
+
+
+# the tables eda_from joins
+EDA_TABLES = ('ANALYTIC.RETENTION', 'ANALYTIC.DEMOGRAPHICS', 'ANALYTIC.USER_RANKINGS', 'RAW.ACHIEVEMENTS', 'ANALYTIC.AD_ENGAGEMENT')
+
+
+def eda_from(database):
+    return f"""FROM {_table(database, 'ANALYTIC', 'RETENTION')} r
+JOIN {_table(database, 'ANALYTIC', 'DEMOGRAPHICS')} d ON r.USER_ID = d.USER_ID
+JOIN {_table(database, 'ANALYTIC', 'USER_RANKINGS')} ur ON r.USER_ID = ur.USER_ID
+JOIN {_table(database, 'RAW', 'ACHIEVEMENTS')} a ON r.USER_ID = a.USER_ID
+JOIN {_table(database, 'ANALYTIC', 'AD_ENGAGEMENT')} ae ON r.USER_ID = ae.USER_ID"""
+
+
+def filter_predicates(filters):
+    """Return the WHERE clause and its bind values for the sidebar selections."""
+    predicates, params = [], []
+
+    if filters.playerbase == 'Active':
+        predicates.append("r.CHURNED = ?")
+        params.append(0)
+    elif filters.playerbase == 'Inactive':
+        predicates.append("r.CHURNED = ?")
+        params.append(1)
+
+    if filters.age_ranges:
+        predicates.append("(" + " OR ".join("d.AGE BETWEEN ? AND ?" for _ in filters.age_ranges) + ")")
+        for age_range in filters.age_ranges:
+            params.extend(age_ranges_dict[age_range])
+
+    if filters.gender in ('Male', 'Female'):
+        predicates.append("d.GENDER = ?")
+        params.append(filters.gender)
+
+    if filters.country_ranges:
+        predicates.append(f"d.LOCATION IN ({_placeholders(filters.country_ranges)})")
+        params.extend(filters.country_ranges)
+
+    if filters.player_type in ('Hardcore', 'Casual'):
+        predicates.append("d.PLAYER_TYPE = ?")
+        params.append(filters.player_type)
+
+    if filters.support_ticket == 'Yes':
+        predicates.append("d.HAS_SUPPORT_TICKET = ?")
+        params.append(True)
+    elif filters.support_ticket == 'No':
+        predicates.append("d.HAS_SUPPORT_TICKET = ?")
+        params.append(False)
+
+    if filters.rank_range:
+        predicates.append(f"ur.RANK_NAME IN ({_placeholders(filters.rank_range)})")
+        params.extend(filters.rank_range)
+
+    where = "WHERE " + "\n  AND ".join(predicates) if predicates else ""
+    return where, params
+
+
+def eda_query(database, filters=EdaFilters(), limit=None, sample=False, dialect='snowflake'):
+    """Players matching ``filters`` with the EDA columns, at most ``limit`` rows, randomly sampled if ``sample``."""
+    where, params = filter_predicates(filters)
+    sql = f"SELECT\n    {EDA_COLUMNS}\n{eda_from(database)}\n{where}"
+    if limit and sample:
+        if dialect == 'snowflake':
+            sql = f"SELECT * FROM (\n{sql}\n) SAMPLE ({int(limit)} ROWS)"
+        else:
+            sql = f"{sql}\nORDER BY RANDOM() LIMIT {int(limit)}"
+    elif limit:
+        sql = f"{sql}\nLIMIT {int(limit)}"
+    return sql, params
+
+
+def eda_page_query(database, filters=EdaFilters(), page_size=25, offset=0, sort_by=None, ascending=True, after_user_id=None):
+    """One page of the players matching ``filters``, ordered by ``sort_by`` with nulls last and then by USER_ID.
+
+    Unsorted pages can be read by keyset, starting after the last USER_ID of the page before, instead of by offset.
+    """
+    if sort_by is not None and sort_by not in EDA_COLUMN_NAMES:
+        raise ValueError(f"Unknown sort column {sort_by!r}")
+    sql, params = eda_query(database, filters)
+    sql = f"SELECT * FROM (\n{sql}\n) p"
+    if sort_by is None and after_user_id is not None:
+        sql = f"{sql}\nWHERE USER_ID > ?"
+        params = params + [int(after_user_id)]
+        offset = 0
+    order_by = "USER_ID" if sort_by is None else f"{sort_by} {'ASC' if ascending else 'DESC'} NULLS LAST, USER_ID"
+    return f"{sql}\nORDER BY {order_by}\nLIMIT {int(page_size)} OFFSET {int(offset)}", params
+
+
+def count_query(database, filters=EdaFilters()):
+    where, params = filter_predicates(filters)
+    return f"SELECT COUNT(*) AS PLAYERS\n{eda_from(database)}\n{where}", params
+
+
+def age_group_expression(column='d.AGE'):
+    cases = "\n        ".join(
+        f"WHEN {column} > {lower} AND {column} <= {upper} THEN '{label}'"
+        for lower, upper, label in zip(AGE_GROUP_BINS[:-1], AGE_GROUP_BINS[1:], AGE_GROUP_LABELS))
+    return f"CASE\n        {cases}\n    END"
+
+
+GROUP_BY_EXPRESSIONS = {
+    'AGE_GROUP': age_group_expression(),
+    'LOCATION': 'd.LOCATION',
+    'PLAYER_TYPE': 'd.PLAYER_TYPE',
+}
+
+
+def churn_rate_query(database, by, filters=EdaFilters()):
+    """Churn rate in percent and player count per value of ``by``, ordered like a pandas groupby."""
+    where, params = filter_predicates(filters)
+    order_by = "MIN(d.AGE)" if by == 'AGE_GROUP' else "GROUP_KEY"
+    return f"""SELECT
+    {GROUP_BY_EXPRESSIONS[by]} AS GROUP_KEY,
+    AVG(r.CHURNED) * 100 AS CHURN_RATE,
+    COUNT(*) AS PLAYERS
+{eda_from(database)}
+{where}
+GROUP BY GROUP_KEY
+HAVING GROUP_KEY IS NOT NULL
+ORDER BY {order_by}""", params
+
+
+def filtered_features_query(database, filters=EdaFilters(), limit=None):
+    """Rolling churn feature rows of the players matching ``filters``."""
+    where, params = filter_predicates(filters)
+    sql = f"""SELECT f.*
+FROM {_table(database, 'APP', 'ROLLING_CHURN_FEATURES')} f
+WHERE f.USER_ID IN (
+SELECT r.USER_ID
+{eda_from(database)}
+{where}
+)"""
+    if limit:
+        sql = f"{sql}\nLIMIT {int(limit)}"
+    return sql, params
+
+
+def save_filtered_query(database, filters=EdaFilters()):
+    """Materialize the filtered players as APP.FILTERED_DF without pulling them into the app."""
+    sql, params = eda_query(database, filters)
+    return f"CREATE OR REPLACE TABLE {_table(database, 'APP', 'FILTERED_DF')} AS\n{sql}", params
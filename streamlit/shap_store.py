@@ -0,0 +1,156 @@
+# The precomputed SHAP explanations of the two churn models, as the "Get Global Shap" forms read them.
+#
+# scripts/batch_explain.py writes APP.ROLLING_CHURN_SHAP, the rolling model's explanation of every row of
+# APP.ROLLING_CHURN_FEATURES, and APP.CHURN_SHAP, the static classifier's of every player of the GAME_360 EDA
+# join. Rows are keyed by (USER_ID, DAY, MODEL_VERSION) and keep the feature values they explain, the SHAP
+# value of every feature, the base value, the churn label as STRATUM and a uniform SAMPLE_KEY. A
+# <table>_SUMMARY table keeps per version, stratum and feature the count, sum and sum of absolute SHAP values.
+#
+# The pages read one player's rows, or a sample of at most a given size drawn per stratum in proportion
+# by the smallest SAMPLE_KEYs, so a global plot is bounded whatever the playerbase, and the global
+# importance from the few dozen rows of the summary.
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from plot_data import PlotSample, class_budgets
+from query_builder import EdaFilters, _table, eda_from, filter_predicates
+
+
+class ExplainedModel(NamedTuple):
+    name: str
+    version: str
+    table: str
+    features: list
+    # +1 when the label is churn, -1 when it is retention, the plots show the contributions towards churn
+    sign: int
+
+
+ROLLING_MODEL = ExplainedModel('Player360_RollingChurn_Classifier', 'v1', 'ROLLING_CHURN_SHAP', [
+    'TOTAL_SESSION_DURATION_ROLLING_30_DAYS',
+    'TOTAL_SESSIONS_ROLLING_30_DAYS',
+    'AVERAGE_SESSION_LEN_ROLLING_30_DAYS',
+    'TOTAL_POINTS_ROLLING_30_DAYS',
+    'AVERAGE_POINTS_PER_SESSION_ROLLING_30_DAYS',
+    'TOTAL_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+    'TOTAL_PURCHASES_ROLLING_30_DAYS',
+    'AVG_PURCHASE_AMOUNT_ROLLING_30_DAYS',
+    'TOTAL_ADS_ROLLING_30_DAYS',
+    'AD_CONVERSION_RATE_ROLLING_30_DAYS',
+    'TOTAL_AD_ENGAGEMENT_TIME_ROLLING_30_DAYS',
+    'AVERAGE_ENGAGEMENT_TIME_ROLLING_30_DAYS',
+], sign=-1)
+STATIC_MODEL = ExplainedModel('Player360_Churn_Classifier', 'v1', 'CHURN_SHAP', [
+    'AGE_GROUP', 'LOCATION', 'AVERAGE_SESSIONS_PER_ACTIVE_WEEK', 'AVERAGE_SESSION_DURATION', 'HAS_SUPPORT_TICKET',
+    'ACHIEVEMENTS_PERCENTAGE', 'PROPORTION_PURCHASED', 'AVERAGE_PURCHASE_AMOUNT', 'AVERAGE_AD_ENGAGEMENT_TIME',
+    'RANK_NAME_OE', 'PLAYER_TYPE_OE', 'GENDER_OE',
+], sign=1)
+MODELS = [ROLLING_MODEL, STATIC_MODEL]
+
+
+def shap_columns(model):
+    return [f"{feature}_SHAP" for feature in model.features]
+
+
+def player_shap_query(database, model, user_id, version=None):
+    """The stored rows of one player, oldest day first."""
+    return f"""SELECT *
+FROM {_table(database, 'APP', model.table)}
+WHERE USER_ID = ? AND MODEL_VERSION = ?
+ORDER BY DAY""", [int(user_id), version or model.version]
+
+
+def importance_query(database, model, version=None):
+    """Mean SHAP and mean absolute SHAP of every feature over all explained rows, most important first."""
+    return f"""SELECT
+    FEATURE,
+    SUM(N) AS N,
+    SUM(SUM_SHAP) / SUM(N) AS MEAN_SHAP,
+    SUM(SUM_ABS_SHAP) / SUM(N) AS MEAN_ABS_SHAP
+FROM {_table(database, 'APP', model.table + '_SUMMARY')}
+WHERE MODEL_VERSION = ?
+GROUP BY FEATURE
+ORDER BY MEAN_ABS_SHAP DESC""", [version or model.version]
+
+
+def _filtered_rows(database, model, filters, version):
+    where, params = filter_predicates(filters)
+    rows = f"FROM {_table(database, 'APP', model.table)} s\nWHERE s.MODEL_VERSION = ?"
+    if not where:
+        return rows, [version or model.version]
+    return f"""{rows}
+  AND s.USER_ID IN (
+SELECT r.USER_ID
+{eda_from(database)}
+{where}
+)""", [version or model.version] + params
+
+
+def strata_query(database, model, filters=EdaFilters(), version=None):
+    """Explained rows per stratum of the players matching ``filters``, from the summary table when all match."""
+    if not filter_predicates(filters)[0]:
+        return f"""SELECT STRATUM, MAX(N) AS N
+FROM {_table(database, 'APP', model.table + '_SUMMARY')}
+WHERE MODEL_VERSION = ?
+GROUP BY STRATUM
+ORDER BY STRATUM""", [version or model.version]
+    rows, params = _filtered_rows(database, model, filters, version)
+    return f"SELECT s.STRATUM, COUNT(*) AS N\n{rows}\nGROUP BY s.STRATUM\nORDER BY s.STRATUM", params
+
+
+def sample_query(database, model, budgets, filters=EdaFilters(), version=None):
+    """The rows with the smallest SAMPLE_KEYs of every stratum, ``budgets[stratum]`` of them."""
+    rows, params = _filtered_rows(database, model, filters, version)
+    branches, all_params = [], []
+    for stratum, budget in budgets.items():
+        if not budget:
+            continue
+        stratum_rows = f"{rows}\n  AND s.STRATUM IS NULL" if stratum is None else f"{rows}\n  AND s.STRATUM = ?"
+        branches.append(f"SELECT * FROM (\nSELECT s.*\n{stratum_rows}\nORDER BY s.SAMPLE_KEY\nLIMIT {int(budget)}\n)")
+        all_params += params + ([] if stratum is None else [stratum])
+    if not branches:
+        return f"SELECT s.*\n{rows}\nLIMIT 0", params
+    return "\nUNION ALL\n".join(branches), all_params
+
+
+def read_sample(read, database, model, budget, filters=EdaFilters(), version=None):
+    """A PlotSample of at most ``budget`` stored rows of the players matching ``filters``.
+
+    ``read(sql, params)`` runs a query and returns a frame, like the pages' load_query.
+    """
+    strata_df = read(*strata_query(database, model, filters, version))
+    totals = {None if pd.isna(stratum) else int(stratum): int(n) for stratum, n in zip(strata_df['STRATUM'], strata_df['N'])}
+    budgets = class_budgets(totals, budget) if totals else {}
+    frame = read(*sample_query(database, model, budgets, filters, version))
+    return PlotSample(frame, totals, budgets)
+
+
+def plot_values(model, frame):
+    """The SHAP values and feature values of stored rows, signed towards churn, for shap.summary_plot."""
+    return model.sign * frame[shap_columns(model)].to_numpy(dtype=np.float64), frame[model.features].astype(np.float64)
+
+
+def draw_importance(importance_df, model, title=None):
+    """The bar summary plot drawn from importance_query, mean absolute SHAP per feature."""
+    import matplotlib.pyplot as plt
+
+    df = importance_df.iloc[::-1]
+    fig, ax = plt.subplots(figsize=(8, 4))
+    ax.barh(df['FEATURE'], df['MEAN_ABS_SHAP'], color='#008bfb')
+    ax.set_xlabel("mean(|SHAP value|) (average impact on model output magnitude)")
+    ax.spines[['top', 'right']].set_visible(False)
+    if title:
+        ax.set_title(title)
+    fig.tight_layout()
+    return fig
+
+
+def draw_shap_summary(shap_values, features, plot_type='dot'):
+    """``shap.summary_plot`` of the forms, module level so plot_artifacts can render it in a worker."""
+    import matplotlib.pyplot as plt
+    import shap
+
+    plt.figure(figsize=(8, 4))
+    shap.summary_plot(shap_values, features, show=False, plot_type=plot_type)
+    plt.tight_layout()
@@ -0,0 +1,251 @@
+# Pre-aggregated player summaries behind the GAME_360 static demographics charts.
+#
+# ANALYTIC.CHURN_SEGMENTS counts players and churned players per age group, location and player type, and
+# ANALYTIC.CORRELATION_MOMENTS keeps, per segment and pair of numeric EDA columns, the count, the means and
+# the centered second moments and co-moment of the players where both columns are set. Centered moments
+# merge across segments exactly with the pooled formula, so the page reads about a hundred rows instead of
+# every player, and keep their precision for large values where raw sums of squares and products cancel.
+# Both are dynamic tables deployed by scripts/summary_tables_build.sql, rendered from the queries below.
+#
+#   python streamlit/summary_stats.py            # rewrite scripts/summary_tables_build.sql
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from query_builder import EDA_COLUMNS, GROUP_BY_EXPRESSIONS, _table, eda_from
+
+# the summaries are kept per segment, every churn rate chart groups by one of these
+SEGMENT_COLUMNS = ['AGE_GROUP', 'LOCATION', 'PLAYER_TYPE']
+# the numeric columns eda_df.describe() picks for the correlation heatmap, the LOGGED_IN flags are booleans
+SUMMARY_COLUMNS = [
+    'USER_ID', 'TOTAL_LOGINS', 'DAYS_SINCE_LAST_LOGIN', 'AGE', 'AVERAGE_SESSIONS_PER_ACTIVE_WEEK',
+    'AVERAGE_SESSION_DURATION', 'TOTAL_ADS', 'AVG_PURCHASE_AMOUNT_PER_AD', 'TOTAL_POINTS', 'ACHIEVEMENTS_PERCENTAGE',
+    'TOTAL_PURCHASES', 'PROPORTION_PURCHASED', 'AVERAGE_PURCHASE_AMOUNT', 'AVERAGE_AD_ENGAGEMENT_TIME', 'CHURNED',
+]
+MOMENT_COLUMNS = ['N', 'MEAN_A', 'MEAN_B', 'M2_A', 'M2_B', 'C_AB']
+
+# the summary tables, for the lineage token of what the page draws from them
+SUMMARY_TABLES = ('ANALYTIC.CHURN_SEGMENTS', 'ANALYTIC.CORRELATION_MOMENTS')
+
+
+def column_pairs(columns=SUMMARY_COLUMNS):
+    """Every pair of ``columns`` once, in column order and with the diagonal, the variances come from (a, a)."""
+    return [(a, b) for i, a in enumerate(columns) for b in columns[i:]]
+
+
+def _players(database):
+    # the EDA columns of every player plus the age group, as the page bins it
+    return f"""players AS (
+    SELECT
+    {GROUP_BY_EXPRESSIONS['AGE_GROUP']} AS AGE_GROUP,
+    {EDA_COLUMNS}
+{eda_from(database)}
+)"""
+
+
+def churn_segments_query(database):
+    """Players, churned players and the youngest age per segment, the source of ANALYTIC.CHURN_SEGMENTS."""
+    segments = ', '.join(SEGMENT_COLUMNS)
+    return f"""WITH {_players(database)}
+SELECT
+    {segments},
+    COUNT(*) AS PLAYERS,
+    SUM(CHURNED) AS CHURNED_PLAYERS,
+    MIN(AGE) AS MIN_AGE
+FROM players
+GROUP BY {segments}"""
+
+
+def _case(alias, columns, suffix=''):
+    # the value of the column named in the pair row, one CASE instead of one branch per pair
+    cases = "\n            ".join(f"WHEN '{column}' THEN v.{column}{suffix}" for column in columns)
+    return f"CASE p.{alias}\n            {cases}\n        END"
+
+
+def correlation_moments_query(database, columns=SUMMARY_COLUMNS):
+    """Pairwise centered moments per segment, the source of ANALYTIC.CORRELATION_MOMENTS.
+
+    The players are read once. Every value is shifted by its segment mean, then crossed with the list of column
+    pairs and aggregated in one GROUP BY. The pair means are the shift plus the mean shifted value, and the
+    second moments and co-moment the shifted sums less their mean term, which is small after the shift.
+    """
+    segments = ', '.join(SEGMENT_COLUMNS)
+    segment_keys = ', '.join(f"v.{column}" for column in SEGMENT_COLUMNS)
+    # as FLOAT so the sums of squares cannot overflow an integer
+    values = ',\n        '.join(f"CAST({column} AS FLOAT) AS {column}" for column in columns)
+    shifted = ',\n        '.join(f"{column} - AVG({column}) OVER (PARTITION BY {segments}) AS {column},\n        "
+                                  f"AVG({column}) OVER (PARTITION BY {segments}) AS {column}_SHIFT" for column in columns)
+    names = '\n    UNION ALL '.join(f"SELECT {i} AS I, '{column}' AS NAME" for i, column in enumerate(columns))
+    return f"""WITH {_players(database)},
+player_values AS (
+    SELECT
+        {segments},
+        {values}
+    FROM players
+),
+shifted_values AS (
+    SELECT
+        {segments},
+        {shifted}
+    FROM player_values
+),
+column_names AS (
+    {names}
+),
+pairs AS (
+    SELECT a.NAME AS COLUMN_A, b.NAME AS COLUMN_B
+    FROM column_names a
+    JOIN column_names b ON a.I <= b.I
+),
+pair_values AS (
+    SELECT
+        {segment_keys},
+        p.COLUMN_A,
+        p.COLUMN_B,
+        {_case('COLUMN_A', columns)} AS A,
+        {_case('COLUMN_B', columns)} AS B,
+        {_case('COLUMN_A', columns, '_SHIFT')} AS SHIFT_A,
+        {_case('COLUMN_B', columns, '_SHIFT')} AS SHIFT_B
+    FROM shifted_values v
+    CROSS JOIN pairs p
+)
+SELECT
+    {segments},
+    COLUMN_A,
+    COLUMN_B,
+    COUNT(*) AS N,
+    MAX(SHIFT_A) + AVG(A) AS MEAN_A,
+    MAX(SHIFT_B) + AVG(B) AS MEAN_B,
+    SUM(A * A) - SUM(A) * SUM(A) / COUNT(*) AS M2_A,
+    SUM(B * B) - SUM(B) * SUM(B) / COUNT(*) AS M2_B,
+    SUM(A * B) - SUM(A) * SUM(B) / COUNT(*) AS C_AB
+FROM pair_values
+WHERE A IS NOT NULL AND B IS NOT NULL
+GROUP BY {segments}, COLUMN_A, COLUMN_B"""
+
+
+def segment_churn_rate_query(database, by):
+    """Churn rate in percent and player count per value of ``by`` from the segments, shaped like churn_rate_query."""
+    if by not in SEGMENT_COLUMNS:
+        raise ValueError(f"Unknown segment column {by!r}")
+    order_by = "MIN(MIN_AGE)" if by == 'AGE_GROUP' else "GROUP_KEY"
+    return f"""SELECT
+    {by} AS GROUP_KEY,
+    SUM(CHURNED_PLAYERS) * 100.0 / SUM(PLAYERS) AS CHURN_RATE,
+    SUM(PLAYERS) AS PLAYERS
+FROM {_table(database, 'ANALYTIC', 'CHURN_SEGMENTS')}
+GROUP BY GROUP_KEY
+HAVING GROUP_KEY IS NOT NULL
+ORDER BY {order_by}""", []
+
+
+def merged_moments_query(database):
+    """The moments of every column pair merged over all segments, one row per pair.
+
+    The pooled means are the count weighted segment means, the pooled second moments and co-moment the sums of
+    the segments' plus the spread of the segment means around the pooled ones.
+    """
+    table = _table(database, 'ANALYTIC', 'CORRELATION_MOMENTS')
+    return f"""WITH pooled AS (
+    SELECT
+        COLUMN_A,
+        COLUMN_B,
+        SUM(N) AS N,
+        SUM(N * MEAN_A) / SUM(N) AS MEAN_A,
+        SUM(N * MEAN_B) / SUM(N) AS MEAN_B
+    FROM {table}
+    WHERE N > 0
+    GROUP BY COLUMN_A, COLUMN_B
+)
+SELECT
+    m.COLUMN_A,
+    m.COLUMN_B,
+    p.N,
+    p.MEAN_A,
+    p.MEAN_B,
+    SUM(m.M2_A + m.N * (m.MEAN_A - p.MEAN_A) * (m.MEAN_A - p.MEAN_A)) AS M2_A,
+    SUM(m.M2_B + m.N * (m.MEAN_B - p.MEAN_B) * (m.MEAN_B - p.MEAN_B)) AS M2_B,
+    SUM(m.C_AB + m.N * (m.MEAN_A - p.MEAN_A) * (m.MEAN_B - p.MEAN_B)) AS C_AB
+FROM {table} m
+JOIN pooled p ON p.COLUMN_A = m.COLUMN_A AND p.COLUMN_B = m.COLUMN_B
+WHERE m.N > 0
+GROUP BY m.COLUMN_A, m.COLUMN_B, p.N, p.MEAN_A, p.MEAN_B""", []
+
+
+def merge_moments(moments_df):
+    """The rows of the same column pair merged like merged_moments_query, indexed by (COLUMN_A, COLUMN_B)."""
+    df = moments_df[moments_df['N'] > 0]
+    keys = [df['COLUMN_A'], df['COLUMN_B']]
+    n = df.groupby(keys)['N'].transform('sum')
+    mean_a = (df['N'] * df['MEAN_A']).groupby(keys).transform('sum') / n
+    mean_b = (df['N'] * df['MEAN_B']).groupby(keys).transform('sum') / n
+    merged = pd.DataFrame({
+        'COLUMN_A': df['COLUMN_A'], 'COLUMN_B': df['COLUMN_B'], 'N': n, 'MEAN_A': mean_a, 'MEAN_B': mean_b,
+        'M2_A': df['M2_A'] + df['N'] * (df['MEAN_A'] - mean_a) ** 2,
+        'M2_B': df['M2_B'] + df['N'] * (df['MEAN_B'] - mean_b) ** 2,
+        'C_AB': df['C_AB'] + df['N'] * (df['MEAN_A'] - mean_a) * (df['MEAN_B'] - mean_b),
+    })
+    return merged.groupby(['COLUMN_A', 'COLUMN_B']).agg(
+        {'N': 'first', 'MEAN_A': 'first', 'MEAN_B': 'first', 'M2_A': 'sum', 'M2_B': 'sum', 'C_AB': 'sum'})
+
+
+def correlation_matrix(moments_df, columns=SUMMARY_COLUMNS):
+    """Pearson correlation matrix of ``columns`` from their moments, like DataFrame.corr() on the players.
+
+    Rows of the same pair are merged first, so segment rows can be passed as they are stored.
+    """
+    moments = merge_moments(moments_df)
+    matrix = pd.DataFrame(np.nan, index=list(columns), columns=list(columns))
+    for (a, b), row in moments.iterrows():
+        if a not in matrix.index or b not in matrix.index or row['N'] < 2:
+            continue
+        if row['M2_A'] <= 0 or row['M2_B'] <= 0:
+            continue
+        # rounding can push a perfect correlation just past 1
+        matrix.loc[a, b] = matrix.loc[b, a] = float(np.clip(row['C_AB'] / np.sqrt(row['M2_A'] * row['M2_B']), -1.0, 1.0))
+    return matrix
+
+
+def build_script(database='PLAYER_360'):
+    """Return the Snowflake deployment script for the summary dynamic tables."""
+    return f"""-- Generated by streamlit/summary_stats.py, edit the generator and rerun it instead of this file.
+-- Run after analytic_build.sql, it reads ANALYTIC.RETENTION, DEMOGRAPHICS, USER_RANKINGS, AD_ENGAGEMENT and RAW.ACHIEVEMENTS.
+-- RETENTION is refreshed in full since it depends on CURRENT_DATE, refresh_mode AUTO picks what the upstream tables allow.
+USE ROLE SYSADMIN;
+USE WAREHOUSE PLAYER_360_BUILD_WH;
+USE SCHEMA {database}.ANALYTIC;
+
+-- 1. Players and churned players per age group, location and player type for the churn rate charts
+CREATE OR REPLACE DYNAMIC TABLE {database}.ANALYTIC.CHURN_SEGMENTS(
+    {', '.join(SEGMENT_COLUMNS)},
+    PLAYERS,
+    CHURNED_PLAYERS,
+    MIN_AGE
+) TARGET_LAG = '1 days' refresh_mode = AUTO initialize = ON_CREATE warehouse = PLAYER_360_BUILD_WH
+AS
+{churn_segments_query(database)};
+
+-- 2. Count, means, centered second moments and co-moment per segment and column pair for the correlation matrix
+CREATE OR REPLACE DYNAMIC TABLE {database}.ANALYTIC.CORRELATION_MOMENTS(
+    {', '.join(SEGMENT_COLUMNS)},
+    COLUMN_A,
+    COLUMN_B,
+    {', '.join(MOMENT_COLUMNS)}
+) TARGET_LAG = '1 days' refresh_mode = AUTO initialize = ON_CREATE warehouse = PLAYER_360_BUILD_WH
+AS
+{correlation_moments_query(database)};
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', type=Path, default=Path(__file__).resolve().parents[1] / 'scripts' / 'summary_tables_build.sql')
+    args = parser.parse_args()
+    args.output.write_text(build_script())
+    print(f"wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
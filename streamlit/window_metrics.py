@@ -0,0 +1,108 @@
+# Time window sums and counts over the per-player frames of PLAYER_360.
+# Each frame is sorted by its timestamp once and keeps prefix sums of the summed columns, so any
+# window [start, end), or [start, end] with include_end, is two searchsorted calls and a subtraction,
+# whatever the window length.
+import numpy as np
+import pandas as pd
+
+METRICS = [
+    'TOTAL_POINTS',
+    'TOTAL_LOGINS',
+    'TOTAL_ADS',
+    'TOTAL_PURCHASES',
+    'PROPORTION_PURCHASED',
+    'TOTAL_PURCHASE_AMOUNT',
+    'AVERAGE_PURCHASE_AMOUNT',
+    'AVERAGE_AD_ENGAGEMENT_TIME',
+]
+# counts are shown as integers, everything else rounded to cents
+COUNT_METRICS = {'TOTAL_LOGINS', 'TOTAL_ADS', 'TOTAL_PURCHASES'}
+
+
+def _datetime64(value):
+    return pd.Timestamp(value).to_datetime64()
+
+
+def safe_divide(numerator, denominator, default_value=0):
+    if denominator == 0:
+        return default_value
+    return numerator / denominator
+
+
+class TimeIndex:
+    def __init__(self, df, time_col, sum_cols=()):
+        times = pd.to_datetime(df[time_col]).to_numpy()
+        order = np.argsort(times, kind='stable')
+        self.times = times[order]
+        # prefix[col][i] is the sum of the first i rows in time order, missing values count as 0
+        self.prefix = {}
+        for col in sum_cols:
+            values = np.nan_to_num(df[col].to_numpy(dtype=float)[order])
+            self.prefix[col] = np.concatenate([[0.0], np.cumsum(values)])
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + sum(prefix.nbytes for prefix in self.prefix.values())
+
+    def bounds(self, start=None, end=None, include_end=False):
+        """Positions of the rows with ``start <= time < end``, ``time <= end`` with ``include_end``, either side
+        open when None."""
+        lo = 0 if start is None else int(np.searchsorted(self.times, _datetime64(start), side='left'))
+        side = 'right' if include_end else 'left'
+        hi = len(self.times) if end is None else int(np.searchsorted(self.times, _datetime64(end), side=side))
+        return lo, max(lo, hi)
+
+    def count(self, start=None, end=None, include_end=False):
+        lo, hi = self.bounds(start, end, include_end)
+        return hi - lo
+
+    def sum(self, col, start=None, end=None, include_end=False):
+        lo, hi = self.bounds(start, end, include_end)
+        return self.prefix[col][hi] - self.prefix[col][lo]
+
+
+class PlayerWindows:
+    def __init__(self, points_df, purchases_df):
+        # every POINTS_PER_EVENT row is one login, every PURCHASES row one ad
+        self.points = TimeIndex(points_df, 'LOG_IN', ['TOTAL_POINTS'])
+        purchases_df = purchases_df.assign(IS_PURCHASE=(purchases_df['PURCHASE_TYPE'] != 'none').astype(int))
+        self.purchases = TimeIndex(purchases_df, 'TIMESTAMP_OF_PURCHASE', ['PURCHASE_AMOUNT', 'AD_ENGAGEMENT_TIME', 'IS_PURCHASE'])
+
+    @property
+    def nbytes(self):
+        return self.points.nbytes + self.purchases.nbytes
+
+    def metrics(self, start=None, end=None, include_end=False):
+        """The eight metric values over ``[start, end)``, ``[start, end]`` with ``include_end``."""
+        window = (start, end, include_end)
+        total_ads = self.purchases.count(*window)
+        total_purchases = int(round(self.purchases.sum('IS_PURCHASE', *window)))
+        total_purchase_amount = self.purchases.sum('PURCHASE_AMOUNT', *window)
+        return {
+            'TOTAL_POINTS': self.points.sum('TOTAL_POINTS', *window),
+            'TOTAL_LOGINS': self.points.count(*window),
+            'TOTAL_ADS': total_ads,
+            'TOTAL_PURCHASES': total_purchases,
+            'PROPORTION_PURCHASED': safe_divide(total_purchases, total_ads) * 100,
+            'TOTAL_PURCHASE_AMOUNT': total_purchase_amount,
+            'AVERAGE_PURCHASE_AMOUNT': safe_divide(total_purchase_amount, total_purchases),
+            'AVERAGE_AD_ENGAGEMENT_TIME': safe_divide(self.purchases.sum('AD_ENGAGEMENT_TIME', *window), total_ads),
+        }
+
+    def compare(self, start, days, end=None):
+        """{metric: (value, delta)} of ``[start, end)`` against the ``days`` before ``start``.
+
+        The previous window is ``[start - days, start]`` like the save_filter block it replaced, a row exactly at
+        ``start`` counts in both windows.
+        """
+        previous_start = pd.Timestamp(start) - pd.Timedelta(days=days)
+        current = self.metrics(start, end)
+        previous = self.metrics(previous_start, start, include_end=True)
+        results = {}
+        for metric in METRICS:
+            delta = current[metric] - previous[metric]
+            results[metric] = (current[metric], int(delta) if metric in COUNT_METRICS else round(float(delta), 2))
+        return results